@@ -1,18 +1,29 @@
 import nmap
 import csv
-import pandas as pd
 from dotenv import load_dotenv
 import os
-import google.generativeai as genai  # For Gemini API integration
-from openai import OpenAI
-from ollama import chat, ChatResponse
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI and Google API clients
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# OpenAI and Google API clients, created on first use so each run only loads the SDK it calls
+_client = None
+_genai = None
+
+def get_openai_client():
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    return _client
+
+def get_genai():
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai  # For Gemini API integration
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        _genai = genai
+    return _genai
 
 # Function to call the Gemini API (assumed to be a REST API)
 def classify_with_gemini(results):
@@ -22,7 +33,7 @@ def classify_with_gemini(results):
             raise ValueError("Google API key is missing.")
 
         # Initialize the Gemini 1.5 model using Google's GenAI SDK
-        model = genai.GenerativeModel('models/gemini-1.5-pro')  # Ensure the correct model name is used
+        model = get_genai().GenerativeModel('models/gemini-1.5-pro')  # Ensure the correct model name is used
 
         # Prepare the context and question (scan results)
         prompt = (
@@ -81,6 +92,7 @@ def classify_with_ollama(results):
         )
 
         # Use Ollama's local model for classification (llama2 or another model you have available)
+        from ollama import chat, ChatResponse
         response: ChatResponse = chat(
             model="gemma2",
             messages=[{"role": "user", "content": prompt}]
@@ -109,7 +121,7 @@ def classify_scan(results):
 
     # Try OpenAI first
     try:
-        user_msg_input_class = client.chat.completions.create(
+        user_msg_input_class = get_openai_client().chat.completions.create(
             model="gpt-4",
             messages=[
                 {
@@ -219,6 +231,7 @@ def scan_with_fallback(target):
     return results
 
 def generate_final_report():
+    import pandas as pd
     # Combine results from initial and follow-up scans
     df_initial = pd.read_csv("initial_scan_results.csv")
     try:
@@ -1,18 +1,29 @@
 import nmap
 import csv
-import pandas as pd
 from dotenv import load_dotenv
 import os
-import google.generativeai as genai  # For Gemini API integration
-from openai import OpenAI
-from ollama import chat, ChatResponse
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI and Google API clients
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# OpenAI and Google API clients, created on first use so each run only loads the SDK it calls
+_client = None
+_genai = None
+
+def get_openai_client():
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    return _client
+
+def get_genai():
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai  # For Gemini API integration
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        _genai = genai
+    return _genai
 
 # Function to call the Gemini API (assumed to be a REST API)
 def classify_with_gemini(results):
@@ -23,7 +34,7 @@ def classify_with_gemini(results):
             raise ValueError("Google API key is missing.")
 
         # Initialize the Gemini 1.5 model using Google's GenAI SDK
-        model = genai.GenerativeModel('models/gemini-1.5-pro')  # Ensure the correct model name is used
+        model = get_genai().GenerativeModel('models/gemini-1.5-pro')  # Ensure the correct model name is used
 
         # Prepare the context and question (scan results)
         prompt = (
@@ -80,6 +91,7 @@ def classify_with_ollama(results):
         )
 
         # Use Ollama's local model for classification (llama2 or another model you have available)
+        from ollama import chat, ChatResponse
         response: ChatResponse = chat(
             model="gemma2", 
             messages=[{"role": "user", "content": prompt}]
@@ -111,7 +123,7 @@ def classify_scan(results):
 
     # Try OpenAI first
     try:
-        user_msg_input_class = client.chat.completions.create(
+        user_msg_input_class = get_openai_client().chat.completions.create(
             model="gpt-4",
             messages=[
                 {
@@ -185,6 +197,36 @@ def run_nmap_scan(target, scan_arguments):
                 })
     return results
 
+AMBIGUOUS_STATES = {"filtered", "open|filtered", "closed|filtered", "unfiltered"}
+
+def is_ambiguous(result):
+    return result['State'] in AMBIGUOUS_STATES or result.get('Name') == 'tcpwrapped' \
+        or result.get('Final Classification') == "Incomplete"
+
+def run_targeted_rescan(target, results, scan_arguments='-sS -T2'):
+    # Only revisit the ambiguous ports, grouping hosts that need the same ones into one scan
+    ports_by_host = {}
+    for result in results:
+        if is_ambiguous(result):
+            ports_by_host.setdefault(result['IP'], set()).add((result['Protocol'], int(result['Port'])))
+    if not ports_by_host:
+        print("No ambiguous ports to target. Rescanning the whole target...")
+        return run_nmap_scan(target, scan_arguments)
+
+    hosts_by_ports = {}
+    for host, ports in ports_by_host.items():
+        tcp = ",".join(str(port) for proto, port in sorted(ports) if proto == 'tcp')
+        udp = ",".join(str(port) for proto, port in sorted(ports) if proto == 'udp')
+        port_spec = ",".join(part for part in (tcp and f"T:{tcp}", udp and f"U:{udp}") if part)
+        hosts_by_ports.setdefault(port_spec, []).append(host)
+
+    rescan_results = []
+    for port_spec, hosts in hosts_by_ports.items():
+        arguments = f"{scan_arguments} -sU -p {port_spec}" if "U:" in port_spec else f"{scan_arguments} -p {port_spec}"
+        print(f"Rescanning {', '.join(hosts)} with: {arguments}")
+        rescan_results.extend(run_nmap_scan(" ".join(hosts), arguments))
+    return rescan_results
+
 def save_results_to_csv(results, filename="scan_results.csv"):
     if results:
         keys = results[0].keys()
@@ -217,12 +259,13 @@ def scan_with_fallback(target):
     # Step 4: If classification is incomplete, run a lighter scan
     if "Incomplete" in [result['Final Classification'] for result in results]:
         print("Running lighter scan due to incomplete results...")
-        light_results = run_nmap_scan(target, '-sS -T2')
+        light_results = run_targeted_rescan(target, results)
         save_results_to_csv(light_results, "light_scan_results.csv")
     
     return results
 
 def generate_final_report():
+    import pandas as pd
     # Combine results from initial and any follow-up scans
     df_initial = pd.read_csv("initial_scan_results.csv")
     try:
@@ -1,21 +1,194 @@
+import json
+import time
+from importlib.util import find_spec
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import automator_client.constants as const
 
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_session = None
+
+
+def get_session() -> requests.Session:
+    """
+    Shared session, so reruns and job polling reuse connections to the API.
+
+    Asks for the most compact encodings the installed packages can decode:
+    Arrow (pyarrow comes with streamlit), then MessagePack, then JSON, and zstd
+    compression when zstandard is installed.
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=const.HTTP_POOL_CONNECTIONS, pool_maxsize=const.HTTP_POOL_MAXSIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        accept = []
+        if find_spec("pyarrow") is not None:
+            accept.append(const.ARROW_MEDIA_TYPE)
+        if find_spec("msgpack") is not None:
+            accept.append(f"{const.MSGPACK_MEDIA_TYPE};q=0.9")
+        accept.append("application/json;q=0.8")
+        encodings = ["gzip", "deflate"]
+        if find_spec("zstandard") is not None:
+            encodings.insert(0, "zstd")
+        session.headers.update({"Accept": ", ".join(accept), "Accept-Encoding": ", ".join(encodings)})
+        _session = session
+    return _session
+
+
+def _join_arrow_rows(body: bytes) -> dict:
+    """Rebuild the payload of an Arrow response: the rows go back into the results of their target."""
+    import pyarrow as pa
+
+    table = pa.ipc.open_stream(body).read_all()
+    payload = json.loads(table.schema.metadata[b"payload"])
+    holder = payload if "data" in payload else payload["result"]
+    names = table.column_names
+    columns = []
+    for name in names:
+        column = table.column(name)
+        if not pa.types.is_dictionary(column.type):
+            columns.append(column.to_pylist())
+            continue
+        values = []
+        for chunk in column.chunks:
+            dictionary = chunk.dictionary.to_pylist() + [None]
+            values.extend(dictionary[index] for index in chunk.indices.fill_null(len(dictionary) - 1).to_pylist())
+        columns.append(values)
+    for values in zip(*columns):
+        row = dict(zip(names, values))
+        holder["data"][row.pop("_target")]["results"].append(row)
+    return payload
+
+
+def decode_response(response: requests.Response):
+    """Decode a JSON, MessagePack or Arrow response body."""
+    body = response.content
+    if body.startswith(ZSTD_MAGIC):
+        # urllib3 only decodes zstd with an optional backport, so do it here
+        import zstandard
+        body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+    if content_type == const.ARROW_MEDIA_TYPE:
+        return _join_arrow_rows(body)
+    if content_type in (const.MSGPACK_MEDIA_TYPE, "application/x-msgpack"):
+        import msgpack
+        return msgpack.unpackb(body)
+    return json.loads(body)
+
 
 def post_request(endpoint: str, payload):
     """Send the scan request and handle the response."""
     try:
-        response = requests.post(endpoint, json=payload)
+        response = get_session().post(endpoint, json=payload)
+        if response.status_code in (200, 202):
+            return decode_response(response), None
+        else:
+            return None, f"Error: {response.status_code} - {response.text}"
+    except requests.RequestException as e:
+        return None, f"API request failed: {e}"
+
+
+def get_request(endpoint: str):
+    """Fetch a resource from the API and handle the response."""
+    try:
+        response = get_session().get(endpoint)
         if response.status_code == 200:
-            return response.json(), None
+            return decode_response(response), None
         else:
             return None, f"Error: {response.status_code} - {response.text}"
     except requests.RequestException as e:
         return None, f"API request failed: {e}"
 
 
+def format_duration(seconds: float) -> str:
+    """Format a duration in seconds as a short human readable string."""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}h {minutes}m"
+    if minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+
+def render_scan_estimate(result):
+    """Display the predicted duration of a scan before it is submitted."""
+    estimate = result["estimate"]
+    st.info(
+        f"Estimated duration: **{format_duration(estimate['seconds'])}** "
+        f"(between {format_duration(estimate['low_seconds'])} and {format_duration(estimate['high_seconds'])}) "
+        f"for {estimate['host_count']} host(s) and {estimate['port_count']} port(s), "
+        f"calibrated on {estimate['calibration_samples']} previous scan(s)."
+    )
+    if not result["admissible"]:
+        st.warning(f"The server would refuse this scan: {result['reason']}")
+
+
+def cancel_job(job_id: str, kind: str):
+    """Ask the server to cancel a job; its partial results are shown on the next run."""
+    job, error = post_request(endpoint=f"{const.JOBS_ENDPOINT}/{job_id}/cancel", payload={})
+    if error:
+        st.session_state["cancel_error"] = error
+    st.session_state[f"cancelled_{kind}_job_id"] = job_id
+
+
+def render_cancelled_job(kind: str, render):
+    """A cancel click interrupts the polling of its job; wait for the job to stop and render what it found."""
+    job_id = st.session_state.pop(f"cancelled_{kind}_job_id", None)
+    if not job_id:
+        return
+    cancel_error = st.session_state.pop("cancel_error", None)
+    if cancel_error:
+        st.error(f"Error cancelling job: {cancel_error}")
+    job, error = get_request(f"{const.JOBS_ENDPOINT}/{job_id}")
+    result = None
+    if job:
+        result, error = wait_for_job(job, kind)
+    if error:
+        st.error(f"Error running {kind}: {error}")
+    elif result:
+        render(result)
+
+
+def job_progress_text(job) -> str:
+    """Describe a job's progress, preferring the live figures reported by nmap when there are any."""
+    progress = job["progress"]
+    text = f"{job['status'].capitalize()} - {progress['percent']}% - ETA {format_duration(progress['eta_seconds'])}"
+    nmap_progress = progress.get("nmap")
+    if nmap_progress and nmap_progress["phase"]:
+        text += f" - nmap {nmap_progress['phase']}: {nmap_progress['percent']}%"
+        if nmap_progress["eta_seconds"] is not None:
+            text += f", {format_duration(nmap_progress['eta_seconds'])} left"
+    return text
+
+
+def wait_for_job(job, kind: str = "scan"):
+    """Poll a scan job until it finishes, showing a live progress bar, ETA and a cancel button."""
+    progress_bar = st.progress(0, text="Waiting for the scan to start...")
+    if job["status"] in ("queued", "running"):
+        st.button("Cancel", key=f"cancel_{job['job_id']}", on_click=cancel_job, args=(job["job_id"], kind))
+    while job["status"] in ("queued", "running"):
+        progress_bar.progress(int(job["progress"]["percent"]) / 100, text=job_progress_text(job))
+        time.sleep(const.JOB_POLL_INTERVAL_SECONDS)
+        job, error = get_request(f"{const.JOBS_ENDPOINT}/{job['job_id']}")
+        if error:
+            return None, error
+    progress_bar.progress(1.0, text="Scan finished.")
+
+    if job["status"] == "failed":
+        return None, job["error"]
+    if job["status"] == "cancelled":
+        st.warning(f"{kind.capitalize()} cancelled. The results gathered before the cancellation are shown below.")
+    elif job["status"] == "timed_out":
+        st.warning(f"{job['error']} The results gathered so far are shown below.")
+    return job["result"], None
+
+
 def render_scan_results(scan_results, scan_file_path, scan_dir_path):
     """Display scan results in a table."""
     st.success("Nmap scan completed. Results displayed below.")
@@ -25,11 +198,12 @@ def render_scan_results(scan_results, scan_file_path, scan_dir_path):
         for subdomain_entry in scan_results
         for entry in subdomain_entry["results"]
     ]
-    df = pd.DataFrame(flattened_results)
-    st.dataframe(df)
+    if len(flattened_results) <= const.INLINE_RESULT_ROWS:
+        st.dataframe(pd.DataFrame(flattened_results))
+    else:
+        st.info(f"{len(flattened_results)} rows found. Browse them page by page in the results section below.")
     st.session_state["scan_file_path"] = scan_file_path
     st.session_state["scan_dir_path"] = scan_dir_path
-    st.session_state["scan_results"] = flattened_results
 
 
 def render_analysis_results(result):
@@ -38,6 +212,16 @@ def render_analysis_results(result):
         st.subheader("LLM Analysis Results")
         st.write(f"**Analysis Description:** {result['analysis_description']}")
         st.write(f"**Classification:** {result['result']}")
+        if result.get("source") == "fast_path":
+            st.caption(f"Classified by the rule-based fast path (confidence {result['confidence']:.0%}), no LLM call was made.")
+        if result.get("hosts"):
+            st.subheader("Per-Host Verdicts")
+            st.dataframe(pd.DataFrame([
+                {"Host": host, "Classification": verdict["classification"], "Explanation": verdict.get("analysis_description")}
+                for host, verdict in result["hosts"].items()
+            ]))
+            if result.get("failed_hosts"):
+                st.warning(f"No verdict for: {', '.join(result['failed_hosts'])}")
         if result.get("next_arguments"):
             st.subheader("Suggested Next Arguments")
             st.write(f"`{' '.join(result['next_arguments'])}`")
@@ -45,6 +229,115 @@ def render_analysis_results(result):
             st.write("No suggestions provided.")
 
 
+def render_refinement_results(result):
+    """Display the iterations of a refinement loop and the refined results."""
+    st.subheader("Refinement Results")
+    st.write(f"**Stopped because:** {result['stop_reason'].replace('_', ' ')}")
+    for iteration in result["iterations"]:
+        arguments = " ".join(iteration["next_arguments"] or [])
+        st.write(
+            f"Iteration {iteration['iteration']}: {iteration['classification']}"
+            + (f", rescanned with `{arguments}`, {iteration.get('changed_rows', 0)} row(s) changed" if "invocations" in iteration else "")
+        )
+    st.dataframe(pd.DataFrame(result["data"]))
+    st.session_state["scan_file_path"] = result["scan_file_path"]
+
+
+def parse_ports(text: str):
+    """Parse a comma-separated list of ports, returning None for an empty field."""
+    ports = [part.strip() for part in text.split(",") if part.strip()]
+    if not ports:
+        return None
+    return [int(port) for port in ports]
+
+
+def set_browse_cursor(cursor):
+    """Button callback moving the result browser to another page."""
+    st.session_state["browse_cursor"] = cursor
+
+
+def render_result_browser(scan_file_path: str):
+    """Browse stored scan results page by page; filtering, sorting and counting happen on the server."""
+    st.header("Browse Scan Results")
+    host_col, port_col, state_col, service_col = st.columns(4)
+    hosts = host_col.text_input("Host(s)", key="browse_hosts", help="Comma-separated IP addresses.")
+    ports = port_col.text_input("Port(s)", key="browse_ports", help="Comma-separated port numbers.")
+    states = state_col.multiselect("State(s)", const.PORT_STATES, key="browse_states")
+    services = service_col.text_input("Service(s)", key="browse_services", help="Comma-separated service names.")
+    try:
+        port_filter = parse_ports(ports)
+    except ValueError:
+        st.warning("Ports must be numbers separated by commas.")
+        port_filter = None
+    filters = {
+        "host": [host.strip() for host in hosts.split(",") if host.strip()] or None,
+        "port": port_filter,
+        "state": states or None,
+        "service": [service.strip() for service in services.split(",") if service.strip()] or None,
+    }
+
+    rows_tab, summary_tab = st.tabs(["Rows", "Summary"])
+    with rows_tab:
+        sort_col, order_col, size_col = st.columns(3)
+        sort_by = sort_col.selectbox("Sort by", const.RESULT_COLUMNS, key="browse_sort_by")
+        descending = order_col.checkbox("Descending", key="browse_descending")
+        limit = size_col.selectbox("Rows per page", const.RESULT_PAGE_SIZES, index=1, key="browse_limit")
+        query = {
+            "scan_file_path": scan_file_path,
+            "filters": filters,
+            "sort_by": sort_by,
+            "descending": descending,
+            "limit": limit
+        }
+        # Any change to the query starts again from the first page
+        if st.session_state.get("browse_query") != query:
+            st.session_state["browse_query"] = query
+            st.session_state["browse_cursor"] = None
+
+        page, error = post_request(const.QUERY_RESULTS_ENDPOINT, {**query, "cursor": st.session_state["browse_cursor"]})
+        if error and st.session_state["browse_cursor"] is not None:
+            # The scan file changed since the cursor was issued
+            st.session_state["browse_cursor"] = None
+            page, error = post_request(const.QUERY_RESULTS_ENDPOINT, query)
+        if error:
+            st.error(f"Error fetching results: {error}")
+        elif page["total"] == 0:
+            st.write("No rows match the filters.")
+        else:
+            st.caption(f"Rows {page['offset'] + 1}-{page['offset'] + len(page['rows'])} of {page['total']}")
+            st.dataframe(pd.DataFrame(page["rows"]), use_container_width=True, hide_index=True)
+            previous_col, next_col = st.columns(2)
+            previous_col.button(
+                "Previous page", disabled=page["prev_cursor"] is None,
+                on_click=set_browse_cursor, args=(page["prev_cursor"],)
+            )
+            next_col.button(
+                "Next page", disabled=page["next_cursor"] is None,
+                on_click=set_browse_cursor, args=(page["next_cursor"],)
+            )
+
+    with summary_tab:
+        aggregate = st.selectbox("Count", const.RESULT_AGGREGATES, key="browse_aggregate")
+        summary, error = post_request(const.AGGREGATE_RESULTS_ENDPOINT, {
+            "scan_file_path": scan_file_path,
+            "filters": filters,
+            "aggregate": aggregate,
+            "limit": const.SUMMARY_GROUPS
+        })
+        if error:
+            st.error(f"Error summarizing results: {error}")
+        elif summary["groups"]:
+            df = pd.DataFrame(summary["groups"])
+            st.caption(f"Top {len(df)} of {summary['total']} {aggregate}")
+            if aggregate == "hosts":
+                st.dataframe(df, use_container_width=True, hide_index=True)
+            else:
+                label = df.columns[0]
+                st.bar_chart(df.assign(**{label: df[label].astype(str)}).set_index(label)["count"])
+        else:
+            st.write("No rows match the filters.")
+
+
 def main():
     st.title("Nmap Scan Automator")
 
@@ -52,12 +345,18 @@ def main():
     st.header("Retrieve Subdomains")
     domain = st.text_input("Enter the domain to enumerate subdomains:", value="megacorpone.com")
 
+    engines = st.multiselect("Subdomain sources:", const.SUBDOMAIN_SOURCES, default=const.SUBDOMAIN_SOURCES)
+
     if st.button("Retrieve Subdomains"):
-        response, error = post_request(const.ENUMERATE_SUBDOMAINS_ENDPOINT, payload={"domain": domain})
+        response, error = post_request(const.ENUMERATE_SUBDOMAINS_ENDPOINT, payload={"domain": domain, "engines": engines})
         if response:
             subdomains = response.get("subdomains", [])
             if subdomains:
                 st.success(f"Found {len(subdomains)} subdomains.")
+                st.caption(
+                    f"Per source: {response['sources']}, {response['stats']['queries']} DNS queries"
+                    + (" (cached)" if response.get("cached") else "")
+                )
                 st.session_state["subdomains"] = subdomains
             else:
                 st.warning("No subdomains found.")
@@ -72,20 +371,56 @@ def main():
 
         # Step 3: Configure Nmap Scan
         st.header("Step 3: Configure Nmap Scan")
-        nmap_args = st.text_input("Enter Nmap arguments (comma-separated):", value="-A,-T3,-v")
+        profiles, error = get_request(const.SCAN_PROFILES_ENDPOINT)
+        profiles = {profile["name"]: profile for profile in profiles["profiles"]} if profiles else {}
+        profile_name = st.selectbox("Choose a scan profile", [const.CUSTOM_PROFILE] + list(profiles))
+
+        strategy = st.selectbox(
+            "Scan strategy", const.SCAN_STRATEGIES,
+            help="two_phase discovers live hosts and open ports first, then runs the arguments below only on those ports."
+        )
+
+        payload = {
+            "scanner": {
+                "save_dir": "./results",
+                "target": selected_subdomains,
+                "strategy": strategy
+            }
+        }
+        if profile_name == const.CUSTOM_PROFILE:
+            nmap_args = st.text_input("Enter Nmap arguments (comma-separated):", value="-A,-T3,-v")
+            payload["scanner"]["nmap_args"] = nmap_args.split(",")
+        else:
+            profile = profiles[profile_name]
+            st.caption(
+                f"{profile['description']} `{' '.join(profile['arguments'])}` - "
+                f"about {format_duration(profile['seconds_per_host'])} per host."
+            )
+            profile_params = {
+                name: st.text_input(f"Profile parameter '{name}':", value=default)
+                for name, default in profile["parameters"].items()
+            }
+            payload["scanner"]["profile"] = profile_name
+            payload["scanner"]["profile_params"] = profile_params
+
+        if st.button("Estimate Scan Duration"):
+            if not selected_subdomains:
+                st.warning("Please select at least one subdomain to scan.")
+            else:
+                result, error = post_request(endpoint=const.ESTIMATE_SCAN_ENDPOINT, payload=payload)
+                if error:
+                    st.error(f"Error estimating scan: {error}")
+                elif result:
+                    render_scan_estimate(result)
 
         if st.button("Run Nmap Scan"):
             if not selected_subdomains:
                 st.warning("Please select at least one subdomain to scan.")
             else:
-                payload = {
-                    "scanner": {
-                        "nmap_args": nmap_args.split(","),
-                        "save_dir": "./results",
-                        "target": selected_subdomains
-                    }
-                }
-                result, error = post_request(endpoint=const.NMAP_ENDPOINT, payload=payload)
+                job, error = post_request(endpoint=const.NMAP_JOB_ENDPOINT, payload=payload)
+                result = None
+                if job:
+                    result, error = wait_for_job(job)
                 if error:
                     st.error(f"Error scanning: {error}")
                 elif result:
@@ -95,13 +430,25 @@ def main():
                         scan_dir_path=result["scan_dir_path"]
                     )
 
+        render_cancelled_job("scan", lambda result: render_scan_results(
+            scan_results=result["data"],
+            scan_file_path=result["scan_file_path"],
+            scan_dir_path=result["scan_dir_path"]
+        ))
+
     # Step 4: Analyze Logs with LLM
     scan_file_path = st.session_state.get("scan_file_path", None)
     scan_dir_path = st.session_state.get("scan_dir_path", None)
     if scan_file_path:
+        render_result_browser(scan_file_path)
+
         st.header("Step 4: Analyze Nmap Logs")
-        interpreter_type = st.selectbox("Choose an interpreter", ["gpt", "gemini", "ollama"])
+        interpreter_type = st.selectbox("Choose an interpreter", const.LLM_INTERPRETORS + ["local", "auto"])
         model_flavor = st.selectbox("Choose a model flavor", const.MODEL_FLAVORS[interpreter_type])
+        fallback_type, fallback_flavor = None, None
+        if interpreter_type == "local":
+            fallback_type = st.selectbox("Fallback interpreter when the local model is unsure", const.LLM_INTERPRETORS)
+            fallback_flavor = st.selectbox("Fallback model flavor", const.MODEL_FLAVORS[fallback_type])
         runner_mode = st.selectbox("Select Runner Mode", const.RUNNER_MODES)
 
         if st.button("Analyze Logs"):
@@ -109,7 +456,9 @@ def main():
                 "interpretor": {
                     "interpretor_type": interpreter_type,
                     "model_flavor": model_flavor,
-                    "interpret_runner": runner_mode
+                    "interpret_runner": runner_mode,
+                    "fallback_interpretor_type": fallback_type,
+                    "fallback_model_flavor": fallback_flavor
                 },
                 "scan_file_path": scan_file_path,
                 "scan_dir_path": scan_dir_path
@@ -120,6 +469,30 @@ def main():
             elif result:
                 render_analysis_results(result["interpreted_results"])
 
+        max_iterations = st.number_input("Maximum refinement iterations", min_value=1, max_value=10, value=3)
+        if st.button("Refine Scan"):
+            payload = {
+                "interpretor": {
+                    "interpretor_type": interpreter_type,
+                    "model_flavor": model_flavor,
+                    "interpret_runner": "suggest",
+                    "fallback_interpretor_type": fallback_type,
+                    "fallback_model_flavor": fallback_flavor
+                },
+                "scan_file_path": scan_file_path,
+                "scan_dir_path": scan_dir_path,
+                "max_iterations": int(max_iterations)
+            }
+            job, error = post_request(endpoint=const.REFINE_SCAN_ENDPOINT, payload=payload)
+            result = None
+            if job:
+                result, error = wait_for_job(job, "refinement")
+            if error:
+                st.error(f"Error refining scan: {error}")
+            elif result:
+                render_refinement_results(result)
+        render_cancelled_job("refinement", render_refinement_results)
+
 
 if __name__ == "__main__":
     if "subdomains" not in st.session_state:
@@ -8,13 +8,45 @@ MODEL_FLAVORS = {
         "llama3.3", "llama3.2", "llama3.1", "llama3", 
         "llama2", "gemma2", "gemma",
         "jimscard/whiterabbit-neo", "ALIENTELLIGENCE/cybersecuritythreatanalysis"
-    ]
+    ],
+    "local": ["default"],
+    "auto": ["default"]
 }
 
-RUNNER_MODES = ["normal", "restricted", "suggest"]
+LLM_INTERPRETORS = ["gpt", "gemini", "ollama"]
+
+RUNNER_MODES = ["normal", "restricted", "suggest", "per_host"]
+
+CUSTOM_PROFILE = "custom"
+
+SCAN_STRATEGIES = ["single", "two_phase"]
+
+SUBDOMAIN_SOURCES = ["wordlist", "axfr", "certlog"]
+
+RESULT_COLUMNS = ["IP", "Protocol", "Port", "State", "Name", "Product", "Version", "Subdomain"]
+PORT_STATES = ["open", "closed", "filtered", "open|filtered", "closed|filtered", "unfiltered"]
+RESULT_AGGREGATES = ["hosts", "services", "ports", "products", "states"]
+RESULT_PAGE_SIZES = [50, 100, 500, 1000]
+# Scans with more rows than this are only shown through the paged result browser
+INLINE_RESULT_ROWS = 1000
+SUMMARY_GROUPS = 20
+
+JOB_POLL_INTERVAL_SECONDS = 2
 
 API_URL = "http://127.0.0.1:5000"
 SCAN_ENDPOINT = f"{API_URL}/scan"
 NMAP_ENDPOINT = f"{API_URL}/nmap_scan"
+ESTIMATE_SCAN_ENDPOINT = f"{API_URL}/estimate_scan"
+NMAP_JOB_ENDPOINT = f"{API_URL}/nmap_scan_job"
+JOBS_ENDPOINT = f"{API_URL}/jobs"
+SCAN_PROFILES_ENDPOINT = f"{API_URL}/scan_profiles"
 LLM_INTERPRETATION_ENDPOINT = f"{API_URL}/llm_interpret"
-ENUMERATE_SUBDOMAINS_ENDPOINT = f"{API_URL}/enumerate_subdomains"
\ No newline at end of file
+REFINE_SCAN_ENDPOINT = f"{API_URL}/refine_scan"
+ENUMERATE_SUBDOMAINS_ENDPOINT = f"{API_URL}/enumerate_subdomains"
+QUERY_RESULTS_ENDPOINT = f"{API_URL}/query_results"
+AGGREGATE_RESULTS_ENDPOINT = f"{API_URL}/aggregate_results"
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 8
\ No newline at end of file
@@ -1,10 +1,16 @@
 import nmap
 import csv
 import os
+import sys
+import ast
+import json
+import time
+import hashlib
 import argparse
-import pandas as pd
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
-from openai import OpenAI
 
 load_dotenv()
 
@@ -12,9 +18,29 @@ SCAN_STATUS_COMPLETED = "_completed"
 SCAN_STATUS_INCOMPLETE = "_incomplete"
 SCAN_STATUS_FPR = "_false_positive_rich"
 
-client = OpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY"),
-)
+_client = None
+
+def get_openai_client():
+    # Created on first use so that --help and rule-based runs never import the SDK
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+        )
+    return _client
+
+def parse_llm_json(text):
+    # Take the outermost object, dropping fences or chatter around it
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end == -1:
+        raise ValueError("No JSON object in the response.")
+    text = text[start:end + 1]
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # Python-style dicts with single quotes or None/True/False; literal_eval never executes code
+        return ast.literal_eval(text)
 
 def run_nmap_scan(target, scan_arguments):
     scanner = nmap.PortScanner()
@@ -36,6 +62,35 @@ def run_nmap_scan(target, scan_arguments):
                 })
     return results
 
+AMBIGUOUS_STATES = {"filtered", "open|filtered", "closed|filtered", "unfiltered"}
+
+def is_ambiguous(result):
+    return result['State'] in AMBIGUOUS_STATES or result.get('Name') == 'tcpwrapped'
+
+def run_targeted_rescan(target, results, scan_arguments='-sS -T2'):
+    # Only revisit the ambiguous ports, grouping hosts that need the same ones into one scan
+    ports_by_host = {}
+    for result in results:
+        if is_ambiguous(result):
+            ports_by_host.setdefault(result['IP'], set()).add((result['Protocol'], int(result['Port'])))
+    if not ports_by_host:
+        print("No ambiguous ports to target. Rescanning the whole target...")
+        return run_nmap_scan(target, scan_arguments)
+
+    hosts_by_ports = {}
+    for host, ports in ports_by_host.items():
+        tcp = ",".join(str(port) for proto, port in sorted(ports) if proto == 'tcp')
+        udp = ",".join(str(port) for proto, port in sorted(ports) if proto == 'udp')
+        port_spec = ",".join(part for part in (tcp and f"T:{tcp}", udp and f"U:{udp}") if part)
+        hosts_by_ports.setdefault(port_spec, []).append(host)
+
+    rescan_results = []
+    for port_spec, hosts in hosts_by_ports.items():
+        arguments = f"{scan_arguments} -sU -p {port_spec}" if "U:" in port_spec else f"{scan_arguments} -p {port_spec}"
+        print(f"Rescanning {', '.join(hosts)} with: {arguments}")
+        rescan_results.extend(run_nmap_scan(" ".join(hosts), arguments))
+    return rescan_results
+
 def save_results_to_csv(results, filename="scan_results.csv"):
     if results:
         keys = results[0].keys()
@@ -56,7 +111,7 @@ def classify_scan(results):
         f"{results}"
     )
 
-    response = client.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model="gpt-4",
         messages=[
             {
@@ -81,7 +136,7 @@ def suggest_arguments_with_llm(results):
         f"{results}"
     )
 
-    response = client.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model="gpt-4",
         messages=[
             {"role": "system", "content": prompt}
@@ -92,7 +147,7 @@ def suggest_arguments_with_llm(results):
 
     suggestion = response.choices[0].message.content.strip()
     try:
-        suggestion_json = eval(suggestion)  # Convert JSON-like response to dict
+        suggestion_json = parse_llm_json(suggestion)
         arguments = suggestion_json.get("suggested_arguments", [])
         explanation = suggestion_json.get("explanation", "")
         print(f"Suggested Arguments: {arguments}\nExplanation: {explanation}")
@@ -101,56 +156,243 @@ def suggest_arguments_with_llm(results):
         print(f"Error parsing suggestion response: {e}")
         return []
 
-def scan_with_fallback(target, use_llm):
-    print("Running initial aggressive scan...")
+def scan_and_refine(target, use_llm):
+    # Returns the initial results, the classification status and the lighter rescan results (None if not needed)
+    print(f"[{target}] Running initial aggressive scan...")
     results = run_nmap_scan(target, '-A -T3 -v')
-    save_results_to_csv(results, "initial_scan_results.csv")
 
     classification = classify_scan(results)
     try:
-        classification_json = eval(classification)
+        classification_json = parse_llm_json(classification)
         status = classification_json.get("status", "").lower()
     except Exception as e:
-        print(f"Error parsing classification response: {e}")
+        print(f"[{target}] Error parsing classification response: {e}")
         status = ""
 
+    light_results = None
     if status == SCAN_STATUS_INCOMPLETE.lower() or status == SCAN_STATUS_FPR.lower():
         if use_llm:
-            print("Scan classified as incomplete/false positive rich. Suggesting new arguments using LLM...")
+            print(f"[{target}] Scan classified as incomplete/false positive rich. Suggesting new arguments using LLM...")
             suggested_arguments = suggest_arguments_with_llm(results)
 
             if suggested_arguments:
                 arguments_str = " ".join(suggested_arguments)
-                print(f"Running scan with suggested arguments: {arguments_str}")
-                results = run_nmap_scan(target, arguments_str)
+                print(f"[{target}] Running scan with suggested arguments: {arguments_str}")
+                light_results = run_nmap_scan(target, arguments_str)
             else:
-                print("No valid arguments suggested. Falling back to rule-based lighter scan...")
-                results = run_nmap_scan(target, '-sS -T2')
+                print(f"[{target}] No valid arguments suggested. Falling back to rule-based lighter scan of the ambiguous ports...")
+                light_results = run_targeted_rescan(target, results)
         else:
-            print("Scan classified as incomplete/false positive rich. Falling back to rule-based lighter scan...")
-            results = run_nmap_scan(target, '-sS -T2')
+            print(f"[{target}] Scan classified as incomplete/false positive rich. Falling back to rule-based lighter scan of the ambiguous ports...")
+            light_results = run_targeted_rescan(target, results)
 
-        save_results_to_csv(results, "light_scan_results.csv")
+    return results, status, light_results
 
+def scan_with_fallback(target, use_llm):
+    results, _, light_results = scan_and_refine(target, use_llm)
+    save_results_to_csv(results, "initial_scan_results.csv")
+    if light_results is not None:
+        save_results_to_csv(light_results, "light_scan_results.csv")
+        return light_results
     return results
 
-def generate_final_report():
-    df_initial = pd.read_csv("initial_scan_results.csv")
+def generate_final_report(output_dir="."):
+    # Streams the shards instead of loading them into pandas; duplicates are tracked by a short digest
+    # per row, and the report is written to a private temp file first so concurrent runs never see
+    # (or leave) a half-written report
+    output_file = os.path.join(output_dir, "final_scan_report.csv")
+    shards = [
+        os.path.join(output_dir, name) for name in ("initial_scan_results.csv", "light_scan_results.csv")
+        if os.path.exists(os.path.join(output_dir, name))
+    ]
+    if not shards:
+        print("No scan results to report.")
+        return
+
+    seen = set()
+    header = None
+    fd, temp_path = tempfile.mkstemp(prefix=".final_scan_report-", suffix=".csv", dir=output_dir)
     try:
-        df_light = pd.read_csv("light_scan_results.csv")
-        df_combined = pd.concat([df_initial, df_light]).drop_duplicates()
-    except FileNotFoundError:
-        df_combined = df_initial
+        with os.fdopen(fd, "w", newline="") as report:
+            writer = csv.writer(report)
+            for path in shards:
+                with open(path, newline="") as shard:
+                    reader = csv.DictReader(shard)
+                    if header is None:
+                        header = reader.fieldnames
+                        writer.writerow(header)
+                    for row in reader:
+                        values = [row.get(field, "") for field in header]
+                        digest = hashlib.blake2b("\x1f".join(values).encode(), digest_size=12).digest()
+                        if digest not in seen:
+                            seen.add(digest)
+                            writer.writerow(values)
+        os.replace(temp_path, output_file)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    print(f"Final report saved as {output_file}")
+
+BATCH_FIELDS = ['Target', 'IP', 'Protocol', 'Port', 'State', 'Name', 'Product', 'Version']
+JOURNAL_FILE = "progress.jsonl"
 
-    df_combined.to_csv("final_scan_report.csv", index=False)
-    print("Final report saved as final_scan_report.csv")
+def iter_targets(source):
+    # One target per line; blank lines, comments and repeated targets are skipped. The file is read
+    # lazily, only the targets seen so far are remembered
+    handle = sys.stdin if source == "-" else open(source, "r")
+    seen = set()
+    try:
+        for line in handle:
+            target = line.split("#", 1)[0].strip()
+            if target and target not in seen:
+                seen.add(target)
+                yield target
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+def load_journal(output_dir, retry_failed):
+    # Targets already handled by a previous run of this output directory
+    done = set()
+    journal_path = os.path.join(output_dir, JOURNAL_FILE)
+    if not os.path.exists(journal_path):
+        return done
+    with open(journal_path, "r") as journal:
+        for line in journal:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; its target is simply scanned again
+                continue
+            if entry.get("error") and retry_failed:
+                done.discard(entry["target"])
+            else:
+                done.add(entry["target"])
+    return done
+
+class BatchWriter:
+    # Appends the rows and the journal entry of each finished target; a single lock keeps the
+    # files consistent across worker threads, and rows are always written before their journal entry
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        self.files = {}
+        self.writers = {}
+        self.journal = open(os.path.join(output_dir, JOURNAL_FILE), "a")
+
+    def _writer(self, name):
+        if name not in self.writers:
+            path = os.path.join(self.output_dir, name)
+            write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+            self.files[name] = open(path, "a", newline="")
+            self.writers[name] = csv.DictWriter(self.files[name], fieldnames=BATCH_FIELDS, extrasaction="ignore")
+            if write_header:
+                self.writers[name].writeheader()
+        return self.writers[name]
+
+    def record(self, target, results=None, status=None, light_results=None, error=None, seconds=0.0):
+        with self.lock:
+            for name, rows in (("initial_scan_results.csv", results), ("light_scan_results.csv", light_results)):
+                if rows:
+                    self._writer(name).writerows({**row, "Target": target} for row in rows)
+                    self.files[name].flush()
+            self.journal.write(json.dumps({
+                "target": target,
+                "status": status,
+                "rows": len(results or []),
+                "light_rows": None if light_results is None else len(light_results),
+                "error": error,
+                "seconds": round(seconds, 3),
+                "finished_at": time.time()
+            }) + "\n")
+            self.journal.flush()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.journal.close()
+
+def process_target(target, use_llm, writer):
+    started = time.monotonic()
+    try:
+        results, status, light_results = scan_and_refine(target, use_llm)
+    except Exception as e:
+        print(f"[{target}] Failed: {e}")
+        writer.record(target, error=str(e), seconds=time.monotonic() - started)
+        return False
+    writer.record(target, results, status, light_results, seconds=time.monotonic() - started)
+    return True
+
+def run_batch(targets_source, output_dir, workers, use_llm, resume=False, retry_failed=False):
+    if os.path.exists(os.path.join(output_dir, JOURNAL_FILE)) and not resume:
+        raise SystemExit(f"{output_dir} already holds a run; pass --resume to continue it or choose another --output-dir.")
+    os.makedirs(output_dir, exist_ok=True)
+    done = load_journal(output_dir, retry_failed) if resume else set()
+    if done:
+        print(f"Resuming: {len(done)} target(s) already done in {output_dir}")
+
+    writer = BatchWriter(output_dir)
+    counts = {"done": 0, "failed": 0, "skipped": 0}
+    started = time.monotonic()
+    pending = set()
+
+    def collect(finished):
+        for future in finished:
+            pending.discard(future)
+            counts["done" if future.result() else "failed"] += 1
+        finished_count = counts["done"] + counts["failed"]
+        if finished and finished_count % 100 == 0:
+            rate = finished_count / max(time.monotonic() - started, 1e-9)
+            print(f"Progress: {finished_count} target(s) finished, {counts['failed']} failed, {rate:.2f} targets/s")
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-scan")
+    try:
+        for target in iter_targets(targets_source):
+            if target in done:
+                counts["skipped"] += 1
+                continue
+            # Keep at most two targets queued per worker so the target list is consumed as a stream
+            while len(pending) >= workers * 2:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            pending.add(executor.submit(process_target, target, use_llm, writer))
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished)
+    except KeyboardInterrupt:
+        print("Interrupted: waiting for the running scans, queued targets are left for --resume...")
+        for future in pending:
+            future.cancel()
+        raise
+    finally:
+        executor.shutdown(wait=True)
+        writer.close()
+        print(
+            f"Batch finished in {time.monotonic() - started:.1f}s: {counts['done']} done, "
+            f"{counts['failed']} failed, {counts['skipped']} skipped. Results in {output_dir}"
+        )
+
+    generate_final_report(output_dir)
 
 def main():
     parser = argparse.ArgumentParser(description="NMAP Scan Automation with LLM Integration")
-    parser.add_argument("--targets", help="Target IP addresses or domains (comma-separated)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--targets", help="Target IP addresses or domains (comma-separated)")
+    source.add_argument("--targets-file", help="Batch mode: file with one target per line, or '-' to read stdin")
     parser.add_argument("--llm-driven", action="store_true", help="Use LLM for argument suggestions instead of rule-based fallback")
+    parser.add_argument("--output-dir", help="Batch mode: run directory (default: runs/<timestamp>)")
+    parser.add_argument("--workers", type=int, default=8, help="Batch mode: targets scanned in parallel")
+    parser.add_argument("--resume", action="store_true", help="Batch mode: continue the run in --output-dir, skipping finished targets")
+    parser.add_argument("--retry-failed", action="store_true", help="Batch mode: with --resume, scan failed targets again")
     args = parser.parse_args()
 
+    if args.targets_file:
+        if args.resume and not args.output_dir:
+            parser.error("--resume needs the --output-dir of the run to continue")
+        output_dir = args.output_dir or os.path.join("runs", time.strftime("%Y%m%d-%H%M%S"))
+        run_batch(args.targets_file, output_dir, max(1, args.workers), args.llm_driven, args.resume, args.retry_failed)
+        return
+
     targets = args.targets.split(",")
     for target in targets:
         print(f"Scanning target: {target}")
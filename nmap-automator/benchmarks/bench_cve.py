@@ -0,0 +1,110 @@
+"""
+Throughput of the offline CVE correlation index.
+
+Builds an index from a synthetic NVD 2.0 feed, then annotates synthetic scan
+rows with three banner mixes: every row carrying a distinct version (each
+lookup reaches SQLite), a few thousand distinct banners as on a large and
+varied network, and the banner mix of synthetic.py (most lookups are answered
+from the cache).
+
+Run from the nmap-automator directory:
+
+    poetry run python benchmarks/bench_cve.py --cves 200000 --rows 200000
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from nmap_automator.vulns import VulnIndex, build_index
+from synthetic import generate_rows
+
+PRODUCTS = [
+    ("openbsd", "openssh"), ("nginx", "nginx"), ("f5", "nginx"), ("apache", "http_server"), ("oracle", "mysql"),
+    ("isc", "bind"), ("net-snmp", "net-snmp"), ("postfix", "postfix"), ("openssl", "openssl"), ("apache", "tomcat"),
+]
+
+
+def synthetic_feed(count: int, vendors: int = 20000, seed: int = 0) -> dict:
+    """
+    NVD 2.0 feed document shaped like the real one: CVEs spread over many products, so the
+    products of synthetic.py get a few hundred CVEs each at 200k CVEs.
+    """
+    rng = random.Random(seed)
+    vulnerabilities = []
+    for i in range(count):
+        if rng.random() < 0.01:
+            vendor, product = rng.choice(PRODUCTS)
+        else:
+            vendor = product = f"vendor{rng.randrange(vendors)}"
+        major, minor = rng.randint(0, 9), rng.randint(0, 30)
+        match = {"vulnerable": True, "criteria": f"cpe:2.3:a:{vendor}:{product}:*:*:*:*:*:*:*:*"}
+        kind = rng.random()
+        if kind < 0.6:
+            match["versionEndExcluding"] = f"{major}.{minor}.{rng.randint(0, 20)}"
+            if rng.random() < 0.5:
+                match["versionStartIncluding"] = f"{major}.0"
+        elif kind < 0.9:
+            match["criteria"] = f"cpe:2.3:a:{vendor}:{product}:{major}.{minor}:*:*:*:*:*:*:*"
+        else:
+            match["versionEndIncluding"] = f"{major}.{minor}"
+        vulnerabilities.append({"cve": {
+            "id": f"CVE-{2000 + i % 25}-{i:06d}",
+            "published": "2024-01-01T00:00:00.000",
+            "descriptions": [{"lang": "en", "value": f"Synthetic vulnerability {i} in {product}."}],
+            "metrics": {"cvssMetricV31": [{"cvssData": {"baseScore": round(rng.uniform(2, 10), 1), "baseSeverity": "HIGH"}}]},
+            "configurations": [{"nodes": [{"operator": "OR", "cpeMatch": [match]}]}]
+        }})
+    return {"format": "NVD_CVE", "version": "2.0", "vulnerabilities": vulnerabilities}
+
+
+def bannered_rows(rows: list[dict], banners: int, seed: int = 1) -> list[dict]:
+    """Rows whose (Product, Version) is drawn from a pool of distinct banners."""
+    rng = random.Random(seed)
+    pool = [
+        (rng.choice(["OpenSSH", "nginx", "Apache httpd", "MySQL", "ISC BIND"]), f"{rng.randint(0, 9)}.{rng.randint(0, 30)}.{i}")
+        for i in range(banners)
+    ]
+    return [{**row, "Product": product, "Version": version} for row, (product, version) in zip(rows, (rng.choice(pool) for _ in rows))]
+
+
+def report(label: str, index: VulnIndex, rows: list[dict]) -> None:
+    started = time.perf_counter()
+    matched = cves = 0
+    for row in index.annotate(rows):
+        if row["CVEs"]:
+            matched += 1
+            cves += len(row["CVEs"])
+    rate = len(rows) / (time.perf_counter() - started)
+    print(f"{label:<30}{rate:>12,.0f} services/s  {matched / len(rows):>6.1%} matched  {cves / max(matched, 1):>7.1f} CVEs per match")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CVE index benchmark")
+    parser.add_argument("--cves", type=int, default=200_000)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--uncached-rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        feed_path = os.path.join(work_dir, "nvdcve-2.0-synthetic.json")
+        with open(feed_path, "w") as f:
+            json.dump(synthetic_feed(args.cves), f)
+        index_path = os.path.join(work_dir, "cve_index.sqlite")
+        started = time.perf_counter()
+        stats = build_index([feed_path], index_path)
+        print(f"build: {time.perf_counter() - started:.1f}s, {stats['ranges']} ranges, "
+              f"{os.path.getsize(index_path) / 2 ** 20:.1f} MiB index, {os.path.getsize(feed_path) / 2 ** 20:.1f} MiB feed")
+
+        rows = generate_rows(args.rows)
+        # Every lookup reaches SQLite here, so fewer rows keep the run short
+        uncached = rows[:args.uncached_rows]
+        report("nearly all distinct banners", VulnIndex(index_path), bannered_rows(uncached, 20 * len(uncached)))
+        report("2,000 distinct banners", VulnIndex(index_path), bannered_rows(rows, 2000))
+        report("synthetic.py banner mix", VulnIndex(index_path), rows)
+
+
+if __name__ == "__main__":
+    main()
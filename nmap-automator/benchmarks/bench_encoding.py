@@ -0,0 +1,93 @@
+"""
+Compare the response encodings of /nmap_scan on a synthetic scan payload.
+
+Reports the serialization and decoding time and the bytes on the wire of plain
+JSON against gzip, zstd, MessagePack and Arrow IPC. Formats whose optional
+package is not installed are skipped.
+
+Run from the nmap-automator directory:
+
+    poetry install --extras fast-transport
+    poetry run python benchmarks/bench_encoding.py --rows 200000
+"""
+import gzip
+import json
+import time
+import argparse
+from importlib.util import find_spec
+
+from nmap_automator.server.encoding import JSON, MSGPACK, ARROW, encode_body, compress, decode_arrow
+from synthetic import generate_rows
+
+
+def timed(fn, repeat: int = 3):
+    """Best wall-clock time of fn over a few runs, in seconds, and its last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def build_payload(rows: list[dict], targets: int) -> dict:
+    per_target = max(1, len(rows) // targets)
+    data = [
+        {"target": f"10.{i}.0.0/16", "results": rows[i * per_target:(i + 1) * per_target]}
+        for i in range(targets)
+    ]
+    return {"data": data, "scan_file_path": "scans/bench/initial_scan_results.csv", "scan_dir_path": "scans/bench"}
+
+
+def cases() -> list[tuple]:
+    """(label, encode, decode) for every available combination."""
+    def zstd_decompress(body):
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+    found = [
+        ("json", lambda p: encode_body(p, JSON), json.loads),
+        ("json + gzip", lambda p: compress(encode_body(p, JSON), "gzip"), lambda b: json.loads(gzip.decompress(b))),
+    ]
+    if find_spec("zstandard"):
+        found.append(("json + zstd", lambda p: compress(encode_body(p, JSON), "zstd"), lambda b: json.loads(zstd_decompress(b))))
+    if find_spec("msgpack"):
+        import msgpack
+        found.append(("msgpack", lambda p: encode_body(p, MSGPACK), msgpack.unpackb))
+        if find_spec("zstandard"):
+            found.append((
+                "msgpack + zstd",
+                lambda p: compress(encode_body(p, MSGPACK), "zstd"),
+                lambda b: msgpack.unpackb(zstd_decompress(b))
+            ))
+    if find_spec("pyarrow"):
+        found.append(("arrow", lambda p: encode_body(p, ARROW), decode_arrow))
+        if find_spec("zstandard"):
+            found.append((
+                "arrow + zstd",
+                lambda p: compress(encode_body(p, ARROW), "zstd"),
+                lambda b: decode_arrow(zstd_decompress(b))
+            ))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API response encoding benchmark")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--targets", type=int, default=4, help="Targets the rows are split across")
+    args = parser.parse_args()
+
+    payload = build_payload(generate_rows(args.rows), args.targets)
+    baseline = None
+    print(f"{'encoding':<16}{'encode (ms)':>13}{'decode (ms)':>13}{'bytes':>14}{'vs json':>9}")
+    for label, encode, decode in cases():
+        encode_time, body = timed(lambda: encode(payload))
+        decode_time, decoded = timed(lambda: decode(body))
+        assert decoded == payload, f"{label} did not round-trip"
+        baseline = baseline or len(body)
+        print(f"{label:<16}{encode_time * 1000:>13.1f}{decode_time * 1000:>13.1f}{len(body):>14,}{len(body) / baseline:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure the cold start of the API server and the main.py CLI.
+
+Every sample runs in a fresh interpreter, so the numbers include the whole
+import graph the way a new worker process or a CLI invocation pays for it. The
+provider rows show the cost that is now deferred until an interpretor of that
+type is first created.
+
+Run from the nmap-automator directory:
+
+    poetry run python benchmarks/bench_import_time.py --repeat 5
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+REPO_ROOT = os.path.dirname(os.path.dirname(SRC_DIR))
+
+SNIPPETS = {
+    "interpreter only": "pass",
+    "server (api_server)": "import nmap_automator.server.api_server",
+    "server + gpt provider": (
+        "import nmap_automator.server.api_server\n"
+        "from nmap_automator.interpretors import InterpretorFactory\n"
+        "InterpretorFactory.create_interpretor('gpt', 'bench', 'gpt-4')"
+    ),
+    "server + gemini provider": (
+        "import nmap_automator.server.api_server\n"
+        "from nmap_automator.interpretors import InterpretorFactory\n"
+        "InterpretorFactory.create_interpretor('gemini', 'bench')"
+    ),
+    "server + ollama provider": (
+        "import nmap_automator.server.api_server\n"
+        "from nmap_automator.interpretors import InterpretorFactory\n"
+        "InterpretorFactory.create_interpretor('ollama', 'bench', 'gemma2')"
+    ),
+}
+
+
+def time_command(command: list[str], cwd: str, repeat: int) -> tuple[float, float]:
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement")
+    args = parser.parse_args()
+
+    # Warm the bytecode cache so the first sample does not pay for compilation
+    subprocess.run([sys.executable, "-c", SNIPPETS["server (api_server)"]], env=dict(os.environ, PYTHONPATH=SRC_DIR))
+
+    print(f"{'measurement':<28} {'median s':>9} {'min s':>8}")
+    for label, snippet in SNIPPETS.items():
+        median, best = time_command([sys.executable, "-c", snippet], SRC_DIR, args.repeat)
+        print(f"{label:<28} {median:>9.3f} {best:>8.3f}")
+
+    main_py = os.path.join(REPO_ROOT, "main.py")
+    if os.path.exists(main_py):
+        median, best = time_command([sys.executable, main_py, "--help"], REPO_ROOT, args.repeat)
+        print(f"{'main.py --help':<28} {median:>9.3f} {best:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Latency and throughput of the ollama interpretor against a local stub of the Ollama API.
+
+Compares the previous interpretor (module-level ollama.chat with the server's
+defaults, one request at a time, host list in the middle of the per-host
+prompt) with the current one (preloaded and pinned model, fixed num_ctx,
+NMAP_AUTOMATOR_OLLAMA_PARALLEL requests in flight, static prompt prefix):
+
+- first request: the first interpretation after the server started;
+- after idle: a request after the server's default keep_alive expired;
+- per-host scan: interpret_per_host over a scan of many hosts.
+
+The stub's default keep_alive is shortened to one second so that the idle
+case does not take five minutes. Run from the nmap-automator directory:
+
+    poetry run python benchmarks/bench_ollama.py --hosts 400
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from stub_ollama import StubOllamaServer
+from synthetic import generate_rows
+
+MODEL = "gemma2"
+# The per-host prompt before the host list moved behind the static instructions
+PREVIOUS_PER_HOST_PROMPT = (
+    "Classify the nmap scan results of each of the following hosts separately as Completed, "
+    "Incomplete, or False Positive Rich.\n"
+    "Hosts to classify: {hosts}\n"
+    "Return a single JSON object with a 'hosts' array holding exactly one object per host, with the following fields:\n"
+    "1. 'host': The IP address of the host, exactly as given.\n"
+    "2. 'classification': The classification result for that host.\n"
+    "3. 'analysis_description': A one or two sentence explanation for that host.\n"
+    "IT IS MISSION CRITICAL THAT YOU NOT ADD ANY COMMENTS TO THE JSON OBJECT.\n\n{scan_results}"
+)
+
+
+def previous_interpretor_class():
+    from ollama import chat
+    from nmap_automator.interpretors import BaseInterpretor
+
+    class PreviousOllamaInterpretor(BaseInterpretor):
+        def configure(self):
+            super().configure()
+
+        def _complete(self, prompt: str, deterministic: bool = False, json_mode: bool = False) -> str:
+            response = chat(
+                model=self.model_flavor,
+                messages=[{"role": "user", "content": prompt}],
+                format="json" if json_mode else None,
+                options={"temperature": 0} if deterministic else None
+            )
+            return response.message.content.strip()
+
+        def _stream(self, prompt: str, deterministic: bool = False, json_mode: bool = False):
+            parts = chat(
+                model=self.model_flavor,
+                messages=[{"role": "user", "content": prompt}],
+                format="json" if json_mode else None,
+                options={"temperature": 0} if deterministic else None,
+                stream=True
+            )
+            for part in parts:
+                yield part.message.content
+
+        def interpret(self, scan_results: str, save_dir: str) -> dict:
+            return self._interpret(scan_results, save_dir, "default")
+
+        def interpret_restricted(self, scan_results: str, save_dir: str) -> dict:
+            return self._interpret(scan_results, save_dir, "restricted")
+
+        def interpret_with_suggestions(self, scan_results: str, save_dir: str) -> dict:
+            return self._interpret(scan_results, save_dir, "with_suggestions")
+
+    return PreviousOllamaInterpretor
+
+
+def timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def run(label: str, make_interpretor, stub: StubOllamaServer, rows: list[dict], save_dir: str, preload: bool) -> list:
+    interpretor = make_interpretor()
+    small = rows[:20]
+    if preload:
+        # The API server preloads NMAP_AUTOMATOR_OLLAMA_PRELOAD models at startup
+        interpretor.configure()
+        time.sleep(stub.load_seconds + 0.5)
+    first = timed(lambda: (interpretor.is_configured or interpretor.configure(), interpretor.interpret(small, save_dir)))
+    time.sleep(stub.default_keep_alive + 0.5)
+    idle = timed(lambda: interpretor.interpret(small, save_dir))
+    before = dict(stub.stats)
+    per_host = timed(lambda: interpretor.interpret_per_host(rows, save_dir))
+    prompt_tokens = stub.stats["prompt_tokens"] - before["prompt_tokens"]
+    cached = stub.stats["cached_prompt_tokens"] - before["cached_prompt_tokens"]
+    return [label, first, idle, per_host, stub.stats["max_in_flight"], cached / max(prompt_tokens, 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama interpretor benchmark")
+    parser.add_argument("--hosts", type=int, default=400)
+    parser.add_argument("--rows-per-host", type=int, default=5)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--load-seconds", type=float, default=1.5)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.hosts * args.rows_per_host, hosts=args.hosts)
+    results = []
+    with tempfile.TemporaryDirectory() as save_dir:
+        for label in ("previous", "current"):
+            stub = StubOllamaServer(load_seconds=args.load_seconds, num_parallel=args.parallel, default_keep_alive=1.0).start()
+            # Both the module-level client of the ollama package and the interpretor read OLLAMA_HOST
+            os.environ["OLLAMA_HOST"] = stub.url
+            os.environ["NMAP_AUTOMATOR_OLLAMA_PARALLEL"] = str(args.parallel)
+            os.environ["NMAP_AUTOMATOR_OLLAMA_NUM_CTX"] = "8192"
+            from nmap_automator.interpretors import prompts
+            if label == "previous":
+                current_prompt = prompts.PROMPTS["per_host"]
+                prompts.PROMPTS["per_host"] = PREVIOUS_PER_HOST_PROMPT
+                previous = previous_interpretor_class()
+                results.append(run(label, lambda: previous("bench", MODEL), stub, rows, save_dir, preload=False))
+                prompts.PROMPTS["per_host"] = current_prompt
+            else:
+                from nmap_automator.interpretors import OllamaInterpretor
+                results.append(run(label, lambda: OllamaInterpretor("bench", MODEL), stub, rows, save_dir, preload=True))
+            stub.stop()
+
+    print(f"{'interpretor':<12}{'first s':>10}{'after idle s':>14}{'per-host s':>12}{'in flight':>11}{'cached prompt':>15}")
+    for label, first, idle, per_host, in_flight, cached in results:
+        print(f"{label:<12}{first:>10.2f}{idle:>14.2f}{per_host:>12.2f}{in_flight:>11}{cached:>15.1%}")
+
+
+if __name__ == "__main__":
+    main()
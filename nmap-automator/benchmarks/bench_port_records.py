@@ -0,0 +1,87 @@
+"""
+Measure memory and serialization cost of the per-row dicts versus PortRecord/PortRecordBatch.
+
+Run from the nmap-automator directory:
+
+    poetry run python benchmarks/bench_port_records.py --rows 500000
+"""
+import io
+import gc
+import csv
+import time
+import argparse
+import tracemalloc
+
+from nmap_automator.scanner import PortRecord, PortRecordBatch
+from synthetic import generate_rows
+
+FIELDS = ['IP', 'Protocol', 'Port', 'State', 'Name', 'Product', 'Version', 'Subdomain']
+
+
+def build_dicts(rows):
+    # Fresh dicts and strings, as python-nmap hands them to __run_scan
+    return [{key: (value if key == "Port" else "".join(value)) for key, value in row.items()} for row in rows]
+
+
+def build_records(rows):
+    return [
+        PortRecord(
+            "".join(r["IP"]), "".join(r["Protocol"]), r["Port"], "".join(r["State"]),
+            "".join(r["Name"]), "".join(r["Product"]), "".join(r["Version"]), "".join(r["Subdomain"])
+        )
+        for r in rows
+    ]
+
+
+def build_batch(rows):
+    batch = PortRecordBatch(subdomain="example.com")
+    for r in rows:
+        batch.append(
+            "".join(r["IP"]), "".join(r["Protocol"]), r["Port"], "".join(r["State"]),
+            "".join(r["Name"]), "".join(r["Product"]), "".join(r["Version"])
+        )
+    return batch
+
+
+def measure(label: str, build, rows):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    container = build(rows)
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<20}{current / 2 ** 20:>12.1f}{current / len(rows):>12.1f}{elapsed * 1000:>12.0f}")
+    return container
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PortRecord memory benchmark")
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.rows)
+    print(f"{'container':<20}{'MiB':>12}{'bytes/row':>12}{'build ms':>12}")
+    dicts = measure("list[dict]", build_dicts, rows)
+    measure("list[PortRecord]", build_records, rows)
+    batch = measure("PortRecordBatch", build_batch, rows)
+
+    print(f"\n{'serialization':<20}{'ms':>12}")
+    started = time.perf_counter()
+    writer = csv.DictWriter(io.StringIO(), fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(dicts)
+    print(f"{'DictWriter CSV':<20}{(time.perf_counter() - started) * 1000:>12.0f}")
+    started = time.perf_counter()
+    batch.write_csv(io.StringIO())
+    print(f"{'batch CSV':<20}{(time.perf_counter() - started) * 1000:>12.0f}")
+    started = time.perf_counter()
+    batch.write_ndjson(io.StringIO())
+    print(f"{'batch NDJSON':<20}{(time.perf_counter() - started) * 1000:>12.0f}")
+    started = time.perf_counter()
+    batch.to_frame()
+    print(f"{'batch to_frame':<20}{(time.perf_counter() - started) * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
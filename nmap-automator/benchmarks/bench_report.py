@@ -0,0 +1,98 @@
+"""
+Compare the pandas final report of main.py with the streamed ReportEngine.
+
+Each measurement runs in a fresh interpreter so its peak RSS can be read
+from the operating system. The pandas baseline only writes the CSV; the
+engine is measured on the CSV alone and on all three formats.
+
+Run from the nmap-automator directory:
+
+    poetry run python benchmarks/bench_report.py --rows 1000000
+"""
+import os
+import csv
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from nmap_automator.scanner.records import RESULT_FIELDS
+from synthetic import generate_rows
+
+PANDAS_REPORT = """
+import sys
+import pandas as pd
+scan_dir = sys.argv[1]
+df_initial = pd.read_csv(scan_dir + "/initial_scan_results.csv")
+df_light = pd.read_csv(scan_dir + "/light_scan_results.csv")
+pd.concat([df_initial, df_light]).drop_duplicates().to_csv(scan_dir + "/final_scan_report.csv", index=False)
+"""
+
+# Peak RSS of the snippet's process and of the worker processes it waited for. ru_maxrss of a
+# fresh child can include the RSS of the forking parent, so the Linux high-water mark is preferred.
+PEAK_RSS = """
+import resource
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open("/proc/self/status") as status:
+        peak = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+except OSError:
+    pass
+print(max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss))
+"""
+
+ENGINE_REPORT = """
+import sys
+from nmap_automator.report import ReportEngine, find_shards
+scan_dir = sys.argv[1]
+formats = sys.argv[3].split(",")
+ReportEngine(partition_bytes=int(sys.argv[2])).generate(find_shards(scan_dir), scan_dir + "/report", formats=formats)
+"""
+
+
+def write_shard(path: str, rows: list[dict]) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def measure(code: str, *args: str) -> tuple[float, float]:
+    """Wall-clock seconds and peak RSS in MiB of a snippet run in a child interpreter."""
+    src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", code + PEAK_RSS, *args],
+        check=True, env=dict(os.environ, PYTHONPATH=src_dir), stdout=subprocess.PIPE, text=True
+    )
+    elapsed = time.perf_counter() - started
+    return elapsed, int(completed.stdout.split()[-1]) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Final report benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--partition-mib", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scan_dir:
+        rows = generate_rows(args.rows)
+        write_shard(os.path.join(scan_dir, "initial_scan_results.csv"), rows)
+        write_shard(os.path.join(scan_dir, "light_scan_results.csv"), rows[: len(rows) // 10])
+        rows = None
+
+        print(f"{'report':<34}{'seconds':>10}{'peak RSS MiB':>14}")
+        try:
+            seconds, rss = measure(PANDAS_REPORT, scan_dir)
+            print(f"{'pandas concat + drop_duplicates':<34}{seconds:>10.2f}{rss:>14.0f}")
+        except subprocess.CalledProcessError:
+            print("pandas baseline failed (is pandas installed?)")
+        for formats in ("csv", "csv,jsonl,html"):
+            seconds, rss = measure(ENGINE_REPORT, scan_dir, str(args.partition_mib * 1024 * 1024), formats)
+            label = f"ReportEngine {formats.replace(',', ' + ')}"
+            print(f"{label:<34}{seconds:>10.2f}{rss:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Latency of interpretations through the provider resilience layer, against stub providers.
+
+Two stub providers answer after a log-normal delay, with an occasional slow
+outlier (queueing, a cold replica). Compares calling the primary directly, as
+the Runner did before, with ResilientInterpretor with and without hedging:
+
+- tail: both providers healthy, a few percent of calls are slow outliers;
+- outage: the primary stops answering and every call runs into its timeout.
+
+The stubs sleep instead of calling a model, so only the waiting is measured.
+Run from the nmap-automator directory:
+
+    poetry run python benchmarks/bench_resilience.py --calls 400
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+from nmap_automator.interpretors import BaseInterpretor, ResilientInterpretor, map_bounded, provider_health
+
+ANSWER = '{"classification": "Completed", "analysis_description": "All probed ports answered.", "next_arguments": null}'
+
+
+class StubInterpretor(BaseInterpretor):
+    """Provider answering after a random delay; delays beyond the policy's timeout raise like an SDK timeout."""
+
+    def __init__(self, provider: str, median: float, slow_fraction: float, slow_seconds: float, seed: int):
+        self.provider = provider
+        self.median = median
+        self.slow_fraction = slow_fraction
+        self.slow_seconds = slow_seconds
+        self.down = False
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        super().__init__("bench", f"{provider}-model")
+
+    def configure(self):
+        super().configure()
+
+    def _complete(self, prompt: str, deterministic: bool = False, json_mode: bool = False) -> str:
+        with self.__lock:
+            slow = self.__random.random() < self.slow_fraction
+            delay = self.slow_seconds if slow else self.median * self.__random.lognormvariate(0, 0.4)
+        if self.down:
+            delay = float("inf")
+        if delay > self.policy.timeout:
+            time.sleep(self.policy.timeout)
+            raise TimeoutError(f"{self.provider} did not answer within {self.policy.timeout}s")
+        time.sleep(delay)
+        return ANSWER
+
+    def interpret(self, scan_results: str, save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "default")
+
+    def interpret_restricted(self, scan_results: str, save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "restricted")
+
+    def interpret_with_suggestions(self, scan_results: str, save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "with_suggestions")
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(label: str, interpretor: BaseInterpretor, calls: int, parallel: int, save_dir: str) -> list:
+    interpretor.configure()
+
+    def call(_) -> tuple:
+        started = time.perf_counter()
+        result = interpretor.interpret([], save_dir)
+        return time.perf_counter() - started, result["error"] is None
+
+    started = time.perf_counter()
+    outcomes = list(map_bounded(call, range(calls), parallel))
+    wall = time.perf_counter() - started
+    latencies = [latency for latency, _ in outcomes]
+    succeeded = sum(ok for _, ok in outcomes)
+    return [label, percentile(latencies, 0.5), percentile(latencies, 0.95), percentile(latencies, 0.99), succeeded / calls, wall]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provider resilience benchmark")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--parallel", type=int, default=8)
+    parser.add_argument("--median", type=float, default=0.05)
+    parser.add_argument("--slow-fraction", type=float, default=0.03)
+    parser.add_argument("--slow-seconds", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    args = parser.parse_args()
+
+    def stubs(run_id: int) -> tuple:
+        # Fresh provider names per run, so no run inherits another's latency window or open circuit
+        make = lambda name, seed: StubInterpretor(f"stub_{name}{run_id}", args.median, args.slow_fraction, args.slow_seconds, seed)
+        for name in ("a", "b"):
+            os.environ[f"NMAP_AUTOMATOR_STUB_{name.upper()}{run_id}_TIMEOUT"] = str(args.timeout)
+            os.environ[f"NMAP_AUTOMATOR_STUB_{name.upper()}{run_id}_RETRIES"] = "0"
+        return make("a", run_id), make("b", run_id + 1000)
+
+    results = []
+    run_id = 0
+    with tempfile.TemporaryDirectory() as save_dir:
+        for scenario in ("tail", "outage"):
+            for label in ("direct", "failover", "hedged"):
+                run_id += 1
+                primary, secondary = stubs(run_id)
+                primary.down = scenario == "outage"
+                if label == "direct":
+                    interpretor = primary
+                else:
+                    interpretor = ResilientInterpretor(primary, secondary, hedge=label == "hedged")
+                    if label == "hedged" and scenario == "tail":
+                        # The hedging delay is the primary's p95, learned from earlier calls
+                        run("warm-up", interpretor, 50, args.parallel, save_dir)
+                results.append([scenario] + run(label, interpretor, args.calls, args.parallel, save_dir))
+
+    print(f"{'scenario':<10}{'interpretor':<12}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'answered':>10}{'wall s':>8}")
+    for scenario, label, p50, p95, p99, answered, wall in results:
+        print(f"{scenario:<10}{label:<12}{p50:>8.3f}{p95:>8.3f}{p99:>8.3f}{answered:>10.0%}{wall:>8.1f}")
+    hedges = {key: (health["hedges"], health["hedge_wins"]) for key, health in provider_health.to_dict().items() if health["hedges"]}
+    print("hedges (sent, won):", hedges)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare the dict-based result paths with ScanFrame at scale.
+
+Run from the nmap-automator directory:
+
+    poetry run python benchmarks/bench_scan_frame.py --rows 1000000
+"""
+import time
+import argparse
+from collections import Counter
+
+from nmap_automator.analysis import ScanFrame, extract_features
+from synthetic import generate_rows
+
+
+def timed(fn, repeat: int = 3) -> float:
+    """Best wall-clock time of fn over a few runs, in seconds."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def dict_host_summary(rows):
+    summary = {}
+    for row in rows:
+        host = summary.setdefault(row["IP"], Counter())
+        host[row["State"]] += 1
+    return summary
+
+
+def dict_port_histogram(rows):
+    return Counter(row["Port"] for row in rows if row["State"] == "open").most_common(20)
+
+
+def dict_filter(rows):
+    return [row for row in rows if row["State"] == "open" and row["Name"] in ("http", "https")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ScanFrame vs dict benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows} rows...")
+    rows = generate_rows(args.rows)
+    started = time.perf_counter()
+    frame = ScanFrame.from_records(rows)
+    print(f"Built ScanFrame in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    cases = [
+        ("features", lambda: extract_features(rows), lambda: frame.features()),
+        ("group-by host", lambda: dict_host_summary(rows), lambda: frame.host_summary()),
+        ("open port histogram", lambda: dict_port_histogram(rows), lambda: frame.port_histogram(top=20)),
+        ("filter open http(s)", lambda: dict_filter(rows), lambda: frame.filter(state="open", name=["http", "https"])),
+    ]
+    print(f"\n{'operation':<24}{'dicts (ms)':>12}{'ScanFrame (ms)':>16}{'speedup':>10}")
+    for label, dict_fn, frame_fn in cases:
+        dict_time, frame_time = timed(dict_fn), timed(frame_fn)
+        print(f"{label:<24}{dict_time * 1000:>12.1f}{frame_time * 1000:>16.1f}{dict_time / frame_time:>9.1f}x")
+
+    print(f"\nto_pandas: {timed(frame.to_pandas) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
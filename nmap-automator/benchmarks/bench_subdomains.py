@@ -0,0 +1,97 @@
+"""
+Measure the query rate of the async subdomain resolver against a local stub DNS server.
+
+The stub runs in its own thread and event loop, so the numbers include the
+server's share of the CPU; a real resolver over the network is usually the
+limit long before the client is.
+
+Run from the nmap-automator directory:
+
+    poetry run python benchmarks/bench_subdomains.py --names 20000
+"""
+import os
+import asyncio
+import argparse
+import tempfile
+import threading
+
+from nmap_automator.subdomains import AsyncResolver, SubdomainEnumerator, TTLCache
+from nmap_automator.subdomains.sources import WordlistSource, ZoneTransferSource, CertificateLogSource
+from stub_dns import StubDNSServer
+
+DOMAIN = "example.test"
+
+
+def start_stub(records: dict) -> tuple[StubDNSServer, asyncio.AbstractEventLoop]:
+    loop = asyncio.new_event_loop()
+    server = StubDNSServer(DOMAIN, records)
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return server, loop
+
+
+async def resolve_all(nameserver, names, concurrency):
+    async with AsyncResolver(nameserver, concurrency=concurrency, timeout=2.0) as resolver:
+        found = await resolver.resolve_many(names)
+    return found, resolver.stats.to_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--names", type=int, default=20000, help="Candidate names to resolve")
+    parser.add_argument("--hit-ratio", type=float, default=0.05, help="Fraction of candidates that exist")
+    args = parser.parse_args()
+
+    existing = int(args.names * args.hit_ratio)
+    records = {f"host{i}.{DOMAIN}": f"10.0.{i // 256 % 256}.{i % 256}" for i in range(existing)}
+    server, loop = start_stub(records)
+    nameserver = (server.host, server.port)
+    candidates = [f"host{i}.{DOMAIN}" for i in range(args.names)]
+
+    print(f"{args.names} candidates, {existing} existing names, stub at {nameserver[0]}:{nameserver[1]}")
+    print(f"{'concurrency':>12} {'found':>8} {'queries':>9} {'timeouts':>9} {'seconds':>9} {'qps':>10}")
+    for concurrency in (1, 10, 50, 200, 1000):
+        names = candidates if concurrency > 1 else candidates[:min(len(candidates), 2000)]
+        found, stats = asyncio.run(resolve_all(nameserver, names, concurrency))
+        print(
+            f"{concurrency:>12} {len(found):>8} {stats['queries']:>9} {stats['timeouts']:>9} "
+            f"{stats['seconds']:>9.2f} {stats['queries_per_second']:>10.0f}"
+        )
+
+    # End-to-end enumeration with every source, then the cached repeat
+    with tempfile.TemporaryDirectory() as certlog_dir:
+        with open(os.path.join(certlog_dir, "crtsh.json"), "w") as f:
+            f.write('[{"name_value": "host1.%s\\n*.host2.%s"}, {"name_value": "stale.%s"}]' % (DOMAIN, DOMAIN, DOMAIN))
+        wordlist = os.path.join(certlog_dir, "words.txt")
+        with open(wordlist, "w") as f:
+            f.write("\n".join(f"host{i}" for i in range(0, args.names, 7)))
+
+        enumerator = SubdomainEnumerator(
+            sources={
+                "wordlist": WordlistSource(wordlist),
+                "axfr": ZoneTransferSource(nameservers=[nameserver]),
+                "certlog": CertificateLogSource(certlog_dir),
+            },
+            cache=TTLCache(),
+            nameserver=nameserver,
+        )
+        for attempt in ("cold", "cached"):
+            result = enumerator.enumerate(DOMAIN)
+            print(
+                f"enumerate ({attempt}): {len(result['subdomains'])} subdomains, sources {result['sources']}, "
+                f"{result['stats']['queries']} queries ({result['stats']['timeouts']} timeouts) in {result['stats']['total_seconds']:.3f}s, cached={result['cached']}"
+            )
+
+    loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    main()
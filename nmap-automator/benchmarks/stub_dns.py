@@ -0,0 +1,86 @@
+"""
+Local stub DNS server for exercising the subdomain enumerator without the network.
+
+Answers A queries for the names of a zone over UDP, NXDOMAIN for everything
+else, and serves the whole zone to AXFR requests over TCP.
+"""
+import struct
+import socket
+import asyncio
+
+from nmap_automator.subdomains.dns_wire import QTYPES, RCODE_NOERROR, RCODE_NXDOMAIN, build_response, encode_name, parse_message
+
+
+def _a_rdata(address: str) -> bytes:
+    return socket.inet_aton(address)
+
+
+def _soa_rdata(domain: str) -> bytes:
+    return encode_name(f"ns1.{domain}") + encode_name(f"hostmaster.{domain}") + struct.pack("!IIIII", 1, 3600, 600, 86400, 60)
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: "StubDNSServer"):
+        self.server = server
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.transport.sendto(self.server.answer(data), addr)
+
+
+class StubDNSServer:
+    def __init__(self, domain: str, records: dict[str, str], ttl: int = 300, allow_axfr: bool = True, host: str = "127.0.0.1"):
+        self.domain = domain
+        self.records = {name.lower(): address for name, address in records.items()}
+        self.ttl = ttl
+        self.allow_axfr = allow_axfr
+        self.host = host
+        self.port = None
+        self.queries = 0
+        self.__udp = None
+        self.__tcp = None
+
+    def answer(self, query: bytes) -> bytes:
+        self.queries += 1
+        message = parse_message(query)
+        name, qtype = message.questions[0]
+        question = query[12:]
+        address = self.records.get(name)
+        if address is None or qtype != QTYPES["A"]:
+            rcode = RCODE_NOERROR if address is not None else RCODE_NXDOMAIN
+            return build_response(message.txid, question, rcode, [])
+        return build_response(message.txid, question, RCODE_NOERROR, [(name, QTYPES["A"], self.ttl, _a_rdata(address))])
+
+    async def __handle_tcp(self, reader, writer) -> None:
+        try:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+            query = await reader.readexactly(length)
+            message = parse_message(query)
+            question = query[12:]
+            if not self.allow_axfr:
+                response = build_response(message.txid, question, 5, [])
+            else:
+                soa = (self.domain, QTYPES["SOA"], self.ttl, _soa_rdata(self.domain))
+                answers = [soa] + [
+                    (name, QTYPES["A"], self.ttl, _a_rdata(address)) for name, address in self.records.items()
+                ] + [soa]
+                response = build_response(message.txid, question, RCODE_NOERROR, answers)
+            writer.write(struct.pack("!H", len(response)) + response)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self) -> "StubDNSServer":
+        loop = asyncio.get_running_loop()
+        self.__udp, _ = await loop.create_datagram_endpoint(lambda: _UDPProtocol(self), local_addr=(self.host, 0))
+        self.port = self.__udp.get_extra_info("sockname")[1]
+        # Serve AXFR on the same port number over TCP
+        self.__tcp = await asyncio.start_server(self.__handle_tcp, self.host, self.port)
+        return self
+
+    async def stop(self) -> None:
+        self.__udp.close()
+        self.__tcp.close()
+        await self.__tcp.wait_closed()
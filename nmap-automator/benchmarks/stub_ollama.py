@@ -0,0 +1,202 @@
+"""
+Local stub of the Ollama HTTP API for benchmarking the ollama interpretor without a model.
+
+Serves /api/chat and /api/generate (plain or streamed NDJSON) and simulates
+the costs that matter for latency: loading the model (again after keep_alive
+expires or when num_ctx changes), evaluating the part of the prompt not
+already cached in the slot that serves it, and generating the answer token by
+token. At most num_parallel requests are evaluated at once, like
+OLLAMA_NUM_PARALLEL; the others wait for a slot.
+"""
+import re
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+_DURATION = re.compile(r"^(-?\d+(?:\.\d+)?)(ms|s|m|h)?$")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}
+
+
+def _keep_alive_seconds(value, default: float) -> float:
+    if value is None or value == "":
+        return default
+    match = _DURATION.match(str(value))
+    if match is None:
+        return default
+    seconds = float(match.group(1)) * _UNITS[match.group(2)]
+    return float("inf") if seconds < 0 else seconds
+
+
+def _common_prefix(a: str, b: str) -> int:
+    length = min(len(a), len(b))
+    index = 0
+    while index < length and a[index] == b[index]:
+        index += 1
+    return index
+
+
+def _answer(prompt: str) -> str:
+    hosts = re.search(r"Hosts to classify: ([^\n]*)", prompt)
+    if hosts:
+        return json.dumps({"hosts": [
+            {"host": host, "classification": "Completed", "analysis_description": "All probed ports answered."}
+            for host in hosts.group(1).split(", ")
+        ]})
+    return json.dumps({"classification": "Completed", "analysis_description": "All probed ports answered.", "next_arguments": None})
+
+
+class StubOllamaServer:
+    def __init__(
+        self,
+        load_seconds: float = 1.5,
+        prompt_tokens_per_second: float = 20000,
+        tokens_per_second: float = 1000,
+        num_parallel: int = 4,
+        default_keep_alive: float = 300,
+        host: str = "127.0.0.1"
+    ):
+        self.load_seconds = load_seconds
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.tokens_per_second = tokens_per_second
+        self.num_parallel = num_parallel
+        self.default_keep_alive = default_keep_alive
+        self.host = host
+        self.port = None
+        self.stats = {"requests": 0, "loads": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "max_in_flight": 0}
+        self.__loaded = None
+        self.__expires_at = 0.0
+        self.__load_lock = threading.Lock()
+        self.__slots = [""] * num_parallel
+        self.__busy = [False] * num_parallel
+        self.__slot_free = threading.Condition()
+        self.__server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def __ensure_loaded(self, model: str, num_ctx) -> float:
+        with self.__load_lock:
+            # A model serving requests never expires; keep_alive counts from the end of the last one
+            if self.__loaded == (model, num_ctx) and (any(self.__busy) or time.monotonic() < self.__expires_at):
+                return 0.0
+            # A (re)load empties the prompt caches of every slot
+            time.sleep(self.load_seconds)
+            self.__loaded = (model, num_ctx)
+            self.__expires_at = float("inf")
+            self.__slots = [""] * self.num_parallel
+            self.stats["loads"] += 1
+            return self.load_seconds
+
+    def __acquire_slot(self, prompt: str) -> int:
+        with self.__slot_free:
+            while all(self.__busy):
+                self.__slot_free.wait()
+            free = [index for index, busy in enumerate(self.__busy) if not busy]
+            slot = max(free, key=lambda index: _common_prefix(self.__slots[index], prompt))
+            self.__busy[slot] = True
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], sum(self.__busy))
+            return slot
+
+    def __release_slot(self, slot: int, keep_alive: float) -> None:
+        with self.__slot_free:
+            self.__busy[slot] = False
+            if not any(self.__busy):
+                self.__expires_at = time.monotonic() + keep_alive
+            self.__slot_free.notify()
+
+    def handle(self, path: str, body: dict):
+        """Yield the response objects of one request; a single object unless streaming."""
+        self.stats["requests"] += 1
+        model = body.get("model")
+        options = body.get("options") or {}
+        keep_alive = _keep_alive_seconds(body.get("keep_alive"), self.default_keep_alive)
+        if path == "/api/chat":
+            messages = body.get("messages") or []
+            prompt = "".join(f"<{message['role']}>{message.get('content', '')}" for message in messages)
+            load_only = not messages
+        else:
+            prompt = body.get("prompt") or ""
+            load_only = not prompt
+
+        load = self.__ensure_loaded(model, options.get("num_ctx"))
+        slot = self.__acquire_slot(prompt)
+        try:
+            if load_only:
+                yield {"model": model, "created_at": "", "response": "", "done": True, "done_reason": "load", "load_duration": int(load * 1e9)}
+                return
+            cached = _common_prefix(self.__slots[slot], prompt) // CHARS_PER_TOKEN
+            tokens = len(prompt) // CHARS_PER_TOKEN
+            self.stats["prompt_tokens"] += tokens
+            self.stats["cached_prompt_tokens"] += cached
+            time.sleep((tokens - cached) / self.prompt_tokens_per_second)
+            self.__slots[slot] = prompt
+
+            answer = _answer(prompt)
+            pieces = [answer[start:start + 16 * CHARS_PER_TOKEN] for start in range(0, len(answer), 16 * CHARS_PER_TOKEN)]
+            key = "message" if path == "/api/chat" else "response"
+            for piece in pieces:
+                time.sleep(len(piece) / CHARS_PER_TOKEN / self.tokens_per_second)
+                if body.get("stream", True):
+                    yield {"model": model, "created_at": "", key: {"role": "assistant", "content": piece} if key == "message" else piece, "done": False}
+            final = {
+                "model": model, "created_at": "", "done": True, "done_reason": "stop", "load_duration": int(load * 1e9),
+                "prompt_eval_count": tokens - cached, "eval_count": len(answer) // CHARS_PER_TOKEN
+            }
+            content = "" if body.get("stream", True) else answer
+            final[key] = {"role": "assistant", "content": content} if key == "message" else content
+            yield final
+        finally:
+            self.__release_slot(slot, keep_alive)
+
+    def start(self) -> "StubOllamaServer":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                self.send_response(200)
+                if body.get("stream", True):
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    parts = stub.handle(self.path, body)
+                    try:
+                        for part in parts:
+                            line = (json.dumps(part) + "\n").encode()
+                            self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                            self.wfile.flush()
+                        self.wfile.write(b"0\r\n\r\n")
+                    except (BrokenPipeError, ConnectionResetError):
+                        # The client stopped reading, as the interpretor does once the JSON is complete
+                        parts.close()
+                        self.close_connection = True
+                else:
+                    payload = json.dumps(list(stub.handle(self.path, body))[-1]).encode()
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address) -> None:
+                # Clients closing pooled connections at exit are expected
+                pass
+
+        self.__server = Server((self.host, 0), Handler)
+        self.__server.daemon_threads = True
+        self.port = self.__server.server_address[1]
+        threading.Thread(target=self.__server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
@@ -0,0 +1,28 @@
+import random
+
+STATES = ["open"] * 5 + ["closed"] * 3 + ["filtered"] * 2 + ["open|filtered"]
+SERVICES = [
+    ("ssh", "OpenSSH", "8.9p1"), ("http", "nginx", "1.24.0"), ("https", "Apache httpd", "2.4.57"),
+    ("smtp", "Postfix smtpd", ""), ("domain", "ISC BIND", "9.18"), ("tcpwrapped", "", ""),
+    ("unknown", "", ""), ("mysql", "MySQL", "8.0.35"), ("rdp", "", ""), ("snmp", "net-snmp", "5.9"),
+]
+PORTS = [22, 25, 53, 80, 110, 143, 161, 443, 445, 993, 3306, 3389, 5432, 8080, 8443]
+
+
+def generate_rows(count: int, hosts: int = 5000, seed: int = 0) -> list[dict]:
+    """Generate synthetic NmapScanner rows with a realistic mix of states and services."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        name, product, version = rng.choice(SERVICES)
+        rows.append({
+            "IP": f"10.{(i % hosts) // 65536}.{(i % hosts) // 256 % 256}.{i % hosts % 256}",
+            "Protocol": "tcp" if rng.random() < 0.9 else "udp",
+            "Port": rng.choice(PORTS) if rng.random() < 0.8 else rng.randint(1, 65535),
+            "State": rng.choice(STATES),
+            "Name": name,
+            "Product": product,
+            "Version": version,
+            "Subdomain": f"host{i % hosts}.example.com",
+        })
+    return rows
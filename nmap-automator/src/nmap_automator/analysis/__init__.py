@@ -0,0 +1,3 @@
+# src/nmap_automator/analysis/__init__.py
+from .features import ScanFeatures, FeatureAccumulator, FEATURE_NAMES, extract_features
+from .frame import ScanFrame
\ No newline at end of file
@@ -0,0 +1,133 @@
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class ScanFeatures:
+    row_count: int = 0
+    host_count: int = 0
+    open_count: int = 0
+    closed_count: int = 0
+    filtered_count: int = 0
+    open_filtered_count: int = 0
+    tcpwrapped_count: int = 0
+    unknown_service_count: int = 0
+    versioned_open_count: int = 0
+
+    @property
+    def open_ratio(self) -> float:
+        return self.open_count / self.row_count if self.row_count else 0.0
+
+    @property
+    def closed_ratio(self) -> float:
+        return self.closed_count / self.row_count if self.row_count else 0.0
+
+    @property
+    def filtered_ratio(self) -> float:
+        """Share of rows nmap could not conclude on (filtered or open|filtered)."""
+        return (self.filtered_count + self.open_filtered_count) / self.row_count if self.row_count else 0.0
+
+    @property
+    def version_coverage(self) -> float:
+        """Share of open ports for which a product or version was detected."""
+        return self.versioned_open_count / self.open_count if self.open_count else 0.0
+
+    @property
+    def tcpwrapped_ratio(self) -> float:
+        return self.tcpwrapped_count / self.open_count if self.open_count else 0.0
+
+    @property
+    def unknown_service_ratio(self) -> float:
+        return self.unknown_service_count / self.open_count if self.open_count else 0.0
+
+    @property
+    def open_ports_per_host(self) -> float:
+        return self.open_count / self.host_count if self.host_count else 0.0
+
+    def vector(self) -> list[float]:
+        """Fixed-order numeric representation used by the learned classifiers."""
+        return [
+            float(self.row_count),
+            float(self.host_count),
+            float(self.open_count),
+            self.open_ratio,
+            self.closed_ratio,
+            self.filtered_ratio,
+            self.version_coverage,
+            self.tcpwrapped_ratio,
+            self.unknown_service_ratio,
+            self.open_ports_per_host,
+        ]
+
+    def to_dict(self) -> dict:
+        summary = asdict(self)
+        summary.update({
+            "open_ratio": self.open_ratio,
+            "closed_ratio": self.closed_ratio,
+            "filtered_ratio": self.filtered_ratio,
+            "version_coverage": self.version_coverage,
+            "tcpwrapped_ratio": self.tcpwrapped_ratio,
+            "unknown_service_ratio": self.unknown_service_ratio,
+            "open_ports_per_host": self.open_ports_per_host,
+        })
+        return summary
+
+
+FEATURE_NAMES = [
+    "row_count", "host_count", "open_count", "open_ratio", "closed_ratio", "filtered_ratio",
+    "version_coverage", "tcpwrapped_ratio", "unknown_service_ratio", "open_ports_per_host",
+]
+
+
+def extract_features(results: list[dict]) -> ScanFeatures:
+    """
+    Summarize scan rows (as produced by NmapScanner or read back from CSV) into classifier features.
+
+    :param results: List of port rows with IP, State, Name, Product and Version keys, or a ScanFrame.
+    :return: ScanFeatures for the whole result set.
+    """
+    if hasattr(results, "features"):
+        # ScanFrame computes the same counts vectorized
+        return results.features()
+
+    features = ScanFeatures()
+    hosts = set()
+    for row in results:
+        features.row_count += 1
+        hosts.add(row.get("IP"))
+        state = row.get("State", "")
+        if state == "open":
+            features.open_count += 1
+            name = row.get("Name") or ""
+            if name == "tcpwrapped":
+                features.tcpwrapped_count += 1
+            elif name in ("", "unknown"):
+                features.unknown_service_count += 1
+            if row.get("Product") or row.get("Version"):
+                features.versioned_open_count += 1
+        elif state == "closed":
+            features.closed_count += 1
+        elif state == "filtered":
+            features.filtered_count += 1
+        elif state == "open|filtered":
+            features.open_filtered_count += 1
+    features.host_count = len(hosts)
+    return features
+
+
+class FeatureAccumulator:
+    """Builds ScanFeatures incrementally over batches of rows, for results too large to hold at once."""
+
+    def __init__(self):
+        self.__features = ScanFeatures()
+        self.__hosts = set()
+
+    def update(self, results: list[dict]) -> None:
+        batch = extract_features(results)
+        for name in ScanFeatures.__dataclass_fields__:
+            if name != "host_count":
+                setattr(self.__features, name, getattr(self.__features, name) + getattr(batch, name))
+        self.__hosts.update(row.get("IP") for row in results)
+
+    def features(self) -> ScanFeatures:
+        self.__features.host_count = len(self.__hosts)
+        return self.__features
@@ -0,0 +1,257 @@
+import csv
+import numpy as np
+
+from .features import ScanFeatures
+
+CATEGORICAL_COLUMNS = ["IP", "Protocol", "State", "Name", "Product", "Version", "Subdomain"]
+COLUMNS = ["IP", "Protocol", "Port", "State", "Name", "Product", "Version", "Subdomain"]
+
+
+class CategoryTable:
+    """Incrementally assigns integer codes to the distinct values of a column."""
+
+    def __init__(self, values: list[str] = None):
+        self.values = []
+        self.codes = {}
+        for value in values or []:
+            self.code(value)
+
+    def code(self, value) -> int:
+        value = "" if value is None else str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def lookup(self, value) -> int:
+        """Code of an existing value, or -1 when the value never occurs in the column."""
+        return self.codes.get("" if value is None else str(value), -1)
+
+
+class ScanFrame:
+    """
+    Columnar, integer-coded view of scan results.
+
+    Every text column is stored as an int32 code array plus the list of its
+    distinct values, and ports as an int32 array. Filters, group-bys and
+    histograms are vectorized NumPy operations over the code arrays, and the
+    category tables are shared between a frame and the frames filtered from it.
+    """
+
+    def __init__(self, codes: dict[str, np.ndarray], categories: dict[str, CategoryTable], ports: np.ndarray):
+        self.codes = codes
+        self.categories = categories
+        self.ports = ports
+
+    def __len__(self) -> int:
+        return len(self.ports)
+
+    @classmethod
+    def from_records(cls, records, subdomain: str = None) -> "ScanFrame":
+        """
+        Build a frame from an iterable of row dictionaries.
+
+        :param records: Iterable of rows with the NmapScanner result keys.
+        :param subdomain: Subdomain to use for rows that do not carry one.
+        :return: ScanFrame holding the rows.
+        """
+        categories = {column: CategoryTable() for column in CATEGORICAL_COLUMNS}
+        code_lists = {column: [] for column in CATEGORICAL_COLUMNS}
+        ports = []
+        for record in records:
+            for column in CATEGORICAL_COLUMNS:
+                value = record.get(column)
+                if column == "Subdomain" and value is None:
+                    value = subdomain
+                code_lists[column].append(categories[column].code(value))
+            ports.append(int(record.get("Port") or 0))
+
+        codes = {column: np.asarray(values, dtype=np.int32) for column, values in code_lists.items()}
+        return cls(codes, categories, np.asarray(ports, dtype=np.int32))
+
+    @classmethod
+    def from_csv(cls, file_path: str) -> "ScanFrame":
+        with open(file_path, "r", newline="") as csv_file:
+            return cls.from_records(csv.DictReader(csv_file))
+
+    @classmethod
+    def from_file(cls, file_path: str) -> "ScanFrame":
+        """Build a frame from a CSV or NDJSON scan file, streaming it row by row."""
+        from nmap_automator.utils.ingest import iter_result_rows
+
+        return cls.from_records(iter_result_rows(file_path))
+
+    def _take(self, selector) -> "ScanFrame":
+        codes = {column: values[selector] for column, values in self.codes.items()}
+        return ScanFrame(codes, self.categories, self.ports[selector])
+
+    def _in(self, column: str, values) -> np.ndarray:
+        if isinstance(values, str):
+            values = [values]
+        wanted = [self.categories[column].lookup(value) for value in values]
+        return np.isin(self.codes[column], [code for code in wanted if code >= 0])
+
+    def filter(
+        self,
+        ip=None,
+        protocol=None,
+        state=None,
+        name=None,
+        product=None,
+        subdomain=None,
+        port=None,
+        port_min: int = None,
+        port_max: int = None
+    ) -> "ScanFrame":
+        """
+        Select rows matching all the given conditions.
+
+        Text conditions and `port` accept a single value or a list of values.
+
+        :return: ScanFrame with the matching rows.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for column, values in (
+            ("IP", ip), ("Protocol", protocol), ("State", state),
+            ("Name", name), ("Product", product), ("Subdomain", subdomain)
+        ):
+            if values is not None:
+                mask &= self._in(column, values)
+        if port is not None:
+            mask &= np.isin(self.ports, [port] if isinstance(port, int) else list(port))
+        if port_min is not None:
+            mask &= self.ports >= port_min
+        if port_max is not None:
+            mask &= self.ports <= port_max
+        return self._take(mask)
+
+    def sort(self, column: str = "Port", descending: bool = False) -> "ScanFrame":
+        """Sort rows by a column (text columns are sorted by value, not by code)."""
+        if column == "Port":
+            keys = self.ports
+        else:
+            # Rank the categories alphabetically so sorting stays a pure integer argsort
+            values = self.categories[column].values
+            ranks = np.empty(len(values), dtype=np.int32)
+            ranks[np.argsort(np.asarray(values, dtype=object), kind="stable")] = np.arange(len(values), dtype=np.int32)
+            keys = ranks[self.codes[column]]
+        order = np.argsort(keys, kind="stable")
+        if descending:
+            order = order[::-1]
+        return self._take(order)
+
+    def slice(self, start: int, stop: int) -> "ScanFrame":
+        return self._take(slice(start, stop))
+
+    def host_summary(self) -> list[dict]:
+        """
+        Count the rows of each state per host.
+
+        :return: List of {'IP': ..., '<state>': count, 'total': count} dictionaries.
+        """
+        ip_codes, state_codes = self.codes["IP"], self.codes["State"]
+        n_ips, n_states = len(self.categories["IP"].values), len(self.categories["State"].values)
+        if not len(self) or not n_ips or not n_states:
+            return []
+
+        counts = np.bincount(ip_codes * n_states + state_codes, minlength=n_ips * n_states).reshape(n_ips, n_states)
+        present = np.flatnonzero(counts.sum(axis=1))
+        states = self.categories["State"].values
+        summary = []
+        for ip_code in present:
+            row = {"IP": self.categories["IP"].values[ip_code], "total": int(counts[ip_code].sum())}
+            for state_code, state in enumerate(states):
+                row[state] = int(counts[ip_code, state_code])
+            summary.append(row)
+        return summary
+
+    def port_histogram(self, state: str = "open", top: int = None) -> list[tuple[int, int]]:
+        """
+        Count how often each port appears, optionally restricted to one state.
+
+        :param state: Only count rows in this state (None counts every row).
+        :param top: Only return the most frequent ports.
+        :return: List of (port, count) tuples, most frequent first.
+        """
+        ports = self.ports if state is None else self.ports[self._in("State", state)]
+        if not len(ports):
+            return []
+        counts = np.bincount(ports)
+        present = np.flatnonzero(counts)
+        order = present[np.argsort(-counts[present], kind="stable")]
+        if top is not None:
+            order = order[:top]
+        return [(int(port), int(counts[port])) for port in order]
+
+    def value_counts(self, column: str, state: str = None, top: int = None) -> list[tuple[str, int]]:
+        """Count the rows per value of a text column, most frequent first."""
+        codes = self.codes[column] if state is None else self.codes[column][self._in("State", state)]
+        if not len(codes):
+            return []
+        counts = np.bincount(codes, minlength=len(self.categories[column].values))
+        present = np.flatnonzero(counts)
+        order = present[np.argsort(-counts[present], kind="stable")]
+        if top is not None:
+            order = order[:top]
+        values = self.categories[column].values
+        return [(values[code], int(counts[code])) for code in order]
+
+    def features(self) -> ScanFeatures:
+        """Compute the classifier features with vectorized counts."""
+        state = self.codes["State"]
+        state_codes = self.categories["State"]
+        is_open = state == state_codes.lookup("open")
+
+        names = self.codes["Name"][is_open]
+        empty_product = self.categories["Product"].lookup("")
+        empty_version = self.categories["Version"].lookup("")
+        versioned = (self.codes["Product"][is_open] != empty_product) | (self.codes["Version"][is_open] != empty_version)
+        unknown_names = [
+            code for code in (self.categories["Name"].lookup(""), self.categories["Name"].lookup("unknown")) if code >= 0
+        ]
+
+        return ScanFeatures(
+            row_count=len(self),
+            host_count=int(np.count_nonzero(np.bincount(self.codes["IP"]))) if len(self) else 0,
+            open_count=int(is_open.sum()),
+            closed_count=int((state == state_codes.lookup("closed")).sum()),
+            filtered_count=int((state == state_codes.lookup("filtered")).sum()),
+            open_filtered_count=int((state == state_codes.lookup("open|filtered")).sum()),
+            tcpwrapped_count=int((names == self.categories["Name"].lookup("tcpwrapped")).sum()),
+            unknown_service_count=int(np.isin(names, unknown_names).sum()),
+            versioned_open_count=int(versioned.sum())
+        )
+
+    def column(self, column: str) -> np.ndarray:
+        """Decode a column to an object array of values."""
+        if column == "Port":
+            return self.ports
+        return np.asarray(self.categories[column].values, dtype=object)[self.codes[column]]
+
+    def to_records(self) -> list[dict]:
+        decoded = {column: self.column(column) for column in CATEGORICAL_COLUMNS}
+        return [
+            {column: (int(self.ports[i]) if column == "Port" else decoded[column][i]) for column in COLUMNS}
+            for i in range(len(self))
+        ]
+
+    def to_pandas(self):
+        """
+        Convert to a pandas DataFrame of categorical columns.
+
+        The code arrays become the categorical codes and the port array is wrapped
+        without copying, so the conversion costs O(distinct values), not O(rows).
+        """
+        import pandas as pd
+
+        data = {}
+        for column in COLUMNS:
+            if column == "Port":
+                data[column] = pd.Series(self.ports, copy=False)
+            else:
+                data[column] = pd.Categorical.from_codes(
+                    self.codes[column], categories=pd.Index(self.categories[column].values, dtype=object)
+                )
+        return pd.DataFrame(data, copy=False)
@@ -0,0 +1,206 @@
+import io
+import os
+import csv
+import json
+import math
+import glob
+import hashlib
+import argparse
+
+from .features import FEATURE_NAMES, extract_features
+
+CLASSES = ["Completed", "Incomplete", "False Positive Rich"]
+DEFAULT_MODEL_PATH = os.path.join("models", "local_classifier.json")
+NON_LLM_SOURCES = ("local_model", "fast_path")
+
+
+class BoostedStumpsClassifier:
+    """
+    Multiclass gradient-boosted decision stumps over the scan feature vector.
+
+    Pure Python and dependency free: a model is a few hundred (feature, threshold,
+    left, right) tuples, so inference is a handful of comparisons per class and
+    stays well under a millisecond on any CPU.
+    """
+
+    def __init__(self, n_rounds: int = 60, learning_rate: float = 0.3, min_leaf: int = 2):
+        self.n_rounds = n_rounds
+        self.learning_rate = learning_rate
+        self.min_leaf = min_leaf
+        self.priors = [0.0] * len(CLASSES)
+        # One list of stumps (feature, threshold, left_value, right_value) per class
+        self.stumps = [[] for _ in CLASSES]
+
+    @staticmethod
+    def _softmax(scores: list[float]) -> list[float]:
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def _fit_stump(self, X: list[list[float]], residuals: list[float], hessians: list[float]):
+        best = None
+        n = len(X)
+        for feature in range(len(X[0])):
+            order = sorted(range(n), key=lambda i: X[i][feature])
+            total_r = sum(residuals)
+            total_h = sum(hessians)
+            left_r = left_h = 0.0
+            for position in range(n - 1):
+                i = order[position]
+                left_r += residuals[i]
+                left_h += hessians[i]
+                count = position + 1
+                value, next_value = X[i][feature], X[order[position + 1]][feature]
+                if value == next_value or count < self.min_leaf or n - count < self.min_leaf:
+                    continue
+                right_r, right_h = total_r - left_r, total_h - left_h
+                # Newton gain of splitting the residuals at this threshold
+                gain = left_r ** 2 / (left_h + 1e-9) + right_r ** 2 / (right_h + 1e-9)
+                if best is None or gain > best[0]:
+                    best = (
+                        gain, feature, (value + next_value) / 2,
+                        left_r / (left_h + 1e-9), right_r / (right_h + 1e-9)
+                    )
+        if best is None:
+            return None
+        return best[1:]
+
+    def fit(self, X: list[list[float]], y: list[str]) -> "BoostedStumpsClassifier":
+        """
+        Train on feature vectors and their verdicts.
+
+        :param X: List of feature vectors (see ScanFeatures.vector).
+        :param y: List of classifications, each one of CLASSES.
+        :return: The fitted classifier.
+        """
+        n, k = len(X), len(CLASSES)
+        targets = [[1.0 if label == c else 0.0 for c in CLASSES] for label in y]
+        self.priors = [math.log((sum(t[c] for t in targets) + 1) / (n + k)) for c in range(k)]
+        self.stumps = [[] for _ in CLASSES]
+        scores = [list(self.priors) for _ in range(n)]
+
+        shrink = (k - 1) / k
+        for _ in range(self.n_rounds):
+            probabilities = [self._softmax(s) for s in scores]
+            for c in range(k):
+                residuals = [targets[i][c] - probabilities[i][c] for i in range(n)]
+                hessians = [probabilities[i][c] * (1 - probabilities[i][c]) for i in range(n)]
+                stump = self._fit_stump(X, residuals, hessians)
+                if stump is None:
+                    continue
+                feature, threshold, left, right = stump
+                left, right = left * shrink * self.learning_rate, right * shrink * self.learning_rate
+                self.stumps[c].append((feature, threshold, left, right))
+                for i in range(n):
+                    scores[i][c] += left if X[i][feature] <= threshold else right
+        return self
+
+    def predict_proba(self, x: list[float]) -> dict[str, float]:
+        scores = list(self.priors)
+        for c, stumps in enumerate(self.stumps):
+            for feature, threshold, left, right in stumps:
+                scores[c] += left if x[feature] <= threshold else right
+        return dict(zip(CLASSES, self._softmax(scores)))
+
+    def predict(self, x: list[float]) -> tuple[str, float]:
+        """
+        Classify a feature vector.
+
+        :param x: Feature vector.
+        :return: Tuple of (classification, probability).
+        """
+        probabilities = self.predict_proba(x)
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+    def save(self, path: str) -> None:
+        dirs = os.path.dirname(path)
+        if dirs:
+            os.makedirs(dirs, exist_ok=True)
+        with io.open(path, "w") as f:
+            f.write(json.dumps({
+                "classes": CLASSES,
+                "features": FEATURE_NAMES,
+                "priors": self.priors,
+                "stumps": self.stumps
+            }))
+
+    @classmethod
+    def load(cls, path: str) -> "BoostedStumpsClassifier":
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Local model not found at '{path}'")
+        with io.open(path, "r") as f:
+            data = json.load(f)
+        if data["features"] != FEATURE_NAMES or data["classes"] != CLASSES:
+            raise ValueError(f"Local model at '{path}' was trained on a different feature set; retrain it.")
+        model = cls()
+        model.priors = data["priors"]
+        model.stumps = [[tuple(stump) for stump in stumps] for stumps in data["stumps"]]
+        return model
+
+
+def collect_training_data(results_root: str, verdict_file: str = "Nmap Automator_results.json"):
+    """
+    Pair every stored scan CSV with the LLM verdict saved next to it.
+
+    Scans whose rows are identical (e.g. one scan shared by concurrent requests,
+    each with its own copy of the verdict) are only counted once.
+
+    :param results_root: Scanner save_dir containing the scan_* directories.
+    :param verdict_file: File name of the interpretor results inside each scan directory.
+    :return: Tuple of (feature vectors, classifications).
+    """
+    X, y = [], []
+    seen = set()
+    for scan_dir in sorted(glob.glob(os.path.join(results_root, "*"))):
+        verdict_path = os.path.join(scan_dir, verdict_file)
+        csv_path = os.path.join(scan_dir, "initial_scan_results.csv")
+        if not os.path.isfile(verdict_path):
+            continue
+        try:
+            with io.open(verdict_path, "r") as f:
+                verdict = json.load(f)
+        except json.JSONDecodeError:
+            continue
+        label = verdict.get("result")
+        if verdict.get("error") or label not in CLASSES:
+            continue
+        # Only LLM verdicts are labels: the model must never learn from its own answers or the heuristic rules
+        if verdict.get("source") in NON_LLM_SOURCES:
+            continue
+
+        rows = []
+        if os.path.isfile(csv_path):
+            with open(csv_path, "r", newline="") as f:
+                rows = list(csv.DictReader(f))
+        scan_hash = hashlib.sha256(json.dumps(rows, sort_keys=True).encode()).hexdigest()
+        if scan_hash in seen:
+            continue
+        seen.add(scan_hash)
+        X.append(extract_features(rows).vector())
+        y.append(label)
+    return X, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local scan classifier from stored LLM verdicts")
+    parser.add_argument("--results-dir", default="./results", help="Scanner save_dir containing scan_* directories")
+    parser.add_argument("--output", default=DEFAULT_MODEL_PATH, help="Where to write the trained model")
+    parser.add_argument("--rounds", type=int, default=60, help="Number of boosting rounds")
+    args = parser.parse_args()
+
+    X, y = collect_training_data(args.results_dir)
+    if len(X) < 2 or len(set(y)) < 2:
+        print(f"Not enough labelled scans to train on ({len(X)} found, {len(set(y))} classes).")
+        return
+
+    model = BoostedStumpsClassifier(n_rounds=args.rounds).fit(X, y)
+    correct = sum(1 for x, label in zip(X, y) if model.predict(x)[0] == label)
+    print(f"Trained on {len(X)} scans, training accuracy {correct / len(X):.1%}")
+    model.save(args.output)
+    print(f"Model saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
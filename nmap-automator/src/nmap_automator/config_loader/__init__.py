@@ -1 +1 @@
-from .config import Config, NmapScanRequest, LLMInterpretRequest, ScannerConfig, InterpretorConfig, SubdomainRequest
\ No newline at end of file
+from .config import Config, NmapScanRequest, LLMInterpretRequest, ResumeScanRequest, RefineScanRequest, ScannerConfig, InterpretorConfig, SubdomainRequest, ResultFilter, ResultQueryRequest, ResultAggregateRequest, ReportRequest, CveCorrelationRequest
\ No newline at end of file
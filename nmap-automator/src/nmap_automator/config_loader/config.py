@@ -1,25 +1,67 @@
 import os
-from typing import Literal, List
+from typing import Literal, List, Optional, Dict
 
 from pydantic import BaseModel, field_validator, model_validator, Field
 from omegaconf import OmegaConf
+from nmap_automator.scanner.arguments import validate_nmap_arguments, validate_target
+from nmap_automator.scanner.profiles import get_profile
+from nmap_automator.scanner.pipeline import TwoPhasePipeline
+from nmap_automator.subdomains.sources import SOURCES as SUBDOMAIN_SOURCES
+
+MODEL_FLAVORS = {
+    "gpt": ["gpt-4", "gpt-4o", "gpt-4o-mini", "o1", "o1-mini"],
+    "gemini": [
+        "models/gemini-1.5-pro", "models/gemini-1.5-flash",
+        "models/gemini-1.5-flash-8b", "models/gemini-1.0-pro"
+    ],
+    "ollama": [
+        "llama3.3", "llama3.2", "llama3.1", "llama3", 
+        "llama2", "gemma2", "gemma",
+        "jimscard/whiterabbit-neo", "ALIENTELLIGENCE/cybersecuritythreatanalysis"
+    ],
+    "local": ["default"],
+    # Picks the model of each request from NMAP_AUTOMATOR_AUTO_MODELS or the providers with an API key
+    "auto": ["default"]
+}
 
 class ScannerConfig(BaseModel):
-    nmap_args: List[str]
+    nmap_args: List[str] = []
     save_dir: str
     target: List[str]
+    profile: Optional[str] = None
+    profile_params: Dict[str, str] = {}
+    strategy: Literal["single", "two_phase"] = "single"
+    hosts_per_batch: Optional[int] = Field(
+        None, gt=0, description="Hosts per nmap invocation and checkpoint; derived from the target size by default."
+    )
 
     @field_validator("nmap_args")
     @classmethod
     def validate_nmap_args(cls, v):
         if not isinstance(v, List):
             raise ValueError("nmap_args must be a list")
-        for arg in v:
-            if not isinstance(arg, str):
-                raise ValueError("nmap-args must be a list of strings")
-            if arg not in ['-sS', '-sV', '-sT', '-A', '-T3', '-v', '-p', '-T4']:
-                raise ValueError("nmap-args must be one of '-sS', '-sT', '-A', '-T3', '-T4', '-v'")
-        return v
+        return validate_nmap_arguments(v)
+
+    @model_validator(mode='after')
+    def apply_profile(self):
+        if self.profile is None:
+            if not self.nmap_args and self.strategy == "single":
+                raise ValueError("Either nmap_args or profile must be provided")
+            if self.profile_params:
+                raise ValueError("profile_params can only be used together with a profile")
+        else:
+            if self.nmap_args:
+                raise ValueError("nmap_args and profile are mutually exclusive")
+            self.nmap_args = get_profile(self.profile).build(**self.profile_params)
+        if self.strategy == "two_phase":
+            # With two phases, the arguments only drive the deep scan of the open ports
+            self.nmap_args = list(self.pipeline().deep_arguments)
+        return self
+
+    def pipeline(self) -> TwoPhasePipeline:
+        if not self.nmap_args:
+            return TwoPhasePipeline()
+        return TwoPhasePipeline.from_deep_arguments(self.nmap_args)
     
     @field_validator("save_dir")
     @classmethod
@@ -33,65 +75,152 @@ class ScannerConfig(BaseModel):
     def validate_target(cls, v):
         if not isinstance(v, List):
             raise ValueError("targets must be a list")
+        for target in v:
+            if not isinstance(target, str):
+                raise ValueError("targets must be strings")
+            validate_target(target)
         return v
     
 class InterpretorConfig(BaseModel):
-    interpretor_type: Literal["ollama", "gpt", "gemini"]
+    interpretor_type: Literal["ollama", "gpt", "gemini", "local", "auto"]
     model_flavor: str
-    interpret_runner: Literal["normal", "restricted", "suggest"]
+    interpret_runner: Literal["normal", "restricted", "suggest", "per_host"]
+    fast_path: bool = True
+    fallback_interpretor_type: Optional[Literal["ollama", "gpt", "gemini"]] = None
+    fallback_model_flavor: Optional[str] = None
+    hedge: bool = False
+    token_budget: Optional[int] = Field(None, gt=0, description="Tokens one job may use; defaults to NMAP_AUTOMATOR_JOB_TOKEN_BUDGET.")
+    cost_budget: Optional[float] = Field(None, gt=0, description="USD one job may spend; defaults to NMAP_AUTOMATOR_JOB_COST_BUDGET.")
 
     @model_validator(mode='before')
     def validate_interpretor_config(cls, values):
         interpretor_type = values.get('interpretor_type')
         model_flavor = values.get('model_flavor')
         interpret_runner = values.get('interpret_runner')
-
-        model_model_flavor = {
-            "gpt": ["gpt-4", "gpt-4o", "gpt-4o-mini", "o1", "o1-mini"],
-            "gemini": [
-                "models/gemini-1.5-pro", "models/gemini-1.5-flash",
-                "models/gemini-1.5-flash-8b", "models/gemini-1.0-pro"
-            ],
-            "ollama": [
-                "llama3.3", "llama3.2", "llama3.1", "llama3", 
-                "llama2", "gemma2", "gemma",
-                "jimscard/whiterabbit-neo", "ALIENTELLIGENCE/cybersecuritythreatanalysis"
-            ]
-        }
+        fallback_type = values.get('fallback_interpretor_type')
+        fallback_flavor = values.get('fallback_model_flavor')
         
-        if interpretor_type not in ["ollama", "gpt", "gemini"]:
-            raise ValueError("interpretor_type must be one of 'ollama', 'gpt', 'gemini'")
+        if interpretor_type not in MODEL_FLAVORS:
+            raise ValueError("interpretor_type must be one of 'ollama', 'gpt', 'gemini', 'local', 'auto'")
         
-        valid_flavors = model_model_flavor.get(interpretor_type, [])
+        valid_flavors = MODEL_FLAVORS.get(interpretor_type, [])
 
         if model_flavor not in valid_flavors:
             raise ValueError(f"model_flavor must be one of {valid_flavors} for interpretor_type '{interpretor_type}'")
         
-        if interpret_runner not in ["normal", "restricted", "suggest"]:
-            raise ValueError("interpret_runner must be one of 'normal', 'restricted', 'suggest'")
+        if interpret_runner not in ["normal", "restricted", "suggest", "per_host"]:
+            raise ValueError("interpret_runner must be one of 'normal', 'restricted', 'suggest', 'per_host'")
+
+        if interpretor_type == "auto" and (fallback_type is not None or values.get('hedge')):
+            raise ValueError("the 'auto' interpretor_type escalates between its own models and takes no fallback or hedge")
+
+        if fallback_type is not None:
+            if fallback_type not in ["ollama", "gpt", "gemini"]:
+                raise ValueError("fallback_interpretor_type must be one of 'ollama', 'gpt', 'gemini'")
+            if fallback_flavor not in MODEL_FLAVORS[fallback_type]:
+                raise ValueError(
+                    f"fallback_model_flavor must be one of {MODEL_FLAVORS[fallback_type]} "
+                    f"for fallback_interpretor_type '{fallback_type}'"
+                )
+            if (fallback_type, fallback_flavor) == (interpretor_type, model_flavor):
+                raise ValueError("the fallback must differ from the interpretor it backs up")
+
+        if values.get('hedge') and (fallback_type is None or interpretor_type == "local"):
+            raise ValueError("hedge requires a fallback_interpretor_type and an interpretor_type other than 'local'")
         
         return values
 
 class NmapScanRequest(BaseModel):
     """Request model for the /nmap_scan endpoint."""
     scanner: ScannerConfig = Field(..., description="Scanner configuration for the Nmap scan.")
+    timeout_seconds: Optional[float] = Field(
+        None, gt=0, description="Hard time limit of a scan job; partial results are kept when it is hit."
+    )
+
+class ResumeScanRequest(BaseModel):
+    """Request model for the /resume_scan endpoint."""
+    scan_dir_path: str = Field(..., description="Path to the directory of the interrupted scan.")
 
 class LLMInterpretRequest(BaseModel):
     """Request model for the /llm_interpret endpoint."""
     #scanner: ScannerConfig = Field(..., description="Scanner configuration for the saved directory.")
     interpretor: InterpretorConfig = Field(..., description="Interpreter configuration for the LLM.")
-    scan_file_path: str = Field(..., description="Path to the CSV file with scan results.")
+    scan_file_path: str = Field(..., description="Path to the CSV or NDJSON file with scan results.")
+    scan_dir_path: str = Field(..., description="Path to the scan data directory.")
+
+class RefineScanRequest(BaseModel):
+    """Request model for the /refine_scan endpoint."""
+    interpretor: InterpretorConfig = Field(..., description="Interpreter configuration; the suggest runner is always used.")
+    scan_file_path: str = Field(..., description="Path to the CSV or NDJSON file with the results to refine.")
     scan_dir_path: str = Field(..., description="Path to the scan data directory.")
+    max_iterations: int = Field(3, ge=1, le=10, description="Maximum number of interpret-then-rescan iterations.")
+    max_seconds: float = Field(1800.0, gt=0, description="Wall-clock budget of the whole refinement.")
+    max_tokens: int = Field(200000, gt=0, description="Approximate prompt token budget across iterations.")
 
 class SubdomainRequest(BaseModel):
     domain: str = Field(..., description="The target domain to enumerate subdomains for.")
     engines: list[str] = Field(
-        default=[
-            "google", "bing", "yahoo", "baidu", "ask", "netcraft",
-            "dnsdumpster", "virustotal", "threatcrowd", "ssl", "passivedns"
-        ],
-        description="List of search engines to use for subdomain enumeration."
+        default=list(SUBDOMAIN_SOURCES),
+        description="Subdomain sources to use: 'wordlist', 'axfr' and/or 'certlog'."
+    )
+    resolver: Optional[str] = Field(None, description="DNS resolver as 'host' or 'host:port', overrides the configured one.")
+
+    @field_validator("engines")
+    @classmethod
+    def validate_engines(cls, v):
+        unknown = set(v) - set(SUBDOMAIN_SOURCES)
+        if unknown:
+            raise ValueError(f"Unknown subdomain source(s) {sorted(unknown)}, expected any of {sorted(SUBDOMAIN_SOURCES)}")
+        return v
+
+class ResultFilter(BaseModel):
+    """Conditions on stored scan rows; text fields and `port` take one value or a list."""
+    host: Optional[str | List[str]] = Field(None, description="IP address(es) of the hosts to keep.")
+    port: Optional[int | List[int]] = Field(None, description="Port number(s) to keep.")
+    port_min: Optional[int] = Field(None, ge=0, le=65535, description="Lowest port to keep.")
+    port_max: Optional[int] = Field(None, ge=0, le=65535, description="Highest port to keep.")
+    protocol: Optional[str | List[str]] = Field(None, description="Protocol(s) to keep, e.g. 'tcp'.")
+    state: Optional[str | List[str]] = Field(None, description="Port state(s) to keep, e.g. 'open'.")
+    service: Optional[str | List[str]] = Field(None, description="Service name(s) to keep, e.g. 'http'.")
+    product: Optional[str | List[str]] = Field(None, description="Product(s) to keep.")
+    subdomain: Optional[str | List[str]] = Field(None, description="Subdomain(s) to keep.")
+
+class ResultQueryRequest(BaseModel):
+    """Request model for the /query_results endpoint."""
+    scan_file_path: str = Field(..., description="Path to the CSV or NDJSON file with scan results.")
+    filters: ResultFilter = Field(default_factory=ResultFilter, description="Conditions the returned rows must match.")
+    sort_by: Literal["IP", "Protocol", "Port", "State", "Name", "Product", "Version", "Subdomain"] = Field(
+        "IP", description="Column to sort the rows by."
+    )
+    descending: bool = Field(False, description="Sort in descending order.")
+    limit: int = Field(100, ge=1, le=5000, description="Maximum number of rows per page.")
+    cursor: Optional[str] = Field(None, description="Cursor of the page to fetch, as returned by the previous page.")
+
+class ResultAggregateRequest(BaseModel):
+    """Request model for the /aggregate_results endpoint."""
+    scan_file_path: str = Field(..., description="Path to the CSV or NDJSON file with scan results.")
+    filters: ResultFilter = Field(default_factory=ResultFilter, description="Conditions on the rows that are aggregated.")
+    aggregate: Literal["hosts", "ports", "services", "products", "states"] = Field(
+        ..., description="'hosts' counts the ports of each state per host, the others count rows per value."
     )
+    state: Optional[str] = Field("open", description="Only count rows in this state (ignored by 'hosts' and 'states').")
+    limit: int = Field(50, ge=1, le=5000, description="Maximum number of groups per page.")
+    cursor: Optional[str] = Field(None, description="Cursor of the page to fetch, as returned by the previous page.")
+
+class ReportRequest(BaseModel):
+    """Request model for the /generate_report endpoint."""
+    scan_dir_path: str = Field(..., description="Path to the scan data directory whose result files are reported on.")
+    formats: List[Literal["csv", "jsonl", "html"]] = Field(
+        default=["csv", "jsonl", "html"], min_length=1, description="Report files to write."
+    )
+    title: Optional[str] = Field(None, description="Title of the HTML report.")
+
+class CveCorrelationRequest(BaseModel):
+    """Request model for the /correlate_cves endpoint."""
+    scan_file_path: str = Field(..., description="Path to the CSV or NDJSON file with scan results.")
+    state: Optional[str] = Field("open", description="Only check ports in this state; null checks every row.")
+    min_score: float = Field(0.0, ge=0.0, le=10.0, description="Ignore CVEs scored below this CVSS base score.")
+    limit: int = Field(1000, ge=1, le=50000, description="Maximum number of matched rows returned, highest score first.")
 
 class Config(BaseModel):
     scanner: ScannerConfig
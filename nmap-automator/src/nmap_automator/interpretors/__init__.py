@@ -1,6 +1,24 @@
 # src/nmap_automator/interpretors/__init__.py
 from .base_interpretor import BaseInterpretor
-from .gpt_based_interpretor import GPTInterpretor
-from .gemini_based_interpretor import GeminiInterpretor
-from .ollama_interpretor import OllamaInterpretor
-from .interpretor_factory import InterpretorFactory
\ No newline at end of file
+from .interpretor_factory import InterpretorFactory, INTERPRETORS, load_interpretor_class
+from .fast_path import FastPathClassifier, FastPathStats
+from .chunking import merge_classifications, map_bounded
+from .health import ProviderPolicy, ProviderHealth, CircuitOpenError, provider_health
+from .resilient_interpretor import ResilientInterpretor
+from .auto_interpretor import AutoInterpretor, RouterStats, auto_candidates, router_stats
+from .accounting import UsageLedger, UsageMeter, BudgetExceededError, MODEL_PRICES, CHEAPER_FLAVORS, estimate_tokens, usage_ledger
+from .parsing import ResponseParseError, IncrementalJSONParser, extract_json, repair_json
+
+_LAZY_CLASSES = {
+    "GPTInterpretor": "gpt",
+    "GeminiInterpretor": "gemini",
+    "OllamaInterpretor": "ollama",
+    "LocalInterpretor": "local",
+}
+
+
+def __getattr__(name: str):
+    # Provider classes pull in their SDKs, so they are only imported when asked for
+    if name in _LAZY_CLASSES:
+        return load_interpretor_class(_LAZY_CLASSES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
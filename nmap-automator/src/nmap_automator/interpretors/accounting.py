@@ -0,0 +1,277 @@
+import io
+import os
+import json
+import time
+import datetime
+import tempfile
+import threading
+from collections import OrderedDict
+
+CHARS_PER_TOKEN = 4
+# USD per million (prompt, completion) tokens; local models are free but still count against token budgets
+MODEL_PRICES = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "o1": (15.0, 60.0),
+    "o1-mini": (3.0, 12.0),
+    "models/gemini-1.5-pro": (1.25, 5.0),
+    "models/gemini-1.5-flash": (0.075, 0.3),
+    "models/gemini-1.5-flash-8b": (0.0375, 0.15),
+    "models/gemini-1.0-pro": (0.5, 1.5),
+}
+# Next cheaper flavor of the same provider, taken when a call would not fit the budget
+CHEAPER_FLAVORS = {
+    "gpt-4": "gpt-4o",
+    "o1": "o1-mini",
+    "o1-mini": "gpt-4o-mini",
+    "gpt-4o": "gpt-4o-mini",
+    "models/gemini-1.5-pro": "models/gemini-1.5-flash",
+    "models/gemini-1.0-pro": "models/gemini-1.5-flash",
+    "models/gemini-1.5-flash": "models/gemini-1.5-flash-8b",
+}
+# Rough answer size per prompt, to check a call against the budget before sending it ('per_host' is per host)
+EXPECTED_COMPLETION_TOKENS = {"default": 150, "restricted": 20, "with_suggestions": 250, "per_host": 40}
+MAX_TRACKED_JOBS = 1000
+KEPT_DAYS = 31
+
+
+class BudgetExceededError(Exception):
+    """Raised when not even the cheapest flavor and prompt fit the remaining token or cost budget."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count estimate for providers that do not report usage (or whose answer was cut short)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def model_prices() -> dict:
+    """MODEL_PRICES, overridden by NMAP_AUTOMATOR_MODEL_PRICES ('{"gpt-4o": [2.5, 10]}', USD per million tokens)."""
+    prices = dict(MODEL_PRICES)
+    overrides = os.getenv("NMAP_AUTOMATOR_MODEL_PRICES", "").strip()
+    if overrides:
+        prices.update({flavor: tuple(price) for flavor, price in json.loads(overrides).items()})
+    return prices
+
+
+def usage_cost(model_flavor: str, prompt_tokens: int, completion_tokens: int, prices: dict = None) -> float:
+    prompt_price, completion_price = (prices or model_prices()).get(model_flavor, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+def _env_number(name: str, cast):
+    value = os.getenv(name, "").strip()
+    return cast(value) if value else None
+
+
+def _empty_usage() -> dict:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "estimated_calls": 0, "cost": 0.0}
+
+
+def _add_usage(usage: dict, prompt_tokens: int, completion_tokens: int, cost: float, estimated: bool) -> None:
+    usage["calls"] += 1
+    usage["prompt_tokens"] += prompt_tokens
+    usage["completion_tokens"] += completion_tokens
+    usage["estimated_calls"] += int(estimated)
+    usage["cost"] += cost
+
+
+def _total(by_flavor: dict) -> dict:
+    total = _empty_usage()
+    for usage in by_flavor.values():
+        for key in total:
+            total[key] += usage[key]
+    total["tokens"] = total["prompt_tokens"] + total["completion_tokens"]
+    return total
+
+
+class UsageLedger:
+    """
+    Token usage and cost of the LLM calls, per job and model flavor, and per day.
+
+    Daily totals are kept in a JSON file (NMAP_AUTOMATOR_USAGE_FILE, default
+    llm_usage.json) so the daily budgets (NMAP_AUTOMATOR_DAILY_TOKEN_BUDGET,
+    NMAP_AUTOMATOR_DAILY_COST_BUDGET in USD) hold across restarts; jobs are
+    only kept in memory, the most recent MAX_TRACKED_JOBS of them.
+    """
+
+    def __init__(self, path: str = None, daily_tokens: int = None, daily_cost: float = None):
+        self.__path = path
+        self.__daily_tokens = daily_tokens
+        self.__daily_cost = daily_cost
+        self.__lock = threading.Lock()
+        self.__jobs = OrderedDict()
+        self.__loaded_days = None
+
+    # Settings are read on use, so values from a .env loaded after import still apply
+    @property
+    def path(self) -> str:
+        return self.__path or os.getenv("NMAP_AUTOMATOR_USAGE_FILE", "llm_usage.json")
+
+    @property
+    def daily_tokens(self) -> int:
+        return self.__daily_tokens if self.__daily_tokens is not None else _env_number("NMAP_AUTOMATOR_DAILY_TOKEN_BUDGET", int)
+
+    @property
+    def daily_cost(self) -> float:
+        return self.__daily_cost if self.__daily_cost is not None else _env_number("NMAP_AUTOMATOR_DAILY_COST_BUDGET", float)
+
+    @property
+    def __days(self) -> dict:
+        if self.__loaded_days is None:
+            self.__loaded_days = self.__load()
+        return self.__loaded_days
+
+    @staticmethod
+    def today() -> str:
+        # Providers bill by UTC day
+        return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+    def __load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with io.open(self.path, "r") as f:
+                return json.load(f).get("days", {})
+        except (OSError, ValueError) as e:
+            print(f"Could not read the LLM usage file {self.path}, starting from zero: {e}")
+            return {}
+
+    def __save(self) -> None:
+        for day in sorted(self.__days)[:-KEPT_DAYS]:
+            del self.__days[day]
+        fd, temp_path = tempfile.mkstemp(prefix=".llm_usage-", suffix=".json", dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            with io.open(fd, "w") as f:
+                f.write(json.dumps({"days": self.__days}, indent=4))
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def __job(self, job_id: str) -> dict:
+        if job_id not in self.__jobs:
+            self.__jobs[job_id] = {"started_at": time.time(), "by_flavor": {}, "downgrades": []}
+            while len(self.__jobs) > MAX_TRACKED_JOBS:
+                self.__jobs.popitem(last=False)
+        return self.__jobs[job_id]
+
+    def record(self, job_id: str, model_flavor: str, prompt_tokens: int, completion_tokens: int, estimated: bool = False) -> None:
+        """
+        Add the usage of one LLM call to its job and to the current day.
+
+        :param job_id: Job the call was made for.
+        :param model_flavor: Flavor that answered the call.
+        :param prompt_tokens: Prompt tokens, as reported by the provider or estimated.
+        :param completion_tokens: Completion tokens, as reported by the provider or estimated.
+        :param estimated: Whether the counts are estimates.
+        """
+        cost = usage_cost(model_flavor, prompt_tokens, completion_tokens)
+        with self.__lock:
+            job = self.__job(job_id)["by_flavor"]
+            day = self.__days.setdefault(self.today(), {})
+            for usage in (job.setdefault(model_flavor, _empty_usage()), day.setdefault(model_flavor, _empty_usage())):
+                _add_usage(usage, prompt_tokens, completion_tokens, cost, estimated)
+            try:
+                self.__save()
+            except OSError as e:
+                # Losing the daily total is better than failing the interpretation that was already paid for
+                print(f"Could not write the LLM usage file {self.path}: {e}")
+
+    def record_downgrade(self, job_id: str, description: str) -> None:
+        with self.__lock:
+            self.__job(job_id)["downgrades"].append(description)
+
+    def job_totals(self, job_id: str) -> dict:
+        with self.__lock:
+            return _total(self.__jobs[job_id]["by_flavor"]) if job_id in self.__jobs else _total({})
+
+    def day_totals(self, day: str = None) -> dict:
+        with self.__lock:
+            return _total(self.__days.get(day or self.today(), {}))
+
+    def job(self, job_id: str) -> dict:
+        """Usage of one job per model flavor and in total; None for an unknown job."""
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            if job is None:
+                return None
+            return {
+                "job_id": job_id,
+                "started_at": job["started_at"],
+                "by_flavor": {flavor: dict(usage) for flavor, usage in job["by_flavor"].items()},
+                "total": _total(job["by_flavor"]),
+                "downgrades": list(job["downgrades"])
+            }
+
+    def meter(self, job_id: str, token_budget: int = None, cost_budget: float = None) -> "UsageMeter":
+        """
+        Budgeted view of the ledger for one job.
+
+        :param token_budget: Tokens the job may use; defaults to NMAP_AUTOMATOR_JOB_TOKEN_BUDGET.
+        :param cost_budget: USD the job may spend; defaults to NMAP_AUTOMATOR_JOB_COST_BUDGET.
+        """
+        return UsageMeter(
+            self,
+            job_id,
+            token_budget if token_budget is not None else _env_number("NMAP_AUTOMATOR_JOB_TOKEN_BUDGET", int),
+            cost_budget if cost_budget is not None else _env_number("NMAP_AUTOMATOR_JOB_COST_BUDGET", float)
+        )
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            days = {day: {"by_flavor": {flavor: dict(usage) for flavor, usage in by_flavor.items()}, "total": _total(by_flavor)}
+                    for day, by_flavor in self.__days.items()}
+            jobs = len(self.__jobs)
+        return {
+            "today": self.today(),
+            "days": days,
+            "daily_budget": {"tokens": self.daily_tokens, "cost": self.daily_cost},
+            "tracked_jobs": jobs
+        }
+
+
+class UsageMeter:
+    """
+    Usage recorder and budget check of one job, attached to the interpretors working for it.
+
+    A call fits when its estimated tokens and cost fit both what is left of the
+    job's budget and of the day's. Calls are checked before they are sent, so
+    calls already in flight may overshoot a budget by at most their own size.
+    """
+
+    def __init__(self, ledger: UsageLedger, job_id: str, token_budget: int = None, cost_budget: float = None):
+        self.ledger = ledger
+        self.job_id = job_id
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+
+    def record(self, model_flavor: str, prompt_tokens: int, completion_tokens: int, estimated: bool = False) -> None:
+        self.ledger.record(self.job_id, model_flavor, prompt_tokens, completion_tokens, estimated)
+
+    def record_downgrade(self, description: str) -> None:
+        print(f"Job {self.job_id}: {description}")
+        self.ledger.record_downgrade(self.job_id, description)
+
+    def remaining(self) -> dict:
+        """Tokens and USD left for the job, the tighter of the job and daily budgets; None where unlimited."""
+        job, day = self.ledger.job_totals(self.job_id), self.ledger.day_totals()
+        tokens = [limit - used["tokens"] for limit, used in ((self.token_budget, job), (self.ledger.daily_tokens, day)) if limit is not None]
+        cost = [limit - used["cost"] for limit, used in ((self.cost_budget, job), (self.ledger.daily_cost, day)) if limit is not None]
+        return {"tokens": min(tokens) if tokens else None, "cost": min(cost) if cost else None}
+
+    def fits(self, model_flavor: str, prompt_tokens: int, completion_tokens: int) -> bool:
+        remaining = self.remaining()
+        if remaining["tokens"] is not None and prompt_tokens + completion_tokens > remaining["tokens"]:
+            return False
+        if remaining["cost"] is not None and usage_cost(model_flavor, prompt_tokens, completion_tokens) > remaining["cost"]:
+            return False
+        return True
+
+    def to_dict(self) -> dict:
+        return dict(self.ledger.job(self.job_id) or {"job_id": self.job_id}, budget={
+            "tokens": self.token_budget, "cost": self.cost_budget, "remaining": self.remaining()
+        })
+
+
+usage_ledger = UsageLedger()
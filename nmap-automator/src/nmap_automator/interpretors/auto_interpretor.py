@@ -0,0 +1,355 @@
+import os
+import json
+import threading
+
+from .base_interpretor import BaseInterpretor
+from .resilient_interpretor import ResilientInterpretor
+from .interpretor_factory import INTERPRETORS
+from .accounting import CHARS_PER_TOKEN, EXPECTED_COMPLETION_TOKENS, estimate_tokens, usage_cost
+from .per_host import group_rows_by_host, overall_classification, describe_host_verdicts
+from .prompts import PROMPTS
+
+# Capability tier of each flavor; flavors not listed (the Ollama models) are tier 0
+FLAVOR_TIERS = {
+    "gpt-4o-mini": 0,
+    "models/gemini-1.5-flash-8b": 0,
+    "models/gemini-1.5-flash": 0,
+    "models/gemini-1.0-pro": 0,
+    "gpt-4o": 1,
+    "gpt-4": 1,
+    "o1-mini": 1,
+    "models/gemini-1.5-pro": 1,
+    "o1": 2,
+}
+# Context window in tokens; Ollama models get NMAP_AUTOMATOR_OLLAMA_NUM_CTX, or the server's default
+CONTEXT_WINDOWS = {
+    "gpt-4": 8192,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "o1": 200000,
+    "o1-mini": 128000,
+    "models/gemini-1.5-pro": 2097152,
+    "models/gemini-1.5-flash": 1048576,
+    "models/gemini-1.5-flash-8b": 1048576,
+    "models/gemini-1.0-pro": 30720,
+}
+OLLAMA_DEFAULT_CONTEXT = 2048
+# Lowest tier each prompt starts on: argument suggestions are where small models go wrong
+MODE_MIN_TIER = {"default": 0, "restricted": 0, "per_host": 0, "with_suggestions": 1}
+DEFAULT_AUTO_MODELS = ["gpt:gpt-4o-mini", "gemini:models/gemini-1.5-flash", "gpt:gpt-4o", "gemini:models/gemini-1.5-pro"]
+# Answers a flavor must have given for a prompt before its acceptance rate is used for routing
+MIN_ROUTING_SAMPLES = 20
+
+
+def auto_candidates() -> list[tuple[str, str]]:
+    """
+    Models the router may use, as (interpretor type, model flavor) pairs.
+
+    NMAP_AUTOMATOR_AUTO_MODELS lists them explicitly ('gpt:gpt-4o-mini,ollama:gemma2').
+    Otherwise they are the models of DEFAULT_AUTO_MODELS whose provider has an
+    API key, plus the Ollama models preloaded with NMAP_AUTOMATOR_OLLAMA_PRELOAD.
+    """
+    configured = os.getenv("NMAP_AUTOMATOR_AUTO_MODELS", "").strip()
+    if configured:
+        entries = configured.split(",")
+    else:
+        keys = {"gpt": os.getenv("OPENAI_API_KEY"), "gemini": os.getenv("GOOGLE_API_KEY")}
+        preloaded = [flavor.strip() for flavor in os.getenv("NMAP_AUTOMATOR_OLLAMA_PRELOAD", "").split(",") if flavor.strip()]
+        entries = [f"ollama:{flavor}" for flavor in preloaded] + [
+            entry for entry in DEFAULT_AUTO_MODELS if keys[entry.split(":", 1)[0]]
+        ]
+
+    candidates = []
+    for entry in entries:
+        interpretor_type, _, model_flavor = entry.strip().partition(":")
+        if interpretor_type not in INTERPRETORS or interpretor_type == "local" or not model_flavor:
+            raise ValueError(f"Invalid auto routing model {entry.strip()!r}, expected '<ollama|gpt|gemini>:<model flavor>'")
+        candidates.append((interpretor_type, model_flavor))
+    return candidates
+
+
+def context_window(interpretor: BaseInterpretor) -> int:
+    if interpretor.provider == "ollama":
+        num_ctx = os.getenv("NMAP_AUTOMATOR_OLLAMA_NUM_CTX", "").strip()
+        return int(num_ctx) if num_ctx else OLLAMA_DEFAULT_CONTEXT
+    return CONTEXT_WINDOWS.get(interpretor.model_flavor, CONTEXT_WINDOWS["gpt-4o"])
+
+
+class RouterStats:
+    """
+    Thread-safe outcome counts of the router per model and prompt.
+
+    An answer is 'accepted', 'low_confidence' (escalated because the model was
+    unsure) or 'failed' (error or unparsable). When a larger model answers after
+    an unsure one, the unsure answer is also counted as 'agreed' or 'disagreed'.
+    """
+
+    OUTCOMES = ("accepted", "low_confidence", "failed", "agreed", "disagreed")
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__counts = {}
+
+    def record(self, model: str, prompt_key: str, outcome: str, count: int = 1) -> None:
+        if count <= 0:
+            return
+        with self.__lock:
+            counts = self.__counts.setdefault((model, prompt_key), dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] += count
+
+    def acceptance(self, model: str, prompt_key: str) -> float:
+        """Share of the model's answers to the prompt that could be used as they were; None without enough history."""
+        with self.__lock:
+            counts = self.__counts.get((model, prompt_key))
+        if counts is None:
+            return None
+        answers = counts["accepted"] + counts["low_confidence"] + counts["failed"]
+        if answers < MIN_ROUTING_SAMPLES:
+            return None
+        return (counts["accepted"] + counts["agreed"]) / answers
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            counts = {key: dict(value) for key, value in self.__counts.items()}
+        stats = {}
+        for (model, prompt_key), value in counts.items():
+            stats.setdefault(model, {})[prompt_key] = dict(value, acceptance=self.acceptance(model, prompt_key))
+        return stats
+
+
+router_stats = RouterStats()
+
+
+class AutoInterpretor(BaseInterpretor):
+    """
+    Interpretor that picks the model of each request instead of the user.
+
+    A request starts on the cheapest and fastest model that can take it:
+    - the payload must fit the model's context window;
+    - the runner mode sets the lowest tier (suggestions start on a larger model),
+      and so does a payload above NMAP_AUTOMATOR_AUTO_LARGE_TOKENS (default 20000);
+    - models whose circuit is open, or that do not fit the remaining budget, are
+      left out;
+    - within a tier, models are ranked by expected cost plus median latency,
+      valued at NMAP_AUTOMATOR_AUTO_SECOND_COST USD per second (default 0.001);
+    - a model whose answers to this prompt were mostly unusable (acceptance below
+      NMAP_AUTOMATOR_AUTO_MIN_ACCEPTANCE, default 0.5) counts one tier higher.
+
+    The answer goes to a model of the next tier up only when it failed to parse
+    or errored, or when its self-reported confidence is below
+    NMAP_AUTOMATOR_AUTO_CONFIDENCE (default 0.7). Per-host requests escalate
+    only the hosts concerned.
+    """
+
+    provider = "auto"
+
+    def __init__(
+        self,
+        name: str,
+        model_flavor: str = "default",
+        api_key: str = None,
+        create=None,
+        candidates: list[tuple[str, str]] = None
+    ):
+        self.create = create
+        self.candidates = candidates
+        self.models = []
+        self.confidence_threshold = float(os.getenv("NMAP_AUTOMATOR_AUTO_CONFIDENCE", "0.7"))
+        self.large_tokens = int(os.getenv("NMAP_AUTOMATOR_AUTO_LARGE_TOKENS", "20000"))
+        self.min_acceptance = float(os.getenv("NMAP_AUTOMATOR_AUTO_MIN_ACCEPTANCE", "0.5"))
+        self.second_cost = float(os.getenv("NMAP_AUTOMATOR_AUTO_SECOND_COST", "0.001"))
+        super().__init__(name, model_flavor, api_key)
+
+    def configure(self) -> None:
+        """
+        Create and configure the candidate models.
+
+        :raises ValueError: If no candidate model could be configured.
+        """
+        self.models = []
+        for interpretor_type, model_flavor in self.candidates if self.candidates is not None else auto_candidates():
+            try:
+                model = self.create(interpretor_type, model_flavor)
+                model.configure()
+            except Exception as e:
+                print(f"Auto routing: leaving out {interpretor_type}:{model_flavor} ({e})")
+                continue
+            self.models.append(model)
+        if not self.models:
+            raise ValueError(
+                "No model available for auto routing: set NMAP_AUTOMATOR_AUTO_MODELS or the API key of a provider"
+            )
+        self.max_concurrency = max(model.max_concurrency for model in self.models)
+        super().configure()
+
+    def attach_meter(self, meter) -> None:
+        super().attach_meter(meter)
+        for model in self.models:
+            model.attach_meter(meter)
+
+    @staticmethod
+    def key(model: BaseInterpretor) -> str:
+        return f"{model.provider}:{model.model_flavor}"
+
+    def __tier(self, model: BaseInterpretor, prompt_key: str) -> int:
+        tier = FLAVOR_TIERS.get(model.model_flavor, 0)
+        acceptance = router_stats.acceptance(self.key(model), prompt_key)
+        if acceptance is not None and acceptance < self.min_acceptance:
+            tier += 1
+        return tier
+
+    def __score(self, model: BaseInterpretor, prompt_tokens: int, completion_tokens: int) -> float:
+        # Models without latency history yet count as fast, so they get tried
+        latency = ResilientInterpretor.health(model).percentile(0.5) or 0.0
+        return usage_cost(model.model_flavor, prompt_tokens, completion_tokens) + self.second_cost * latency
+
+    def plan(self, prompt_key: str, prompt_tokens: int, completion_tokens: int) -> list[BaseInterpretor]:
+        """
+        Order in which models are asked: the model to start with, then one model per higher tier.
+
+        :param prompt_key: Key of the prompt to send.
+        :param prompt_tokens: Estimated prompt size of one call.
+        :param completion_tokens: Expected answer size of one call.
+        :return: Escalation ladder, never empty.
+        """
+        usable = [
+            model for model in self.models
+            if context_window(model) >= prompt_tokens + completion_tokens and ResilientInterpretor.health(model).available()
+        ] or list(self.models)
+        if self.meter is not None:
+            affordable = [model for model in usable if self.meter.fits(model.model_flavor, prompt_tokens, completion_tokens)]
+            if not affordable:
+                # The cheapest model still goes; its budget check falls back to the 'restricted' prompt or gives up
+                return [min(usable, key=lambda model: self.__score(model, prompt_tokens, completion_tokens))]
+            usable = affordable
+
+        tiers = {id(model): self.__tier(model, prompt_key) for model in usable}
+        min_tier = MODE_MIN_TIER.get(prompt_key, 0)
+        if prompt_key != "per_host" and prompt_tokens > self.large_tokens:
+            min_tier = max(min_tier, 1)
+        min_tier = min(min_tier, max(tiers.values()))
+        ranked = sorted(
+            (model for model in usable if tiers[id(model)] >= min_tier),
+            key=lambda model: (tiers[id(model)], self.__score(model, prompt_tokens, completion_tokens))
+        )
+        ladder = ranked[:1]
+        for model in ranked[1:]:
+            if tiers[id(model)] > tiers[id(ladder[-1])]:
+                ladder.append(model)
+        return ladder
+
+    def _interpret(self, scan_results: str, save_dir: str, prompt_key: str, deterministic: bool = False) -> dict:
+        if not self.is_configured:
+            return super()._interpret(scan_results, save_dir, prompt_key, deterministic)
+
+        prompt_tokens = estimate_tokens(PROMPTS[prompt_key].format(scan_results=scan_results))
+        ladder = self.plan(prompt_key, prompt_tokens, EXPECTED_COMPLETION_TOKENS[prompt_key])
+        best, unsure, result = None, [], None
+        for index, model in enumerate(ladder):
+            key = self.key(model)
+            last = index == len(ladder) - 1
+            result = dict(model._interpret(scan_results, save_dir, prompt_key, deterministic), model=key, escalations=index)
+            if result.get("budget_exhausted"):
+                break
+            if result["error"]:
+                router_stats.record(key, prompt_key, "failed")
+                if not last:
+                    print(f"Auto routing: {key} failed ({result['error']}), escalating to {self.key(ladder[index + 1])}")
+                continue
+            confidence = result.get("confidence")
+            if confidence is not None and confidence < self.confidence_threshold and not last:
+                router_stats.record(key, prompt_key, "low_confidence")
+                unsure.append((key, result["result"]))
+                if best is None or confidence > best["confidence"]:
+                    best = result
+                print(f"Auto routing: {key} unsure ({confidence:.2f}), escalating to {self.key(ladder[index + 1])}")
+                continue
+            router_stats.record(key, prompt_key, "accepted")
+            for unsure_key, label in unsure:
+                router_stats.record(unsure_key, prompt_key, "agreed" if label == result["result"] else "disagreed")
+            break
+        else:
+            # The largest model failed as well: an unsure answer beats none
+            if best is not None:
+                result = dict(best, escalations=len(ladder) - 1)
+
+        self.save_results(result, save_dir)
+        return result
+
+    def interpret_per_host(self, scan_results: list[dict], save_dir: str, max_retries: int = 1) -> dict:
+        """Per-host interpretation where only the failed and unsure hosts move on to a larger model."""
+        if not self.is_configured:
+            return super().interpret_per_host(scan_results, save_dir, max_retries)
+
+        rows_by_host = group_rows_by_host(scan_results)
+        # Hosts are packed into calls of at most NMAP_AUTOMATOR_MAX_PROMPT_CHARS characters
+        batch_chars = min(len(json.dumps(scan_results, default=str)), int(os.getenv("NMAP_AUTOMATOR_MAX_PROMPT_CHARS", "24000")))
+        hosts_per_call = min(len(rows_by_host), int(os.getenv("NMAP_AUTOMATOR_HOSTS_PER_CALL", "20")))
+        ladder = self.plan(
+            "per_host",
+            estimate_tokens(PROMPTS["per_host"]) + batch_chars // CHARS_PER_TOKEN,
+            EXPECTED_COMPLETION_TOKENS["per_host"] * max(hosts_per_call, 1)
+        )
+        classifications = {
+            "error": None,
+            "result": None,
+            "analysis_description": None,
+            "next_arguments": None,
+            "hosts": {},
+            "failed_hosts": [],
+            "calls": 0
+        }
+        hosts, unsure, error = {}, {}, None
+        pending = list(rows_by_host)
+        for index, model in enumerate(ladder):
+            if not pending:
+                break
+            key = self.key(model)
+            last = index == len(ladder) - 1
+            result = model.interpret_per_host([row for host in pending for row in rows_by_host[host]], save_dir, max_retries)
+            classifications["calls"] += result["calls"]
+            error = result["error"] or error
+            escalate = list(result["failed_hosts"])
+            router_stats.record(key, "per_host", "failed", len(escalate))
+            for host, verdict in result["hosts"].items():
+                verdict = dict(verdict, model=key)
+                confidence = verdict.get("confidence")
+                if confidence is not None and confidence < self.confidence_threshold and not last:
+                    router_stats.record(key, "per_host", "low_confidence")
+                    unsure[host] = (key, verdict["classification"])
+                    if confidence > hosts.get(host, {}).get("confidence", -1):
+                        hosts[host] = verdict
+                    escalate.append(host)
+                    continue
+                router_stats.record(key, "per_host", "accepted")
+                if host in unsure:
+                    unsure_key, label = unsure.pop(host)
+                    router_stats.record(unsure_key, "per_host", "agreed" if label == verdict["classification"] else "disagreed")
+                hosts[host] = verdict
+            pending = escalate
+            if result.get("budget_exhausted"):
+                classifications["budget_exhausted"] = True
+                break
+            if pending and not last:
+                print(f"Auto routing: {len(pending)} host(s) escalated from {key} to {self.key(ladder[index + 1])}")
+
+        failed = [host for host in pending if host not in hosts]
+        classifications["hosts"] = hosts
+        classifications["failed_hosts"] = failed
+        classifications["result"] = overall_classification(hosts)
+        if hosts:
+            classifications["analysis_description"] = describe_host_verdicts(hosts, failed)
+        else:
+            classifications["error"] = error or "No valid per-host verdicts found in LLM response."
+
+        self.save_per_host_results(classifications, save_dir)
+        return classifications
+
+    def interpret(self, scan_results: str, save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "default")
+
+    def interpret_restricted(self, scan_results: str, save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "restricted", deterministic=True)
+
+    def interpret_with_suggestions(self, scan_results: str, save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "with_suggestions")
@@ -2,8 +2,20 @@ from abc import ABC, abstractmethod
 import io
 import os
 import json
+import tempfile
+import threading
+
+from .prompts import PROMPTS
+from .health import ProviderPolicy
+from .accounting import BudgetExceededError, CHEAPER_FLAVORS, EXPECTED_COMPLETION_TOKENS, estimate_tokens
+from .chunking import map_bounded
+from .per_host import group_rows_by_host, pack_hosts, validate_host_verdicts, overall_classification, describe_host_verdicts
+from .parsing import IncrementalJSONParser, ResponseParseError, extract_json, validate_classification
 
 class BaseInterpretor(ABC):
+    # Name of the provider in NMAP_AUTOMATOR_<PROVIDER>_* settings and in the provider health keys
+    provider = "llm"
+
     def __init__(
         self,
         name: str,
@@ -15,20 +27,269 @@ class BaseInterpretor(ABC):
         self.model_flavor = model_flavor
         self.results = None
         self.is_configured = False
+        # Calls this interpretor may have in flight at once; providers that can serve more raise it
+        self.max_concurrency = 1
+        self.policy = ProviderPolicy.from_env(self.provider)
+        # Usage recorder and budget of the job this interpretor works for, if any
+        self.meter = None
+        self.__flavor_lock = threading.Lock()
+
+    def __save(self, results: dict, path: str) -> None:
+        # Chunks interpreted concurrently save concurrently, so replace the file whole instead of rewriting it in place
+        fd, temp_path = tempfile.mkstemp(prefix=".results-", suffix=".json", dir=os.path.dirname(path) or ".")
+        try:
+            with io.open(fd, "w") as f:
+                f.write(json.dumps(results, indent=4))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
 
     def save_results(self, results: dict, save_dir: str) -> None:
         # Save the results to a file
-        with io.open(os.path.join(save_dir, f"{self.name}_results.json"), "w") as f:
-            f.write(json.dumps(results, indent=4))
+        self.__save(results, os.path.join(save_dir, f"{self.name}_results.json"))
+
+    def save_per_host_results(self, results: dict, save_dir: str) -> None:
+        self.__save(results, os.path.join(save_dir, f"{self.name}_per_host_results.json"))
+
+    def attach_meter(self, meter) -> None:
+        """Record the usage of this interpretor's calls on `meter` and keep them within its budget."""
+        self.meter = meter
+
+    def _record_usage(self, model_flavor: str, prompt: str, output: str, prompt_tokens: int = None, completion_tokens: int = None) -> None:
+        """
+        Record the usage of one call; counts the provider did not report are estimated from the text.
+
+        :param model_flavor: Flavor the call was sent to.
+        :param prompt: Prompt of the call.
+        :param output: Answer text received, possibly cut short.
+        :param prompt_tokens: Prompt tokens reported by the provider.
+        :param completion_tokens: Completion tokens reported by the provider.
+        """
+        if self.meter is None:
+            return
+        estimated = prompt_tokens is None or completion_tokens is None
+        self.meter.record(
+            model_flavor,
+            estimate_tokens(prompt) if prompt_tokens is None else prompt_tokens,
+            estimate_tokens(output) if completion_tokens is None else completion_tokens,
+            estimated
+        )
+
+    def _downgrade(self, model_flavor: str) -> bool:
+        """
+        Switch from `model_flavor` to the next cheaper flavor of the provider.
+
+        Chunks interpreted concurrently may ask at the same time; only the first
+        one steps down, the others find the flavor already changed.
+
+        :return: False when there is no cheaper flavor.
+        """
+        with self.__flavor_lock:
+            if self.model_flavor != model_flavor:
+                return True
+            cheaper = CHEAPER_FLAVORS.get(model_flavor)
+            if cheaper is None:
+                return False
+            self.model_flavor = cheaper
+        self.meter.record_downgrade(f"{model_flavor} -> {cheaper} to stay within the budget")
+        return True
+
+    def _fit_budget(self, prompt_key: str, expected_completion: int = None, **fields) -> tuple[str, str]:
+        """
+        Choose the prompt and flavor of a call so that it fits the job's budget.
+
+        Cheaper flavors are tried first, then the 'restricted' prompt, whose answer
+        is only the label; per-host prompts have no cheaper variant.
+
+        :param prompt_key: Key of the prompt asked for.
+        :param expected_completion: Expected answer tokens; defaults to EXPECTED_COMPLETION_TOKENS of the prompt.
+        :param fields: Fields of the prompt template.
+        :return: Tuple of (prompt key, prompt) to send.
+        """
+        while True:
+            prompt = PROMPTS[prompt_key].format(**fields)
+            if self.meter is None:
+                return prompt_key, prompt
+            model_flavor = self.model_flavor
+            completion = expected_completion or EXPECTED_COMPLETION_TOKENS.get(prompt_key, 0)
+            if self.meter.fits(model_flavor, estimate_tokens(prompt), completion):
+                return prompt_key, prompt
+            if self._downgrade(model_flavor):
+                continue
+            if prompt_key in ("default", "with_suggestions"):
+                self.meter.record_downgrade(f"'{prompt_key}' -> 'restricted' prompt to stay within the budget")
+                prompt_key, expected_completion = "restricted", None
+                continue
+            raise BudgetExceededError(f"no flavor or prompt fits the remaining budget {self.meter.remaining()}")
+
+    def _complete(self, prompt: str, deterministic: bool = False, json_mode: bool = False) -> str:
+        """Send a prompt to the provider and return the raw text of the answer."""
+        raise NotImplementedError(f"{type(self).__name__} does not support free-form completions")
+
+    def _stream(self, prompt: str, deterministic: bool = False, json_mode: bool = False):
+        """Yield the answer in chunks as the provider produces them; providers without streaming yield it whole."""
+        yield self._complete(prompt, deterministic, json_mode)
+
+    def _request_json(self, prompt: str, deterministic: bool = False, cancelled: threading.Event = None) -> str:
+        """
+        Ask for a JSON answer, in the provider's JSON mode.
+
+        When streaming is enabled (NMAP_AUTOMATOR_STREAM_RESPONSES, default on) the
+        stream is closed as soon as the first JSON value is complete, so trailing
+        commentary is neither waited for nor paid for. It is also closed when
+        `cancelled` is set, e.g. because a hedged request to another provider won.
+        """
+        if os.getenv("NMAP_AUTOMATOR_STREAM_RESPONSES", "1").lower() in ("0", "false", "no"):
+            return self._complete(prompt, deterministic, json_mode=True)
+
+        parser = IncrementalJSONParser()
+        received = []
+        stream = self._stream(prompt, deterministic, json_mode=True)
+        try:
+            for chunk in stream:
+                received.append(chunk)
+                if parser.feed(chunk) is not None or (cancelled is not None and cancelled.is_set()):
+                    break
+        finally:
+            stream.close()
+        return "".join(received).strip()
+
+    def _parse_json(self, output: str, validate):
+        """
+        Extract and validate the JSON of an answer.
+
+        Defects that cheap repairs cannot fix get one short follow-up call that
+        carries only the broken output and the error, never the original prompt,
+        provided it fits the job's budget.
+
+        :param output: Raw answer text.
+        :param validate: Callable checking the decoded value; raises ResponseParseError if it is unusable.
+        :return: Whatever `validate` returns.
+        """
+        try:
+            return validate(extract_json(output))
+        except ResponseParseError as e:
+            prompt = PROMPTS["fix_json"].format(error=e, output=output)
+            # The corrected answer is about as long as the broken one
+            if self.meter is not None and not self.meter.fits(self.model_flavor, estimate_tokens(prompt), estimate_tokens(output)):
+                print(f"{type(self).__name__}: unusable JSON in the answer ({e}), no budget left to ask for a corrected version")
+                raise
+            print(f"{type(self).__name__}: unusable JSON in the answer ({e}), asking for a corrected version")
+            fixed = self._complete(prompt, deterministic=True, json_mode=True)
+            return validate(extract_json(fixed))
+
+    def _interpret(self, scan_results: str, save_dir: str, prompt_key: str, deterministic: bool = False) -> dict:
+        classifications = {
+            "error": None,
+            "result": None,
+            "analysis_description": None,
+            "next_arguments": None
+        }
+
+        if not self.is_configured:
+            classifications["error"] = "Interpretor not configured."
+        else:
+            try:
+                prompt_key, prompt = self._fit_budget(prompt_key, scan_results=scan_results)
+                output = self._request_json(prompt, deterministic)
+                parsed = self._parse_json(output, validate_classification)
+                classifications["result"] = parsed.pop("classification")
+                classifications.update(parsed)
+            except ResponseParseError as e:
+                classifications["error"] = f"Failed to parse JSON response from LLM: {e}"
+            except BudgetExceededError as e:
+                classifications["error"] = f"Budget exhausted: {e}"
+                classifications["budget_exhausted"] = True
+            except Exception as e:
+                classifications["error"] = f"Error with {type(self).__name__}: {e}"
+
+        self.save_results(classifications, save_dir)
+        return classifications
+
+    def _parse_host_verdicts(self, output: str, hosts: list[str]) -> tuple[dict, list[str]]:
+        try:
+            return self._parse_json(output, lambda parsed: validate_host_verdicts(parsed, hosts))
+        except ResponseParseError:
+            return {}, list(hosts)
+
+    def interpret_per_host(self, scan_results: list[dict], save_dir: str, max_retries: int = 1) -> dict:
+        """
+        Classify every host separately while packing many hosts into each LLM call.
+
+        Each call asks for a JSON object holding one verdict per host. Entries are
+        validated individually; only the hosts without a valid entry are sent again,
+        up to `max_retries` times.
+
+        :param scan_results: List of port rows.
+        :param save_dir: Directory to save the interpretation results.
+        :param max_retries: Number of follow-up calls for hosts whose entries failed.
+        :return: Dictionary with the overall result and a verdict per host.
+        """
+        classifications = {
+            "error": None,
+            "result": None,
+            "analysis_description": None,
+            "next_arguments": None,
+            "hosts": {},
+            "failed_hosts": [],
+            "calls": 0
+        }
+
+        if not self.is_configured:
+            classifications["error"] = "Interpretor not configured."
+            self.save_per_host_results(classifications, save_dir)
+            return classifications
+
+        rows_by_host = group_rows_by_host(scan_results)
+        pending = pack_hosts(rows_by_host)
+        errors = []
+
+        def classify(hosts: list[str]) -> tuple:
+            rows = [row for host in hosts for row in rows_by_host[host]]
+            try:
+                _, prompt = self._fit_budget(
+                    "per_host", EXPECTED_COMPLETION_TOKENS["per_host"] * len(hosts), hosts=", ".join(hosts), scan_results=rows
+                )
+                output = self._request_json(prompt, deterministic=True)
+                verdicts, missing = self._parse_host_verdicts(output, hosts)
+            except BudgetExceededError as e:
+                classifications["budget_exhausted"] = True
+                return {}, hosts, f"Budget exhausted: {e}"
+            except Exception as e:
+                return {}, hosts, str(e)
+            return verdicts, missing, None
+
+        for attempt in range(max_retries + 1):
+            failed = []
+            # Batches are independent calls, so up to max_concurrency of them run at once
+            for verdicts, missing, error in map_bounded(classify, pending, self.max_concurrency):
+                classifications["calls"] += 1
+                if error is not None:
+                    errors.append(error)
+                classifications["hosts"].update(verdicts)
+                failed.extend(missing)
+            if not failed:
+                break
+            print(f"Per-host interpretation: {len(failed)} host(s) without a valid verdict after attempt {attempt + 1}")
+            pending = pack_hosts({host: rows_by_host[host] for host in failed})
+
+        classifications["failed_hosts"] = failed
+        classifications["result"] = overall_classification(classifications["hosts"])
+        if classifications["hosts"]:
+            classifications["analysis_description"] = describe_host_verdicts(classifications["hosts"], failed)
+        elif errors:
+            classifications["error"] = f"Error with {type(self).__name__}: {errors[-1]}"
+        else:
+            classifications["error"] = "No valid per-host verdicts found in LLM response."
+
+        self.save_per_host_results(classifications, save_dir)
+        return classifications
 
     @abstractmethod
     def configure(self) -> None:
         self.is_configured = True
 
-    @abstractmethod
-    def _interpret(self, scan_results: str, save_dir: str, prompt: str, deterministic: bool = False) -> dict:
-        pass
-    
     @abstractmethod
     def interpret(self, scan_results: str, save_dir: str) -> dict:
         pass
@@ -0,0 +1,90 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Precedence used when chunks of the same scan disagree: any incomplete chunk makes the scan incomplete
+CLASSIFICATION_PRECEDENCE = ["Incomplete", "False Positive Rich", "Completed"]
+MAX_MERGED_DESCRIPTIONS = 20
+
+
+def merge_classifications(classifications) -> dict:
+    """
+    Fold the per-chunk classifications of one scan into a single result.
+
+    Consumes the classifications lazily, so it can be fed a generator that
+    interprets the chunks one at a time.
+
+    :param classifications: Iterable of interpretor result dictionaries.
+    :return: Merged classification dictionary.
+    """
+    merged = {
+        "error": None,
+        "result": None,
+        "analysis_description": None,
+        "next_arguments": None,
+        "chunks": 0
+    }
+    descriptions, errors, next_arguments = [], [], []
+    for index, classification in enumerate(classifications, start=1):
+        merged["chunks"] = index
+        if classification.get("error"):
+            errors.append(f"Chunk {index}: {classification['error']}")
+            continue
+
+        result = classification.get("result")
+        if result in CLASSIFICATION_PRECEDENCE and (
+            merged["result"] is None
+            or CLASSIFICATION_PRECEDENCE.index(result) < CLASSIFICATION_PRECEDENCE.index(merged["result"])
+        ):
+            merged["result"] = result
+        if classification.get("analysis_description") and len(descriptions) < MAX_MERGED_DESCRIPTIONS:
+            descriptions.append(f"Chunk {index}: {classification['analysis_description']}")
+        for host, verdict in (classification.get("hosts") or {}).items():
+            # A host split across chunks keeps its worst verdict
+            previous = merged.setdefault("hosts", {}).get(host)
+            if previous is None or CLASSIFICATION_PRECEDENCE.index(verdict["classification"]) \
+                    < CLASSIFICATION_PRECEDENCE.index(previous["classification"]):
+                merged["hosts"][host] = verdict
+        if classification.get("failed_hosts"):
+            merged.setdefault("failed_hosts", []).extend(classification["failed_hosts"])
+        for argument in classification.get("next_arguments") or []:
+            if argument not in next_arguments:
+                next_arguments.append(argument)
+
+    if merged["chunks"] == 1 and not errors:
+        descriptions = [description.split(": ", 1)[1] for description in descriptions]
+    if descriptions:
+        merged["analysis_description"] = "\n".join(descriptions)
+    if next_arguments:
+        merged["next_arguments"] = next_arguments
+    if errors and merged["result"] is None:
+        merged["error"] = "\n".join(errors)
+    elif errors:
+        merged["partial_errors"] = errors
+    return merged
+
+
+def map_bounded(fn, items, max_workers: int = 1):
+    """
+    Apply fn to every item with up to max_workers calls in flight, yielding results in input order.
+
+    Items are pulled from the iterable only as workers free up, so a generator of
+    chunks is never read ahead by more than max_workers chunks. With a single
+    worker the calls run inline, one after the other.
+
+    :param fn: Callable applied to each item.
+    :param items: Iterable of items, consumed lazily.
+    :param max_workers: Maximum concurrent calls.
+    :return: Iterator of results.
+    """
+    if max_workers <= 1:
+        for item in items:
+            yield fn(item)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="interpret") as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,135 @@
+import io
+import os
+import json
+import threading
+
+from nmap_automator.analysis import ScanFeatures, extract_features
+
+
+class FastPathStats:
+    """Thread-safe counters of how many interpretation calls the fast path answered."""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.calls = 0
+        self.fast_path_hits = 0
+        self.by_classification = {}
+
+    def record(self, verdict: dict = None) -> None:
+        with self.__lock:
+            self.calls += 1
+            if verdict is not None:
+                self.fast_path_hits += 1
+                label = verdict["result"]
+                self.by_classification[label] = self.by_classification.get(label, 0) + 1
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            return {
+                "calls": self.calls,
+                "fast_path_hits": self.fast_path_hits,
+                "llm_calls": self.calls - self.fast_path_hits,
+                "avoided_fraction": self.fast_path_hits / self.calls if self.calls else 0.0,
+                "by_classification": dict(self.by_classification)
+            }
+
+
+class FastPathClassifier:
+    """
+    Deterministic rule-based classifier that answers the obvious cases without an LLM.
+
+    Each rule yields a classification with a confidence; the verdict is only used
+    when the confidence reaches the threshold, otherwise the caller escalates to
+    the configured interpretor.
+    """
+
+    RESULTS_FILE = "fast_path_results.json"
+
+    def __init__(self, threshold: float = None):
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("NMAP_AUTOMATOR_FAST_PATH_THRESHOLD", "0.85")
+        )
+
+    @staticmethod
+    def evaluate(features: ScanFeatures) -> tuple[str, float, str, list]:
+        """
+        Apply the rules to a feature summary.
+
+        :param features: Features of the scan results.
+        :return: Tuple of (classification, confidence, explanation, suggested next arguments).
+        """
+        if features.row_count == 0:
+            return (
+                "Incomplete", 1.0,
+                "The scan returned no hosts or ports, so nothing about the target could be established.",
+                ["-Pn", "-sS", "-T3"]
+            )
+
+        if features.open_count == 0 and features.filtered_ratio == 1.0:
+            return (
+                "Incomplete", 0.95,
+                f"All {features.row_count} reported ports are filtered; a firewall is likely dropping the probes.",
+                ["-Pn", "-sS", "-T2"]
+            )
+
+        if features.open_count >= 4 and features.tcpwrapped_ratio >= 0.5:
+            return (
+                "False Positive Rich", 0.9,
+                f"{features.tcpwrapped_count} of {features.open_count} open ports are tcpwrapped, which points at "
+                "a middlebox answering on behalf of the host rather than real services.",
+                ["-sS", "-sV", "--version-intensity", "7", "-T2"]
+            )
+
+        if features.open_ports_per_host > 500:
+            return (
+                "False Positive Rich", 0.9,
+                f"{features.open_ports_per_host:.0f} open ports per host is implausible for real services; "
+                "the target most likely accepts every connection.",
+                ["-sS", "-sV", "-T2"]
+            )
+
+        # Fits most ordinary -sV scans, so it stays below the default threshold: the configured model
+        # still answers them, and the rule only decides when asked to (budget exhausted, lower threshold)
+        if features.open_count > 0 and features.filtered_ratio < 0.1 \
+                and features.version_coverage >= 0.8 and features.tcpwrapped_count == 0:
+            return (
+                "Completed", 0.75,
+                f"{features.open_count} open port(s) across {features.host_count} host(s) with "
+                f"{features.version_coverage:.0%} version detection coverage and few filtered ports.",
+                []
+            )
+
+        # Mixed results: the heuristic has an opinion but not a confident one
+        if features.open_count == 0:
+            return ("Incomplete", 0.6, "No open ports were found among the reported ones.", ["-Pn", "-sS", "-T2"])
+        return ("Completed", 0.5, "Open services were found but the results are not clear-cut.", [])
+
+    def classify(self, results: list[dict], runner_type: str = "normal") -> dict:
+        """
+        Classify the scan results if a rule is confident enough.
+
+        :param results: List of port rows.
+        :param runner_type: Interpretation runner ('normal', 'restricted' or 'suggest').
+        :return: Classification dictionary shaped like the interpretors' output, or None to escalate.
+        """
+        return self.classify_features(extract_features(results), runner_type)
+
+    def classify_features(self, features: ScanFeatures, runner_type: str = "normal") -> dict:
+        """Same as classify, for features that were already computed (e.g. accumulated while streaming)."""
+        classification, confidence, description, next_arguments = self.evaluate(features)
+        if confidence < self.threshold:
+            return None
+
+        return {
+            "error": None,
+            "result": classification,
+            "analysis_description": None if runner_type == "restricted" else description,
+            "next_arguments": next_arguments if runner_type == "suggest" else None,
+            "source": "fast_path",
+            "confidence": confidence
+        }
+
+    def save_results(self, results: dict, save_dir: str) -> None:
+        # Kept apart from the LLM verdicts so they are never mistaken for model output
+        with io.open(os.path.join(save_dir, self.RESULTS_FILE), "w") as f:
+            f.write(json.dumps(results, indent=4))
@@ -1,11 +1,11 @@
 from .base_interpretor import BaseInterpretor
-from .prompts import PROMPTS
 
 import google.generativeai as genai
-import json
 
 
 class GeminiInterpretor(BaseInterpretor):
+    provider = "gemini"
+
     def __init__(
         self,
         name: str,
@@ -13,7 +13,8 @@ class GeminiInterpretor(BaseInterpretor):
         api_key: str = None
     ):
         self.__client = None
-        self.__model = None
+        # One model object per flavor, the flavor changes when the budget forces a cheaper one
+        self.__models = {}
         self.__safety_settings = [
             {
                 "category": "HARM_CATEGORY_DANGEROUS",
@@ -40,44 +41,60 @@ class GeminiInterpretor(BaseInterpretor):
 
     def configure(self) -> None:
         self.__client = genai.configure(api_key=self.api_key)
-        self.__model = genai.GenerativeModel(self.model_flavor)
+        self.__model(self.model_flavor)
         super().configure()
 
-    def _interpret(self, scan_results: str, save_dir: str, prompt_key: str) -> dict:
-        classifications = {
-            "error": None,
-            "result": None,
-            "analysis_description": None,
-            "next_arguments": None
-        }
+    def __generation_config(self, deterministic: bool, json_mode: bool) -> dict:
+        config = {}
+        if deterministic:
+            config["temperature"] = 0
+        if json_mode:
+            config["response_mime_type"] = "application/json"
+        return config or None
 
-        if not self.is_configured:
-            classifications["error"] = "Interpretor not configured."
-        else:
-            try:
-                prompt = PROMPTS[prompt_key].format(scan_results=scan_results)
-                response = self.__model.generate_content([prompt], safety_settings=self.__safety_settings)
-                output = response.text.strip()
+    def __model(self, model_flavor: str):
+        if model_flavor not in self.__models:
+            self.__models[model_flavor] = genai.GenerativeModel(model_flavor)
+        return self.__models[model_flavor]
 
-                # Attempt to parse JSON response
-                json_start = output.find('{')  # Find the first '{' character
-                json_end = output.rfind('}')  # Find the last '}' character
+    def __record_usage(self, model_flavor: str, prompt: str, output: str, metadata) -> None:
+        self._record_usage(
+            model_flavor, prompt, output,
+            metadata.prompt_token_count if metadata else None,
+            metadata.candidates_token_count if metadata else None
+        )
 
-                if json_start != -1 and json_end != -1:
-                    sanitized_output = output[json_start:json_end + 1]  # Extract JSON part
-                    parsed_output = json.loads(sanitized_output)
-                    classifications["result"] = parsed_output.get("classification", None)
-                    classifications["analysis_description"] = parsed_output.get("analysis_description", None)
-                    classifications["next_arguments"] = parsed_output.get("next_arguments", [])
-                else:
-                    classifications["error"] = "No valid JSON found in Gemini response."
-            except json.JSONDecodeError:
-                classifications["error"] = "Failed to parse JSON response from Gemini."
-            except Exception as e:
-                classifications["error"] = f"Error with Gemini API: {e}"
+    def _complete(self, prompt: str, deterministic: bool = False, json_mode: bool = False) -> str:
+        model_flavor = self.model_flavor
+        response = self.__model(model_flavor).generate_content(
+            [prompt],
+            safety_settings=self.__safety_settings,
+            generation_config=self.__generation_config(deterministic, json_mode),
+            request_options={"timeout": self.policy.timeout}
+        )
+        output = response.text.strip()
+        self.__record_usage(model_flavor, prompt, output, getattr(response, "usage_metadata", None))
+        return output
 
-        self.save_results(classifications, save_dir)
-        return classifications
+    def _stream(self, prompt: str, deterministic: bool = False, json_mode: bool = False):
+        model_flavor = self.model_flavor
+        response = self.__model(model_flavor).generate_content(
+            [prompt],
+            safety_settings=self.__safety_settings,
+            generation_config=self.__generation_config(deterministic, json_mode),
+            request_options={"timeout": self.policy.timeout},
+            stream=True
+        )
+        received = []
+        metadata = None
+        try:
+            for chunk in response:
+                # Every chunk carries the usage so far; the last one read has the most complete count
+                metadata = getattr(chunk, "usage_metadata", None) or metadata
+                received.append(chunk.text)
+                yield chunk.text
+        finally:
+            self.__record_usage(model_flavor, prompt, "".join(received), metadata)
 
     def interpret(self, scan_results: str, save_dir: str) -> dict:
         return self._interpret(scan_results, save_dir, "default")
@@ -1,11 +1,11 @@
 from .base_interpretor import BaseInterpretor
-from .prompts import PROMPTS
 
-import json
 from openai import OpenAI
 
 
 class GPTInterpretor(BaseInterpretor):
+    provider = "gpt"
+
     def __init__(
         self,
         name: str,
@@ -17,69 +17,75 @@ class GPTInterpretor(BaseInterpretor):
 
     
     def configure(self):
-        self.__client = OpenAI(api_key=self.api_key)
+        # Retries are left to the resilience layer, which also knows when to stop calling OpenAI altogether
+        self.__client = OpenAI(api_key=self.api_key, timeout=self.policy.timeout, max_retries=0)
         super().configure()
 
-    def _interpret(self, scan_results: str, save_dir: str, prompt_key: str, deterministic: bool = False) -> dict:
-        classifications = {
-            "error": None,
-            "result": None,
-            "analysis_description": None,
-            "next_arguments": None
-        }
-
-        if not self.is_configured:
-            classifications["error"] = "Interpretor not configured."
-        else:
-            try:
-                prompt = PROMPTS[prompt_key].format(scan_results=scan_results)
-                messages = [
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a system that classifies scan results as 'Completed', "
-                            "'Incomplete', or 'False Positive Rich', optionally providing additional "
-                            "recommendations based on your analysis."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-
-                response = self.__client.chat.completions.create(
-                    model=self.model_flavor,
-                    messages=messages,
-                    temperature=0 if deterministic else 1,
-                    top_p=1
+    def __messages(self, prompt: str) -> list[dict]:
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "You are a system that classifies scan results as 'Completed', "
+                    "'Incomplete', or 'False Positive Rich', optionally providing additional "
+                    "recommendations based on your analysis."
                 )
-                output = response.choices[0].message.content.strip()
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
 
-                # Attempt to extract JSON from response
-                json_start = output.find('{')  # Find the first '{' character
-                json_end = output.rfind('}')  # Find the last '}' character
+    def __options(self, deterministic: bool, json_mode: bool) -> dict:
+        options = {"temperature": 0 if deterministic else 1, "top_p": 1}
+        if json_mode:
+            options["response_format"] = {"type": "json_object"}
+        return options
 
-                if json_start != -1 and json_end != -1:
-                    sanitized_output = output[json_start:json_end + 1]  # Extract JSON part
-                    parsed_output = json.loads(sanitized_output)  # Parse as JSON
-                    classifications["result"] = parsed_output.get("classification", None)
-                    classifications["analysis_description"] = parsed_output.get("analysis_description", None)
-                    classifications["next_arguments"] = parsed_output.get("next_arguments", [])
-                else:
-                    classifications["error"] = "No valid JSON found in LLM response."
+    def _complete(self, prompt: str, deterministic: bool = False, json_mode: bool = False) -> str:
+        model_flavor = self.model_flavor
+        response = self.__client.chat.completions.create(
+            model=model_flavor,
+            messages=self.__messages(prompt),
+            **self.__options(deterministic, json_mode)
+        )
+        output = response.choices[0].message.content.strip()
+        usage = response.usage
+        self._record_usage(
+            model_flavor, prompt, output, usage and usage.prompt_tokens, usage and usage.completion_tokens
+        )
+        return output
 
-            except json.JSONDecodeError:
-                classifications["error"] = "Failed to parse JSON response from LLM."
-            except Exception as e:
-                classifications["error"] = f"Error with OpenAI API: {e}"
+    def _stream(self, prompt: str, deterministic: bool = False, json_mode: bool = False):
+        model_flavor = self.model_flavor
+        stream = self.__client.chat.completions.create(
+            model=model_flavor,
+            messages=self.__messages(prompt),
+            stream=True,
+            # The usage arrives in a last chunk without choices
+            stream_options={"include_usage": True},
+            **self.__options(deterministic, json_mode)
+        )
+        received = []
+        usage = None
+        try:
+            for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    received.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Drops the connection when the caller stops reading early, before the usage chunk
+            stream.close()
+            self._record_usage(
+                model_flavor, prompt, "".join(received), usage and usage.prompt_tokens, usage and usage.completion_tokens
+            )
 
-        self.save_results(classifications, save_dir)
-        return classifications
-    
     def interpret(self, scan_results: str, save_dir: str) -> dict:
         return self._interpret(scan_results, save_dir, "default")
-    
+
     def interpret_restricted(self, scan_results: str, save_dir: str) -> dict:
        return self._interpret(scan_results, save_dir, "restricted", deterministic=True)
 
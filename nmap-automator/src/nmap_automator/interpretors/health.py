@@ -0,0 +1,240 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+
+# Request timeout per provider in seconds when NMAP_AUTOMATOR_<PROVIDER>_TIMEOUT is not set; local models load and generate slowly
+DEFAULT_TIMEOUTS = {"gpt": 60.0, "gemini": 60.0, "ollama": 300.0}
+# Status codes and exception names that mean "try again later" rather than "this request is wrong"
+TRANSIENT_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+TRANSIENT_ERROR_NAMES = (
+    "Timeout", "Connection", "RateLimit", "ServiceUnavailable", "InternalServer",
+    "ResourceExhausted", "DeadlineExceeded", "Unavailable", "Overloaded"
+)
+# Successful calls kept per provider for the latency percentiles
+LATENCY_WINDOW = 200
+# Calls needed before the p95 is trusted as a hedging delay
+MIN_LATENCY_SAMPLES = 20
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name, "").strip()
+    return float(value) if value else default
+
+
+class ProviderPolicy:
+    """
+    Timeout, retry and circuit breaker settings of one provider.
+
+    Read from NMAP_AUTOMATOR_<PROVIDER>_TIMEOUT and NMAP_AUTOMATOR_<PROVIDER>_RETRIES
+    (e.g. NMAP_AUTOMATOR_GPT_TIMEOUT), and from NMAP_AUTOMATOR_BREAKER_FAILURES and
+    NMAP_AUTOMATOR_BREAKER_COOLDOWN, which apply to every provider.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 60.0,
+        retries: int = 2,
+        backoff: float = 0.5,
+        backoff_max: float = 8.0,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        cooldown_max: float = 300.0
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.cooldown_max = cooldown_max
+
+    @classmethod
+    def from_env(cls, provider: str) -> "ProviderPolicy":
+        prefix = f"NMAP_AUTOMATOR_{provider.upper()}"
+        return cls(
+            timeout=_env_float(f"{prefix}_TIMEOUT", DEFAULT_TIMEOUTS.get(provider, 60.0)),
+            retries=max(0, int(_env_float(f"{prefix}_RETRIES", 2))),
+            failure_threshold=max(1, int(_env_float("NMAP_AUTOMATOR_BREAKER_FAILURES", 5))),
+            cooldown=_env_float("NMAP_AUTOMATOR_BREAKER_COOLDOWN", 30.0)
+        )
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, so clients failing together do not retry together."""
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether a provider error is worth retrying.
+
+    Inspects the status code and the exception names rather than the SDK
+    exception classes, so no provider SDK has to be imported to classify errors.
+
+    :param error: Exception raised by a provider call.
+    :return: True for timeouts, connection errors, rate limits and server errors.
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status in TRANSIENT_STATUS_CODES:
+        return True
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(name in cls.__name__ for cls in type(error).__mro__ for name in TRANSIENT_ERROR_NAMES)
+
+
+def retry_after(error: Exception) -> float:
+    """Delay in seconds asked for by a rate-limited provider (Retry-After header), or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderHealth:
+    """
+    Circuit breaker and latency window of one provider and model, shared by every interpretor of the process.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls are
+    refused without reaching the provider. Once the cooldown has passed a single
+    probe call is let through (half-open): its success closes the circuit, its
+    failure opens it again for twice as long, up to `cooldown_max`.
+    """
+
+    def __init__(self, key: str, policy: ProviderPolicy):
+        self.key = key
+        self.policy = policy
+        self.__lock = threading.Lock()
+        self.__latencies = deque(maxlen=LATENCY_WINDOW)
+        self.__state = CLOSED
+        self.__consecutive_failures = 0
+        self.__cooldown = policy.cooldown
+        self.__opened_at = 0.0
+        self.__probing = False
+        self.successes = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @property
+    def state(self) -> str:
+        with self.__lock:
+            return self.__current_state()
+
+    def __current_state(self) -> str:
+        if self.__state == OPEN and time.monotonic() - self.__opened_at >= self.__cooldown:
+            return HALF_OPEN
+        return self.__state
+
+    def available(self) -> bool:
+        """Whether a call could be let through now, without claiming the half-open probe."""
+        with self.__lock:
+            state = self.__current_state()
+            return state == CLOSED or (state == HALF_OPEN and not self.__probing)
+
+    def allow(self) -> bool:
+        """Claim the right to call the provider; False (and counted) when the circuit refuses the call."""
+        with self.__lock:
+            state = self.__current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self.__probing:
+                self.__state = HALF_OPEN
+                self.__probing = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self, latency: float = None) -> None:
+        """Count a successful call and close the circuit; without a latency the call is left out of the percentiles."""
+        with self.__lock:
+            self.successes += 1
+            if latency is not None:
+                self.__latencies.append(latency)
+            if self.__state != CLOSED:
+                print(f"Provider {self.key} recovered, closing its circuit")
+            self.__state = CLOSED
+            self.__consecutive_failures = 0
+            self.__cooldown = self.policy.cooldown
+            self.__probing = False
+
+    def record_failure(self) -> None:
+        with self.__lock:
+            self.failures += 1
+            self.__consecutive_failures += 1
+            if self.__state == HALF_OPEN:
+                self.__cooldown = min(self.policy.cooldown_max, self.__cooldown * 2)
+                self.__open()
+            elif self.__state == CLOSED and self.__consecutive_failures >= self.policy.failure_threshold:
+                self.__open()
+
+    def __open(self) -> None:
+        print(f"Provider {self.key} failed {self.__consecutive_failures} time(s) in a row, "
+              f"skipping it for {self.__cooldown:.0f}s")
+        self.__state = OPEN
+        self.__opened_at = time.monotonic()
+        self.__probing = False
+
+    def record_hedge(self, won: bool = False) -> None:
+        with self.__lock:
+            if won:
+                self.hedge_wins += 1
+            else:
+                self.hedges += 1
+
+    def percentile(self, fraction: float) -> float:
+        """Latency percentile of the recent successful calls in seconds, or None without enough samples."""
+        with self.__lock:
+            if len(self.__latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            latencies = sorted(self.__latencies)
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+    def to_dict(self) -> dict:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        with self.__lock:
+            return {
+                "state": self.__current_state(),
+                "consecutive_failures": self.__consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "short_circuited": self.short_circuited,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "p50_seconds": p50,
+                "p95_seconds": p95
+            }
+
+
+class HealthRegistry:
+    """Thread-safe map of provider key ('gpt:gpt-4o') to its ProviderHealth."""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__providers = {}
+
+    def get(self, key: str, policy: ProviderPolicy) -> ProviderHealth:
+        with self.__lock:
+            if key not in self.__providers:
+                self.__providers[key] = ProviderHealth(key, policy)
+            return self.__providers[key]
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            providers = dict(self.__providers)
+        return {key: health.to_dict() for key, health in providers.items()}
+
+
+provider_health = HealthRegistry()
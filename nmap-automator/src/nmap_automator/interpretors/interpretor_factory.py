@@ -1,21 +1,39 @@
-from .gpt_based_interpretor import GPTInterpretor
-from .ollama_interpretor import OllamaInterpretor
-from .gemini_based_interpretor import GeminiInterpretor
+from importlib import import_module
+
 from .base_interpretor import BaseInterpretor
 
+# Provider modules are imported on first use, so a process only pays for the SDKs it actually needs
+INTERPRETORS = {
+    "ollama": "ollama_interpretor:OllamaInterpretor",
+    "gpt": "gpt_based_interpretor:GPTInterpretor",
+    "gemini": "gemini_based_interpretor:GeminiInterpretor",
+    "local": "local_interpretor:LocalInterpretor",
+}
+
+
+def load_interpretor_class(interpretor_type: str) -> type[BaseInterpretor]:
+    """
+    Import the module of an interpretor type and return its class.
+
+    :param interpretor_type: Key of INTERPRETORS.
+    :return: Interpretor class.
+    """
+    if interpretor_type not in INTERPRETORS:
+        raise ValueError("Interpretor type not supported.")
+    module_name, class_name = INTERPRETORS[interpretor_type].split(":")
+    return getattr(import_module(f".{module_name}", __package__), class_name)
+
+
 class InterpretorFactory:
     @staticmethod
     def create_interpretor(
         interpretor_type: str,
         name: str,
         model_flavor: str="models/gemini-1.5-pro",
-        api_key: str=None
+        api_key: str=None,
+        fallback: BaseInterpretor=None
     ) -> BaseInterpretor:
-        if interpretor_type == "ollama":
-            return OllamaInterpretor(name, model_flavor, api_key)
-        elif interpretor_type == "gpt":
-            return GPTInterpretor(name, model_flavor, api_key)
-        elif interpretor_type == "gemini":
-            return GeminiInterpretor(name, model_flavor, api_key)
-        else:
-            raise ValueError("Interpretor type not supported.")
+        interpretor_class = load_interpretor_class(interpretor_type)
+        if interpretor_type == "local":
+            return interpretor_class(name, model_flavor, api_key, fallback=fallback)
+        return interpretor_class(name, model_flavor, api_key)
@@ -0,0 +1,161 @@
+from .base_interpretor import BaseInterpretor
+
+import io
+import os
+import json
+from nmap_automator.analysis import extract_features
+from nmap_automator.analysis.local_model import BoostedStumpsClassifier, DEFAULT_MODEL_PATH
+from .per_host import group_rows_by_host, overall_classification
+
+
+class LocalInterpretor(BaseInterpretor):
+    """
+    CPU-only interpretor backed by the classifier trained from past LLM verdicts.
+
+    When the model is not confident enough the request is handed to the fallback
+    interpretor, if one was given.
+    """
+
+    RESULTS_FILE = "local_model_results.json"
+
+    def __init__(
+        self,
+        name: str,
+        model_flavor: str = "default",
+        api_key: str = None,
+        fallback: BaseInterpretor = None,
+        threshold: float = None
+    ):
+        self.__model = None
+        self.fallback = fallback
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("NMAP_AUTOMATOR_LOCAL_THRESHOLD", "0.8")
+        )
+        super().__init__(name, model_flavor, api_key)
+
+    def configure(self) -> None:
+        model_path = os.getenv("NMAP_AUTOMATOR_LOCAL_MODEL", DEFAULT_MODEL_PATH)
+        self.__model = BoostedStumpsClassifier.load(model_path)
+        if self.fallback is not None:
+            self.fallback.configure()
+            # Chunks only wait on the fallback's calls, so they can overlap as much as the fallback allows
+            self.max_concurrency = self.fallback.max_concurrency
+        super().configure()
+
+    def attach_meter(self, meter) -> None:
+        # Only the fallback's calls cost tokens
+        super().attach_meter(meter)
+        if self.fallback is not None:
+            self.fallback.attach_meter(meter)
+
+    def _interpret(self, scan_results: list[dict], save_dir: str, prompt_key: str) -> dict:
+        classifications = {
+            "error": None,
+            "result": None,
+            "analysis_description": None,
+            "next_arguments": None
+        }
+
+        if not self.is_configured:
+            classifications["error"] = "Interpretor not configured."
+            self.__save(classifications, save_dir)
+            return classifications
+
+        try:
+            features = extract_features(scan_results)
+            label, confidence = self.__model.predict(features.vector())
+        except Exception as e:
+            classifications["error"] = f"Error with local model: {e}"
+            self.__save(classifications, save_dir)
+            return classifications
+
+        if confidence < self.threshold and self.fallback is not None:
+            print(f"Local model unsure ({label}, {confidence:.2f}), falling back to {self.fallback.model_flavor}")
+            if prompt_key == "restricted":
+                return self.fallback.interpret_restricted(scan_results, save_dir)
+            if prompt_key == "with_suggestions":
+                return self.fallback.interpret_with_suggestions(scan_results, save_dir)
+            return self.fallback.interpret(scan_results, save_dir)
+
+        classifications["result"] = label
+        classifications["confidence"] = confidence
+        classifications["source"] = "local_model"
+        if prompt_key != "restricted":
+            classifications["analysis_description"] = (
+                f"Local model verdict with {confidence:.0%} confidence over {features.row_count} port row(s) "
+                f"on {features.host_count} host(s)."
+            )
+        if prompt_key == "with_suggestions":
+            classifications["next_arguments"] = []
+
+        self.__save(classifications, save_dir)
+        return classifications
+
+    def interpret_per_host(self, scan_results: list[dict], save_dir: str, max_retries: int = 1) -> dict:
+        """Classify each host with the local model, sending only the unsure hosts to the fallback."""
+        classifications = {
+            "error": None,
+            "result": None,
+            "analysis_description": None,
+            "next_arguments": None,
+            "hosts": {},
+            "failed_hosts": [],
+            "calls": 0,
+            "source": "local_model"
+        }
+        if not self.is_configured:
+            classifications["error"] = "Interpretor not configured."
+            self.__save(classifications, save_dir)
+            return classifications
+
+        rows_by_host = group_rows_by_host(scan_results)
+        unsure = []
+        for host, rows in rows_by_host.items():
+            try:
+                label, confidence = self.__model.predict(extract_features(rows).vector())
+            except Exception as e:
+                classifications["error"] = f"Error with local model: {e}"
+                self.__save(classifications, save_dir)
+                return classifications
+            if confidence < self.threshold and self.fallback is not None:
+                unsure.append(host)
+            else:
+                classifications["hosts"][host] = {
+                    "classification": label,
+                    "analysis_description": f"Local model verdict with {confidence:.0%} confidence.",
+                    "confidence": confidence
+                }
+
+        if unsure:
+            print(f"Local model unsure about {len(unsure)} host(s), falling back to {self.fallback.model_flavor}")
+            fallback_results = self.fallback.interpret_per_host(
+                [row for host in unsure for row in rows_by_host[host]], save_dir, max_retries
+            )
+            classifications["hosts"].update(fallback_results["hosts"])
+            classifications["failed_hosts"] = fallback_results["failed_hosts"]
+            classifications["calls"] = fallback_results["calls"]
+
+        classifications["result"] = overall_classification(classifications["hosts"])
+        self.__save(classifications, save_dir)
+        return classifications
+
+    def __save(self, results: dict, save_dir: str) -> None:
+        # Kept out of {name}_results.json so the model never trains on its own verdicts
+        with io.open(os.path.join(save_dir, self.RESULTS_FILE), "w") as f:
+            f.write(json.dumps(results, indent=4))
+
+    def save_results(self, results: dict, save_dir: str) -> None:
+        # Verdicts merged from chunks are partly the model's own, so they go to the same file
+        self.__save(results, save_dir)
+
+    def save_per_host_results(self, results: dict, save_dir: str) -> None:
+        self.__save(results, save_dir)
+
+    def interpret(self, scan_results: list[dict], save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "default")
+
+    def interpret_restricted(self, scan_results: list[dict], save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "restricted")
+
+    def interpret_with_suggestions(self, scan_results: list[dict], save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "with_suggestions")
@@ -1,11 +1,48 @@
+import os
+import threading
+
 from .base_interpretor import BaseInterpretor
-from .prompts import PROMPTS
 
-from ollama import chat
-import json
+from ollama import Client
+
+# One client (and connection pool) and one request limiter per Ollama server, shared by all interpretors
+_clients = {}
+_slots = {}
+_warmed = set()
+_lock = threading.Lock()
+
+
+def _keep_alive():
+    """
+    How long the server keeps the model loaded after a request (NMAP_AUTOMATOR_OLLAMA_KEEP_ALIVE).
+
+    Defaults to -1, which pins the model until the server stops; a duration such
+    as '30m' or a number of seconds unloads it after that much idle time, and an
+    empty value leaves the server's own default (5 minutes).
+    """
+    value = os.getenv("NMAP_AUTOMATOR_OLLAMA_KEEP_ALIVE", "-1").strip()
+    if not value:
+        return None
+    try:
+        return float(value) if "." in value else int(value)
+    except ValueError:
+        return value
 
 
 class OllamaInterpretor(BaseInterpretor):
+    """
+    Interpretor backed by a local Ollama server.
+
+    Every request carries the same keep-alive and context size, so the model is
+    loaded once and never reloaded: Ollama reloads a model whose num_ctx changes,
+    and it drops a model's prompt cache when unloading it. The prompts start with
+    their static instructions, so requests of the same kind reuse the cached
+    prefix. Up to NMAP_AUTOMATOR_OLLAMA_PARALLEL requests (default 4, match the
+    server's OLLAMA_NUM_PARALLEL) are in flight per server across the process.
+    """
+
+    provider = "ollama"
+
     def __init__(
         self,
         name: str,
@@ -13,49 +50,86 @@ class OllamaInterpretor(BaseInterpretor):
         api_key: str = None
     ):
         self.__client = None
+        self.__slots = None
+        self.host = os.getenv("OLLAMA_HOST") or "http://127.0.0.1:11434"
+        self.keep_alive = _keep_alive()
+        num_ctx = os.getenv("NMAP_AUTOMATOR_OLLAMA_NUM_CTX", "").strip()
+        self.num_ctx = int(num_ctx) if num_ctx else None
         super().__init__(name, model_flavor, api_key)
+        self.max_concurrency = max(1, int(os.getenv("NMAP_AUTOMATOR_OLLAMA_PARALLEL", "4")))
 
     def configure(self):
+        with _lock:
+            if self.host not in _clients:
+                _clients[self.host] = Client(host=self.host, timeout=self.policy.timeout)
+                _slots[self.host] = threading.BoundedSemaphore(self.max_concurrency)
+            self.__client = _clients[self.host]
+            self.__slots = _slots[self.host]
+            warm_key = (self.host, self.model_flavor, self.num_ctx)
+            first = warm_key not in _warmed
+            _warmed.add(warm_key)
+        if first:
+            threading.Thread(target=self.warm, name=f"ollama-warm-{self.model_flavor}", daemon=True).start()
         super().configure()
 
-    def _interpret(self, scan_results: str, save_dir: str, prompt_key: str) -> dict:
-        classifications = {
-            "error": None,
-            "result": None,
-            "analysis_description": None,
-            "next_arguments": None
-        }
-
-        if not self.is_configured:
-            classifications["error"] = "Interpretor not configured."
-        else:
+    def warm(self) -> None:
+        """Load the model with the request options, without generating anything, so the first real request does not pay the load."""
+        try:
+            with self.__slots:
+                self.__client.generate(model=self.model_flavor, prompt="", keep_alive=self.keep_alive, options=self.__options(True))
+            print(f"Ollama model {self.model_flavor} loaded on {self.host}")
+        except Exception as e:
+            # Not fatal: the first request loads the model instead
+            print(f"Could not preload Ollama model {self.model_flavor}: {e}")
+
+    def __options(self, deterministic: bool) -> dict:
+        options = {}
+        if deterministic:
+            options["temperature"] = 0
+        if self.num_ctx:
+            options["num_ctx"] = self.num_ctx
+        return options or None
+
+    def __chat(self, model_flavor: str, prompt: str, deterministic: bool, json_mode: bool, stream: bool = False):
+        return self.__client.chat(
+            model=model_flavor,
+            messages=[{"role": "user", "content": prompt}],
+            format="json" if json_mode else None,
+            options=self.__options(deterministic),
+            keep_alive=self.keep_alive,
+            stream=stream
+        )
+
+    def _complete(self, prompt: str, deterministic: bool = False, json_mode: bool = False) -> str:
+        model_flavor = self.model_flavor
+        with self.__slots:
+            response = self.__chat(model_flavor, prompt, deterministic, json_mode)
+        output = response.message.content.strip()
+        # prompt_eval_count leaves out the prompt prefix the server had cached
+        self._record_usage(model_flavor, prompt, output, response.prompt_eval_count, response.eval_count)
+        return output
+
+    def _stream(self, prompt: str, deterministic: bool = False, json_mode: bool = False):
+        model_flavor = self.model_flavor
+        received = []
+        final = None
+        with self.__slots:
+            parts = self.__chat(model_flavor, prompt, deterministic, json_mode, stream=True)
             try:
-                prompt = PROMPTS[prompt_key].format(scan_results=scan_results)
-                response = chat(
-                    model=self.model_flavor,
-                    messages=[{"role": "user", "content": prompt}]
+                for part in parts:
+                    if part.done:
+                        final = part
+                    received.append(part.message.content)
+                    yield part.message.content
+            finally:
+                # Closing the generator early (first JSON value complete) ends the request
+                close = getattr(parts, "close", None)
+                if close is not None:
+                    close()
+                self._record_usage(
+                    model_flavor, prompt, "".join(received),
+                    final.prompt_eval_count if final else None, final.eval_count if final else None
                 )
-                output = response.message.content.strip()
-
-                # Attempt to parse JSON response
-                json_start = output.find('{')  # Find the first '{' character
-                json_end = output.rfind('}')  # Find the last '}' character
-
-                if json_start != -1 and json_end != -1:
-                    sanitized_output = output[json_start:json_end + 1]  # Extract JSON part
-                    parsed_output = json.loads(sanitized_output)
-                    classifications["result"] = parsed_output.get("classification", None)
-                    classifications["analysis_description"] = parsed_output.get("analysis_description", None)
-                    classifications["next_arguments"] = parsed_output.get("next_arguments", [])
-                else:
-                    classifications["error"] = "No valid JSON found in Ollama response."
-            except json.JSONDecodeError:
-                classifications["error"] = "Failed to parse JSON response from Ollama."
-            except Exception as e:
-                classifications["error"] = f"Error with Ollama API: {e}"
-
-        self.save_results(classifications, save_dir)
-        return classifications
 
     def interpret(self, scan_results: str, save_dir: str) -> dict:
         return self._interpret(scan_results, save_dir, "default")
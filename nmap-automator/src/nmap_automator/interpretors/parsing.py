@@ -0,0 +1,195 @@
+import re
+import json
+
+from .per_host import CLASSIFICATIONS, parse_confidence
+
+FENCE = re.compile(r"```(?:json|JSON)?")
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false", "NULL": "null", "Null": "null"}
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+class ResponseParseError(ValueError):
+    """Raised when an LLM response cannot be turned into the expected structure."""
+
+
+class IncrementalJSONParser:
+    """
+    Finds the first complete top-level JSON object or array in streamed text.
+
+    Chunks are fed as they arrive; brackets are counted outside of strings, so
+    the caller can stop reading the stream as soon as `feed` returns the value's
+    text, without waiting for any trailing commentary.
+    """
+
+    def __init__(self, opening: str = "{["):
+        self.opening = opening
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+
+    def feed(self, chunk: str) -> str:
+        """
+        Consume a chunk of text.
+
+        :param chunk: Next piece of the response.
+        :return: Text of the first complete JSON value once it is closed, else None.
+        """
+        for char in chunk:
+            if not self.started:
+                if char not in self.opening:
+                    continue
+                self.started = True
+            self.buffer.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    return "".join(self.buffer)
+        return None
+
+    def partial(self) -> str:
+        """Text collected so far, for repairing a value the stream cut short."""
+        return "".join(self.buffer)
+
+
+def _replace_outside_strings(text: str, replace) -> str:
+    """Apply `replace` to the segments of the text that are not inside double-quoted strings."""
+    parts = re.split(r'("(?:[^"\\]|\\.)*")', text)
+    return "".join(part if i % 2 else replace(part) for i, part in enumerate(parts))
+
+
+def _close_truncated(text: str) -> str:
+    """Close the strings and brackets left open by a response that was cut off."""
+    stack, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    if stack and stack[-1] == "}":
+        # A key whose value never arrived
+        text = re.sub(r'(?<=[{,])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$', "", text)
+    text = re.sub(r"[,:]\s*$", "", text.rstrip())
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    """
+    Fix the defects LLMs commonly introduce in JSON.
+
+    Handles code fences, smart quotes, comments, single-quoted strings, Python
+    literals, trailing commas and output truncated before the closing brackets.
+    """
+    text = FENCE.sub("", text).translate(SMART_QUOTES).strip()
+    text = _replace_outside_strings(text, lambda part: re.sub(r"//[^\n]*|/\*.*?\*/", "", part, flags=re.S))
+    if '"' not in text and "'" in text:
+        text = text.replace("'", '"')
+    else:
+        # Single-quoted keys and values next to double-quoted ones
+        text = _replace_outside_strings(text, lambda part: re.sub(r"'([^'\n]*)'", lambda m: json.dumps(m.group(1)), part))
+    text = _replace_outside_strings(
+        text, lambda part: re.sub(r"\b(None|True|False|NULL|Null)\b", lambda m: PYTHON_LITERALS[m.group(1)], part)
+    )
+    text = _close_truncated(text)
+    return _replace_outside_strings(text, lambda part: TRAILING_COMMA.sub(r"\1", part))
+
+
+def extract_json(text: str):
+    """
+    Decode the first JSON value in an LLM response, repairing it if needed.
+
+    :param text: Raw response text.
+    :return: Decoded value.
+    :raises ResponseParseError: If no JSON value can be recovered.
+    """
+    parser = IncrementalJSONParser()
+    candidate = parser.feed(FENCE.sub("", text))
+    if candidate is None:
+        candidate = parser.partial()
+    if not candidate:
+        raise ResponseParseError("No JSON found in the response.")
+
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError as e:
+        first_error = e
+    try:
+        return json.loads(repair_json(candidate))
+    except json.JSONDecodeError:
+        raise ResponseParseError(f"Invalid JSON in the response: {first_error}")
+
+
+def validate_classification(parsed) -> dict:
+    """
+    Check a decoded classification object and normalize its fields.
+
+    :param parsed: Decoded JSON value.
+    :return: Dictionary with classification, analysis_description, next_arguments and, if given, next_profile(_params) and confidence.
+    :raises ResponseParseError: If a required field is missing or has the wrong type.
+    """
+    if not isinstance(parsed, dict):
+        raise ResponseParseError("Expected a JSON object.")
+
+    classification = parsed.get("classification")
+    if isinstance(classification, str):
+        # Tolerate case and spacing differences such as 'completed' or 'False positive rich'
+        matches = [label for label in CLASSIFICATIONS if label.lower() == classification.strip().lower()]
+        classification = matches[0] if matches else classification
+    if classification not in CLASSIFICATIONS:
+        raise ResponseParseError(
+            f"'classification' must be one of {', '.join(CLASSIFICATIONS)}, got {classification!r}."
+        )
+
+    description = parsed.get("analysis_description")
+    if description is not None and not isinstance(description, str):
+        description = json.dumps(description)
+
+    next_arguments = parsed.get("next_arguments")
+    if isinstance(next_arguments, str):
+        next_arguments = next_arguments.split()
+    elif next_arguments is not None and not (
+        isinstance(next_arguments, list) and all(isinstance(argument, str) for argument in next_arguments)
+    ):
+        raise ResponseParseError("'next_arguments' must be an array of strings or null.")
+
+    validated = {
+        "classification": classification,
+        "analysis_description": description,
+        "next_arguments": next_arguments if next_arguments is not None else [],
+    }
+    if parsed.get("next_profile"):
+        if not isinstance(parsed["next_profile"], str):
+            raise ResponseParseError("'next_profile' must be a string or null.")
+        params = parsed.get("next_profile_params")
+        if params is not None and not isinstance(params, dict):
+            raise ResponseParseError("'next_profile_params' must be an object or null.")
+        validated["next_profile"] = parsed["next_profile"]
+        validated["next_profile_params"] = params
+    confidence = parse_confidence(parsed.get("confidence"))
+    if confidence is not None:
+        validated["confidence"] = confidence
+    return validated
@@ -0,0 +1,122 @@
+import os
+import json
+
+from .chunking import CLASSIFICATION_PRECEDENCE
+
+CLASSIFICATIONS = tuple(CLASSIFICATION_PRECEDENCE)
+
+
+def parse_confidence(value) -> float:
+    """
+    Read a self-reported confidence as a number between 0 and 1.
+
+    Percentages (e.g. 85 or "85%") are scaled down; anything else that is not a
+    number in range is ignored rather than failing the answer.
+
+    :param value: Decoded 'confidence' field.
+    :return: Confidence, or None when missing or unusable.
+    """
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if 1 < value <= 100:
+        value = value / 100
+    return float(value) if 0 <= value <= 1 else None
+
+
+def group_rows_by_host(scan_results: list) -> dict[str, list]:
+    """Group port rows by their IP, keeping the order in which hosts first appear."""
+    rows_by_host = {}
+    for row in scan_results:
+        rows_by_host.setdefault(row["IP"], []).append(row)
+    return rows_by_host
+
+
+def pack_hosts(rows_by_host: dict[str, list], hosts_per_call: int = None, max_chars: int = None) -> list[list[str]]:
+    """
+    Pack hosts into batches for one LLM call each.
+
+    A batch is closed when it reaches `hosts_per_call` hosts or when adding the
+    next host would push its serialized rows past `max_chars`. A single host
+    larger than `max_chars` still gets a batch of its own.
+
+    :param rows_by_host: Port rows grouped by host.
+    :param hosts_per_call: Maximum hosts per call (NMAP_AUTOMATOR_HOSTS_PER_CALL, default 20).
+    :param max_chars: Maximum serialized size per call (NMAP_AUTOMATOR_MAX_PROMPT_CHARS, default 24000).
+    :return: List of host batches.
+    """
+    hosts_per_call = hosts_per_call or int(os.getenv("NMAP_AUTOMATOR_HOSTS_PER_CALL", "20"))
+    max_chars = max_chars or int(os.getenv("NMAP_AUTOMATOR_MAX_PROMPT_CHARS", "24000"))
+
+    batches, batch, size = [], [], 0
+    for host, rows in rows_by_host.items():
+        host_size = len(json.dumps(rows, default=str))
+        if batch and (len(batch) >= hosts_per_call or size + host_size > max_chars):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(host)
+        size += host_size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def validate_host_verdicts(parsed, expected_hosts: list[str]) -> tuple[dict, list[str]]:
+    """
+    Check a parsed per-host response against the expected schema.
+
+    Every entry must be an object with a 'host' among the expected ones and a
+    'classification' among CLASSIFICATIONS; 'analysis_description' and
+    'confidence' are optional.
+    Invalid entries are dropped rather than failing the whole response.
+
+    :param parsed: Decoded JSON response, expected to be an array (or an object holding one under 'hosts').
+    :param expected_hosts: Hosts that were sent in the request.
+    :return: Tuple of (verdicts by host, hosts without a valid verdict).
+    """
+    if isinstance(parsed, dict):
+        parsed = parsed.get("hosts", [])
+    if not isinstance(parsed, list):
+        return {}, list(expected_hosts)
+
+    expected = set(expected_hosts)
+    verdicts = {}
+    for entry in parsed:
+        if not isinstance(entry, dict):
+            continue
+        host = str(entry.get("host", "")).strip()
+        classification = entry.get("classification")
+        if host not in expected or classification not in CLASSIFICATIONS:
+            continue
+        description = entry.get("analysis_description")
+        verdicts[host] = {
+            "classification": classification,
+            "analysis_description": description if isinstance(description, str) else None
+        }
+        confidence = parse_confidence(entry.get("confidence"))
+        if confidence is not None:
+            verdicts[host]["confidence"] = confidence
+    return verdicts, [host for host in expected_hosts if host not in verdicts]
+
+
+def overall_classification(verdicts: dict) -> str:
+    """Worst verdict across hosts: any incomplete host makes the scan incomplete."""
+    for classification in CLASSIFICATION_PRECEDENCE:
+        if any(verdict["classification"] == classification for verdict in verdicts.values()):
+            return classification
+    return None
+
+
+def describe_host_verdicts(verdicts: dict, failed: list) -> str:
+    """One-line summary of per-host verdicts, e.g. 'Per-host verdicts: 12 Completed, 3 Incomplete.'"""
+    counts = {}
+    for verdict in verdicts.values():
+        counts[verdict["classification"]] = counts.get(verdict["classification"], 0) + 1
+    return "Per-host verdicts: " + ", ".join(
+        f"{count} {label}" for label, count in counts.items()
+    ) + (f"; {len(failed)} host(s) could not be classified." if failed else ".")
@@ -1,3 +1,7 @@
+from nmap_automator.scanner.profiles import profile_menu
+
+# Every prompt starts with its static instructions and ends with the scan data, so providers that
+# cache prompt prefixes (Ollama's slot cache, OpenAI prompt caching) reuse the instructions
 PROMPTS = {
     "default": (
         "Classify the following nmap scan results as Completed, Incomplete, or False Positive Rich.\n"
@@ -5,6 +9,7 @@ PROMPTS = {
         "1. 'classification': The classification result.\n"
         "2. 'analysis_description': A detailed explanation of the classification decision.\n"
         "3. 'next_arguments': keep it NULL.\n"
+        "4. 'confidence': Your confidence in the classification, a number between 0 and 1.\n"
         "IT IS MISSION CRITICAL THAT YOU NOT ADD ANY COMMENTS TO THE JSON OBJECT.\n\n{scan_results}"
     ),
     "restricted": (
@@ -15,6 +20,7 @@ PROMPTS = {
         "1. 'classification': The classification result.\n"
         "2. 'analysis_description': keep it NULL.\n"
         "3. 'next_arguments': keep it NULL.\n"
+        "4. 'confidence': Your confidence in the classification, a number between 0 and 1.\n"
         "IT IS MISSION CRITICAL THAT YOU NOT ADD ANY COMMENTS TO THE JSON OBJECT.\n\n{scan_results}"
     ),
     "with_suggestions": (
@@ -22,7 +28,27 @@ PROMPTS = {
         "Prepare a single JSON object that will be returned as an API Response with the following fields:\n"
         "1. 'classification': The classification result.\n"
         "2. 'analysis_description': A detailed explanation of the classification decision.\n"
-        "3. 'next_arguments': An array of recommended nmap arguments for the next nmap scan.\n"
+        "3. 'next_profile': The name of the scan profile to run next, chosen from the list below, or NULL.\n"
+        "4. 'next_profile_params': An object overriding the profile parameters (e.g. {{\"ports\": \"22,80\"}}), or NULL.\n"
+        "5. 'next_arguments': An array of recommended nmap arguments for the next nmap scan, "
+        "only if no profile fits.\n"
+        "6. 'confidence': Your confidence in the classification, a number between 0 and 1.\n"
+        "Available scan profiles:\n" + profile_menu() + "\n"
         "IT IS MISSION CRITICAL THAT YOU NOT ADD ANY COMMENTS TO THE JSON OBJECT.\n\n{scan_results}"
     ),
+    "per_host": (
+        "Classify the nmap scan results of each of the hosts listed below separately as Completed, "
+        "Incomplete, or False Positive Rich.\n"
+        "Return a single JSON object with a 'hosts' array holding exactly one object per host, with the following fields:\n"
+        "1. 'host': The IP address of the host, exactly as given.\n"
+        "2. 'classification': The classification result for that host.\n"
+        "3. 'analysis_description': A one or two sentence explanation for that host.\n"
+        "4. 'confidence': Your confidence in that host's classification, a number between 0 and 1.\n"
+        "IT IS MISSION CRITICAL THAT YOU NOT ADD ANY COMMENTS TO THE JSON OBJECT.\n\n"
+        "Hosts to classify: {hosts}\n\n{scan_results}"
+    ),
+    "fix_json": (
+        "The following output was supposed to be valid JSON but could not be used: {error}\n"
+        "Return only the corrected JSON, keeping its content unchanged.\n\n{output}"
+    ),
 }
\ No newline at end of file
@@ -0,0 +1,166 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .base_interpretor import BaseInterpretor
+from .health import CircuitOpenError, ProviderHealth, is_transient, retry_after, provider_health
+
+# Hedged calls run here so the caller can wait on whichever provider answers first
+_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-hedge")
+
+
+class ResilientInterpretor(BaseInterpretor):
+    """
+    Interpretor that calls a primary provider and, when it fails, a secondary one.
+
+    Every provider call is bounded by the provider's timeout and transient errors
+    are retried with exponential backoff. Providers that keep failing have their
+    circuit opened and are skipped without waiting until they recover. With
+    `hedge`, a call the primary has not answered within its p95 latency is also
+    sent to the secondary, and the first answer wins; the other call is closed as
+    soon as it next yields.
+
+    Health is shared across requests through the process-wide provider registry,
+    so one request's timeouts spare the next ones the wait.
+    """
+
+    def __init__(self, primary: BaseInterpretor, secondary: BaseInterpretor = None, hedge: bool = False):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge = hedge
+        self.provider = primary.provider
+        super().__init__(primary.name, primary.model_flavor, primary.api_key)
+
+    @property
+    def providers(self) -> list[BaseInterpretor]:
+        return [provider for provider in (self.primary, self.secondary) if provider is not None]
+
+    def configure(self) -> None:
+        self.primary.configure()
+        if self.secondary is not None:
+            try:
+                self.secondary.configure()
+            except Exception as e:
+                # A missing key for the secondary must not take the primary down with it
+                print(f"Could not configure secondary provider {self.secondary.provider}: {e}")
+                self.secondary = None
+        self.max_concurrency = self.primary.max_concurrency
+        super().configure()
+
+    def attach_meter(self, meter) -> None:
+        super().attach_meter(meter)
+        for provider in self.providers:
+            provider.attach_meter(meter)
+
+    def _downgrade(self, model_flavor: str) -> bool:
+        # The budget is checked against the primary's flavor, so that is the one that steps down
+        stepped = self.primary._downgrade(model_flavor)
+        self.model_flavor = self.primary.model_flavor
+        return stepped
+
+    @staticmethod
+    def health(provider: BaseInterpretor) -> ProviderHealth:
+        return provider_health.get(f"{provider.provider}:{provider.model_flavor}", provider.policy)
+
+    def __attempt(self, provider: BaseInterpretor, request, cancelled: threading.Event = None):
+        """Call one provider, retrying transient errors while its circuit lets the calls through."""
+        health = self.health(provider)
+        error = None
+        for attempt in range(provider.policy.retries + 1):
+            if cancelled is not None and cancelled.is_set():
+                break
+            if not health.allow():
+                # A failed retry may have opened the circuit: report what actually went wrong
+                raise error or CircuitOpenError(f"circuit of {health.key} is open")
+            started = time.monotonic()
+            try:
+                result = request(provider, cancelled)
+            except Exception as e:
+                error = e
+                health.record_failure()
+                if attempt == provider.policy.retries or not is_transient(e):
+                    break
+                delay = retry_after(e)
+                delay = provider.policy.backoff_delay(attempt) if delay is None else min(delay, provider.policy.backoff_max)
+                print(f"{health.key}: {type(e).__name__} ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+            else:
+                # A call cut short by a hedge that already won says nothing about the provider's latency,
+                # but it still answered: recording it releases a half-open probe the call may hold
+                cut_short = cancelled is not None and cancelled.is_set()
+                health.record_success(None if cut_short else time.monotonic() - started)
+                return result
+        raise error or CircuitOpenError(f"call to {health.key} cancelled")
+
+    def __call(self, request):
+        """
+        Run `request(provider, cancelled)` against the providers in order of preference.
+
+        :param request: Callable doing one provider call.
+        :return: The first successful result.
+        """
+        providers = [provider for provider in self.providers if self.health(provider).available()]
+        if not providers:
+            raise CircuitOpenError(
+                "every provider is failing: " + ", ".join(self.health(provider).key for provider in self.providers)
+            )
+        if self.hedge and len(providers) == 2:
+            delay = self.health(providers[0]).percentile(0.95)
+            # Until the primary's latency is known, failures still fail over but nothing is hedged
+            if delay is not None:
+                return self.__hedged(request, providers, delay)
+
+        error = None
+        for index, provider in enumerate(providers):
+            try:
+                return self.__attempt(provider, request)
+            except Exception as e:
+                error = e
+                if index + 1 < len(providers):
+                    print(f"{self.health(provider).key} failed ({e}), failing over to {self.health(providers[index + 1]).key}")
+        raise error
+
+    def __hedged(self, request, providers: list[BaseInterpretor], delay: float):
+        primary, secondary = providers
+        cancelled = threading.Event()
+        pending = {_executor.submit(self.__attempt, primary, request, cancelled): primary}
+        hedged = False
+        error = None
+        try:
+            done, _ = wait(pending, timeout=delay)
+            while True:
+                for future in done:
+                    provider = pending.pop(future)
+                    if future.exception() is None:
+                        if provider is secondary and hedged:
+                            self.health(primary).record_hedge(won=True)
+                        return future.result()
+                    error = future.exception()
+                if not hedged:
+                    # The primary is slower than usual, or already failed: bring the secondary in
+                    hedged = True
+                    if not done:
+                        print(f"{self.health(primary).key} slower than its p95 ({delay:.1f}s), hedging to {self.health(secondary).key}")
+                        self.health(primary).record_hedge()
+                    pending[_executor.submit(self.__attempt, secondary, request, cancelled)] = secondary
+                if not pending:
+                    raise error
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        finally:
+            # The losing call stops at its next chunk instead of streaming an answer nobody reads
+            cancelled.set()
+
+    def _complete(self, prompt: str, deterministic: bool = False, json_mode: bool = False) -> str:
+        return self.__call(lambda provider, cancelled: provider._complete(prompt, deterministic, json_mode))
+
+    def _request_json(self, prompt: str, deterministic: bool = False, cancelled: threading.Event = None) -> str:
+        return self.__call(lambda provider, hedge_cancelled: provider._request_json(prompt, deterministic, hedge_cancelled))
+
+    def interpret(self, scan_results: str, save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "default")
+
+    def interpret_restricted(self, scan_results: str, save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "restricted", deterministic=True)
+
+    def interpret_with_suggestions(self, scan_results: str, save_dir: str) -> dict:
+        return self._interpret(scan_results, save_dir, "with_suggestions")
@@ -0,0 +1,2 @@
+# src/nmap_automator/report/__init__.py
+from .engine import ReportEngine, ReportSummary, REPORT_FORMATS, find_shards, find_verdicts
\ No newline at end of file
@@ -0,0 +1,305 @@
+import io
+import os
+import csv
+import json
+import glob
+import heapq
+import zlib
+import shutil
+import tempfile
+import threading
+import ipaddress
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from nmap_automator.scanner.records import RESULT_FIELDS
+from nmap_automator.utils.ingest import iter_result_rows
+from . import html
+
+REPORT_FORMATS = ("csv", "jsonl", "html")
+REPORT_NAMES = {"csv": "final_scan_report.csv", "jsonl": "final_scan_report.jsonl", "html": "final_scan_report.html"}
+INITIAL_SHARD = "initial_scan_results.csv"
+REFINED_SHARD = "refined_scan_results.csv"
+SHARD_PATTERNS = ("*_scan_results.csv", "*_scan_results.ndjson", "*_scan_results.jsonl")
+TOP_GROUPS = 20
+
+
+def find_shards(scan_dir: str) -> list[str]:
+    """
+    Result files of a scan directory in the order their rows take precedence.
+
+    The initial scan comes first, then any other *_scan_results file by
+    modification time, and the refined results last, so that rows of a later
+    shard replace the rows of an earlier one for the same host and port.
+    """
+    found = set()
+    for pattern in SHARD_PATTERNS:
+        found.update(glob.glob(os.path.join(scan_dir, pattern)))
+    initial, refined = os.path.join(scan_dir, INITIAL_SHARD), os.path.join(scan_dir, REFINED_SHARD)
+    others = sorted(found - {initial, refined}, key=os.path.getmtime)
+    return [path for path in [initial, *others, refined] if path in found]
+
+
+def find_verdicts(scan_dir: str) -> dict:
+    """Per-host verdicts saved by per-host interpretations of the scan, most recent file last."""
+    verdicts = {}
+    for path in sorted(glob.glob(os.path.join(scan_dir, "*_per_host_results.json")), key=os.path.getmtime):
+        try:
+            with open(path, "r") as f:
+                verdicts.update(json.load(f).get("hosts") or {})
+        except (OSError, ValueError, AttributeError):
+            print(f"Skipping unreadable verdict file {path}")
+    return verdicts
+
+
+def _host_sort_key(host: str) -> list:
+    """Numeric order for IP addresses, IPv4 before IPv6, then host names alphabetically."""
+    try:
+        address = ipaddress.ip_address(host)
+        return [address.version, int(address)]
+    except ValueError:
+        return [10, host or ""]
+
+
+def _port(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _render_partition(spill_path: str, part_path: str, formats: list[str], verdicts: dict) -> dict:
+    """
+    Deduplicate, group and render the hosts of one partition.
+
+    Runs in a worker process. Every host lands in exactly one partition, so the
+    partition can be processed on its own; its hosts are written sorted, one
+    JSON line per host holding the host's CSV, JSON Lines and HTML text.
+
+    :return: Counters of the partition, merged into the report summary.
+    """
+    latest = {}
+    read = 0
+    with open(spill_path, "r", newline="") as spill:
+        for values in csv.reader(spill):
+            read += 1
+            row = dict(zip(RESULT_FIELDS, values))
+            row["Port"] = _port(row["Port"])
+            latest[(row["IP"], row["Protocol"], row["Port"])] = row
+
+    hosts = {}
+    for row in latest.values():
+        hosts.setdefault(row["IP"], []).append(row)
+    latest = None
+
+    states, services, ports, verdict_counts = Counter(), Counter(), Counter(), Counter()
+    top_hosts = []
+    with open(part_path, "w") as part:
+        for host in sorted(hosts, key=_host_sort_key):
+            rows = sorted(hosts[host], key=lambda row: (row["Protocol"], row["Port"]))
+            open_count = 0
+            for row in rows:
+                states[row["State"]] += 1
+                if row["State"] == "open":
+                    open_count += 1
+                    services[row["Name"]] += 1
+                    ports[row["Port"]] += 1
+            verdict = verdicts.get(host)
+            if verdict:
+                verdict_counts[verdict.get("classification")] += 1
+            top_hosts = heapq.nlargest(TOP_GROUPS, top_hosts + [(open_count, len(rows), host)])
+
+            csv_text = jsonl_text = html_text = ""
+            if "csv" in formats:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows([row[field] for field in RESULT_FIELDS] for row in rows)
+                csv_text = buffer.getvalue()
+            if "jsonl" in formats:
+                jsonl_text = "".join(json.dumps(row) + "\n" for row in rows)
+            if "html" in formats:
+                html_text = html.render_host(host, rows, verdict)
+            part.write(json.dumps([_host_sort_key(host), csv_text, jsonl_text, html_text]) + "\n")
+
+    return {
+        "read": read,
+        "rows": sum(states.values()),
+        "hosts": len(hosts),
+        "states": states,
+        "services": services,
+        "ports": ports,
+        "verdicts": verdict_counts,
+        "top_hosts": top_hosts,
+    }
+
+
+def _iter_part(part_path: str):
+    with open(part_path, "r") as part:
+        for line in part:
+            yield json.loads(line)
+
+
+class ReportSummary:
+    """Scan-wide counters merged from the partitions of a report."""
+
+    def __init__(self):
+        self.read = 0
+        self.rows = 0
+        self.hosts = 0
+        self.states = Counter()
+        self.services = Counter()
+        self.ports = Counter()
+        self.verdicts = Counter()
+        self.top_hosts = []
+
+    def merge(self, partial: dict) -> None:
+        self.read += partial["read"]
+        self.rows += partial["rows"]
+        self.hosts += partial["hosts"]
+        self.states.update(partial["states"])
+        self.services.update(partial["services"])
+        self.ports.update(partial["ports"])
+        self.verdicts.update(partial["verdicts"])
+        self.top_hosts = heapq.nlargest(TOP_GROUPS, self.top_hosts + partial["top_hosts"])
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "hosts": self.hosts,
+            "duplicates": self.read - self.rows,
+            "states": self.states.most_common(),
+            "top_services": self.services.most_common(TOP_GROUPS),
+            "top_ports": self.ports.most_common(TOP_GROUPS),
+            "top_hosts": [(host, open_count, total) for open_count, total, host in self.top_hosts],
+            "verdicts": self.verdicts.most_common()
+        }
+
+
+class ReportEngine:
+    """
+    Builds the final report of a scan from its result shards with bounded memory.
+
+    The shards are streamed once and every row is spilled to one of several
+    partition files chosen by a hash of its host, so a partition holds all the
+    rows of its hosts. Partitions are deduplicated (later shards win for the
+    same host, protocol and port) and rendered in parallel worker processes,
+    each producing its hosts in sorted order. A k-way merge of the rendered
+    partitions then writes the CSV, JSON Lines and HTML reports side by side.
+
+    Everything is written to a private temporary directory first and moved
+    into place atomically, so concurrent reports never clobber each other's
+    files or leave a half-written report behind.
+    """
+
+    def __init__(self, partition_bytes: int = None, max_workers: int = None):
+        self.partition_bytes = partition_bytes or int(os.getenv("NMAP_AUTOMATOR_REPORT_PARTITION_BYTES", str(16 * 1024 * 1024)))
+        self.max_workers = max_workers or int(os.getenv("NMAP_AUTOMATOR_REPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.__publish_lock = threading.Lock()
+
+    @staticmethod
+    def __iter_values(shard: str):
+        """Rows of a shard as lists in RESULT_FIELDS order; CSV shards skip the dictionary per row."""
+        if not shard.lower().endswith(".csv"):
+            for row in iter_result_rows(shard):
+                yield [row.get(field, "") for field in RESULT_FIELDS]
+            return
+        with open(shard, "r", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            columns = [header.index(field) if field in header else None for field in RESULT_FIELDS]
+            for values in reader:
+                if values:
+                    yield [values[column] if column is not None and column < len(values) else "" for column in columns]
+
+    def __partition(self, shards: list[str], work_dir: str, partitions: int) -> list[str]:
+        spill_paths = [os.path.join(work_dir, f"spill-{index}.csv") for index in range(partitions)]
+        files = [open(path, "w", newline="") for path in spill_paths]
+        try:
+            writers = [csv.writer(f) for f in files]
+            # Spills keep the shard order, so a later row for the same port replaces an earlier one
+            for shard in shards:
+                if partitions == 1:
+                    writers[0].writerows(self.__iter_values(shard))
+                    continue
+                for values in self.__iter_values(shard):
+                    writers[zlib.crc32(values[0].encode()) % partitions].writerow(values)
+        finally:
+            for f in files:
+                f.close()
+        return spill_paths
+
+    def __render(self, spill_paths: list[str], work_dir: str, formats: list[str], verdicts: dict) -> tuple[list[str], ReportSummary]:
+        part_paths = [os.path.join(work_dir, f"part-{index}.jsonl") for index in range(len(spill_paths))]
+        tasks = [(spill, part, formats, verdicts) for spill, part in zip(spill_paths, part_paths)]
+        summary = ReportSummary()
+        workers = min(self.max_workers, len(tasks))
+        if workers <= 1:
+            for task in tasks:
+                summary.merge(_render_partition(*task))
+        else:
+            # Spawned workers: forking the threaded API server is not safe
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                for partial in executor.map(_render_partition, *zip(*tasks)):
+                    summary.merge(partial)
+        for spill in spill_paths:
+            os.remove(spill)
+        return part_paths, summary
+
+    def generate(self, shards: list[str], output_dir: str, formats=REPORT_FORMATS, title: str = None, verdicts: dict = None) -> dict:
+        """
+        Write the final report of a scan.
+
+        :param shards: Result files in precedence order, see find_shards.
+        :param output_dir: Directory receiving the report files.
+        :param formats: Any of 'csv', 'jsonl' and 'html'.
+        :param title: Title of the HTML report.
+        :param verdicts: Per-host verdicts to show in the HTML report, see find_verdicts.
+        :return: Dictionary with the path of each report file and the summary.
+        """
+        formats = [name for name in REPORT_FORMATS if name in formats]
+        if not formats:
+            raise ValueError(f"No report format selected, expected any of {', '.join(REPORT_FORMATS)}")
+        if not shards:
+            raise ValueError("No scan result files to report on.")
+        for shard in shards:
+            if not os.path.exists(shard):
+                raise ValueError(f"File not found: {shard}")
+
+        os.makedirs(output_dir, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix=".report-", dir=output_dir)
+        try:
+            total_bytes = sum(os.path.getsize(shard) for shard in shards)
+            partitions = max(1, -(-total_bytes // self.partition_bytes))
+            spill_paths = self.__partition(shards, work_dir, partitions)
+            part_paths, summary = self.__render(spill_paths, work_dir, formats, verdicts or {})
+            summary_dict = summary.to_dict()
+
+            staged = {name: os.path.join(work_dir, REPORT_NAMES[name]) for name in formats}
+            outputs = {name: open(path, "w", newline="") for name, path in staged.items()}
+            try:
+                if "csv" in outputs:
+                    csv.writer(outputs["csv"]).writerow(RESULT_FIELDS)
+                if "html" in outputs:
+                    outputs["html"].write(html.render_head(title or "Nmap scan report", summary_dict, shards))
+                for _, csv_text, jsonl_text, html_text in heapq.merge(*map(_iter_part, part_paths), key=lambda host: host[0]):
+                    for name, text in (("csv", csv_text), ("jsonl", jsonl_text), ("html", html_text)):
+                        if name in outputs:
+                            outputs[name].write(text)
+                if "html" in outputs:
+                    outputs["html"].write(html.render_tail())
+            finally:
+                for f in outputs.values():
+                    f.close()
+
+            paths = {}
+            # Publish the files of one report together, never mixed with a concurrent run's
+            with self.__publish_lock:
+                for name, path in staged.items():
+                    paths[name] = os.path.join(output_dir, REPORT_NAMES[name])
+                    os.replace(path, paths[name])
+            print(f"Report of {summary.rows} rows on {summary.hosts} hosts written to {output_dir}")
+            return {"outputs": paths, "partitions": partitions, "shards": shards, "summary": summary_dict}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,94 @@
+import time
+from html import escape
+
+STYLE = """
+body { font-family: system-ui, sans-serif; margin: 2rem; color: #222; }
+table { border-collapse: collapse; margin: 0.5rem 0 1.5rem; }
+th, td { border: 1px solid #ccc; padding: 0.25rem 0.6rem; text-align: left; font-size: 0.9rem; }
+th { background: #f2f2f2; }
+section { border-top: 2px solid #ddd; padding-top: 0.5rem; }
+.open { color: #1a7f37; font-weight: 600; }
+.muted { color: #777; }
+"""
+PORT_COLUMNS = ["Port", "Protocol", "State", "Name", "Product", "Version", "Subdomain"]
+
+
+def host_anchor(host: str) -> str:
+    return "host-" + "".join(char if char.isalnum() else "-" for char in host)
+
+
+def _table(headers: list[str], rows) -> str:
+    head = "".join(f"<th>{escape(str(header))}</th>" for header in headers)
+    body = "".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows)
+    return f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
+
+
+def render_host(host: str, rows: list[dict], verdict: dict = None) -> str:
+    """
+    Render the section of one host.
+
+    :param host: Host address.
+    :param rows: Port rows of the host, already deduplicated and sorted.
+    :param verdict: Per-host LLM verdict, if the scan was interpreted per host.
+    :return: HTML fragment.
+    """
+    states = {}
+    for row in rows:
+        states[row["State"]] = states.get(row["State"], 0) + 1
+    parts = [f'<section id="{host_anchor(host)}"><h2>{escape(host)}</h2>']
+    parts.append("<p>" + ", ".join(f"{count} {escape(state)}" for state, count in sorted(states.items())) + "</p>")
+    if verdict:
+        parts.append(
+            f"<p><strong>{escape(str(verdict.get('classification')))}</strong>"
+            f" <span class=\"muted\">{escape(str(verdict.get('analysis_description') or ''))}</span></p>"
+        )
+    parts.append(_table(PORT_COLUMNS, (
+        [
+            f'<span class="open">{escape(str(row[column]))}</span>' if column == "State" and row[column] == "open"
+            else escape(str(row[column] if row[column] is not None else ""))
+            for column in PORT_COLUMNS
+        ]
+        for row in rows
+    )))
+    parts.append("</section>\n")
+    return "".join(parts)
+
+
+def render_head(title: str, summary: dict, shards: list[str]) -> str:
+    """
+    Render the page header and the scan-wide summary that precedes the host sections.
+
+    :param title: Report title.
+    :param summary: Dictionary produced by ReportSummary.to_dict.
+    :param shards: Scan files the report was built from.
+    :return: HTML text up to the first host section.
+    """
+    parts = [
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">",
+        f"<title>{escape(title)}</title><style>{STYLE}</style></head><body>",
+        f"<h1>{escape(title)}</h1>",
+        f"<p class=\"muted\">Generated {escape(time.strftime('%Y-%m-%d %H:%M:%S'))} from "
+        + ", ".join(escape(shard) for shard in shards) + "</p>",
+        f"<p>{summary['hosts']} host(s), {summary['rows']} port row(s), "
+        f"{summary['duplicates']} duplicate or superseded row(s) dropped.</p>",
+        "<h2>Port states</h2>",
+        _table(["State", "Rows"], ([escape(state), count] for state, count in summary["states"])),
+        "<h2>Top open services</h2>",
+        _table(["Service", "Open ports"], ([escape(name or "unknown"), count] for name, count in summary["top_services"])),
+        "<h2>Top open ports</h2>",
+        _table(["Port", "Open"], ([port, count] for port, count in summary["top_ports"])),
+        "<h2>Hosts with the most open ports</h2>",
+        _table(["Host", "Open", "Total"], (
+            [f'<a href="#{host_anchor(host)}">{escape(host)}</a>', open_count, total]
+            for host, open_count, total in summary["top_hosts"]
+        )),
+    ]
+    if summary["verdicts"]:
+        parts.append("<h2>Per-host verdicts</h2>")
+        parts.append(_table(["Classification", "Hosts"], ([escape(label), count] for label, count in summary["verdicts"])))
+    parts.append("<h2>Hosts</h2>\n")
+    return "".join(parts)
+
+
+def render_tail() -> str:
+    return "</body></html>\n"
@@ -1,2 +1,11 @@
 # src/nmap_automator/scanner/__init__.py
-from .nmap_scanner import NmapScanner
\ No newline at end of file
+from .nmap_scanner import NmapScanner
+from .records import PortRecord, PortRecordBatch
+from .scan_history import ScanHistory
+from .cost_model import ScanCostEstimator, ScanEstimate
+from .checkpoint import ScanCheckpoint
+from .arguments import validate_nmap_arguments, validate_target
+from .profiles import ScanProfile, SCAN_PROFILES, get_profile, resolve_suggestion
+from .pipeline import TwoPhasePipeline
+from .rescan_planner import ambiguous_pairs, plan_rescan
+from .subprocess_backend import ScanControl, NmapProgress, ScanInterrupted, ScanCancelled, ScanTimeout, SubprocessNmapBackend
\ No newline at end of file
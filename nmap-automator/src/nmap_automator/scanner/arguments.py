@@ -0,0 +1,105 @@
+import re
+
+PORT_SPEC = re.compile(r"^(?:[TU]:)?\d{1,5}(?:-\d{0,5})?(?:,(?:[TU]:)?\d{1,5}(?:-\d{0,5})?)*$")
+TIME_SPEC = re.compile(r"^\d+(?:ms|s|m|h)?$")
+
+# Flags that take no value
+SWITCHES = {
+    "-sS", "-sT", "-sU", "-sV", "-sC", "-sn", "-A", "-O", "-Pn", "-n",
+    "-v", "-vv", "-F", "-p-", "--open", "--reason",
+    "-T0", "-T1", "-T2", "-T3", "-T4", "-T5",
+}
+
+
+def _int_between(low: int, high: int):
+    def check(value: str) -> bool:
+        return value.isdigit() and low <= int(value) <= high
+    return check
+
+
+def _port_spec(value: str) -> bool:
+    if not PORT_SPEC.match(value):
+        return False
+    for part in value.split(","):
+        part = part.split(":", 1)[-1]
+        for bound in part.split("-"):
+            if bound and not 0 <= int(bound) <= 65535:
+                return False
+    return True
+
+
+# Flags that take exactly one value, with the check applied to that value
+OPTIONS = {
+    "-p": _port_spec,
+    "--top-ports": _int_between(1, 65535),
+    "--min-rate": _int_between(1, 1000000),
+    "--max-rate": _int_between(1, 1000000),
+    "--max-retries": _int_between(0, 10),
+    "--min-hostgroup": _int_between(1, 4096),
+    "--max-hostgroup": _int_between(1, 4096),
+    "--version-intensity": _int_between(0, 9),
+    "--host-timeout": TIME_SPEC.match,
+    "--max-rtt-timeout": TIME_SPEC.match,
+}
+
+
+def tokenize(nmap_args: list[str]) -> list[str]:
+    """Split argument list items on whitespace, so both ['-p 22,80'] and ['-p', '22,80'] are accepted."""
+    tokens = []
+    for arg in nmap_args:
+        if not isinstance(arg, str):
+            raise ValueError("nmap-args must be a list of strings")
+        tokens.extend(arg.split())
+    return tokens
+
+
+def validate_nmap_arguments(nmap_args: list[str]) -> list[str]:
+    """
+    Check an nmap argument list against the allowed flags and their value formats.
+
+    :param nmap_args: List of nmap arguments.
+    :return: Normalized list with one token per item.
+    :raises ValueError: If a flag is not allowed or a value is missing or malformed.
+    """
+    tokens = tokenize(nmap_args)
+    normalized = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in SWITCHES:
+            normalized.append(token)
+        elif token in OPTIONS:
+            if i + 1 >= len(tokens):
+                raise ValueError(f"nmap argument '{token}' requires a value")
+            value = tokens[i + 1]
+            if not OPTIONS[token](value):
+                raise ValueError(f"Invalid value '{value}' for nmap argument '{token}'")
+            normalized.extend([token, value])
+            i += 1
+        elif token.startswith("-p") and token[2:] and _port_spec(token[2:]):
+            # Attached form, e.g. -p22,80
+            normalized.extend(["-p", token[2:]])
+        else:
+            raise ValueError(
+                f"nmap argument '{token}' is not allowed; allowed flags are "
+                f"{', '.join(sorted(SWITCHES | set(OPTIONS)))}"
+            )
+        i += 1
+    return normalized
+
+
+def validate_target(target: str) -> str:
+    """
+    Check that a target expression only names hosts, so it cannot smuggle options past the argument checks.
+
+    :param target: Hosts, ranges or networks separated by whitespace.
+    :return: The target, unchanged.
+    :raises ValueError: If the target is empty or one of its tokens starts with '-'.
+    """
+    tokens = target.split()
+    if not tokens:
+        raise ValueError("targets must not be empty")
+    for token in tokens:
+        if token.startswith("-"):
+            raise ValueError(f"Invalid target '{token}': targets cannot start with '-'")
+    return target
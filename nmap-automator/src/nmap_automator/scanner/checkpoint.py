@@ -0,0 +1,185 @@
+import io
+import os
+import json
+import ipaddress
+import threading
+
+# Networks larger than this are kept as a single unit instead of being expanded host by host
+MAX_EXPANDED_HOSTS = 65536
+
+
+def expand_target(target: str) -> list[str]:
+    """
+    Split an nmap target expression into the hosts it covers.
+
+    CIDR networks and octet ranges are expanded locally so progress can be tracked
+    per host. Hostnames (and networks too large to track) are kept as one unit.
+
+    :param target: Target IP, hostname, range or network.
+    :return: List of host expressions to scan.
+    """
+    target = target.strip()
+    try:
+        network = ipaddress.ip_network(target, strict=False)
+        if network.num_addresses == 1:
+            return [str(network.network_address)]
+        if network.num_addresses <= MAX_EXPANDED_HOSTS:
+            hosts = [str(host) for host in network.hosts()]
+            return hosts or [str(host) for host in network]
+        return [target]
+    except ValueError:
+        pass
+
+    octets = target.split(".")
+    if len(octets) != 4 or not all(o.replace("-", "").replace(",", "").isdigit() for o in octets):
+        return [target]
+
+    try:
+        expanded = [[]]
+        for octet in octets:
+            values = _octet_values(octet)
+            if not values:
+                return [target]
+            expanded = [prefix + [value] for prefix in expanded for value in values]
+            if len(expanded) > MAX_EXPANDED_HOSTS:
+                return [target]
+    except ValueError:
+        # Anything we cannot read ourselves is left to nmap, which reports it
+        return [target]
+    return [".".join(str(v) for v in host) for host in expanded]
+
+
+def _octet_values(octet: str) -> list[int]:
+    """Values of one octet of an nmap range ('1,5-7', '100-', '-5'); empty parts are ignored as nmap does."""
+    values = []
+    for part in octet.split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            # Open-ended ranges run to the bounds of the octet
+            values.extend(range(int(start or 0), int(end or 255) + 1))
+        else:
+            values.append(int(part))
+    if any(value > 255 for value in values):
+        raise ValueError(f"octet out of range: {octet}")
+    return values
+
+
+class ScanCheckpoint:
+    """
+    Tracks which hosts of each target have been scanned and persisted in a scan directory.
+
+    Rows are appended to the results CSV as each batch of hosts completes, and the
+    checkpoint records the CSV size after the last committed batch. A crash can
+    therefore only lose the batch that was in flight: on restart the CSV is cut back
+    to the committed size and only the hosts that are not marked completed are
+    scanned again.
+
+    Completed batches are appended to a log, so committing one costs the size of
+    the batch rather than of the whole scan; the log is folded into the JSON state
+    when the checkpoint is loaded or a target is started. The hosts of a target
+    are not stored, they are expanded again from the target expression.
+    """
+
+    FILE_NAME = "checkpoint.json"
+    LOG_NAME = "checkpoint.log"
+
+    def __init__(self, scan_dir: str):
+        self.path = os.path.join(scan_dir, self.FILE_NAME)
+        self.log_path = os.path.join(scan_dir, self.LOG_NAME)
+        self.__lock = threading.Lock()
+        self.__state = {"targets": {}, "csv_offset": 0}
+        self.__completed = {}
+        if os.path.exists(self.path):
+            with io.open(self.path, "r") as f:
+                self.__state = json.load(f)
+            for target, entry in self.__state["targets"].items():
+                # Checkpoints written before the log also hold the expanded hosts, which are no longer needed
+                entry.pop("hosts", None)
+                self.__completed[target] = set(entry["completed"])
+        if os.path.exists(self.log_path):
+            self.__replay_log()
+            self.__save()
+
+    @classmethod
+    def exists(cls, scan_dir: str) -> bool:
+        return os.path.exists(os.path.join(scan_dir, cls.FILE_NAME))
+
+    @property
+    def csv_offset(self) -> int:
+        return self.__state["csv_offset"]
+
+    def start_target(self, target: str, arguments: str, resume: bool) -> list[str]:
+        """
+        Register a target and return the hosts that still need scanning.
+
+        :param target: Target expression as given by the user.
+        :param arguments: Nmap arguments used for the target.
+        :param resume: Keep the progress of a previous run of the same target.
+        :return: List of hosts not yet completed.
+        """
+        with self.__lock:
+            entry = self.__state["targets"].get(target)
+            if entry is None or not resume or entry["arguments"] != arguments:
+                self.__state["targets"][target] = {"arguments": arguments, "completed": []}
+                self.__completed[target] = set()
+                self.__save()
+            completed = self.__completed[target]
+            return [host for host in expand_target(target) if host not in completed]
+
+    def mark_completed(self, target: str, hosts: list[str], csv_offset: int) -> None:
+        """
+        Record that a batch of hosts has been scanned and its rows are on disk.
+
+        :param target: Target the hosts belong to.
+        :param hosts: Hosts of the completed batch.
+        :param csv_offset: Size of the results CSV after the batch was written.
+        """
+        with self.__lock:
+            self.__apply(target, hosts, csv_offset)
+            with io.open(self.log_path, "a") as f:
+                f.write(json.dumps({"target": target, "hosts": hosts, "csv_offset": csv_offset}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def pending_targets(self) -> dict[str, dict]:
+        """Return the targets that still have unscanned hosts, with their arguments and remaining hosts."""
+        with self.__lock:
+            pending = {}
+            for target, entry in self.__state["targets"].items():
+                completed = self.__completed[target]
+                remaining = [host for host in expand_target(target) if host not in completed]
+                if remaining:
+                    pending[target] = {"arguments": entry["arguments"], "remaining_hosts": remaining}
+            return pending
+
+    def __apply(self, target: str, hosts: list[str], csv_offset: int) -> None:
+        completed = self.__completed[target]
+        new_hosts = [host for host in hosts if host not in completed]
+        completed.update(new_hosts)
+        self.__state["targets"][target]["completed"].extend(new_hosts)
+        self.__state["csv_offset"] = csv_offset
+
+    def __replay_log(self) -> None:
+        with io.open(self.log_path, "r") as f:
+            for line in f:
+                try:
+                    batch = json.loads(line)
+                except ValueError:
+                    # A batch torn by a crash was never committed; nothing after it was written
+                    break
+                if batch["target"] in self.__state["targets"]:
+                    self.__apply(batch["target"], batch["hosts"], batch["csv_offset"])
+
+    def __save(self) -> None:
+        # Write-then-rename so a crash never leaves a half-written checkpoint behind
+        tmp_path = f"{self.path}.tmp"
+        with io.open(tmp_path, "w") as f:
+            f.write(json.dumps(self.__state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # The state now holds every logged batch; replaying them again would be harmless but slow
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
@@ -0,0 +1,241 @@
+import math
+import ipaddress
+from dataclasses import dataclass, asdict
+
+from .scan_history import ScanHistory
+
+
+# Seconds spent probing a single port on a responsive host, per timing template.
+PER_PORT_SECONDS = {0: 300.0, 1: 15.0, 2: 0.4, 3: 0.012, 4: 0.006, 5: 0.004}
+# Fixed per-host cost (host discovery, reverse DNS, bookkeeping).
+PER_HOST_SECONDS = {0: 600.0, 1: 60.0, 2: 8.0, 3: 2.0, 4: 1.2, 5: 1.0}
+# Multipliers applied on top of the port sweep for the expensive detection phases.
+FLAG_MULTIPLIERS = {
+    "-sV": 3.0,
+    "-O": 1.4,
+    "-sC": 2.0,
+    "-sU": 8.0,
+}
+DEFAULT_PORT_COUNT = 1000
+MAX_PORT_COUNT = 65535
+
+
+@dataclass
+class ScanEstimate:
+    seconds: float
+    low_seconds: float
+    high_seconds: float
+    host_count: int
+    port_count: int
+    calibration_samples: int
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def progress(self, elapsed: float) -> dict:
+        """
+        Derive a live progress report from the estimate.
+
+        The percentage is capped below 100 while the scan is still running so a job
+        that overruns its estimate does not look finished.
+
+        :param elapsed: Seconds since the scan started.
+        :return: Dictionary with percent complete and remaining seconds.
+        """
+        if self.seconds <= 0:
+            return {"percent": 99.0, "eta_seconds": 0.0}
+        percent = min(elapsed / self.seconds * 100, 99.0)
+        return {
+            "percent": round(percent, 1),
+            "eta_seconds": round(max(self.seconds - elapsed, 0.0), 1)
+        }
+
+
+def count_targets(target: str) -> int:
+    """Count the hosts described by a single nmap target expression."""
+    target = target.strip()
+    if not target:
+        return 0
+    try:
+        return ipaddress.ip_network(target, strict=False).num_addresses
+    except ValueError:
+        pass
+
+    # Octet ranges such as 10.0.0.1-20 or 10.0.1-3.1
+    octets = target.split(".")
+    if len(octets) == 4 and all(o.replace("-", "").replace(",", "").isdigit() for o in octets):
+        total = 1
+        for octet in octets:
+            size = 0
+            for part in octet.split(","):
+                if "-" in part:
+                    start, end = part.split("-", 1)
+                    size += max(int(end) - int(start) + 1, 0)
+                else:
+                    size += 1
+            total *= size
+        return total
+
+    # Hostname
+    return 1
+
+
+def count_ports(spec: str) -> int:
+    """Count the ports described by an nmap -p specification (e.g. '22,80,8000-8100')."""
+    if spec in ("-", "1-65535"):
+        return MAX_PORT_COUNT
+    total = 0
+    for part in spec.split(","):
+        part = part.strip()
+        if ":" in part:
+            # Protocol qualifiers such as T:80 or U:53
+            part = part.split(":", 1)[1]
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            start = int(start) if start else 1
+            end = int(end) if end else MAX_PORT_COUNT
+            total += max(end - start + 1, 0)
+        else:
+            total += 1
+    return min(total, MAX_PORT_COUNT)
+
+
+def parse_scan_shape(nmap_args: list[str]) -> dict:
+    """
+    Extract the cost-relevant properties of an nmap argument list.
+
+    :param nmap_args: List of nmap arguments (e.g. ['-A', '-T3', '-v']).
+    :return: Dictionary with timing template, port count and enabled phases.
+    """
+    tokens = []
+    for arg in nmap_args:
+        tokens.extend(arg.split())
+
+    shape = {"timing": 3, "port_count": DEFAULT_PORT_COUNT, "flags": set(), "ping_only": False, "min_rate": None}
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.startswith("-T") and token[2:].isdigit():
+            shape["timing"] = min(int(token[2:]), 5)
+        elif token == "-A":
+            shape["flags"].update(["-sV", "-O", "-sC"])
+        elif token in FLAG_MULTIPLIERS:
+            shape["flags"].add(token)
+        elif token == "-sn":
+            shape["ping_only"] = True
+        elif token == "-p-":
+            shape["port_count"] = MAX_PORT_COUNT
+        elif token.startswith("-p") and len(token) > 2:
+            shape["port_count"] = count_ports(token[2:])
+        elif token == "-p" and i + 1 < len(tokens) and not tokens[i + 1].startswith("-"):
+            shape["port_count"] = count_ports(tokens[i + 1])
+            i += 1
+        elif token == "-F":
+            shape["port_count"] = 100
+        elif token == "--top-ports" and i + 1 < len(tokens) and tokens[i + 1].isdigit():
+            shape["port_count"] = min(int(tokens[i + 1]), MAX_PORT_COUNT)
+            i += 1
+        elif token == "--min-rate" and i + 1 < len(tokens) and tokens[i + 1].isdigit():
+            shape["min_rate"] = int(tokens[i + 1])
+            i += 1
+        i += 1
+    return shape
+
+
+class ScanCostEstimator:
+    """
+    Predicts nmap scan duration from target count, port range, timing template and flags.
+
+    The base model is a per-host plus per-port cost scaled by the detection phases
+    that are enabled. It is calibrated against the scan history by learning a
+    correction factor per argument signature (and a global one as fallback).
+    """
+
+    MIN_SAMPLES = 3
+
+    def __init__(self, history: ScanHistory = None):
+        self.__history = history
+        self.__global_factor = 1.0
+        self.__global_samples = 0
+        self.__signature_factors = {}
+
+    @staticmethod
+    def _signature(shape: dict) -> str:
+        flags = ",".join(sorted(shape["flags"]))
+        return f"T{shape['timing']}|{flags}|{'sn' if shape['ping_only'] else 'ports'}"
+
+    @staticmethod
+    def _base_seconds(shape: dict, host_count: int) -> float:
+        timing = shape["timing"]
+        per_host = PER_HOST_SECONDS[timing]
+        if shape["ping_only"]:
+            return host_count * per_host
+
+        per_port = PER_PORT_SECONDS[timing]
+        if shape.get("min_rate"):
+            # --min-rate puts a floor under the probe rate, i.e. a ceiling on the time per port
+            per_port = min(per_port, 1.0 / shape["min_rate"])
+        multiplier = 1.0
+        for flag in shape["flags"]:
+            multiplier *= FLAG_MULTIPLIERS[flag]
+        return host_count * (per_host + shape["port_count"] * per_port * multiplier)
+
+    def calibrate(self) -> None:
+        """Fit correction factors from the recorded scan history."""
+        if self.__history is None:
+            return
+
+        log_ratios = {}
+        all_log_ratios = []
+        for entry in self.__history.load():
+            duration = entry.get("duration") or 0
+            if duration <= 0:
+                continue
+            shape = parse_scan_shape(entry.get("arguments", "").split())
+            hosts = max(entry.get("hosts_up") or count_targets(entry.get("target", "")), 1)
+            predicted = self._base_seconds(shape, hosts)
+            if predicted <= 0:
+                continue
+            ratio = math.log(duration / predicted)
+            log_ratios.setdefault(self._signature(shape), []).append(ratio)
+            all_log_ratios.append(ratio)
+
+        # Geometric means keep one pathological run from dominating the factor
+        if all_log_ratios:
+            self.__global_factor = math.exp(sum(all_log_ratios) / len(all_log_ratios))
+            self.__global_samples = len(all_log_ratios)
+        self.__signature_factors = {
+            signature: (math.exp(sum(ratios) / len(ratios)), len(ratios))
+            for signature, ratios in log_ratios.items()
+            if len(ratios) >= self.MIN_SAMPLES
+        }
+
+    def estimate(self, targets: list[str], nmap_args: list[str]) -> ScanEstimate:
+        """
+        Estimate how long a scan of the given targets will take.
+
+        :param targets: List of nmap target expressions.
+        :param nmap_args: List of nmap arguments.
+        :return: ScanEstimate with the predicted duration and a spread.
+        """
+        shape = parse_scan_shape(nmap_args)
+        host_count = sum(count_targets(t) for t in targets)
+        seconds = self._base_seconds(shape, host_count)
+
+        factor, samples = self.__signature_factors.get(
+            self._signature(shape), (self.__global_factor, self.__global_samples)
+        )
+        seconds *= factor
+
+        # The spread narrows as more comparable runs are observed
+        spread = 1.0 + 2.0 / math.sqrt(samples + 1)
+        return ScanEstimate(
+            seconds=round(seconds, 1),
+            low_seconds=round(seconds / spread, 1),
+            high_seconds=round(seconds * spread, 1),
+            host_count=host_count,
+            port_count=0 if shape["ping_only"] else shape["port_count"],
+            calibration_samples=samples
+        )
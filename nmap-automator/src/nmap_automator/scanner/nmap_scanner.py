@@ -1,68 +1,295 @@
 import os
 import csv
+import time
 import nmap
 
+from .scan_history import ScanHistory
+from .checkpoint import ScanCheckpoint
+from .records import PortRecordBatch
+from .pipeline import TwoPhasePipeline
+from .subprocess_backend import SubprocessNmapBackend, ScanControl, ScanInterrupted, ScanTimeout
+
+BACKENDS = ("subprocess", "python-nmap")
+# nmap parallelizes across the hosts of one invocation, so batches only need to be small enough to checkpoint
+MIN_HOSTS_PER_BATCH = 256
+MAX_BATCHES_PER_TARGET = 64
+
+
+def default_hosts_per_batch(host_count: int) -> int:
+    """Hosts per nmap invocation: at least MIN_HOSTS_PER_BATCH, and no more than MAX_BATCHES_PER_TARGET invocations."""
+    return max(MIN_HOSTS_PER_BATCH, -(-host_count // MAX_BATCHES_PER_TARGET))
+
+
 class NmapScanner:
-    def __init__(self):
-        self.__scanner = nmap.PortScanner()
+    def __init__(self, history: ScanHistory = None, control: ScanControl = None, backend: str = None):
+        """
+        :param history: Scan history receiving the duration of every nmap run.
+        :param control: Cancellation, deadline and live progress shared with the caller.
+        :param backend: "subprocess" (cancellable, with progress) or "python-nmap"; defaults to NMAP_AUTOMATOR_SCANNER_BACKEND or "subprocess".
+        """
+        backend = backend or os.getenv("NMAP_AUTOMATOR_SCANNER_BACKEND", "subprocess")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown scanner backend '{backend}', expected one of {', '.join(BACKENDS)}")
+        if backend == "python-nmap":
+            self.__scanner = nmap.PortScanner()
+            self.__backend = None
+        else:
+            self.__scanner = None
+            self.__backend = SubprocessNmapBackend()
+        self.__history = history
+        self.control = control or ScanControl()
+
+    def __nmap(self, target: str, arguments: str, results: PortRecordBatch, up_hosts: list = None) -> None:
+        """Run one nmap invocation on the configured backend."""
+        self.control.check()
+        if self.__backend is not None:
+            self.__backend.scan(target, arguments, results, self.control, up_hosts)
+            return
 
-    def __run_scan(self, target: str, arguments: str) -> list[dict]:
+        # python-nmap cannot be interrupted, only bounded by the remaining time
+        remaining = self.control.remaining_seconds()
         try:
-            print(f"Starting Nmap scan on target: {target} with arguments: {arguments}")
-            self.__scanner.scan(hosts=target, arguments=arguments)
-        except Exception as e:
-            print(f"Error running Nmap scan: {e}")
-            return []
+            self.__scanner.scan(hosts=target, arguments=arguments, timeout=max(int(remaining), 1) if remaining else 0)
+        except nmap.PortScannerTimeout:
+            self.control.stop_reason = "timeout"
+            raise ScanTimeout("Scan exceeded its time limit.")
+        if up_hosts is not None:
+            up_hosts.extend(host for host in self.__scanner.all_hosts() if self.__scanner[host].state() == "up")
+        self.__append_python_nmap_rows(results)
 
-        results = []
+    def __append_python_nmap_rows(self, results: PortRecordBatch) -> None:
         for host in self.__scanner.all_hosts():
             for proto in self.__scanner[host].all_protocols():
                 for port in self.__scanner[host][proto]:
                     service_info = self.__scanner[host][proto][port]
-                    results.append({
-                        'IP': host,
-                        'Protocol': proto,
-                        'Port': port,
-                        'State': service_info['state'],
-                        'Name': service_info.get('name', ''),
-                        'Product': service_info.get('product', ''),
-                        'Version': service_info.get('version', '')
-                    })
-        return results
+                    results.append(
+                        host,
+                        proto,
+                        port,
+                        service_info['state'],
+                        service_info.get('name', ''),
+                        service_info.get('product', ''),
+                        service_info.get('version', '')
+                    )
 
-    def __save_results_to_csv(self, results: list[dict], filename: str, subdomain: str) -> None:
-        if results:
-            # Add Subdomain information to each result
-            for result in results:
-                result["Subdomain"] = subdomain
-
-            dirs = os.path.dirname(filename)
-            if dirs:
-                os.makedirs(dirs, exist_ok=True)
-
-            keys = results[0].keys()
-            with open(filename, 'w', newline='') as output_file:
-                dict_writer = csv.DictWriter(output_file, fieldnames=keys)
-                dict_writer.writeheader()
-                dict_writer.writerows(results)
-            print(f"Results saved to: {filename}")
-        else:
-            print(f"No results to save in {filename}.")
+    def __run_scan(self, target: str, arguments: str, results: PortRecordBatch) -> None:
+        print(f"Starting Nmap scan on target: {target} with arguments: {arguments}")
+        self.__nmap(target, arguments, results)
+
+    def __discover_hosts(self, target: str, arguments: str) -> list[str]:
+        print(f"Discovering live hosts in: {target} with arguments: {arguments}")
+        up_hosts = []
+        self.__nmap(target, arguments, PortRecordBatch(), up_hosts)
+        return up_hosts
+
+    def __record_history(self, target: str, arguments: str, started: float, results: PortRecordBatch, start: int = 0, hosts_up: int = None) -> None:
+        if self.__history is None:
+            return
+        self.__history.record(
+            target=target,
+            arguments=arguments,
+            duration=time.monotonic() - started,
+            hosts_up=hosts_up if hosts_up is not None else results.host_count(start=start),
+            port_count=len(results) - start
+        )
+
+    def __append_results_to_csv(self, results: PortRecordBatch, start: int, filename: str) -> int:
+        """Append the rows of the batch from `start` on, sync them to disk and return the new file size."""
+        dirs = os.path.dirname(filename)
+        if dirs:
+            os.makedirs(dirs, exist_ok=True)
+
+        write_header = not os.path.exists(filename) or os.path.getsize(filename) == 0
+        with open(filename, 'a', newline='') as output_file:
+            results.write_csv(output_file, write_header=write_header, start=start)
+            output_file.flush()
+            os.fsync(output_file.fileno())
+            return output_file.tell()
+
+    def __load_results_from_csv(self, filename: str, results: PortRecordBatch) -> None:
+        """Reload the rows persisted for the batch's target by earlier runs."""
+        if not os.path.exists(filename):
+            return
+        with open(filename, 'r', newline='') as input_file:
+            results.extend(row for row in csv.DictReader(input_file) if row["Subdomain"] == results.subdomain)
 
-    def scan(self, target: str, arguments: str = "-A -T3 -v", save_dir: str = "./results") -> list[dict]:
+    def scan(
+        self,
+        target: str,
+        arguments: str = "-A -T3 -v",
+        save_dir: str = "./results",
+        resume: bool = False,
+        hosts_per_batch: int = None
+    ) -> PortRecordBatch:
         """
         Perform an Nmap scan on the specified target using the given arguments.
+
+        Hosts are scanned in batches and each batch is persisted as soon as it
+        completes, so an interrupted scan can be resumed without rescanning the
+        hosts that already finished.
         
         :param target: Target IP, hostname, or range.
         :param arguments: Nmap arguments (e.g., "-A -T3 -v").
         :param save_dir: Directory to save scan results.
-        :return: List of results as dictionaries.
+        :param resume: Skip the hosts already completed by a previous run in save_dir.
+        :param hosts_per_batch: Number of hosts handed to each nmap invocation; derived from the target size by default.
+        :return: PortRecordBatch with the rows of the target (including recovered ones when resuming).
         """
+        os.makedirs(save_dir, exist_ok=True)
         initial_results_file = os.path.join(save_dir, "initial_scan_results.csv")
+        has_checkpoint = ScanCheckpoint.exists(save_dir)
+        checkpoint = ScanCheckpoint(save_dir)
+
+        # Drop any rows written after the last committed batch (torn by a crash)
+        if has_checkpoint and os.path.exists(initial_results_file) \
+                and os.path.getsize(initial_results_file) > checkpoint.csv_offset:
+            with open(initial_results_file, 'r+') as f:
+                f.truncate(checkpoint.csv_offset)
+
+        results = PortRecordBatch(subdomain=target)
+        if resume:
+            self.__load_results_from_csv(initial_results_file, results)
+        recovered = len(results)
+        remaining = checkpoint.start_target(target, arguments, resume=resume)
+        if resume:
+            print(f"Resuming scan of {target}: {len(remaining)} host(s) left, {recovered} row(s) recovered.")
+        hosts_per_batch = hosts_per_batch or default_hosts_per_batch(len(remaining))
 
         # Run the scan
-        results = self.__run_scan(target, arguments)
+        started = time.monotonic()
+        for i in range(0, len(remaining), hosts_per_batch):
+            batch = remaining[i:i + hosts_per_batch]
+            batch_start = len(results)
+            try:
+                self.__run_scan(" ".join(batch), arguments, results)
+            except ScanInterrupted as e:
+                # Keep what nmap finished, but leave the batch unmarked so a resumed run redoes it cleanly
+                print(f"Nmap scan of {target} stopped: {e} Keeping {len(results) - batch_start} partial row(s).")
+                self.__append_results_to_csv(results, batch_start, initial_results_file)
+                break
+            except Exception as e:
+                # Leave the batch unmarked so a resumed run picks it up again
+                print(f"Error running Nmap scan: {e}")
+                break
+
+            offset = self.__append_results_to_csv(results, batch_start, initial_results_file)
+            checkpoint.mark_completed(target, batch, offset)
+
+        new_rows = len(results) - recovered
+        # An interrupted run would make the cost model think the scan was cheap
+        if new_rows and not self.control.stopped:
+            self.__record_history(target, arguments, started, results, start=recovered)
+
+        if new_rows:
+            print(f"Results saved to: {initial_results_file}")
+        else:
+            print(f"No new results to save in {initial_results_file}.")
+        return results
+
+    def scan_hosts(self, hosts: list[str], arguments: str, subdomain: str = '', results: PortRecordBatch = None) -> PortRecordBatch:
+        """
+        Scan an explicit list of hosts without touching the checkpoint or the results file.
+
+        Used by follow-up scans that only revisit part of an earlier scan.
+
+        :param hosts: Hosts to scan.
+        :param arguments: Nmap arguments.
+        :param subdomain: Subdomain recorded on the rows.
+        :param results: Batch to append to, a new one by default.
+        :return: PortRecordBatch with the rows of the scan, partial if the scan was cancelled or timed out (see control.stopped).
+        """
+        results = results if results is not None else PortRecordBatch(subdomain=subdomain)
+        start = len(results)
+        started = time.monotonic()
+        try:
+            self.__run_scan(" ".join(hosts), arguments, results)
+        except ScanInterrupted as e:
+            print(f"Nmap scan of {', '.join(hosts)} stopped: {e}")
+            return results
+        self.__record_history(" ".join(hosts), arguments, started, results, start=start)
+        return results
+
+    def scan_two_phase(
+        self,
+        target: str,
+        save_dir: str = "./results",
+        pipeline: TwoPhasePipeline = None,
+        hosts_per_batch: int = None
+    ) -> PortRecordBatch:
+        """
+        Scan the target in two phases instead of running every probe on every port.
+
+        Phase one discovers live hosts and sweeps them for open ports; phase two runs
+        version, script and OS detection only on those ports. The sweep results are
+        handed to the deep phase in memory and only the final rows are written to disk.
+        If a deep batch fails, the sweep rows of its hosts are kept instead.
 
-        # Save the results
-        self.__save_results_to_csv(results, initial_results_file, subdomain=target)
+        :param target: Target IP, hostname, or range.
+        :param save_dir: Directory to save scan results.
+        :param pipeline: Argument plans of the phases, defaults to TwoPhasePipeline().
+        :param hosts_per_batch: Number of hosts handed to each nmap invocation; derived from the number of live hosts by default.
+        :return: PortRecordBatch with the rows of the target.
+        """
+        pipeline = pipeline or TwoPhasePipeline()
+        os.makedirs(save_dir, exist_ok=True)
+        initial_results_file = os.path.join(save_dir, "initial_scan_results.csv")
+
+        # Phase 1a: host discovery
+        started = time.monotonic()
+        discovery_arguments = " ".join(pipeline.discovery_arguments)
+        try:
+            live_hosts = self.__discover_hosts(target, discovery_arguments)
+        except ScanInterrupted as e:
+            print(f"Nmap host discovery stopped: {e}")
+            return PortRecordBatch(subdomain=target)
+        except Exception as e:
+            print(f"Error running Nmap host discovery: {e}")
+            live_hosts = []
+        self.__record_history(target, discovery_arguments, started, PortRecordBatch(), hosts_up=len(live_hosts))
+        print(f"Host discovery found {len(live_hosts)} live host(s) in {target}.")
+        hosts_per_batch = hosts_per_batch or default_hosts_per_batch(len(live_hosts))
+
+        # Phase 1b: open port sweep of the live hosts
+        sweep_results = PortRecordBatch(subdomain=target)
+        sweep_arguments = " ".join(pipeline.sweep_arguments)
+        started = time.monotonic()
+        for i in range(0, len(live_hosts), hosts_per_batch):
+            try:
+                self.__run_scan(" ".join(live_hosts[i:i + hosts_per_batch]), sweep_arguments, sweep_results)
+            except ScanInterrupted as e:
+                print(f"Nmap port sweep stopped: {e}")
+                break
+            except Exception as e:
+                print(f"Error running Nmap port sweep: {e}")
+        if sweep_results:
+            self.__record_history(target, sweep_arguments, started, sweep_results)
+
+        # Phase 2: detection on the confirmed-open ports only
+        results = PortRecordBatch(subdomain=target)
+        deep_plan = pipeline.deep_plan(sweep_results, hosts_per_batch)
+        for index, (hosts, deep_arguments) in enumerate(deep_plan):
+            batch_start = len(results)
+            started = time.monotonic()
+            try:
+                self.__run_scan(" ".join(hosts), deep_arguments, results)
+                self.__record_history(target, deep_arguments, started, results, start=batch_start)
+            except ScanInterrupted as e:
+                # Hosts the deep phase will not reach keep their sweep rows
+                print(f"Nmap deep scan stopped: {e}")
+                finished = {row[0] for row in results.rows(batch_start)}
+                unfinished = set(hosts) - finished
+                unfinished.update(host for later_hosts, _ in deep_plan[index + 1:] for host in later_hosts)
+                results.extend(row for row in sweep_results if row['IP'] in unfinished)
+                self.__append_results_to_csv(results, batch_start, initial_results_file)
+                break
+            except Exception as e:
+                print(f"Error running Nmap deep scan on {', '.join(hosts)}: {e}")
+                failed_hosts = set(hosts)
+                results.extend(row for row in sweep_results if row['IP'] in failed_hosts)
+            self.__append_results_to_csv(results, batch_start, initial_results_file)
+
+        if results:
+            print(f"Results saved to: {initial_results_file}")
+        else:
+            print(f"No open ports found on {target}.")
         return results
@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+
+from .arguments import validate_nmap_arguments
+from .cost_model import ScanCostEstimator, ScanEstimate
+from .records import PortRecordBatch
+
+# Ports the deep phase is expected to visit per live host when estimating ahead of the sweep
+EXPECTED_OPEN_PORTS_PER_HOST = 10
+# Flags that choose the port set; in the deep phase the ports come from the sweep instead
+PORT_SELECTION_FLAGS = {"-p", "-p-", "-F", "--top-ports"}
+
+
+def format_port_spec(ports: set) -> str:
+    """
+    Render (protocol, port) pairs as an nmap -p value.
+
+    Plain port numbers are used when every port is TCP, otherwise each protocol
+    gets its T: or U: qualifier.
+    """
+    protocols = {protocol for protocol, _ in ports}
+    if protocols <= {"tcp"}:
+        return ",".join(str(port) for _, port in sorted(ports))
+    parts = []
+    for qualifier, protocol in (("T", "tcp"), ("U", "udp")):
+        numbers = sorted(port for p, port in ports if p == protocol)
+        if numbers:
+            parts.append(f"{qualifier}:" + ",".join(str(port) for port in numbers))
+    return ",".join(parts)
+
+
+def group_hosts_by_ports(ports_by_host: dict, hosts_per_batch: int = 16) -> list[tuple[list[str], str]]:
+    """
+    Group hosts that need exactly the same ports so they share one nmap invocation.
+
+    :param ports_by_host: Mapping of host to a set of (protocol, port) pairs.
+    :param hosts_per_batch: Maximum number of hosts per invocation.
+    :return: List of (hosts, port spec) pairs.
+    """
+    hosts_by_ports = {}
+    for host, ports in ports_by_host.items():
+        if ports:
+            hosts_by_ports.setdefault(format_port_spec(ports), []).append(host)
+
+    groups = []
+    for port_spec, hosts in hosts_by_ports.items():
+        for i in range(0, len(hosts), hosts_per_batch):
+            groups.append((hosts[i:i + hosts_per_batch], port_spec))
+    return groups
+
+
+@dataclass(frozen=True)
+class TwoPhasePipeline:
+    """
+    Argument plans of the discovery-then-deep-scan strategy.
+
+    Phase one finds live hosts and sweeps them for open TCP ports at a high rate.
+    Phase two runs the expensive detection only on the ports the sweep found open,
+    grouping hosts that share the same open ports into one nmap invocation.
+    """
+
+    discovery_arguments: tuple[str, ...] = ("-sn", "-n", "-T4")
+    sweep_arguments: tuple[str, ...] = ("-sS", "-Pn", "-n", "--open", "--top-ports", "1000", "--min-rate", "1000", "-T4")
+    deep_arguments: tuple[str, ...] = ("-sV", "-sC", "-O", "-Pn", "-T3")
+
+    @classmethod
+    def from_deep_arguments(cls, nmap_args: list[str]) -> "TwoPhasePipeline":
+        """
+        Build a pipeline whose deep phase runs the given detection arguments.
+
+        :param nmap_args: Detection arguments, without any port selection.
+        :return: TwoPhasePipeline with the default discovery and sweep phases.
+        :raises ValueError: If the arguments are invalid or select ports themselves.
+        """
+        tokens = validate_nmap_arguments(nmap_args)
+        selected = PORT_SELECTION_FLAGS.intersection(tokens)
+        if selected:
+            raise ValueError(
+                f"{', '.join(sorted(selected))} cannot be used with the two_phase strategy; "
+                "the deep scan only visits the ports found open by the sweep"
+            )
+        return cls(deep_arguments=tuple(tokens))
+
+    def deep_plan(self, sweep_results: PortRecordBatch, hosts_per_batch: int = 16) -> list[tuple[list[str], str]]:
+        """
+        Plan the deep phase from the rows of the sweep.
+
+        :param sweep_results: Rows produced by the sweep phase.
+        :param hosts_per_batch: Maximum number of hosts per nmap invocation.
+        :return: List of (hosts, nmap arguments) pairs, one per invocation.
+        """
+        open_ports = {}
+        for ip, protocol, port, state, *_ in sweep_results.rows():
+            if protocol == "tcp" and state == "open":
+                open_ports.setdefault(ip, set()).add((protocol, port))
+
+        return [
+            (hosts, " ".join(self.deep_arguments + ("-p", port_spec)))
+            for hosts, port_spec in group_hosts_by_ports(open_ports, hosts_per_batch)
+        ]
+
+    def estimate(self, targets: list[str], estimator: ScanCostEstimator = None) -> ScanEstimate:
+        """
+        Estimate the whole pipeline before it runs.
+
+        The discovery and sweep phases are charged for every address, the deep
+        phase for EXPECTED_OPEN_PORTS_PER_HOST ports on every address, which is a
+        deliberate overestimate since dead hosts never reach it.
+        """
+        estimator = estimator or ScanCostEstimator()
+        phases = [
+            estimator.estimate(targets, list(self.discovery_arguments)),
+            estimator.estimate(targets, list(self.sweep_arguments)),
+            estimator.estimate(
+                targets, list(self.deep_arguments) + ["-p", f"1-{EXPECTED_OPEN_PORTS_PER_HOST}"]
+            ),
+        ]
+        return ScanEstimate(
+            seconds=round(sum(phase.seconds for phase in phases), 1),
+            low_seconds=round(sum(phase.low_seconds for phase in phases), 1),
+            high_seconds=round(sum(phase.high_seconds for phase in phases), 1),
+            host_count=phases[0].host_count,
+            port_count=phases[1].port_count,
+            calibration_samples=min(phase.calibration_samples for phase in phases)
+        )
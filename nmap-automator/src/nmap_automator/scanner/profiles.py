@@ -0,0 +1,122 @@
+from dataclasses import dataclass, field
+
+from .arguments import validate_nmap_arguments
+from .cost_model import ScanCostEstimator, ScanEstimate
+
+
+@dataclass(frozen=True)
+class ScanProfile:
+    name: str
+    description: str
+    # Argument template; '{param}' placeholders are filled from the profile parameters
+    arguments: tuple[str, ...]
+    defaults: dict = field(default_factory=dict)
+
+    def build(self, **params) -> list[str]:
+        """
+        Render the argument plan of the profile.
+
+        :param params: Overrides for the profile parameters (e.g. ports='22,80').
+        :return: Validated nmap argument list.
+        :raises ValueError: If a parameter is unknown or produces an invalid argument.
+        """
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown parameter(s) {sorted(unknown)} for scan profile '{self.name}'")
+        values = {**self.defaults, **{key: str(value) for key, value in params.items()}}
+        return validate_nmap_arguments([argument.format(**values) for argument in self.arguments])
+
+    def estimate(self, targets: list[str], estimator: ScanCostEstimator = None, **params) -> ScanEstimate:
+        estimator = estimator or ScanCostEstimator()
+        return estimator.estimate(targets, self.build(**params))
+
+    def to_dict(self, estimator: ScanCostEstimator = None) -> dict:
+        per_host = self.estimate(["127.0.0.1"], estimator)
+        return {
+            "name": self.name,
+            "description": self.description,
+            "arguments": self.build(),
+            "parameters": dict(self.defaults),
+            "seconds_per_host": per_host.seconds,
+            "calibration_samples": per_host.calibration_samples
+        }
+
+
+SCAN_PROFILES = {
+    profile.name: profile for profile in [
+        ScanProfile(
+            name="discovery",
+            description="Host discovery only, no port scan. Use to find live hosts in a range.",
+            arguments=("-sn", "-n", "-T4"),
+        ),
+        ScanProfile(
+            name="fast-top-1000",
+            description="SYN scan of the most common TCP ports at a high packet rate.",
+            arguments=("-sS", "-Pn", "--top-ports", "{top_ports}", "--min-rate", "{min_rate}", "-T4"),
+            defaults={"top_ports": "1000", "min_rate": "1000"},
+        ),
+        ScanProfile(
+            name="full-tcp",
+            description="SYN scan of all 65535 TCP ports with few retries.",
+            arguments=("-sS", "-Pn", "-p-", "--min-rate", "{min_rate}", "--max-retries", "2", "-T4"),
+            defaults={"min_rate": "2000"},
+        ),
+        ScanProfile(
+            name="service-deep",
+            description="Version detection, default scripts and OS detection on a given port list.",
+            arguments=("-sV", "-sC", "-O", "-Pn", "-p", "{ports}", "--version-intensity", "7", "-T3"),
+            defaults={"ports": "1-1000"},
+        ),
+        ScanProfile(
+            name="udp-top",
+            description="UDP scan of the most common UDP ports.",
+            arguments=("-sU", "-Pn", "--top-ports", "{top_ports}", "--max-retries", "1", "-T4"),
+            defaults={"top_ports": "100"},
+        ),
+    ]
+}
+
+
+def get_profile(name: str) -> ScanProfile:
+    if name not in SCAN_PROFILES:
+        raise ValueError(f"Unknown scan profile '{name}', expected one of {sorted(SCAN_PROFILES)}")
+    return SCAN_PROFILES[name]
+
+
+def profile_menu() -> str:
+    """One line per profile, for embedding in LLM prompts."""
+    return "\n".join(f"- '{profile.name}': {profile.description}" for profile in SCAN_PROFILES.values())
+
+
+def resolve_suggestion(classification: dict) -> dict:
+    """
+    Turn the suggestion of an interpretor into a vetted argument plan.
+
+    A suggested profile wins over raw arguments; raw arguments are kept only if
+    they pass validation. Invalid suggestions are dropped and the reason is
+    recorded under 'suggestion_error'.
+
+    :param classification: Interpretor result dictionary.
+    :return: The same dictionary with 'next_arguments' (and 'next_profile') normalized.
+    """
+    profile_name = classification.get("next_profile")
+    if profile_name:
+        try:
+            classification["next_arguments"] = get_profile(profile_name).build(
+                **(classification.get("next_profile_params") or {})
+            )
+            return classification
+        except ValueError as e:
+            classification["suggestion_error"] = str(e)
+            classification["next_profile"] = None
+
+    next_arguments = classification.get("next_arguments")
+    if next_arguments:
+        try:
+            if isinstance(next_arguments, str):
+                next_arguments = [next_arguments]
+            classification["next_arguments"] = validate_nmap_arguments(next_arguments)
+        except ValueError as e:
+            classification["suggestion_error"] = str(e)
+            classification["next_arguments"] = None
+    return classification
@@ -0,0 +1,178 @@
+import io
+import csv
+import sys
+import json
+from array import array
+
+import numpy as np
+
+from nmap_automator.analysis.frame import ScanFrame, CategoryTable
+
+RESULT_FIELDS = ['IP', 'Protocol', 'Port', 'State', 'Name', 'Product', 'Version', 'Subdomain']
+# Text columns stored as codes into a per-batch string table
+CODED_FIELDS = ['IP', 'Protocol', 'State', 'Name', 'Product', 'Version']
+
+
+class PortRecord:
+    """
+    One port row of a scan result.
+
+    Uses __slots__ and interned strings instead of a per-row dict. It also exposes
+    the mapping interface (r['IP'], r.get('Name')) so code written against the
+    dict rows keeps working.
+    """
+
+    __slots__ = ('ip', 'protocol', 'port', 'state', 'name', 'product', 'version', 'subdomain')
+
+    def __init__(
+        self,
+        ip: str,
+        protocol: str,
+        port: int,
+        state: str,
+        name: str = '',
+        product: str = '',
+        version: str = '',
+        subdomain: str = ''
+    ):
+        self.ip = sys.intern(ip)
+        self.protocol = sys.intern(protocol)
+        self.port = int(port)
+        self.state = sys.intern(state)
+        self.name = sys.intern(name or '')
+        self.product = sys.intern(product or '')
+        self.version = sys.intern(version or '')
+        self.subdomain = sys.intern(subdomain or '')
+
+    def values(self) -> tuple:
+        return (self.ip, self.protocol, self.port, self.state, self.name, self.product, self.version, self.subdomain)
+
+    def keys(self) -> list[str]:
+        return RESULT_FIELDS
+
+    def __getitem__(self, key: str):
+        return getattr(self, _ATTRIBUTES[key])
+
+    def get(self, key: str, default=None):
+        attribute = _ATTRIBUTES.get(key)
+        return getattr(self, attribute) if attribute else default
+
+    def to_dict(self) -> dict:
+        return dict(zip(RESULT_FIELDS, self.values()))
+
+    def __repr__(self) -> str:
+        return f"PortRecord({self.to_dict()})"
+
+
+_ATTRIBUTES = dict(zip(RESULT_FIELDS, PortRecord.__slots__))
+
+
+class PortRecordBatch:
+    """
+    Compact container for the port rows of one scan target.
+
+    Ports and the codes of every text column live in typed `array`s (4 bytes per
+    cell) and each distinct string is stored once in a per-column table, so a row
+    costs a few dozen bytes instead of a dict and its eight values. The subdomain
+    is the same for the whole batch and is stored once.
+    """
+
+    def __init__(self, subdomain: str = ''):
+        self.subdomain = subdomain
+        self.tables = {field: CategoryTable() for field in CODED_FIELDS}
+        self.codes = {field: array('i') for field in CODED_FIELDS}
+        self.ports = array('i')
+
+    def append(
+        self,
+        ip: str,
+        protocol: str,
+        port: int,
+        state: str,
+        name: str = '',
+        product: str = '',
+        version: str = ''
+    ) -> None:
+        for field, value in (
+            ('IP', ip), ('Protocol', protocol), ('State', state),
+            ('Name', name), ('Product', product), ('Version', version)
+        ):
+            self.codes[field].append(self.tables[field].code(value))
+        self.ports.append(int(port))
+
+    def extend(self, rows) -> None:
+        """Append rows given as dictionaries or PortRecords."""
+        for row in rows:
+            self.append(
+                row['IP'], row['Protocol'], row['Port'], row['State'],
+                row.get('Name', ''), row.get('Product', ''), row.get('Version', '')
+            )
+
+    def __len__(self) -> int:
+        return len(self.ports)
+
+    def __bool__(self) -> bool:
+        return len(self.ports) > 0
+
+    def __getitem__(self, index: int) -> PortRecord:
+        values = {field: self.tables[field].values[self.codes[field][index]] for field in CODED_FIELDS}
+        return PortRecord(
+            values['IP'], values['Protocol'], self.ports[index], values['State'],
+            values['Name'], values['Product'], values['Version'], self.subdomain
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def host_count(self, start: int = 0) -> int:
+        return len(set(self.codes['IP'][start:]))
+
+    def rows(self, start: int = 0):
+        """Yield each row from `start` onwards as a tuple in RESULT_FIELDS order."""
+        columns = [
+            [self.tables[field].values[code] for code in self.codes[field][start:]]
+            for field in CODED_FIELDS
+        ]
+        ips, protocols, states, names, products, versions = columns
+        subdomain = self.subdomain
+        for i, port in enumerate(self.ports[start:]):
+            yield (ips[i], protocols[i], port, states[i], names[i], products[i], versions[i], subdomain)
+
+    def to_dicts(self) -> list[dict]:
+        return [dict(zip(RESULT_FIELDS, row)) for row in self.rows()]
+
+    def write_csv(self, output_file, write_header: bool = True, start: int = 0) -> None:
+        writer = csv.writer(output_file)
+        if write_header:
+            writer.writerow(RESULT_FIELDS)
+        writer.writerows(self.rows(start))
+
+    def write_ndjson(self, output_file, start: int = 0) -> None:
+        for row in self.rows(start):
+            output_file.write(json.dumps(dict(zip(RESULT_FIELDS, row))))
+            output_file.write("\n")
+
+    def to_csv_string(self) -> str:
+        buffer = io.StringIO()
+        self.write_csv(buffer)
+        return buffer.getvalue()
+
+    def to_frame(self) -> ScanFrame:
+        """
+        View the batch as a ScanFrame.
+
+        The code and port buffers are shared, not copied, so the batch cannot grow
+        while the frame is alive (array refuses to resize an exported buffer).
+        """
+        codes = {field: np.frombuffer(self.codes[field], dtype=np.int32) for field in CODED_FIELDS}
+        codes['Subdomain'] = np.zeros(len(self), dtype=np.int32)
+        categories = dict(self.tables)
+        categories['Subdomain'] = CategoryTable([self.subdomain])
+        return ScanFrame(codes, categories, np.frombuffer(self.ports, dtype=np.int32))
+
+    @classmethod
+    def from_rows(cls, rows, subdomain: str = '') -> "PortRecordBatch":
+        batch = cls(subdomain)
+        batch.extend(rows)
+        return batch
@@ -0,0 +1,82 @@
+from .arguments import validate_nmap_arguments
+from .pipeline import PORT_SELECTION_FLAGS, group_hosts_by_ports
+
+# States where nmap could not tell whether the port is really open
+AMBIGUOUS_STATES = {"filtered", "open|filtered", "closed|filtered", "unfiltered"}
+# Service names that mean something answered, but not necessarily the host's own service
+AMBIGUOUS_SERVICES = {"tcpwrapped"}
+# Flags of PORT_SELECTION_FLAGS that consume the next token
+_VALUED_PORT_FLAGS = {"-p", "--top-ports"}
+
+
+def _pair(row) -> tuple:
+    return (row["IP"], row["Protocol"], int(row["Port"]))
+
+
+def ambiguous_pairs(*passes) -> dict:
+    """
+    Find the (host, port) pairs whose result cannot be trusted.
+
+    A pair is ambiguous when its latest state is filtered-like, when its service is
+    tcpwrapped, or when its state differs between the given passes.
+
+    :param passes: One or more iterables of result rows, oldest first.
+    :return: Mapping of host to a set of (protocol, port) pairs.
+    """
+    states = {}
+    latest = {}
+    for rows in passes:
+        for row in rows:
+            pair = _pair(row)
+            states.setdefault(pair, set()).add(row["State"])
+            latest[pair] = row
+
+    ambiguous = {}
+    for pair, row in latest.items():
+        if row["State"] in AMBIGUOUS_STATES or row.get("Name") in AMBIGUOUS_SERVICES or len(states[pair]) > 1:
+            host, protocol, port = pair
+            ambiguous.setdefault(host, set()).add((protocol, port))
+    return ambiguous
+
+
+def ambiguous_fraction(ambiguous: dict, row_count: int) -> float:
+    if row_count == 0:
+        return 0.0
+    return sum(len(ports) for ports in ambiguous.values()) / row_count
+
+
+def strip_port_selection(nmap_args: list[str]) -> list[str]:
+    """Validate the arguments and drop any port selection, which the planner supplies itself."""
+    tokens = validate_nmap_arguments(nmap_args)
+    stripped = []
+    skip = False
+    for token in tokens:
+        if skip:
+            skip = False
+        elif token in _VALUED_PORT_FLAGS:
+            skip = True
+        elif token not in PORT_SELECTION_FLAGS:
+            stripped.append(token)
+    return stripped
+
+
+def plan_rescan(ambiguous: dict, nmap_args: list[str], hosts_per_batch: int = 16) -> list[tuple[list[str], str]]:
+    """
+    Build the minimal nmap invocations that revisit only the ambiguous pairs.
+
+    Hosts needing the same ports share an invocation. A UDP scan type is added
+    when UDP pairs are involved, since nmap ignores U: ports otherwise.
+
+    :param ambiguous: Mapping of host to (protocol, port) pairs, see ambiguous_pairs.
+    :param nmap_args: Arguments of the rescan (e.g. ['-sS', '-T2']); port selection is replaced.
+    :param hosts_per_batch: Maximum number of hosts per invocation.
+    :return: List of (hosts, nmap arguments) pairs, one per invocation.
+    """
+    arguments = strip_port_selection(nmap_args)
+    plan = []
+    for hosts, port_spec in group_hosts_by_ports(ambiguous, hosts_per_batch):
+        invocation = list(arguments)
+        if "U:" in port_spec and "-sU" not in invocation:
+            invocation.append("-sU")
+        plan.append((hosts, " ".join(invocation + ["-p", port_spec])))
+    return plan
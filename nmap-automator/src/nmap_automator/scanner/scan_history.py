@@ -0,0 +1,70 @@
+import io
+import os
+import json
+import time
+import threading
+
+
+class ScanHistory:
+    """Append-only JSON Lines log of finished scans, used to calibrate the cost model."""
+
+    FILE_NAME = "scan_history.jsonl"
+
+    def __init__(self, save_dir: str):
+        self.path = os.path.join(save_dir, self.FILE_NAME)
+        self.__lock = threading.Lock()
+
+    def record(
+        self,
+        target: str,
+        arguments: str,
+        duration: float,
+        hosts_up: int,
+        port_count: int
+    ) -> None:
+        """
+        Append a finished scan to the history file.
+
+        :param target: Target that was scanned.
+        :param arguments: Nmap arguments used for the scan.
+        :param duration: Wall-clock duration of the scan in seconds.
+        :param hosts_up: Number of hosts that reported back.
+        :param port_count: Number of port rows produced by the scan.
+        """
+        entry = {
+            "timestamp": time.time(),
+            "target": target,
+            "arguments": arguments,
+            "duration": round(duration, 3),
+            "hosts_up": hosts_up,
+            "port_count": port_count
+        }
+        with self.__lock:
+            dirs = os.path.dirname(self.path)
+            if dirs:
+                os.makedirs(dirs, exist_ok=True)
+            with io.open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def load(self, limit: int = 1000) -> list[dict]:
+        """
+        Load the most recent history entries.
+
+        :param limit: Maximum number of entries to return (most recent last).
+        :return: List of history entries as dictionaries.
+        """
+        if not os.path.exists(self.path):
+            return []
+
+        entries = []
+        with io.open(self.path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A crash mid-write can leave a truncated last line behind
+                    continue
+        return entries[-limit:]
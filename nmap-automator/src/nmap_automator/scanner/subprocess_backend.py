@@ -0,0 +1,276 @@
+import os
+import re
+import time
+import signal
+import asyncio
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+
+from .records import PortRecordBatch
+from .arguments import validate_target
+
+PROGRESS_LINE = re.compile(
+    r"^(?P<phase>.+?) Timing: About (?P<percent>[\d.]+)% done(?:; ETC: \S+ \((?P<remaining>[\d:]+) remaining\))?"
+)
+STATS_LINE = re.compile(r"^Stats: (?P<elapsed>[\d:]+) elapsed; (?P<completed>\d+) hosts completed \((?P<up>\d+) up\)")
+
+
+class ScanInterrupted(Exception):
+    """Raised when an nmap run was stopped before it finished; the rows of completed hosts are kept."""
+
+
+class ScanCancelled(ScanInterrupted):
+    """Raised when an nmap run was cancelled through its ScanControl."""
+
+
+class ScanTimeout(ScanInterrupted):
+    """Raised when an nmap run exceeded the deadline of its ScanControl."""
+
+
+def _seconds(clock: str) -> int:
+    """Convert nmap's H:MM:SS durations to seconds."""
+    seconds = 0
+    for part in clock.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+@dataclass
+class NmapProgress:
+    phase: str = None
+    percent: float = 0.0
+    eta_seconds: int = None
+    elapsed_seconds: int = None
+    hosts_completed: int = 0
+    hosts_up: int = 0
+    updated_at: float = None
+
+    def update(self, line: str) -> bool:
+        """
+        Update the progress from a line of nmap's --stats-every output.
+
+        :param line: Line printed by nmap.
+        :return: True if the line was a progress line.
+        """
+        line = line.strip()
+        match = STATS_LINE.match(line)
+        if match:
+            self.elapsed_seconds = _seconds(match.group("elapsed"))
+            self.hosts_completed = int(match.group("completed"))
+            self.hosts_up = int(match.group("up"))
+            self.updated_at = time.time()
+            return True
+        match = PROGRESS_LINE.match(line)
+        if match:
+            self.phase = match.group("phase")
+            self.percent = float(match.group("percent"))
+            if match.group("remaining"):
+                self.eta_seconds = _seconds(match.group("remaining"))
+            self.updated_at = time.time()
+            return True
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "phase": self.phase,
+            "percent": self.percent,
+            "eta_seconds": self.eta_seconds,
+            "elapsed_seconds": self.elapsed_seconds,
+            "hosts_completed": self.hosts_completed,
+            "hosts_up": self.hosts_up,
+            "updated_at": self.updated_at
+        }
+
+
+class ScanControl:
+    """
+    Shared between a running scan and the code that supervises it.
+
+    The supervisor can cancel the scan or give it a deadline; the scan reports
+    the progress of the nmap process currently running.
+    """
+
+    def __init__(self, timeout: float = None):
+        self.progress = NmapProgress()
+        self.deadline = None
+        self.set_timeout(timeout)
+        self.stop_reason = None
+        self.__cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self.__cancelled.set()
+
+    def set_timeout(self, timeout: float) -> None:
+        """Start the hard deadline now, e.g. when a queued job actually starts running."""
+        self.deadline = time.monotonic() + timeout if timeout else None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__cancelled.is_set()
+
+    def remaining_seconds(self) -> float:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def check(self) -> None:
+        """Raise if the scan should stop now."""
+        if self.cancelled:
+            self.stop_reason = "cancelled"
+            raise ScanCancelled("Scan cancelled.")
+        remaining = self.remaining_seconds()
+        if remaining is not None and remaining <= 0:
+            self.stop_reason = "timeout"
+            raise ScanTimeout("Scan exceeded its time limit.")
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop_reason is not None
+
+
+def parse_nmap_xml(path: str, results: PortRecordBatch, up_hosts: list = None) -> int:
+    """
+    Append the ports of every host element in an nmap XML report.
+
+    The report of a killed nmap process ends in the middle of a host; hosts whose
+    element was closed are kept and the truncated tail is ignored.
+
+    :param path: Path of the -oX report.
+    :param results: Batch to append to.
+    :param up_hosts: List receiving the addresses of the hosts reported up.
+    :return: Number of hosts read.
+    """
+    hosts = 0
+    if not os.path.exists(path):
+        return hosts
+    try:
+        for _, element in ET.iterparse(path, events=("end",)):
+            if element.tag != "host":
+                continue
+            hosts += 1
+            address = next(
+                (a.get("addr") for a in element.findall("address") if a.get("addrtype") in ("ipv4", "ipv6")),
+                None
+            )
+            status = element.find("status")
+            if up_hosts is not None and status is not None and status.get("state") == "up":
+                up_hosts.append(address)
+            for port in element.iterfind("ports/port"):
+                state = port.find("state")
+                service = port.find("service")
+                service = service.attrib if service is not None else {}
+                results.append(
+                    address,
+                    port.get("protocol"),
+                    int(port.get("portid")),
+                    state.get("state") if state is not None else "",
+                    service.get("name", ""),
+                    service.get("product", ""),
+                    service.get("version", "")
+                )
+            element.clear()
+    except ET.ParseError:
+        pass
+    return hosts
+
+
+class SubprocessNmapBackend:
+    """
+    Runs nmap as an asyncio subprocess in its own process group.
+
+    Progress lines from --stats-every are parsed into the ScanControl while the
+    scan runs. Cancelling or hitting the deadline terminates the whole process
+    group (nmap's helper processes included) and keeps the hosts nmap finished.
+    """
+
+    def __init__(self, nmap_path: str = "nmap", stats_every: str = None, poll_interval: float = 0.2, kill_grace: float = 5.0):
+        self.nmap_path = nmap_path
+        self.stats_every = stats_every or os.getenv("NMAP_AUTOMATOR_STATS_EVERY", "5s")
+        self.poll_interval = poll_interval
+        self.kill_grace = kill_grace
+
+    def __terminate(self, process) -> None:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    async def __read_progress(self, process, control: ScanControl) -> None:
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                return
+            control.progress.update(line.decode(errors="replace"))
+
+    async def __run(self, target: str, arguments: str, xml_path: str, control: ScanControl) -> int:
+        process = await asyncio.create_subprocess_exec(
+            self.nmap_path, *arguments.split(), "--stats-every", self.stats_every, "-oX", xml_path, *target.split(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            start_new_session=True
+        )
+        reader = asyncio.ensure_future(self.__read_progress(process, control))
+        try:
+            while process.returncode is None:
+                try:
+                    control.check()
+                except ScanInterrupted:
+                    self.__terminate(process)
+                    try:
+                        await asyncio.wait_for(process.wait(), self.kill_grace)
+                    except asyncio.TimeoutError:
+                        try:
+                            os.killpg(process.pid, signal.SIGKILL)
+                        except ProcessLookupError:
+                            # The group exited in the meantime; the ScanInterrupted must still reach the caller
+                            pass
+                        await process.wait()
+                    raise
+                try:
+                    await asyncio.wait_for(process.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Helpers left in the group would keep stdout open and the reader waiting forever
+            self.__terminate(process)
+            try:
+                await asyncio.wait_for(reader, self.kill_grace)
+            except asyncio.TimeoutError:
+                pass
+        return process.returncode
+
+    def scan(
+        self,
+        target: str,
+        arguments: str,
+        results: PortRecordBatch,
+        control: ScanControl = None,
+        up_hosts: list = None
+    ) -> None:
+        """
+        Run nmap and append its rows to the batch.
+
+        :param target: Hosts or ranges, separated by spaces.
+        :param arguments: Nmap arguments.
+        :param results: Batch to append to; on cancel or timeout it receives the hosts nmap finished.
+        :param control: Cancellation, deadline and progress of the scan.
+        :param up_hosts: List receiving the addresses of the hosts reported up.
+        :raises ScanInterrupted: If the scan was cancelled or timed out.
+        :raises ValueError: If a target token starts with '-'.
+        :raises RuntimeError: If nmap exited with an error.
+        """
+        # Tokens are handed to nmap as they are, so a target must never read as an option
+        validate_target(target)
+        control = control or ScanControl()
+        control.progress = NmapProgress()
+        fd, xml_path = tempfile.mkstemp(prefix="nmap-", suffix=".xml")
+        os.close(fd)
+        try:
+            try:
+                returncode = asyncio.run(self.__run(target, arguments, xml_path, control))
+            finally:
+                parse_nmap_xml(xml_path, results, up_hosts)
+            if returncode != 0:
+                raise RuntimeError(f"nmap exited with status {returncode}")
+        finally:
+            os.remove(xml_path)
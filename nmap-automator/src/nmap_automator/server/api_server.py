@@ -1,33 +1,103 @@
 from flask import Flask, request, jsonify
 import os
+import csv
+import json
+import uuid
+import hashlib
 import datetime
 from dotenv import load_dotenv
-from nmap_automator.interpretors import InterpretorFactory
-from nmap_automator.scanner import NmapScanner
-from nmap_automator.config_loader import Config, NmapScanRequest, LLMInterpretRequest, ScannerConfig, InterpretorConfig, SubdomainRequest
-from nmap_automator.utils.api_utils import parse_request_data, read_results_from_csv
+from nmap_automator.interpretors import InterpretorFactory, FastPathClassifier, FastPathStats, merge_classifications, map_bounded, load_interpretor_class, ResilientInterpretor, AutoInterpretor, provider_health, router_stats, usage_ledger
+from nmap_automator.interpretors.per_host import group_rows_by_host, overall_classification
+from nmap_automator.scanner import NmapScanner, ScanHistory, ScanCostEstimator, ScanEstimate, ScanCheckpoint, ScanControl, ScanInterrupted, SCAN_PROFILES, resolve_suggestion
+from nmap_automator.scanner.records import RESULT_FIELDS
+from nmap_automator.config_loader import Config, NmapScanRequest, LLMInterpretRequest, ResumeScanRequest, RefineScanRequest, ScannerConfig, InterpretorConfig, SubdomainRequest, ResultQueryRequest, ResultAggregateRequest, ReportRequest, CveCorrelationRequest
+from nmap_automator.utils.api_utils import parse_request_data
+from nmap_automator.utils.ingest import iter_result_batches, iter_result_rows
+from nmap_automator.analysis import FeatureAccumulator, extract_features
+from nmap_automator.server.jobs import JobRegistry, AdmissionError
+from nmap_automator.server.refinement import RefinementLoop, RefinementBudget
+from nmap_automator.server.coalescing import SingleFlight, file_digest
+from nmap_automator.server.encoding import negotiated_response
+from nmap_automator.server.result_store import ResultStore, StaleCursorError
+from nmap_automator.report import ReportEngine, find_shards, find_verdicts
+from nmap_automator.vulns import VulnIndex
+from nmap_automator.subdomains import SubdomainEnumerator, parse_nameserver
 from pydantic import ValidationError
 
 api_server = Flask(__name__)
+job_registry = JobRegistry()
+fast_path_stats = FastPathStats()
+subdomain_enumerator = SubdomainEnumerator()
+result_store = ResultStore()
+report_engine = ReportEngine()
+# Rough report throughput, only used to plan report jobs in the scheduler
+REPORT_BYTES_PER_SECOND = 5 * 1024 * 1024
+# Identical concurrent requests share one nmap run / one LLM call; the TTLs optionally cache finished results
+scan_flights = SingleFlight(ttl=float(os.getenv("NMAP_AUTOMATOR_SCAN_CACHE_TTL", "0")))
+interpret_flights = SingleFlight(ttl=float(os.getenv("NMAP_AUTOMATOR_INTERPRET_CACHE_TTL", "0")))
+# Times a request scans again itself when the shared scan it waited for was stopped by its own request
+MAX_SHARED_SCAN_ATTEMPTS = 3
+# Opened on first use and reopened when the index file is rebuilt
+cve_index = None
 
 class Runner:
-    def __init__(self):
+    def __init__(self, job_id: str = None):
         load_dotenv()
+        # LLM usage and budgets are accounted per job; a plain request is a job of its own
+        self.job_id = job_id or uuid.uuid4().hex
+
+    def _api_key(self, interpretor_type: str) -> str:
+        if interpretor_type == "gpt":
+            return os.getenv("OPENAI_API_KEY")
+        elif interpretor_type == "gemini":
+            return os.getenv("GOOGLE_API_KEY")
+        return None
 
     def _create_interpretor(self, conf: InterpretorConfig):
-        api_key = None
-        if conf.interpretor_type == "gpt":
-            api_key = os.getenv("OPENAI_API_KEY")
-        elif conf.interpretor_type == "gemini":
-            api_key = os.getenv("GOOGLE_API_KEY")
-
-        interpretor = InterpretorFactory.create_interpretor(
-          conf.interpretor_type,
-          "Nmap Automator",
-          conf.model_flavor,
-          api_key=api_key
-        )
+        fallback = None
+        if conf.fallback_interpretor_type is not None:
+            fallback = InterpretorFactory.create_interpretor(
+              conf.fallback_interpretor_type,
+              "Nmap Automator",
+              conf.fallback_model_flavor,
+              api_key=self._api_key(conf.fallback_interpretor_type)
+            )
+
+        # Timeouts, retries and circuit breakers for the LLM calls; the secondary takes over when the primary fails
+        if conf.interpretor_type == "auto":
+            interpretor = AutoInterpretor(
+              "Nmap Automator",
+              conf.model_flavor,
+              create=lambda interpretor_type, model_flavor: ResilientInterpretor(
+                InterpretorFactory.create_interpretor(
+                  interpretor_type,
+                  "Nmap Automator",
+                  model_flavor,
+                  api_key=self._api_key(interpretor_type)
+                )
+              )
+            )
+        elif conf.interpretor_type == "local":
+            interpretor = InterpretorFactory.create_interpretor(
+              conf.interpretor_type,
+              "Nmap Automator",
+              conf.model_flavor,
+              api_key=self._api_key(conf.interpretor_type),
+              fallback=ResilientInterpretor(fallback) if fallback is not None else None
+            )
+        else:
+            interpretor = ResilientInterpretor(
+              InterpretorFactory.create_interpretor(
+                conf.interpretor_type,
+                "Nmap Automator",
+                conf.model_flavor,
+                api_key=self._api_key(conf.interpretor_type)
+              ),
+              fallback,
+              hedge=conf.hedge
+            )
         interpretor.configure()
+        interpretor.attach_meter(usage_ledger.meter(self.job_id, conf.token_budget, conf.cost_budget))
         return interpretor
     
     def create_save_dir(self, scanner_conf: ScannerConfig) -> str:
@@ -36,28 +106,110 @@ class Runner:
         os.makedirs(full_path, exist_ok=True)
         return full_path
 
-    def scan_with_nmap(self, scanner_conf: ScannerConfig, target: str, scan_dir: str) -> dict:
+    def _scan_key(self, scanner_conf: ScannerConfig, target: str) -> tuple:
+        # nmap_args are already validated into one token per item, so equal scans compare equal
+        return ("scan", target.strip().lower(), scanner_conf.strategy, tuple(scanner_conf.nmap_args))
+
+    def _record_shared_results(self, target: str, nmap_args: str, rows: list[dict], scan_dir: str, complete: bool) -> list[dict]:
+        """
+        Append rows produced by another request's scan to this request's results file, through its checkpoint.
+
+        The checkpoint's committed size moves past the rows, so later targets of the
+        scan do not cut them off, and a resume does not scan their hosts again.
+
+        :param complete: Whether the other scan finished; if not, only the hosts it reported are marked completed.
+        :return: The rows, recorded under this request's spelling of the target.
+        """
+        rows = [dict(row, Subdomain=target) for row in rows]
+        checkpoint = ScanCheckpoint(scan_dir)
+        hosts = checkpoint.start_target(target, nmap_args, resume=False)
+        if not complete:
+            reported = {row["IP"] for row in rows}
+            hosts = [host for host in hosts if host in reported]
+
+        results_file = os.path.join(scan_dir, "initial_scan_results.csv")
+        write_header = not os.path.exists(results_file) or os.path.getsize(results_file) == 0
+        with open(results_file, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            if write_header:
+                writer.writeheader()
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+            offset = f.tell()
+        checkpoint.mark_completed(target, hosts, offset)
+        return rows
+
+    def scan_with_nmap(self, scanner_conf: ScannerConfig, target: str, scan_dir: str, control: ScanControl = None) -> dict:
         """
         Perform an Nmap scan for a single target.
 
+        Concurrent requests for the same target and arguments attach to the scan
+        already running instead of starting another nmap process. A request waiting
+        on another one's scan still stops when it is cancelled or runs out of time,
+        and scans again itself if the one it waited for was stopped.
+
         :param scanner_conf: ScannerConfig object with nmap_args and save_dir.
         :param target: The specific target to scan (single IP or hostname).
+        :param control: Cancellation, deadline and progress of this request's scan.
         :return: Dictionary containing scan results and metadata.
         """
-        scanner = NmapScanner()
         nmap_args = " ".join(scanner_conf.nmap_args)
+        control = control or ScanControl()
+        key = self._scan_key(scanner_conf, target)
+
+        def run() -> dict:
+            scanner = NmapScanner(history=ScanHistory(scanner_conf.save_dir), control=control)
+            if scanner_conf.strategy == "two_phase":
+                print(f"Scanning target: {target} in two phases, deep scan args: {nmap_args}")
+                scan_results = scanner.scan_two_phase(
+                    target=target,
+                    save_dir=scan_dir,
+                    pipeline=scanner_conf.pipeline(),
+                    hosts_per_batch=scanner_conf.hosts_per_batch
+                )
+            else:
+                print(f"Scanning target: {target} with args: {nmap_args}")
+                scan_results = scanner.scan(
+                    target=target,
+                    arguments=nmap_args,
+                    save_dir=scan_dir,
+                    hosts_per_batch=scanner_conf.hosts_per_batch
+                )
+            return {"rows": scan_results.to_dicts(), "stop_reason": control.stop_reason}
 
         try:
-            print(f"Scanning target: {target} with args: {nmap_args}")
-            scan_results = scanner.scan(
-                target=target,
-                arguments=nmap_args,
-                save_dir=scan_dir
-            )
+            for attempt in range(1, MAX_SHARED_SCAN_ATTEMPTS + 1):
+                try:
+                    # Partial rows must not be served to later requests as a finished scan
+                    outcome, shared = scan_flights.do(
+                        key, run, check=control.check, cache_if=lambda outcome: outcome["stop_reason"] is None
+                    )
+                except ScanInterrupted as e:
+                    print(f"Stopped waiting for the shared scan of {target}: {e}")
+                    return {
+                        "target": target,
+                        "results": [],
+                        "nmap_args": scanner_conf.nmap_args,
+                        "shared": True,
+                        "stop_reason": control.stop_reason
+                    }
+                # The scan this request waited for was stopped by its own request: scan again unless out of attempts
+                if not shared or outcome["stop_reason"] is None or attempt == MAX_SHARED_SCAN_ATTEMPTS:
+                    break
+                print(f"The shared scan of {target} was stopped ({outcome['stop_reason']}), scanning again")
+
+            rows = outcome["rows"]
+            if shared:
+                print(f"Reusing the scan of {target} with args: {nmap_args} from a concurrent or recent request")
+                rows = self._record_shared_results(target, nmap_args, rows, scan_dir, complete=outcome["stop_reason"] is None)
             return {
                 "target": target,
-                "results": scan_results,
-                "nmap_args": scanner_conf.nmap_args
+                "results": rows,
+                "nmap_args": scanner_conf.nmap_args,
+                "shared": shared,
+                # Partial rows of a stopped shared scan carry the reason it stopped
+                "stop_reason": outcome["stop_reason"] if shared else control.stop_reason
             }
         except Exception as e:
             print(f"Error scanning target {target}: {e}")
@@ -66,21 +218,249 @@ class Runner:
                 "error": str(e),
                 "nmap_args": scanner_conf.nmap_args
             }
+
+    def scan_targets(self, scanner_conf: ScannerConfig, scan_dir: str, control: ScanControl = None) -> list[dict]:
+        """Scan every target of the configuration sequentially, stopping early if the scan is cancelled or times out."""
+        control = control or ScanControl()
+        all_results = []
+        for target in scanner_conf.target:
+            if control.stopped:
+                break
+            all_results.append(self.scan_with_nmap(scanner_conf=scanner_conf, target=target, scan_dir=scan_dir, control=control))
+        return all_results
+
+    def resume_scan(self, scan_dir: str, control: ScanControl = None) -> list[dict]:
+        """
+        Finish an interrupted scan, rescanning only the hosts its checkpoint does not mark completed.
+
+        :param scan_dir: Directory of the interrupted scan.
+        :param control: Cancellation, deadline and progress of the scan.
+        :return: List of per-target result dictionaries, including rows recovered from disk.
+        """
+        checkpoint = ScanCheckpoint(scan_dir)
+        scanner = NmapScanner(history=ScanHistory(os.path.dirname(os.path.normpath(scan_dir))), control=control)
+        all_results = []
+        for target, pending in checkpoint.pending_targets().items():
+            if scanner.control.stopped:
+                break
+            arguments = pending["arguments"]
+            try:
+                print(f"Resuming target: {target} with args: {arguments}")
+                scan_results = scanner.scan(target=target, arguments=arguments, save_dir=scan_dir, resume=True)
+                all_results.append({"target": target, "results": scan_results.to_dicts(), "nmap_args": arguments.split()})
+            except Exception as e:
+                print(f"Error resuming target {target}: {e}")
+                all_results.append({"target": target, "error": str(e), "nmap_args": arguments.split()})
+        return all_results
+
+    def estimate_scan(self, scanner_conf: ScannerConfig):
+        """
+        Predict the duration of a scan from the history recorded under its save_dir.
+
+        :param scanner_conf: ScannerConfig object with nmap_args, save_dir and targets.
+        :return: ScanEstimate for the whole target list.
+        """
+        estimator = ScanCostEstimator(ScanHistory(scanner_conf.save_dir))
+        estimator.calibrate()
+        if scanner_conf.strategy == "two_phase":
+            return scanner_conf.pipeline().estimate(scanner_conf.target, estimator)
+        return estimator.estimate(scanner_conf.target, scanner_conf.nmap_args)
     
-    def run_llm_interpretation(self, interpreter_conf: InterpretorConfig, results: list[dict], save_dir: str) -> list[dict]:
-        interpretor = self._create_interpretor(interpreter_conf)
-        print("Interpreting with", interpreter_conf.interpretor_type, " via ", interpreter_conf.model_flavor)
-        runner_type = interpreter_conf.interpret_runner
-        if runner_type == "normal":
-            res = interpretor.interpret(results, save_dir)
+    def _fast_path_verdict(self, interpreter_conf: InterpretorConfig, features, save_dir: str) -> dict:
+        fast_path = FastPathClassifier()
+        verdict = fast_path.classify_features(features, interpreter_conf.interpret_runner)
+        fast_path_stats.record(verdict)
+        if verdict is not None:
+            print(f"Fast path classified results as {verdict['result']} (confidence {verdict['confidence']})")
+            fast_path.save_results(verdict, save_dir)
+        return verdict
+
+    def _interpret_per_host(self, interpretor, results: list[dict], save_dir: str, fast_path: bool) -> dict:
+        """Per-host interpretation where the fast path answers the clear-cut hosts first."""
+        if not fast_path:
+            return interpretor.interpret_per_host(results, save_dir)
+
+        classifier = FastPathClassifier()
+        fast_verdicts, escalated = {}, []
+        for host, rows in group_rows_by_host(results).items():
+            verdict = classifier.classify(rows)
+            fast_path_stats.record(verdict)
+            if verdict is None:
+                escalated.extend(rows)
+            else:
+                fast_verdicts[host] = {
+                    "classification": verdict["result"],
+                    "analysis_description": verdict["analysis_description"],
+                    "source": "fast_path"
+                }
+
+        if not escalated:
+            classifications = {
+                "error": None, "result": None, "analysis_description": None, "next_arguments": None,
+                "hosts": {}, "failed_hosts": [], "calls": 0
+            }
+        else:
+            classifications = interpretor.interpret_per_host(escalated, save_dir)
+        classifications["hosts"].update(fast_verdicts)
+        classifications["result"] = overall_classification(classifications["hosts"])
+        if classifications["hosts"]:
+            classifications["error"] = None
+        print(f"Per-host interpretation: {len(fast_verdicts)} host(s) answered by the fast path")
+        return classifications
+
+    def _budget_fallback(self, runner_type: str, results: list[dict], classifications: dict, save_dir: str) -> dict:
+        """Answer with the heuristic rules, whatever their confidence, what the budget no longer let the LLM answer."""
+        if not classifications.get("budget_exhausted"):
+            return classifications
+        rules = FastPathClassifier(threshold=0.0)
+        if runner_type == "per_host":
+            rows_by_host = group_rows_by_host(results)
+            for host in classifications["failed_hosts"]:
+                verdict = rules.classify(rows_by_host.get(host, []))
+                classifications["hosts"][host] = {
+                    "classification": verdict["result"],
+                    "analysis_description": verdict["analysis_description"],
+                    "source": "fast_path"
+                }
+            print(f"Budget exhausted: {len(classifications['failed_hosts'])} host(s) classified by the heuristic rules")
+            classifications["failed_hosts"] = []
+            classifications["result"] = overall_classification(classifications["hosts"])
+            classifications["error"] = None
+            return classifications
+
+        verdict = rules.classify(results, runner_type)
+        verdict["budget_exhausted"] = True
+        print(f"Budget exhausted: heuristic rules classified results as {verdict['result']} (confidence {verdict['confidence']})")
+        rules.save_results(verdict, save_dir)
+        return verdict
+
+    def _interpret_chunk(self, interpretor, runner_type: str, results: list[dict], save_dir: str, fast_path: bool = False) -> dict:
+        if runner_type == "per_host":
+            classifications = self._interpret_per_host(interpretor, results, save_dir, fast_path)
+        elif runner_type == "normal":
+            classifications = interpretor.interpret(results, save_dir)
         elif runner_type == "restricted":
-            res = interpretor.interpret_restricted(results, save_dir)
+            classifications = interpretor.interpret_restricted(results, save_dir)
         elif runner_type == "suggest":
-            res = interpretor.interpret_with_suggestions(results, save_dir)
+            # Only vetted argument plans leave the server, whatever the model proposed
+            return resolve_suggestion(self._budget_fallback(
+                runner_type, results, interpretor.interpret_with_suggestions(results, save_dir), save_dir
+            ))
         else:
             raise Exception(f"Invalid interpret_runner: {runner_type}")
-        
-        return res
+        return self._budget_fallback(runner_type, results, classifications, save_dir)
+
+    def _interpret_key(self, interpreter_conf: InterpretorConfig, scan_hash: str) -> tuple:
+        return ("interpret", scan_hash, interpreter_conf.model_dump_json())
+
+    def _save_shared_verdict(self, interpreter_conf: InterpretorConfig, classifications: dict, source_dir: str, save_dir: str) -> None:
+        """Write an interpretation shared from another request into this request's scan directory, where the reports and training data look for it."""
+        if source_dir == save_dir:
+            return
+        verdict = dict(classifications, shared_from=source_dir)
+        if classifications.get("source") == "fast_path" and "hosts" not in classifications:
+            file_name = FastPathClassifier.RESULTS_FILE
+        elif classifications.get("source") == "local_model" or interpreter_conf.interpretor_type == "local":
+            # Merged chunk verdicts carry no source; the local model's answers must never become training labels
+            file_name = load_interpretor_class("local").RESULTS_FILE
+        elif interpreter_conf.interpret_runner == "per_host":
+            file_name = "Nmap Automator_per_host_results.json"
+        else:
+            file_name = "Nmap Automator_results.json"
+        os.makedirs(save_dir, exist_ok=True)
+        with open(os.path.join(save_dir, file_name), "w") as f:
+            f.write(json.dumps(verdict, indent=4))
+
+    def _coalesced_interpretation(self, interpreter_conf: InterpretorConfig, scan_hash: str, save_dir: str, fn) -> dict:
+        """Run an interpretation once for all concurrent requests on the same scan with the same configuration."""
+        outcome, shared = interpret_flights.do(
+            self._interpret_key(interpreter_conf, scan_hash), lambda: {"classifications": fn(), "save_dir": save_dir}
+        )
+        classifications = outcome["classifications"]
+        if shared:
+            print("Reusing the interpretation of a concurrent or recent request on the same scan")
+            self._save_shared_verdict(interpreter_conf, classifications, outcome["save_dir"], save_dir)
+            classifications = dict(classifications, shared=True)
+        return classifications
+
+    def run_llm_interpretation(self, interpreter_conf: InterpretorConfig, results: list[dict], save_dir: str) -> list[dict]:
+        scan_hash = hashlib.sha256(json.dumps(results, sort_keys=True, default=str).encode()).hexdigest()
+        return self._coalesced_interpretation(
+            interpreter_conf, scan_hash, save_dir, lambda: self._run_llm_interpretation(interpreter_conf, results, save_dir)
+        )
+
+    def _run_llm_interpretation(self, interpreter_conf: InterpretorConfig, results: list[dict], save_dir: str) -> list[dict]:
+        per_host = interpreter_conf.interpret_runner == "per_host"
+        if interpreter_conf.fast_path and not per_host:
+            verdict = self._fast_path_verdict(interpreter_conf, extract_features(results), save_dir)
+            if verdict is not None:
+                return verdict
+
+        interpretor = self._create_interpretor(interpreter_conf)
+        print("Interpreting with", interpreter_conf.interpretor_type, " via ", interpreter_conf.model_flavor)
+        return self._interpret_chunk(
+            interpretor, interpreter_conf.interpret_runner, results, save_dir, interpreter_conf.fast_path
+        )
+
+    def run_streamed_interpretation(
+        self,
+        interpreter_conf: InterpretorConfig,
+        scan_file_path: str,
+        save_dir: str,
+        chunk_rows: int = None
+    ) -> dict:
+        """
+        Interpret a scan file of any size while holding at most one chunk of rows in memory.
+
+        The fast path runs over features accumulated in a first streaming pass; if it
+        has to escalate, a second pass feeds the file chunk by chunk to the interpretor
+        and the per-chunk verdicts are merged. Concurrent requests on a file with the
+        same contents and the same configuration share one interpretation.
+
+        :param interpreter_conf: InterpretorConfig object.
+        :param scan_file_path: Path to a CSV or NDJSON scan file.
+        :param save_dir: Directory to save the interpretation results.
+        :param chunk_rows: Rows per interpretor call.
+        :return: Merged classification dictionary.
+        """
+        return self._coalesced_interpretation(
+            interpreter_conf,
+            file_digest(scan_file_path),
+            save_dir,
+            lambda: self._run_streamed_interpretation(interpreter_conf, scan_file_path, save_dir, chunk_rows)
+        )
+
+    def _run_streamed_interpretation(
+        self,
+        interpreter_conf: InterpretorConfig,
+        scan_file_path: str,
+        save_dir: str,
+        chunk_rows: int = None
+    ) -> dict:
+        chunk_rows = chunk_rows or int(os.getenv("NMAP_AUTOMATOR_INTERPRET_CHUNK_ROWS", "2000"))
+
+        # Per-host verdicts need every host classified, so the whole-scan fast path is applied per host instead
+        if interpreter_conf.fast_path and interpreter_conf.interpret_runner != "per_host":
+            accumulator = FeatureAccumulator()
+            for batch in iter_result_batches(scan_file_path):
+                accumulator.update(batch)
+            verdict = self._fast_path_verdict(interpreter_conf, accumulator.features(), save_dir)
+            if verdict is not None:
+                return verdict
+
+        interpretor = self._create_interpretor(interpreter_conf)
+        print("Interpreting with", interpreter_conf.interpretor_type, " via ", interpreter_conf.model_flavor)
+        # Chunks are interpreted concurrently when the provider can serve parallel requests
+        merged = merge_classifications(map_bounded(
+            lambda batch: self._interpret_chunk(interpretor, interpreter_conf.interpret_runner, batch, save_dir, interpreter_conf.fast_path),
+            iter_result_batches(scan_file_path, batch_rows=chunk_rows),
+            interpretor.max_concurrency
+        ))
+        if merged["chunks"] == 0:
+            # Empty file with the fast path disabled: still give the interpretor a chance to answer
+            return self._interpret_chunk(interpretor, interpreter_conf.interpret_runner, [], save_dir)
+        interpretor.save_results(merged, save_dir)
+        return merged
 
     def process_scan(self, conf: Config):
         save_dir = self.create_save_dir(conf.scanner)
@@ -97,10 +477,10 @@ def scan():
     try:
         runner = Runner()
         interpreted_results, raw_results = runner.process_scan(conf)
-        return jsonify({
+        return negotiated_response({
             "raw_results": raw_results,
             "interpreted_results": interpreted_results,
-        })
+        }, request)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -121,24 +501,179 @@ def nmap_scan():
         scan_dir = runner.create_save_dir(scanner_conf=scanner_config)
 
         # Run the scan for all targets
-        all_results = []
-        for target in scanner_config.target:
-            scan_result = runner.scan_with_nmap(scanner_conf=scanner_config, target=target, scan_dir=scan_dir)
-            all_results.append(scan_result)
+        all_results = runner.scan_targets(scanner_conf=scanner_config, scan_dir=scan_dir)
 
-        return jsonify({
+        return negotiated_response({
             "data": all_results,
             "scan_file_path": os.path.join(scan_dir, "initial_scan_results.csv"),
             "scan_dir_path": scan_dir
-        })
+        }, request)
     except ValidationError as e:
         print(f"Validation Error: {e}")
-        return jsonify({"error": e.errors()}), 400
+        return jsonify({"error": e.errors(include_context=False)}), 400
     except Exception as e:
         print(f"Unhandled Exception: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+def estimate_scan():
+    """Predict how long an Nmap scan would take without running it."""
+    try:
+        data = request.get_json()
+        request_model = NmapScanRequest(**data)
+        estimate = Runner().estimate_scan(request_model.scanner)
+
+        try:
+            job_registry.check_admission(estimate)
+            admissible, reason = True, None
+        except AdmissionError as e:
+            admissible, reason = False, str(e)
+
+        return jsonify({
+            "estimate": estimate.to_dict(),
+            "admissible": admissible,
+            "reason": reason
+        })
+    except ValidationError as e:
+        return jsonify({"error": e.errors(include_context=False)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def nmap_scan_job():
+    """Submit an Nmap scan as a background job and return its id immediately."""
+    try:
+        data = request.get_json()
+        request_model = NmapScanRequest(**data)
+        scanner_config = request_model.scanner
+
+        runner = Runner()
+        estimate = runner.estimate_scan(scanner_config)
+        scan_dir = runner.create_save_dir(scanner_conf=scanner_config)
+
+        def work(job):
+            return {
+                "data": runner.scan_targets(scanner_conf=scanner_config, scan_dir=scan_dir, control=job.control),
+                "scan_file_path": os.path.join(scan_dir, "initial_scan_results.csv"),
+                "scan_dir_path": scan_dir
+            }
+
+        job = job_registry.submit(
+            scanner_config.target, scanner_config.nmap_args, estimate, work, timeout_seconds=request_model.timeout_seconds
+        )
+        return jsonify(job.to_dict()), 202
+    except ValidationError as e:
+        return jsonify({"error": e.errors(include_context=False)}), 400
+    except AdmissionError as e:
+        return jsonify({"error": str(e)}), 429
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def resume_scan():
+    """Resume an interrupted scan from its checkpoint as a background job."""
+    try:
+        data = request.get_json()
+        request_model = ResumeScanRequest(**data)
+        scan_dir = request_model.scan_dir_path
+        if not ScanCheckpoint.exists(scan_dir):
+            return jsonify({"error": f"No checkpoint found in {scan_dir}"}), 404
+
+        pending = ScanCheckpoint(scan_dir).pending_targets()
+        if not pending:
+            return jsonify({"message": "Scan already complete.", "scan_dir_path": scan_dir})
+
+        # Only the unfinished hosts are rescanned, so only they are charged to the scheduler
+        estimator = ScanCostEstimator(ScanHistory(os.path.dirname(os.path.normpath(scan_dir))))
+        estimator.calibrate()
+        remaining_hosts = [host for entry in pending.values() for host in entry["remaining_hosts"]]
+        nmap_args = next(iter(pending.values()))["arguments"].split()
+        estimate = estimator.estimate(remaining_hosts, nmap_args)
+
+        runner = Runner()
+
+        def work(job):
+            return {
+                "data": runner.resume_scan(scan_dir, control=job.control),
+                "scan_file_path": os.path.join(scan_dir, "initial_scan_results.csv"),
+                "scan_dir_path": scan_dir
+            }
+
+        job = job_registry.submit(list(pending.keys()), nmap_args, estimate, work)
+        return jsonify(job.to_dict()), 202
+    except ValidationError as e:
+        return jsonify({"error": e.errors(include_context=False)}), 400
+    except AdmissionError as e:
+        return jsonify({"error": str(e)}), 429
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def refine_scan():
+    """Run the bounded interpret-then-rescan loop on a finished scan as a background job."""
+    try:
+        data = request.get_json()
+        request_model = RefineScanRequest(**data)
+        budget = RefinementBudget(
+            max_iterations=request_model.max_iterations,
+            max_seconds=request_model.max_seconds,
+            max_tokens=request_model.max_tokens
+        )
+        runner = Runner()
+        loop = RefinementLoop(runner, request_model.interpretor, request_model.scan_dir_path, budget)
+
+        # The time budget is the worst case the scheduler has to plan for
+        estimate = ScanEstimate(
+            seconds=budget.max_seconds,
+            low_seconds=0.0,
+            high_seconds=budget.max_seconds,
+            host_count=0,
+            port_count=0,
+            calibration_samples=0
+        )
+
+        def work(job):
+            # The LLM calls of the loop are accounted to the job
+            runner.job_id = job.job_id
+            result = loop.run(request_model.scan_file_path, control=job.control)
+            result["scan_dir_path"] = request_model.scan_dir_path
+            result["usage"] = usage_ledger.job(job.job_id)
+            return result
+
+        job = job_registry.submit([request_model.scan_file_path], [], estimate, work)
+        return jsonify(job.to_dict()), 202
+    except ValidationError as e:
+        return jsonify({"error": e.errors(include_context=False)}), 400
+    except AdmissionError as e:
+        return jsonify({"error": str(e)}), 429
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def scan_profiles():
+    """List the scan profiles with their argument plans and calibrated per-host cost."""
+    try:
+        save_dir = request.args.get("save_dir", "./results")
+        estimator = ScanCostEstimator(ScanHistory(save_dir))
+        estimator.calibrate()
+        return jsonify({"profiles": [profile.to_dict(estimator) for profile in SCAN_PROFILES.values()]})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def get_job(job_id: str):
+    """Report the status, live ETA and (once finished) the results of a scan job."""
+    job = job_registry.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return negotiated_response(job.to_dict(), request)
+
+
+def cancel_job(job_id: str):
+    """Cancel a queued or running scan job; a running nmap process group is terminated and its partial results kept."""
+    job = job_registry.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    if job.status not in ("queued", "running"):
+        return jsonify({"error": f"Job {job_id} is already {job.status}."}), 409
+    job_registry.cancel(job_id)
+    return jsonify(job.to_dict())
+
 
 def llm_interpret():
     """Run only the LLM interpretation on provided scan results."""
@@ -149,61 +684,197 @@ def llm_interpret():
         # Validate and extract configurations
         # conf = Config(scanner=request_model.scanner, interpretor=request_model.interpretor)
         conf = request_model.interpretor
-        raw_results = read_results_from_csv(request_model.scan_file_path)
 
         runner = Runner()
-        interpreted_results = runner.run_llm_interpretation(conf, raw_results, request_model.scan_dir_path)
-        return jsonify({
+        interpreted_results = runner.run_streamed_interpretation(
+            conf, request_model.scan_file_path, request_model.scan_dir_path
+        )
+        return negotiated_response({
             "interpreted_results": interpreted_results,
-        })
+            "usage": usage_ledger.job(runner.job_id)
+        }, request)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+def interpret_stats():
+    """Report how many interpretation calls the fast path answered without an LLM, and the health of each LLM provider."""
+    return jsonify(dict(fast_path_stats.to_dict(), providers=provider_health.to_dict(), router=router_stats.to_dict()))
+
+def llm_usage():
+    """Report the LLM token usage and cost per day and model flavor, with the daily budgets."""
+    return jsonify(usage_ledger.to_dict())
+
+def llm_usage_job(job_id: str):
+    """Report the LLM token usage, cost and budget downgrades of one job."""
+    usage = usage_ledger.job(job_id)
+    if usage is None:
+        return jsonify({"error": f"No LLM usage recorded for job {job_id}"}), 404
+    return jsonify(usage)
+
+def coalescing_stats():
+    """Report how many scan and interpretation requests shared another request's execution."""
+    return jsonify({"scan": scan_flights.to_dict(), "interpret": interpret_flights.to_dict()})
+
 def enumerate_subdomains():
-    """Dummy function to return hardcoded subdomains for megacorpone.com."""
+    """Enumerate the subdomains of a domain with the requested sources."""
     try:
         data = request.get_json()
         request_model = SubdomainRequest(**data)  # Validate request with Pydantic
 
-        if request_model.domain != "megacorpone.com":
-            return jsonify({"error": "This function only supports megacorpone.com."}), 400
-
-        # Hardcoded list of subdomains for megacorpone.com
-        # tried using sublist3r -> kouuusa
-        subdomains = [
-            "www.megacorpone.com",
-            "admin.megacorpone.com",
-            "mail.megacorpone.com",
-            "vpn.megacorpone.com",
-            "test.megacorpone.com",
-            "beta.megacorpone.com",
-            "fs1.megacorpone.com",
-            "intranet.megacorpone.com",
-            "mail2.megacorpone.com",
-            "ns1.megacorpone.com",
-            "ns2.megacorpone.com",
-            "ns3.megacorpone.com",
-            "router.megacorpone.com",
-            "siem.megacorpone.com",
-            "snmp.megacorpone.com",
-            "support.megacorpone.com",
-            "syslog.megacorpone.com",
-            "test.megacorpone.com",
-        ]
-
-        return jsonify({"domain": request_model.domain, "subdomains": subdomains})
+        nameserver = parse_nameserver(request_model.resolver) if request_model.resolver else None
+        result = subdomain_enumerator.enumerate(request_model.domain, request_model.engines, nameserver)
+        return jsonify(result)
     except ValidationError as e:
-        return jsonify({"error": e.errors()}), 400
+        return jsonify({"error": e.errors(include_context=False)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    
 
 
+def query_results():
+    """Return one page of the stored scan rows matching the filters, in the requested order."""
+    try:
+        request_model = ResultQueryRequest(**request.get_json())
+        page = result_store.query(
+            request_model.scan_file_path,
+            request_model.filters.model_dump(),
+            sort_by=request_model.sort_by,
+            descending=request_model.descending,
+            limit=request_model.limit,
+            cursor=request_model.cursor
+        )
+        return negotiated_response(page, request)
+    except ValidationError as e:
+        return jsonify({"error": e.errors(include_context=False)}), 400
+    except StaleCursorError as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def aggregate_results():
+    """Return one page of per-host or per-value counts over the stored scan rows matching the filters."""
+    try:
+        request_model = ResultAggregateRequest(**request.get_json())
+        page = result_store.aggregate(
+            request_model.scan_file_path,
+            request_model.filters.model_dump(),
+            request_model.aggregate,
+            state=request_model.state,
+            limit=request_model.limit,
+            cursor=request_model.cursor
+        )
+        return negotiated_response(page, request)
+    except ValidationError as e:
+        return jsonify({"error": e.errors(include_context=False)}), 400
+    except StaleCursorError as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def generate_report():
+    """Write the CSV, JSON Lines and HTML reports of a scan directory as a background job."""
+    try:
+        request_model = ReportRequest(**request.get_json())
+        scan_dir = request_model.scan_dir_path
+        shards = find_shards(scan_dir)
+        if not shards:
+            return jsonify({"error": f"No scan results found in {scan_dir}"}), 404
+
+        seconds = sum(os.path.getsize(shard) for shard in shards) / REPORT_BYTES_PER_SECOND
+        estimate = ScanEstimate(
+            seconds=seconds,
+            low_seconds=seconds / 2,
+            high_seconds=seconds * 2,
+            host_count=0,
+            port_count=0,
+            calibration_samples=0
+        )
+
+        def work(job):
+            result = report_engine.generate(
+                shards,
+                os.path.join(scan_dir, "report"),
+                formats=request_model.formats,
+                title=request_model.title or f"Nmap scan report - {os.path.basename(os.path.normpath(scan_dir))}",
+                verdicts=find_verdicts(scan_dir)
+            )
+            result["scan_dir_path"] = scan_dir
+            return result
+
+        job = job_registry.submit(shards, [], estimate, work)
+        return jsonify(job.to_dict()), 202
+    except ValidationError as e:
+        return jsonify({"error": e.errors(include_context=False)}), 400
+    except AdmissionError as e:
+        return jsonify({"error": str(e)}), 429
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def get_cve_index() -> VulnIndex:
+    global cve_index
+    path = os.getenv("NMAP_AUTOMATOR_CVE_INDEX", "./cve_index.sqlite")
+    if cve_index is None or cve_index.index_path != path or not os.path.exists(path) \
+            or (os.stat(path).st_mtime_ns, os.stat(path).st_size) != cve_index.signature:
+        cve_index = VulnIndex(path)
+    return cve_index
+
+def correlate_cves():
+    """Match the services of a stored scan against the offline CVE index."""
+    try:
+        request_model = CveCorrelationRequest(**request.get_json())
+        if not os.path.exists(request_model.scan_file_path):
+            return jsonify({"error": f"File not found: {request_model.scan_file_path}"}), 404
+        result = get_cve_index().correlate(
+            iter_result_rows(request_model.scan_file_path),
+            state=request_model.state,
+            min_score=request_model.min_score,
+            limit=request_model.limit
+        )
+        result["scan_file_path"] = request_model.scan_file_path
+        return negotiated_response(result, request)
+    except ValidationError as e:
+        return jsonify({"error": e.errors(include_context=False)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 503
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def preload_ollama_models() -> None:
+    """Load the models of NMAP_AUTOMATOR_OLLAMA_PRELOAD (comma-separated model flavors) in the background."""
+    flavors = [flavor.strip() for flavor in os.getenv("NMAP_AUTOMATOR_OLLAMA_PRELOAD", "").split(",") if flavor.strip()]
+    if not flavors:
+        return
+    interpretor_class = load_interpretor_class("ollama")
+    for flavor in flavors:
+        interpretor_class("Nmap Automator", flavor).configure()
+
 
 def create_api_server() -> Flask:
+    preload_ollama_models()
     api_server = Flask(__name__)
     api_server.add_url_rule('/scan', 'scan', scan, methods=['POST'])
     api_server.add_url_rule('/nmap_scan', 'nmap_scan', nmap_scan, methods=['POST'])
+    api_server.add_url_rule('/estimate_scan', 'estimate_scan', estimate_scan, methods=['POST'])
+    api_server.add_url_rule('/nmap_scan_job', 'nmap_scan_job', nmap_scan_job, methods=['POST'])
+    api_server.add_url_rule('/resume_scan', 'resume_scan', resume_scan, methods=['POST'])
+    api_server.add_url_rule('/refine_scan', 'refine_scan', refine_scan, methods=['POST'])
+    api_server.add_url_rule('/scan_profiles', 'scan_profiles', scan_profiles, methods=['GET'])
+    api_server.add_url_rule('/jobs/<job_id>', 'get_job', get_job, methods=['GET'])
+    api_server.add_url_rule('/jobs/<job_id>/cancel', 'cancel_job', cancel_job, methods=['POST'])
     api_server.add_url_rule('/llm_interpret', 'llm_interpret', llm_interpret, methods=['POST'])
+    api_server.add_url_rule('/interpret_stats', 'interpret_stats', interpret_stats, methods=['GET'])
+    api_server.add_url_rule('/llm_usage', 'llm_usage', llm_usage, methods=['GET'])
+    api_server.add_url_rule('/llm_usage/<job_id>', 'llm_usage_job', llm_usage_job, methods=['GET'])
+    api_server.add_url_rule('/coalescing_stats', 'coalescing_stats', coalescing_stats, methods=['GET'])
     api_server.add_url_rule('/enumerate_subdomains', 'enumerate_subdomains', enumerate_subdomains, methods=['POST'])
+    api_server.add_url_rule('/query_results', 'query_results', query_results, methods=['POST'])
+    api_server.add_url_rule('/aggregate_results', 'aggregate_results', aggregate_results, methods=['POST'])
+    api_server.add_url_rule('/generate_report', 'generate_report', generate_report, methods=['POST'])
+    api_server.add_url_rule('/correlate_cves', 'correlate_cves', correlate_cves, methods=['POST'])
     return api_server
\ No newline at end of file
@@ -0,0 +1,127 @@
+import time
+import hashlib
+import threading
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent executions of the same work.
+
+    The first caller for a key runs the function; callers arriving with the same
+    key while it is in flight wait for it and receive the same result (or the same
+    exception). With a positive `ttl`, successful results are also kept for that
+    many seconds and handed to later callers without running the function again.
+    A waiter can stop waiting on its own (cancelled, out of time) without
+    affecting the execution the others are waiting for.
+    """
+
+    def __init__(self, ttl: float = 0.0, max_entries: int = 256, poll_interval: float = 0.2):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.poll_interval = poll_interval
+        self.__lock = threading.Lock()
+        self.__flights = {}
+        self.__cache = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def __cached(self, key, now: float):
+        entry = self.__cache.get(key)
+        if entry is None:
+            return None
+        expires, result = entry
+        if expires <= now:
+            del self.__cache[key]
+            return None
+        return entry
+
+    def __store(self, key, result, now: float) -> None:
+        if self.ttl <= 0:
+            return
+        if len(self.__cache) >= self.max_entries:
+            # Drop expired entries first, then the ones closest to expiry
+            for stale in [k for k, (expires, _) in self.__cache.items() if expires <= now]:
+                del self.__cache[stale]
+            while len(self.__cache) >= self.max_entries:
+                del self.__cache[min(self.__cache, key=lambda k: self.__cache[k][0])]
+        self.__cache[key] = (now + self.ttl, result)
+
+    def do(self, key, fn, check=None, cache_if=None) -> tuple[object, bool]:
+        """
+        Run `fn` once for all concurrent callers of `key`.
+
+        :param key: Hashable identity of the work.
+        :param fn: Callable without arguments doing the work.
+        :param check: Callable polled while waiting for another caller's execution; whatever it raises ends the wait.
+        :param cache_if: Predicate on the result; results it rejects (e.g. partial ones) are not cached.
+        :return: Tuple of (result, shared), where shared is True when the result came from another caller's execution or the cache.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            entry = self.__cached(key, now)
+            if entry is not None:
+                self.cache_hits += 1
+                return entry[1], True
+
+            flight = self.__flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.__flights[key] = _Flight()
+                self.executions += 1
+            else:
+                flight.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            while not flight.done.wait(self.poll_interval if check is not None else None):
+                check()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.__lock:
+                del self.__flights[key]
+                if flight.error is None and (cache_if is None or cache_if(flight.result)):
+                    self.__store(key, flight.result, time.monotonic())
+            flight.done.set()
+        return flight.result, False
+
+    def forget(self, key) -> None:
+        """Drop the cached result of a key, e.g. after the underlying data changed."""
+        with self.__lock:
+            self.__cache.pop(key, None)
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "cache_hits": self.cache_hits,
+                "in_flight": len(self.__flights),
+                "cached": len(self.__cache),
+                "ttl_seconds": self.ttl
+            }
+
+
+def file_digest(path: str, chunk_bytes: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in chunks so large scans are never loaded whole."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,231 @@
+import io
+import gzip
+import json
+from importlib.util import find_spec
+
+from flask import Response
+
+from nmap_automator.scanner.records import RESULT_FIELDS
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+MEDIA_TYPES = {
+    JSON: JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    ARROW: ARROW,
+}
+# Responses smaller than this are not worth the compression overhead
+MIN_COMPRESS_BYTES = 1024
+TARGET_COLUMN = "_target"
+PAYLOAD_METADATA_KEY = b"payload"
+
+
+def available_formats() -> list[str]:
+    """Media types this server can produce; the binary ones need their optional packages."""
+    formats = [JSON]
+    if find_spec("msgpack") is not None:
+        formats.append(MSGPACK)
+    if find_spec("pyarrow") is not None:
+        formats.append(ARROW)
+    return formats
+
+
+def available_encodings() -> list[str]:
+    encodings = ["gzip"]
+    if find_spec("zstandard") is not None:
+        encodings.insert(0, "zstd")
+    return encodings
+
+
+def _parse_header(header: str) -> list[tuple[str, float]]:
+    """Split an Accept or Accept-Encoding header into (value, q) pairs, highest preference first."""
+    values = []
+    for position, item in enumerate((header or "").split(",")):
+        parts = [part.strip() for part in item.split(";")]
+        if not parts[0]:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        values.append((parts[0].lower(), q, position))
+    values.sort(key=lambda value: (-value[1], value[2]))
+    return [(value, q) for value, q, _ in values if q > 0]
+
+
+def negotiate_format(accept: str, tabular: bool = True) -> str:
+    """
+    Pick the response media type from the Accept header.
+
+    :param accept: Accept header of the request.
+    :param tabular: Whether the payload has scan rows; Arrow can only encode those.
+    :return: One of JSON, MSGPACK or ARROW; JSON when nothing else matches.
+    """
+    formats = available_formats()
+    if not tabular and ARROW in formats:
+        formats.remove(ARROW)
+    for value, _ in _parse_header(accept):
+        media_type = MEDIA_TYPES.get(value)
+        if media_type in formats:
+            return media_type
+        if value in ("*/*", "application/*"):
+            return JSON
+    return JSON
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """
+    Pick the content coding from the Accept-Encoding header.
+
+    :param accept_encoding: Accept-Encoding header of the request.
+    :return: "zstd", "gzip" or None for identity.
+    """
+    encodings = available_encodings()
+    for value, _ in _parse_header(accept_encoding):
+        if value in encodings:
+            return value
+        if value == "*":
+            return encodings[0]
+    return None
+
+
+def _rows_holder(payload) -> dict:
+    """The dictionary holding the per-target "data" list: the payload itself, or the "result" of a job."""
+    if not isinstance(payload, dict):
+        return None
+    for holder in (payload, payload.get("result")):
+        if isinstance(holder, dict) and isinstance(holder.get("data"), list) and all(
+            isinstance(entry, dict) for entry in holder["data"]
+        ):
+            return holder
+    return None
+
+
+def is_tabular(payload) -> bool:
+    return _rows_holder(payload) is not None
+
+
+def split_rows(payload: dict) -> tuple[dict, list[dict]]:
+    """
+    Take the scan rows out of a payload with a {"data": [{"target": ..., "results": [...]}, ...]} part.
+
+    :return: Tuple of (payload without the rows, rows tagged with the index of their entry).
+    """
+    holder = _rows_holder(payload)
+    rows, entries = [], []
+    for index, entry in enumerate(holder["data"]):
+        for row in entry.get("results") or []:
+            rows.append(dict(row, **{TARGET_COLUMN: index}))
+        entries.append(dict(entry, results=[]) if "results" in entry else dict(entry))
+    stripped = dict(holder, data=entries)
+    return (stripped if holder is payload else dict(payload, result=stripped)), rows
+
+
+def join_rows(payload: dict, rows: list[dict]) -> dict:
+    """Inverse of split_rows."""
+    holder = _rows_holder(payload)
+    for row in rows:
+        holder["data"][row.pop(TARGET_COLUMN)]["results"].append(row)
+    return payload
+
+
+def encode_arrow(payload: dict) -> bytes:
+    """
+    Encode a scan payload as an Arrow IPC stream.
+
+    The rows become a table with dictionary-encoded string columns (hosts, states
+    and services repeat a lot); everything else travels as JSON in the schema metadata.
+    """
+    import pyarrow as pa
+
+    metadata, rows = split_rows(payload)
+    columns = {}
+    for field in RESULT_FIELDS:
+        values = [row.get(field) for row in rows]
+        if field == "Port":
+            columns[field] = pa.array([int(value) for value in values], type=pa.int32())
+        else:
+            columns[field] = pa.array([None if value is None else str(value) for value in values], type=pa.string()).dictionary_encode()
+    columns[TARGET_COLUMN] = pa.array([row[TARGET_COLUMN] for row in rows], type=pa.int32())
+    table = pa.table(columns).replace_schema_metadata({PAYLOAD_METADATA_KEY: json.dumps(metadata, default=str)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_arrow(body: bytes) -> dict:
+    """Inverse of encode_arrow, used by the benchmarks and Python clients."""
+    import pyarrow as pa
+
+    table = pa.ipc.open_stream(body).read_all()
+    payload = json.loads(table.schema.metadata[PAYLOAD_METADATA_KEY])
+    return join_rows(payload, arrow_rows(table))
+
+
+def arrow_rows(table) -> list[dict]:
+    """Rows of an Arrow table as dictionaries; column-wise conversion is much faster than Table.to_pylist."""
+    names = table.column_names
+    columns = [_column_values(table.column(name)) for name in names]
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+def _column_values(column) -> list:
+    import pyarrow as pa
+
+    if not pa.types.is_dictionary(column.type):
+        return column.to_pylist()
+    values = []
+    for chunk in column.chunks:
+        # Look the indices up in the small dictionary instead of boxing every value through Arrow
+        dictionary = chunk.dictionary.to_pylist() + [None]
+        missing = len(dictionary) - 1
+        values.extend(dictionary[index] for index in chunk.indices.fill_null(missing).to_pylist())
+    return values
+
+
+def encode_body(payload, media_type: str) -> bytes:
+    if media_type == ARROW:
+        return encode_arrow(payload)
+    if media_type == MSGPACK:
+        import msgpack
+        return msgpack.packb(payload, default=str)
+    return json.dumps(payload, default=str, separators=(",", ":")).encode()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    # Low levels give most of the size reduction for a fraction of the CPU
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=5, mtime=0) as f:
+        f.write(body)
+    return buffer.getvalue()
+
+
+def negotiated_response(payload, request, status: int = 200) -> Response:
+    """
+    Build a response in the format and content coding the client asked for.
+
+    Clients that send no Accept/Accept-Encoding headers get the same JSON as before.
+
+    :param payload: JSON-serializable payload.
+    :param request: The Flask request, for its Accept and Accept-Encoding headers.
+    :param status: HTTP status code.
+    :return: Flask Response.
+    """
+    media_type = negotiate_format(request.headers.get("Accept"), tabular=is_tabular(payload))
+    body = encode_body(payload, media_type)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding")) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding is not None:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, status=status, mimetype=media_type, headers=headers)
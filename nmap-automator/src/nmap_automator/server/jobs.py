@@ -0,0 +1,218 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from nmap_automator.scanner import ScanEstimate, ScanControl
+
+
+class AdmissionError(Exception):
+    """Raised when a job is refused because the scheduler is already saturated."""
+
+
+@dataclass
+class ScanJob:
+    job_id: str
+    targets: list[str]
+    nmap_args: list[str]
+    estimate: ScanEstimate
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+    result: dict = None
+    error: str = None
+    timeout_seconds: float = None
+    control: ScanControl = field(default_factory=ScanControl)
+
+    def to_dict(self) -> dict:
+        if self.status == "queued":
+            progress = {"percent": 0.0, "eta_seconds": self.estimate.seconds}
+        elif self.status == "running":
+            progress = self.estimate.progress(time.time() - self.started_at)
+            if self.control.progress.updated_at is not None:
+                # Live figures reported by the nmap process currently running
+                progress["nmap"] = self.control.progress.to_dict()
+        else:
+            progress = {"percent": 100.0, "eta_seconds": 0.0}
+
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "targets": self.targets,
+            "nmap_args": self.nmap_args,
+            "estimate": self.estimate.to_dict(),
+            "progress": progress,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "timeout_seconds": self.timeout_seconds
+        }
+
+
+class JobRegistry:
+    """
+    Runs scan jobs in the background and admits new ones based on their cost estimate.
+
+    A job is refused when its own estimate exceeds `max_job_seconds`, or when the
+    estimated work already queued or running would exceed `max_pending_seconds`.
+    A running job is stopped once it has run for `job_timeout_seconds`, keeping
+    the results it gathered so far. Finished jobs, with their results, are kept
+    for `finished_job_ttl` seconds and at most `max_finished_jobs` of them.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = None,
+        max_job_seconds: float = None,
+        max_pending_seconds: float = None,
+        job_timeout_seconds: float = None,
+        max_finished_jobs: int = None,
+        finished_job_ttl: float = None
+    ):
+        self.max_workers = max_workers or int(os.getenv("NMAP_AUTOMATOR_MAX_WORKERS", "4"))
+        self.max_job_seconds = max_job_seconds or float(os.getenv("NMAP_AUTOMATOR_MAX_JOB_SECONDS", "21600"))
+        self.max_pending_seconds = max_pending_seconds or float(
+            os.getenv("NMAP_AUTOMATOR_MAX_PENDING_SECONDS", "86400")
+        )
+        self.job_timeout_seconds = job_timeout_seconds or float(
+            os.getenv("NMAP_AUTOMATOR_JOB_TIMEOUT_SECONDS", str(self.max_job_seconds))
+        )
+        self.max_finished_jobs = max_finished_jobs or int(os.getenv("NMAP_AUTOMATOR_MAX_FINISHED_JOBS", "1000"))
+        self.finished_job_ttl = finished_job_ttl or float(os.getenv("NMAP_AUTOMATOR_FINISHED_JOB_TTL", "86400"))
+        self.__jobs = {}
+        # Queued and running jobs, and finished ones in the order they finished
+        self.__active = {}
+        self.__finished = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scan-job")
+
+    def pending_seconds(self) -> float:
+        """Estimated seconds of work that is queued or still running."""
+        with self.__lock:
+            return self.__pending_seconds()
+
+    def __pending_seconds(self) -> float:
+        now = time.time()
+        total = 0.0
+        for job in self.__active.values():
+            if job.status == "queued":
+                total += job.estimate.seconds
+            elif job.status == "running":
+                total += max(job.estimate.seconds - (now - job.started_at), 0.0)
+        return total
+
+    def check_admission(self, estimate: ScanEstimate) -> None:
+        """
+        Raise AdmissionError if a job with the given estimate should not be accepted.
+
+        :param estimate: Cost estimate of the candidate job.
+        """
+        with self.__lock:
+            self.__check_admission(estimate)
+
+    def __check_admission(self, estimate: ScanEstimate) -> None:
+        if estimate.seconds > self.max_job_seconds:
+            raise AdmissionError(
+                f"Estimated duration {estimate.seconds:.0f}s exceeds the per-job limit of {self.max_job_seconds:.0f}s."
+            )
+        pending = self.__pending_seconds()
+        if pending + estimate.seconds > self.max_pending_seconds:
+            raise AdmissionError(
+                f"Scheduler saturated: {pending:.0f}s of scans pending, limit is {self.max_pending_seconds:.0f}s."
+            )
+
+    def __finish(self, job: ScanJob) -> None:
+        """Move a job to the finished ones and evict those past their TTL or beyond the limit (lock held)."""
+        self.__active.pop(job.job_id, None)
+        self.__finished[job.job_id] = job
+        expired = time.time() - self.finished_job_ttl
+        while self.__finished:
+            job_id, oldest = next(iter(self.__finished.items()))
+            if len(self.__finished) <= self.max_finished_jobs and oldest.finished_at >= expired:
+                break
+            del self.__finished[job_id]
+            del self.__jobs[job_id]
+
+    def submit(
+        self,
+        targets: list[str],
+        nmap_args: list[str],
+        estimate: ScanEstimate,
+        work,
+        timeout_seconds: float = None
+    ) -> ScanJob:
+        """
+        Admit and schedule a job.
+
+        :param targets: Targets covered by the job.
+        :param nmap_args: Nmap arguments of the job.
+        :param estimate: Cost estimate of the job.
+        :param work: Callable taking the ScanJob and returning the result dictionary; scans should use job.control.
+        :param timeout_seconds: Hard limit of the job's run time, capped at job_timeout_seconds.
+        :return: The registered ScanJob.
+        """
+        timeout = min(timeout_seconds, self.job_timeout_seconds) if timeout_seconds else self.job_timeout_seconds
+        job = ScanJob(
+            job_id=uuid.uuid4().hex, targets=targets, nmap_args=nmap_args, estimate=estimate, timeout_seconds=timeout
+        )
+        # Checked and registered at once, so concurrent submits cannot all pass against the same pending total
+        with self.__lock:
+            self.__check_admission(estimate)
+            self.__jobs[job.job_id] = job
+            self.__active[job.job_id] = job
+        self.__executor.submit(self.__run, job, work)
+        return job
+
+    def get(self, job_id: str) -> ScanJob:
+        with self.__lock:
+            return self.__jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> ScanJob:
+        """
+        Cancel a job. A queued job never starts; a running one has its nmap process group terminated.
+
+        :param job_id: Id of the job.
+        :return: The job, or None if it is unknown.
+        """
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            if job is None:
+                return None
+            job.control.cancel()
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = time.time()
+                self.__finish(job)
+        return job
+
+    def __run(self, job: ScanJob, work) -> None:
+        with self.__lock:
+            if job.status == "cancelled":
+                return
+            job.started_at = time.time()
+            job.status = "running"
+        job.control.set_timeout(job.timeout_seconds)
+        try:
+            job.result = work(job)
+            # Stopped scans still return what they gathered
+            if job.control.stop_reason == "cancelled" or job.control.cancelled:
+                job.status = "cancelled"
+            elif job.control.stop_reason == "timeout":
+                job.status = "timed_out"
+                job.error = f"Job exceeded its time limit of {job.timeout_seconds:.0f}s; partial results kept."
+            else:
+                job.status = "completed"
+        except Exception as e:
+            print(f"Job {job.job_id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            with self.__lock:
+                job.finished_at = time.time()
+                self.__finish(job)
@@ -0,0 +1,211 @@
+import io
+import os
+import csv
+import json
+import time
+from dataclasses import dataclass
+
+from nmap_automator.scanner import NmapScanner, ScanHistory, ScanCostEstimator, ScanControl, resolve_suggestion
+from nmap_automator.scanner.pipeline import PORT_SELECTION_FLAGS
+from nmap_automator.scanner.rescan_planner import ambiguous_pairs, plan_rescan
+from nmap_automator.scanner.records import RESULT_FIELDS
+from nmap_automator.utils.ingest import iter_result_rows
+from nmap_automator.interpretors import estimate_tokens, usage_ledger
+
+
+@dataclass
+class RefinementBudget:
+    max_iterations: int = 3
+    max_seconds: float = 1800.0
+    max_tokens: int = 200000
+
+
+class RefinementLoop:
+    """
+    Bounded interpret-then-rescan loop driven by the suggest runner.
+
+    Each iteration interprets the current results, vets the suggested arguments
+    against the profiles and argument grammar, and rescans only the hosts that
+    reported ports. A suggestion that selects its own ports is run as-is on those
+    hosts. Otherwise only the ambiguous ports are revisited (filtered, tcpwrapped
+    or conflicting between passes). New rows replace the old ones for the same
+    (host, protocol, port).
+
+    The loop stops when the scan is classified Completed, when a rescan changes
+    nothing, when the model repeats itself or has no valid suggestion, or when the
+    iteration, time or token budget would be exceeded. Tokens are the usage the
+    interpretors reported to the ledger for the runner's job; only the next
+    prompt is estimated. Every iteration is appended to refinement_log.jsonl in
+    the scan directory.
+    """
+
+    LOG_FILE = "refinement_log.jsonl"
+    RESULTS_FILE = "refined_scan_results.csv"
+
+    def __init__(self, runner, interpreter_conf, scan_dir: str, budget: RefinementBudget = None, hosts_per_batch: int = 16):
+        self.__runner = runner
+        self.__conf = interpreter_conf.model_copy(update={"interpret_runner": "suggest"})
+        self.__scan_dir = scan_dir
+        self.__budget = budget or RefinementBudget()
+        self.__hosts_per_batch = hosts_per_batch
+        self.__history = ScanHistory(os.path.dirname(os.path.normpath(scan_dir)))
+
+    @staticmethod
+    def _row_key(row) -> tuple:
+        return (row["IP"], row["Protocol"], int(row["Port"]))
+
+    def plan(self, passes: list, next_arguments: list[str]) -> list[tuple[list[str], str]]:
+        """
+        Decide which hosts and ports the suggested arguments should revisit.
+
+        :param passes: Rows of the initial scan and of each rescan so far, oldest first.
+        :param next_arguments: Vetted suggested arguments.
+        :return: List of (hosts, nmap arguments) pairs, one per invocation.
+        """
+        if PORT_SELECTION_FLAGS.intersection(next_arguments):
+            hosts = sorted({row["IP"] for row in passes[0]})
+            arguments = " ".join(next_arguments)
+            return [
+                (hosts[i:i + self.__hosts_per_batch], arguments)
+                for i in range(0, len(hosts), self.__hosts_per_batch)
+            ]
+        return plan_rescan(ambiguous_pairs(*passes), next_arguments, self.__hosts_per_batch)
+
+    def __log(self, entry: dict) -> None:
+        with io.open(os.path.join(self.__scan_dir, self.LOG_FILE), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def __save(self, rows: dict) -> str:
+        path = os.path.join(self.__scan_dir, self.RESULTS_FILE)
+        with io.open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows.values())
+        return path
+
+    def run(self, scan_file_path: str, control: ScanControl = None) -> dict:
+        """
+        Refine the results of a finished scan.
+
+        :param scan_file_path: CSV or NDJSON file with the results to refine.
+        :param control: Cancellation and deadline of the rescans; a stopped rescan ends the loop with its partial rows.
+        :return: Dictionary with the final classification, the iterations and the refined rows.
+        """
+        started = time.monotonic()
+        scanner = NmapScanner(history=self.__history, control=control)
+        estimator = ScanCostEstimator(self.__history)
+        estimator.calibrate()
+        rows = {}
+        for row in iter_result_rows(scan_file_path):
+            row = dict(row, Port=int(row["Port"]))
+            rows[self._row_key(row)] = row
+        passes = [list(rows.values())]
+        subdomains = {host: row.get("Subdomain", "") for (host, _, _), row in rows.items()}
+        # Usage of the runner's job before the loop, so only the loop's own calls count against its budget
+        tokens_before = usage_ledger.job_totals(self.__runner.job_id)["tokens"]
+        tokens_used = 0
+        tried_arguments = []
+        iterations = []
+        classification = None
+        stop_reason = None
+
+        for iteration in range(1, self.__budget.max_iterations + 1):
+            result_rows = list(rows.values())
+            prompt_tokens = estimate_tokens(json.dumps(result_rows))
+            if tokens_used + prompt_tokens > self.__budget.max_tokens:
+                stop_reason = "token_budget"
+                break
+
+            classification = resolve_suggestion(
+                self.__runner.run_llm_interpretation(self.__conf, result_rows, self.__scan_dir)
+            )
+            tokens_used = usage_ledger.job_totals(self.__runner.job_id)["tokens"] - tokens_before
+            entry = {
+                "iteration": iteration,
+                "classification": classification.get("result"),
+                "next_arguments": classification.get("next_arguments"),
+                "suggestion_error": classification.get("suggestion_error"),
+                "tokens_used": tokens_used
+            }
+
+            next_arguments = classification.get("next_arguments")
+            if classification.get("result") == "Completed":
+                stop_reason = "completed"
+            elif not next_arguments:
+                stop_reason = "no_valid_suggestion"
+            elif next_arguments in tried_arguments:
+                stop_reason = "repeated_suggestion"
+            else:
+                stop_reason = None
+
+            invocations = self.plan(passes, next_arguments) if stop_reason is None else []
+            if stop_reason is None:
+                targets = [host for hosts, _ in invocations for host in hosts]
+                estimate = sum(
+                    estimator.estimate(hosts, arguments.split()).seconds for hosts, arguments in invocations
+                )
+                if time.monotonic() - started + estimate > self.__budget.max_seconds:
+                    stop_reason = "time_budget"
+                    entry["estimated_seconds"] = round(estimate, 1)
+                elif not targets:
+                    stop_reason = "nothing_to_rescan"
+
+            if stop_reason is not None:
+                entry["stop_reason"] = stop_reason
+                self.__log(entry)
+                iterations.append(entry)
+                break
+
+            tried_arguments.append(next_arguments)
+            iteration_started = time.monotonic()
+            changed = 0
+            rescanned = []
+            for hosts, arguments in invocations:
+                if scanner.control.stopped:
+                    break
+                try:
+                    batch = scanner.scan_hosts(hosts, arguments)
+                except Exception as e:
+                    print(f"Error rescanning {', '.join(hosts)}: {e}")
+                    continue
+                for record in batch:
+                    row = record.to_dict()
+                    row["Subdomain"] = subdomains.get(row["IP"], "")
+                    key = self._row_key(row)
+                    previous = rows.get(key)
+                    if previous is None or any(
+                        str(previous.get(field, "")) != str(row[field]) for field in ("State", "Name", "Product", "Version")
+                    ):
+                        changed += 1
+                    rows[key] = row
+                    rescanned.append(row)
+            passes.append(rescanned)
+
+            entry.update({
+                "invocations": [{"hosts": hosts, "arguments": arguments} for hosts, arguments in invocations],
+                "changed_rows": changed,
+                "duration": round(time.monotonic() - iteration_started, 3)
+            })
+            if scanner.control.stopped:
+                stop_reason = scanner.control.stop_reason
+                entry["stop_reason"] = stop_reason
+            elif changed == 0:
+                stop_reason = "converged"
+                entry["stop_reason"] = stop_reason
+            self.__log(entry)
+            iterations.append(entry)
+            print(f"Refinement iteration {iteration}: {changed} row(s) changed by {' '.join(next_arguments)}")
+            if stop_reason is not None:
+                break
+        else:
+            stop_reason = "max_iterations"
+
+        return {
+            "classification": classification,
+            "stop_reason": stop_reason,
+            "iterations": iterations,
+            "tokens_used": tokens_used,
+            "duration": round(time.monotonic() - started, 3),
+            "scan_file_path": self.__save(rows),
+            "data": list(rows.values())
+        }
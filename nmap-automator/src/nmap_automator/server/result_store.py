@@ -0,0 +1,193 @@
+import os
+import json
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+
+from nmap_automator.analysis import ScanFrame
+from nmap_automator.server.coalescing import SingleFlight
+
+# ResultFilter field -> ScanFrame.filter argument
+FILTER_ARGUMENTS = {
+    "host": "ip",
+    "port": "port",
+    "port_min": "port_min",
+    "port_max": "port_max",
+    "protocol": "protocol",
+    "state": "state",
+    "service": "name",
+    "product": "product",
+    "subdomain": "subdomain",
+}
+AGGREGATE_COLUMNS = {"services": "Name", "products": "Product", "states": "State"}
+
+
+class CursorError(ValueError):
+    """Raised when a cursor cannot be decoded."""
+
+
+class StaleCursorError(CursorError):
+    """Raised when a cursor belongs to another query or to an older version of the scan file."""
+
+
+class ResultStore:
+    """
+    Serves filtered, sorted and aggregated pages of stored scan results.
+
+    Scan files are loaded once into ScanFrames and kept in a small LRU cache
+    keyed by path, reloaded when the file changes on disk. The filtered and
+    sorted view of a query is cached as well, so paging through it only slices
+    the frame. Cursors name the view and the offset of the page; they stop
+    being valid once the file changes.
+    """
+
+    def __init__(self, max_frames: int = None, max_views: int = None):
+        self.max_frames = max_frames or int(os.getenv("NMAP_AUTOMATOR_RESULT_FRAMES", "4"))
+        self.max_views = max_views or int(os.getenv("NMAP_AUTOMATOR_RESULT_VIEWS", "8"))
+        self.__lock = threading.Lock()
+        self.__frames = OrderedDict()
+        self.__views = OrderedDict()
+        self.__loads = SingleFlight()
+
+    @staticmethod
+    def __signature(path: str) -> tuple:
+        if not os.path.exists(path):
+            raise ValueError(f"File not found: {path}")
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def __remember(cache: OrderedDict, key, value, limit: int) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+    def frame(self, path: str) -> tuple[ScanFrame, tuple]:
+        """
+        Load a scan file, or reuse the frame loaded for the same version of it.
+
+        :param path: Path of a CSV or NDJSON scan file.
+        :return: Tuple of (frame, signature of the file version it was read from).
+        """
+        path = os.path.abspath(path)
+        signature = self.__signature(path)
+        with self.__lock:
+            cached = self.__frames.get(path)
+            if cached is not None and cached[0] == signature:
+                self.__frames.move_to_end(path)
+                return cached[1], signature
+
+        # Concurrent first requests for a large file share a single load
+        frame, _ = self.__loads.do((path, signature), lambda: ScanFrame.from_file(path))
+        with self.__lock:
+            self.__remember(self.__frames, path, (signature, frame), self.max_frames)
+        return frame, signature
+
+    def __view(self, path: str, query: dict, build) -> tuple[str, object]:
+        """Cached result of `build(frame)` for a query over the current version of a file."""
+        frame, signature = self.frame(path)
+        view_id = hashlib.sha256(
+            json.dumps([os.path.abspath(path), signature, query], sort_keys=True).encode()
+        ).hexdigest()[:16]
+        with self.__lock:
+            view = self.__views.get(view_id)
+            if view is not None:
+                self.__views.move_to_end(view_id)
+                return view_id, view
+        view = build(frame)
+        with self.__lock:
+            self.__remember(self.__views, view_id, view, self.max_views)
+        return view_id, view
+
+    @staticmethod
+    def __filtered(frame: ScanFrame, filters: dict) -> ScanFrame:
+        arguments = {FILTER_ARGUMENTS[name]: value for name, value in filters.items() if value is not None}
+        return frame.filter(**arguments) if arguments else frame
+
+    @staticmethod
+    def encode_cursor(view_id: str, offset: int) -> str:
+        token = json.dumps({"v": view_id, "o": offset}, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(token).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str, view_id: str) -> int:
+        """
+        Offset a cursor points to.
+
+        :raises CursorError: If the cursor is malformed.
+        :raises StaleCursorError: If the cursor belongs to another query or file version.
+        """
+        try:
+            token = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            offset = int(token["o"])
+        except (ValueError, TypeError, KeyError) as e:
+            raise CursorError(f"Invalid cursor: {e}")
+        if offset < 0:
+            raise CursorError("Invalid cursor: negative offset")
+        if token.get("v") != view_id:
+            raise StaleCursorError("The cursor belongs to another query or the scan file changed; start again from the first page.")
+        return offset
+
+    def __page(self, view_id: str, total: int, limit: int, cursor: str) -> tuple[int, int, dict]:
+        offset = self.decode_cursor(cursor, view_id) if cursor else 0
+        stop = min(offset + limit, total)
+        links = {
+            "total": total,
+            "offset": offset,
+            "next_cursor": self.encode_cursor(view_id, stop) if stop < total else None,
+            "prev_cursor": self.encode_cursor(view_id, max(0, offset - limit)) if offset > 0 else None,
+        }
+        return offset, stop, links
+
+    def query(self, path: str, filters: dict, sort_by: str = "IP", descending: bool = False, limit: int = 100, cursor: str = None) -> dict:
+        """
+        Fetch a page of the rows matching the filters.
+
+        :param path: Path of a CSV or NDJSON scan file.
+        :param filters: ResultFilter fields.
+        :param sort_by: Column to sort by.
+        :param descending: Sort in descending order.
+        :param limit: Maximum number of rows in the page.
+        :param cursor: Cursor returned with the previous page, or None for the first page.
+        :return: Dictionary with the rows, the total number of matching rows and the cursors of the neighbouring pages.
+        :raises CursorError: If the cursor is malformed or stale.
+        """
+        view_id, view = self.__view(
+            path,
+            {"filters": filters, "sort_by": sort_by, "descending": descending},
+            lambda frame: self.__filtered(frame, filters).sort(sort_by, descending=descending)
+        )
+        offset, stop, links = self.__page(view_id, len(view), limit, cursor)
+        return {"rows": view.slice(offset, stop).to_records(), **links}
+
+    def aggregate(self, path: str, filters: dict, aggregate: str, state: str = "open", limit: int = 50, cursor: str = None) -> dict:
+        """
+        Fetch a page of per-group counts over the rows matching the filters.
+
+        :param path: Path of a CSV or NDJSON scan file.
+        :param filters: ResultFilter fields.
+        :param aggregate: 'hosts', 'ports', 'services', 'products' or 'states'.
+        :param state: Only count rows in this state ('ports', 'services' and 'products').
+        :param limit: Maximum number of groups in the page.
+        :param cursor: Cursor returned with the previous page, or None for the first page.
+        :return: Dictionary with the groups, largest first, the number of groups and the page cursors.
+        :raises CursorError: If the cursor is malformed or stale.
+        """
+        def build(frame: ScanFrame) -> list[dict]:
+            frame = self.__filtered(frame, filters)
+            if aggregate == "hosts":
+                hosts = frame.host_summary()
+                for host in hosts:
+                    host.setdefault("open", 0)
+                return sorted(hosts, key=lambda host: (-host["open"], -host["total"]))
+            if aggregate == "ports":
+                return [{"Port": port, "count": count} for port, count in frame.port_histogram(state=state)]
+            column = AGGREGATE_COLUMNS[aggregate]
+            counted_state = None if aggregate == "states" else state
+            return [{column: value, "count": count} for value, count in frame.value_counts(column, state=counted_state)]
+
+        view_id, groups = self.__view(path, {"filters": filters, "aggregate": aggregate, "state": state}, build)
+        offset, stop, links = self.__page(view_id, len(groups), limit, cursor)
+        return {"aggregate": aggregate, "groups": groups[offset:stop], **links}
@@ -0,0 +1,4 @@
+from .resolver import AsyncResolver, parse_nameserver
+from .cache import TTLCache
+from .sources import SubdomainSource, WordlistSource, ZoneTransferSource, CertificateLogSource, SOURCES
+from .enumerator import SubdomainEnumerator
\ No newline at end of file
@@ -0,0 +1,43 @@
+import os
+import time
+import threading
+
+
+class TTLCache:
+    """
+    Thread-safe cache whose entries expire after their own time-to-live.
+
+    Used to keep enumeration results between requests; each entry carries the
+    shortest DNS TTL of its answers, capped by `max_ttl`.
+    """
+
+    def __init__(self, max_ttl: float = None, max_entries: int = 1024):
+        self.max_ttl = max_ttl if max_ttl is not None else float(os.getenv("NMAP_AUTOMATOR_SUBDOMAIN_CACHE_TTL", "3600"))
+        self.max_entries = max_entries
+        self.__entries = {}
+        self.__lock = threading.Lock()
+
+    def get(self, key):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.__entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl: float = None) -> None:
+        ttl = self.max_ttl if ttl is None else min(ttl, self.max_ttl)
+        if ttl <= 0:
+            return
+        with self.__lock:
+            if len(self.__entries) >= self.max_entries and key not in self.__entries:
+                # Evict whatever expires first
+                del self.__entries[min(self.__entries, key=lambda k: self.__entries[k][0])]
+            self.__entries[key] = (time.monotonic() + ttl, value)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
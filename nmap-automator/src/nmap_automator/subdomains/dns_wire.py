@@ -0,0 +1,143 @@
+import struct
+from dataclasses import dataclass
+
+QTYPES = {"A": 1, "NS": 2, "CNAME": 5, "SOA": 6, "AAAA": 28, "AXFR": 252}
+QTYPE_NAMES = {value: key for key, value in QTYPES.items()}
+CLASS_IN = 1
+
+RCODE_NOERROR = 0
+RCODE_NXDOMAIN = 3
+
+_HEADER = struct.Struct("!HHHHHH")
+_RR_FIXED = struct.Struct("!HHIH")
+
+
+@dataclass
+class ResourceRecord:
+    name: str
+    rtype: int
+    ttl: int
+    data: str
+
+
+@dataclass
+class DNSMessage:
+    txid: int
+    rcode: int
+    truncated: bool
+    questions: list
+    answers: list[ResourceRecord]
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case a domain name and drop the trailing dot and any wildcard label."""
+    name = name.strip().lower().rstrip(".")
+    while name.startswith("*."):
+        name = name[2:]
+    return name
+
+
+def encode_name(name: str) -> bytes:
+    encoded = b""
+    for label in normalize_name(name).split("."):
+        if label:
+            raw = label.encode("idna") if not label.isascii() else label.encode("ascii")
+            if len(raw) > 63:
+                raise ValueError(f"DNS label too long in '{name}'")
+            encoded += bytes([len(raw)]) + raw
+    return encoded + b"\x00"
+
+
+def build_query(txid: int, name: str, qtype: str = "A", recursion: bool = True) -> bytes:
+    """
+    Encode a single-question DNS query.
+
+    :param txid: 16-bit transaction id used to match the response.
+    :param name: Name to look up.
+    :param qtype: Record type ('A', 'AAAA', 'NS', 'AXFR', ...).
+    :param recursion: Set the recursion-desired flag.
+    :return: Query in DNS wire format.
+    """
+    flags = 0x0100 if recursion else 0
+    return _HEADER.pack(txid, flags, 1, 0, 0, 0) + encode_name(name) + struct.pack("!HH", QTYPES[qtype], CLASS_IN)
+
+
+def build_response(txid: int, question: bytes, rcode: int, answers: list[tuple[str, int, int, bytes]]) -> bytes:
+    """
+    Encode a response, used by stub servers.
+
+    :param txid: Transaction id of the query.
+    :param question: Raw question section copied from the query.
+    :param rcode: Response code.
+    :param answers: List of (name, type, ttl, rdata) tuples.
+    :return: Response in DNS wire format.
+    """
+    flags = 0x8180 | rcode
+    body = question
+    for name, rtype, ttl, rdata in answers:
+        body += encode_name(name) + _RR_FIXED.pack(rtype, CLASS_IN, ttl, len(rdata)) + rdata
+    return _HEADER.pack(txid, flags, 1 if question else 0, len(answers), 0, 0) + body
+
+
+def decode_name(message: bytes, offset: int) -> tuple[str, int]:
+    """Decode a possibly compressed name and return it with the offset just past it."""
+    labels = []
+    end = None
+    jumps = 0
+    while True:
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            pointer = struct.unpack_from("!H", message, offset)[0] & 0x3FFF
+            if end is None:
+                end = offset + 2
+            offset = pointer
+            jumps += 1
+            if jumps > 32:
+                raise ValueError("DNS name compression loop")
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(message[offset:offset + length].decode("ascii", errors="replace"))
+        offset += length
+    return ".".join(labels).lower(), end if end is not None else offset
+
+
+def _decode_rdata(message: bytes, rtype: int, offset: int, length: int) -> str:
+    if rtype == QTYPES["A"] and length == 4:
+        return ".".join(str(b) for b in message[offset:offset + 4])
+    if rtype == QTYPES["AAAA"] and length == 16:
+        raw = message[offset:offset + 16]
+        return ":".join(f"{raw[i] << 8 | raw[i + 1]:x}" for i in range(0, 16, 2))
+    if rtype in (QTYPES["NS"], QTYPES["CNAME"]):
+        return decode_name(message, offset)[0]
+    return ""
+
+
+def parse_message(message: bytes) -> DNSMessage:
+    """
+    Decode the header, question and answer sections of a DNS message.
+
+    :param message: Message in DNS wire format.
+    :return: DNSMessage; record data is decoded for A, AAAA, NS and CNAME.
+    :raises ValueError: If the message is truncated or malformed.
+    """
+    try:
+        txid, flags, qdcount, ancount, _, _ = _HEADER.unpack_from(message, 0)
+        offset = _HEADER.size
+        questions = []
+        for _ in range(qdcount):
+            name, offset = decode_name(message, offset)
+            qtype, _ = struct.unpack_from("!HH", message, offset)
+            offset += 4
+            questions.append((name, qtype))
+        answers = []
+        for _ in range(ancount):
+            name, offset = decode_name(message, offset)
+            rtype, _, ttl, length = _RR_FIXED.unpack_from(message, offset)
+            offset += _RR_FIXED.size
+            answers.append(ResourceRecord(name, rtype, ttl, _decode_rdata(message, rtype, offset, length)))
+            offset += length
+    except (IndexError, struct.error) as e:
+        raise ValueError(f"Malformed DNS message: {e}")
+    return DNSMessage(txid, flags & 0x000F, bool(flags & 0x0200), questions, answers)
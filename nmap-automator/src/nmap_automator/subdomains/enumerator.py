@@ -0,0 +1,91 @@
+import time
+import asyncio
+
+from .cache import TTLCache
+from .dns_wire import normalize_name
+from .resolver import AsyncResolver, default_nameserver
+from .sources import SOURCES, SubdomainSource
+
+# How long an enumeration that resolved nothing is remembered
+NEGATIVE_TTL = 300
+
+
+class SubdomainEnumerator:
+    """
+    Runs the selected sources concurrently, merges and deduplicates their names,
+    resolves the names the sources did not resolve themselves and caches the result.
+
+    Only names that resolve are reported. The cache key is the domain and the set
+    of sources, and an entry lives as long as the shortest TTL among its answers.
+    """
+
+    def __init__(self, sources: dict[str, SubdomainSource] = None, cache: TTLCache = None, nameserver: tuple[str, int] = None, concurrency: int = None):
+        self.sources = sources or {name: source() for name, source in SOURCES.items()}
+        self.cache = cache or TTLCache()
+        self.nameserver = nameserver
+        self.concurrency = concurrency
+
+    async def _enumerate(self, domain: str, engines: list[str], nameserver: tuple[str, int]) -> dict:
+        async with AsyncResolver(nameserver, self.concurrency) as resolver:
+            outcomes = await asyncio.gather(
+                *(self.sources[engine].enumerate(domain, resolver) for engine in engines),
+                return_exceptions=True
+            )
+
+            resolved, unresolved, per_source, errors = {}, set(), {}, {}
+            for engine, outcome in zip(engines, outcomes):
+                if isinstance(outcome, Exception):
+                    print(f"Subdomain source '{engine}' failed for {domain}: {outcome}")
+                    errors[engine] = str(outcome)
+                    continue
+                per_source[engine] = len(outcome)
+                for name, answer in outcome.items():
+                    if answer is None:
+                        unresolved.add(name)
+                    else:
+                        resolved[name] = answer
+
+            resolved.update(await resolver.resolve_many(unresolved - set(resolved)))
+        return {
+            "resolved": resolved,
+            "sources": per_source,
+            "errors": errors,
+            "stats": resolver.stats.to_dict()
+        }
+
+    def enumerate(self, domain: str, engines: list[str] = None, nameserver: tuple[str, int] = None) -> dict:
+        """
+        Enumerate the subdomains of a domain.
+
+        :param domain: Domain to enumerate.
+        :param engines: Names of the sources to use, all of them by default.
+        :param nameserver: (host, port) of the resolver to query instead of the configured one.
+        :return: Dictionary with the sorted subdomains, their addresses, per-source counts and resolver stats.
+        """
+        domain = normalize_name(domain)
+        engines = sorted(set(engines or self.sources))
+        unknown = set(engines) - set(self.sources)
+        if unknown:
+            raise ValueError(f"Unknown subdomain source(s) {sorted(unknown)}, expected any of {sorted(self.sources)}")
+
+        nameserver = nameserver or self.nameserver or default_nameserver()
+        key = (domain, tuple(engines), nameserver)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        started = time.monotonic()
+        outcome = asyncio.run(self._enumerate(domain, engines, nameserver))
+        resolved = outcome["resolved"]
+        result = {
+            "domain": domain,
+            "subdomains": sorted(resolved),
+            "addresses": {name: resolved[name][0] for name in sorted(resolved)},
+            "sources": outcome["sources"],
+            "errors": outcome["errors"],
+            "stats": {**outcome["stats"], "total_seconds": round(time.monotonic() - started, 3)}
+        }
+        ttl = min((ttl for _, ttl in resolved.values()), default=NEGATIVE_TTL)
+        if not outcome["errors"]:
+            self.cache.set(key, result, ttl)
+        return {**result, "cached": False}
@@ -0,0 +1,159 @@
+import os
+import time
+import socket
+import random
+import struct
+import asyncio
+from dataclasses import dataclass
+
+from .dns_wire import QTYPES, RCODE_NOERROR, build_query, parse_message, normalize_name
+
+RECEIVE_BUFFER_BYTES = 4 * 1024 * 1024
+
+
+def default_nameserver() -> tuple[str, int]:
+    """
+    Resolver to query: NMAP_AUTOMATOR_DNS_RESOLVER ('host' or 'host:port'), else the
+    first nameserver of /etc/resolv.conf, else a public resolver.
+    """
+    configured = os.getenv("NMAP_AUTOMATOR_DNS_RESOLVER")
+    if configured:
+        return parse_nameserver(configured)
+    try:
+        with open("/etc/resolv.conf") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == "nameserver":
+                    return (parts[1], 53)
+    except OSError:
+        pass
+    return ("8.8.8.8", 53)
+
+
+def parse_nameserver(value: str) -> tuple[str, int]:
+    host, _, port = value.rpartition(":") if value.count(":") == 1 else (value, "", "")
+    return (host, int(port)) if port else (value, 53)
+
+
+@dataclass
+class ResolverStats:
+    queries: int = 0
+    responses: int = 0
+    timeouts: int = 0
+    started: float = None
+    finished: float = None
+
+    def to_dict(self) -> dict:
+        seconds = (self.finished or time.monotonic()) - self.started if self.started else 0.0
+        return {
+            "queries": self.queries,
+            "responses": self.responses,
+            "timeouts": self.timeouts,
+            "seconds": round(seconds, 3),
+            "queries_per_second": round(self.queries / seconds, 1) if seconds > 0 else 0.0
+        }
+
+
+class _ResolverProtocol(asyncio.DatagramProtocol):
+    def __init__(self, pending: dict):
+        self.pending = pending
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if len(data) < 2:
+            return
+        future = self.pending.pop(struct.unpack_from("!H", data)[0], None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+
+class AsyncResolver:
+    """
+    Minimal stub resolver that sends many queries concurrently over one UDP socket.
+
+    Responses are matched to queries by transaction id, so the number of queries
+    in flight is bounded only by `concurrency`, not by the number of sockets.
+    Use it as an async context manager.
+    """
+
+    def __init__(self, nameserver: tuple[str, int] = None, concurrency: int = None, timeout: float = 2.0, retries: int = 1):
+        self.nameserver = nameserver or default_nameserver()
+        self.concurrency = concurrency or int(os.getenv("NMAP_AUTOMATOR_DNS_CONCURRENCY", "200"))
+        self.timeout = timeout
+        self.retries = retries
+        self.stats = ResolverStats()
+        self.__pending = {}
+        self.__transport = None
+        self.__semaphore = None
+
+    async def __aenter__(self) -> "AsyncResolver":
+        loop = asyncio.get_running_loop()
+        self.__transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ResolverProtocol(self.__pending), remote_addr=self.nameserver
+        )
+        try:
+            # Bursts of answers arrive faster than the loop drains them; a small buffer drops them
+            self.__transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_BYTES)
+        except (OSError, AttributeError):
+            pass
+        self.__semaphore = asyncio.Semaphore(self.concurrency)
+        self.stats.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.stats.finished = time.monotonic()
+        self.__transport.close()
+
+    def __next_txid(self) -> int:
+        txid = random.getrandbits(16)
+        while txid in self.__pending:
+            txid = random.getrandbits(16)
+        return txid
+
+    async def query(self, name: str, qtype: str = "A"):
+        """
+        Send one query, retrying on timeout.
+
+        :param name: Name to look up.
+        :param qtype: Record type.
+        :return: Parsed DNSMessage, or None if every attempt timed out.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.__semaphore:
+            for _ in range(self.retries + 1):
+                txid = self.__next_txid()
+                future = loop.create_future()
+                self.__pending[txid] = future
+                self.stats.queries += 1
+                self.__transport.sendto(build_query(txid, name, qtype))
+                try:
+                    data = await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    self.__pending.pop(txid, None)
+                    self.stats.timeouts += 1
+                    continue
+                self.stats.responses += 1
+                try:
+                    return parse_message(data)
+                except ValueError:
+                    return None
+        return None
+
+    async def resolve(self, name: str, qtype: str = "A") -> tuple[list[str], int]:
+        """
+        Resolve a name to its addresses.
+
+        :param name: Name to resolve.
+        :param qtype: 'A' or 'AAAA'.
+        :return: Tuple of (addresses, minimum TTL); addresses is empty if the name does not resolve.
+        """
+        message = await self.query(name, qtype)
+        if message is None or message.rcode != RCODE_NOERROR:
+            return [], 0
+        records = [answer for answer in message.answers if answer.rtype == QTYPES[qtype]]
+        return [record.data for record in records], min((record.ttl for record in records), default=0)
+
+    async def resolve_many(self, names, qtype: str = "A") -> dict[str, tuple[list[str], int]]:
+        """Resolve every name concurrently and return only the ones that resolved."""
+        names = list(dict.fromkeys(normalize_name(name) for name in names))
+        results = await asyncio.gather(*(self.resolve(name, qtype) for name in names))
+        return {name: result for name, result in zip(names, results) if result[0]}
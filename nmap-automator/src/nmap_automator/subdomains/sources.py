@@ -0,0 +1,179 @@
+import os
+import io
+import json
+import uuid
+import struct
+import asyncio
+
+from .dns_wire import QTYPES, build_query, parse_message, normalize_name
+from .resolver import AsyncResolver
+from .wordlist import DEFAULT_WORDLIST
+
+
+def in_domain(name: str, domain: str) -> bool:
+    return name == domain or name.endswith("." + domain)
+
+
+class SubdomainSource:
+    """
+    A way of discovering subdomains.
+
+    `enumerate` returns a mapping of subdomain to (addresses, ttl) when the source
+    resolved the name itself, or to None when the name still has to be resolved.
+    """
+
+    name = None
+
+    async def enumerate(self, domain: str, resolver: AsyncResolver) -> dict:
+        raise NotImplementedError
+
+
+class WordlistSource(SubdomainSource):
+    """Brute force '<word>.<domain>' for every word of a wordlist through the async resolver."""
+
+    name = "wordlist"
+
+    def __init__(self, wordlist_path: str = None):
+        self.wordlist_path = wordlist_path or os.getenv("NMAP_AUTOMATOR_SUBDOMAIN_WORDLIST")
+
+    def words(self) -> list[str]:
+        if not self.wordlist_path:
+            return list(DEFAULT_WORDLIST)
+        with io.open(self.wordlist_path, "r") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    async def enumerate(self, domain: str, resolver: AsyncResolver) -> dict:
+        # A wildcard record makes every candidate resolve; its answers are filtered out
+        wildcard, _ = await resolver.resolve(f"{uuid.uuid4().hex[:16]}.{domain}")
+        wildcard = set(wildcard)
+
+        found = await resolver.resolve_many(f"{word}.{domain}" for word in self.words())
+        return {
+            name: (addresses, ttl) for name, (addresses, ttl) in found.items()
+            if not wildcard or not set(addresses) <= wildcard
+        }
+
+
+class ZoneTransferSource(SubdomainSource):
+    """Attempt an AXFR of the domain from each of its authoritative nameservers."""
+
+    name = "axfr"
+
+    def __init__(self, nameservers: list[tuple[str, int]] = None, timeout: float = 5.0):
+        # Explicit nameservers skip the NS lookup (useful against a local test server)
+        self.nameservers = nameservers
+        self.timeout = timeout
+
+    async def _nameservers(self, domain: str, resolver: AsyncResolver) -> list[tuple[str, int]]:
+        if self.nameservers:
+            return self.nameservers
+        message = await resolver.query(domain, "NS")
+        if message is None:
+            return []
+        hosts = [answer.data for answer in message.answers if answer.rtype == QTYPES["NS"]]
+        resolved = await resolver.resolve_many(hosts)
+        return [(address, 53) for addresses, _ in resolved.values() for address in addresses]
+
+    async def _transfer(self, domain: str, nameserver: tuple[str, int]) -> set[str]:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(*nameserver), self.timeout)
+        try:
+            query = build_query(0, domain, "AXFR", recursion=False)
+            writer.write(struct.pack("!H", len(query)) + query)
+            await writer.drain()
+
+            names = set()
+            soa_seen = 0
+            while soa_seen < 2:
+                length = struct.unpack("!H", await asyncio.wait_for(reader.readexactly(2), self.timeout))[0]
+                message = parse_message(await asyncio.wait_for(reader.readexactly(length), self.timeout))
+                if message.rcode != 0:
+                    break
+                if not message.answers:
+                    break
+                for answer in message.answers:
+                    if answer.rtype == QTYPES["SOA"]:
+                        soa_seen += 1
+                    names.add(answer.name)
+            return names
+        finally:
+            writer.close()
+
+    async def enumerate(self, domain: str, resolver: AsyncResolver) -> dict:
+        found = {}
+        for nameserver in await self._nameservers(domain, resolver):
+            try:
+                names = await self._transfer(domain, nameserver)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                print(f"Zone transfer of {domain} from {nameserver[0]} refused or failed: {e}")
+                continue
+            print(f"Zone transfer of {domain} from {nameserver[0]} returned {len(names)} name(s)")
+            found.update({name: None for name in names if name != domain and in_domain(name, domain)})
+        return found
+
+
+class CertificateLogSource(SubdomainSource):
+    """
+    Read subdomains from certificate transparency exports stored on disk.
+
+    Every file of the directory is read: JSON arrays or JSON Lines of crt.sh-style
+    entries ('name_value', 'common_name' or 'dns_names'), or plain text with one
+    name per line.
+    """
+
+    name = "certlog"
+    NAME_FIELDS = ("name_value", "common_name", "dns_names")
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or os.getenv("NMAP_AUTOMATOR_CERTLOG_DIR", "./certlogs")
+
+    def _names_from_entry(self, entry) -> list[str]:
+        if isinstance(entry, str):
+            return entry.split()
+        names = []
+        for field in self.NAME_FIELDS:
+            value = entry.get(field)
+            if isinstance(value, list):
+                names.extend(value)
+            elif isinstance(value, str):
+                names.extend(value.split())
+        return names
+
+    def _names_from_file(self, path: str) -> list[str]:
+        with io.open(path, "r", errors="replace") as f:
+            content = f.read()
+        stripped = content.lstrip()
+        if stripped.startswith("["):
+            try:
+                return [name for entry in json.loads(stripped) for name in self._names_from_entry(entry)]
+            except json.JSONDecodeError:
+                pass
+        names = []
+        for line in content.splitlines():
+            line = line.strip()
+            if line.startswith("{"):
+                try:
+                    names.extend(self._names_from_entry(json.loads(line)))
+                    continue
+                except json.JSONDecodeError:
+                    pass
+            names.extend(line.split())
+        return names
+
+    async def enumerate(self, domain: str, resolver: AsyncResolver) -> dict:
+        if not os.path.isdir(self.directory):
+            return {}
+        found = {}
+        for file_name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, file_name)
+            if not os.path.isfile(path):
+                continue
+            for name in self._names_from_file(path):
+                name = normalize_name(name)
+                if name != domain and in_domain(name, domain):
+                    found[name] = None
+        return found
+
+
+SOURCES = {
+    source.name: source for source in (WordlistSource, ZoneTransferSource, CertificateLogSource)
+}
@@ -0,0 +1,16 @@
+# Small built-in wordlist of common subdomain labels; point
+# NMAP_AUTOMATOR_SUBDOMAIN_WORDLIST at a larger file for real engagements.
+DEFAULT_WORDLIST = (
+    "www", "www1", "www2", "mail", "mail1", "mail2", "smtp", "pop", "pop3", "imap", "webmail", "mx", "mx1", "mx2",
+    "ns", "ns1", "ns2", "ns3", "ns4", "dns", "dns1", "dns2",
+    "admin", "administrator", "portal", "intranet", "extranet", "internal", "corp", "office",
+    "vpn", "vpn1", "vpn2", "remote", "gateway", "gw", "router", "firewall", "fw", "proxy",
+    "test", "testing", "dev", "development", "stage", "staging", "beta", "alpha", "demo", "qa", "uat", "sandbox",
+    "api", "api1", "api2", "app", "apps", "mobile", "m", "static", "cdn", "assets", "media", "img", "images",
+    "blog", "shop", "store", "support", "help", "helpdesk", "docs", "wiki", "forum", "news",
+    "fs", "fs1", "fs2", "ftp", "sftp", "files", "backup", "storage", "nas",
+    "db", "database", "sql", "mysql", "mongo", "redis", "ldap", "ad", "dc", "dc1", "dc2",
+    "git", "gitlab", "jenkins", "ci", "jira", "confluence", "monitor", "monitoring", "nagios", "grafana",
+    "siem", "snmp", "syslog", "log", "logs", "auth", "sso", "login", "id", "accounts",
+    "crm", "erp", "hr", "finance", "billing", "pay", "payments", "secure", "ssl",
+)
@@ -0,0 +1,85 @@
+import io
+import os
+import csv
+import json
+import mmap
+
+# Files at least this large are read through a memory map instead of buffered reads
+MMAP_THRESHOLD_BYTES = 64 * 1024 * 1024
+DEFAULT_BATCH_ROWS = 5000
+
+
+def _detect_format(file_path: str) -> str:
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson"
+    if extension == ".csv":
+        return "csv"
+    raise ValueError(f"Unsupported scan file format '{extension}', expected .csv, .ndjson or .jsonl")
+
+
+def _iter_mmap_lines(file_path: str):
+    """Yield decoded lines of a file through a read-only memory map."""
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for line in iter(mapped.readline, b""):
+                yield line.decode("utf-8")
+
+
+def _iter_lines(file_path: str, use_mmap: bool):
+    if use_mmap:
+        yield from _iter_mmap_lines(file_path)
+    else:
+        with io.open(file_path, "r", newline="") as f:
+            yield from f
+
+
+def iter_result_rows(file_path: str, use_mmap: bool = None):
+    """
+    Stream scan result rows from a CSV or NDJSON file one at a time.
+
+    :param file_path: Path to a .csv, .ndjson or .jsonl scan file.
+    :param use_mmap: Force memory-mapped reads on or off; by default large files are mapped.
+    :return: Generator of row dictionaries.
+    """
+    if not os.path.exists(file_path):
+        raise ValueError(f"File not found: {file_path}")
+    file_format = _detect_format(file_path)
+    if use_mmap is None:
+        use_mmap = os.path.getsize(file_path) >= MMAP_THRESHOLD_BYTES
+
+    lines = _iter_lines(file_path, use_mmap)
+    if file_format == "csv":
+        yield from csv.DictReader(lines)
+    else:
+        for line_number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number} of {file_path}: {e}")
+
+
+def iter_result_batches(file_path: str, batch_rows: int = DEFAULT_BATCH_ROWS, use_mmap: bool = None):
+    """
+    Stream scan result rows in lists of at most `batch_rows` rows.
+
+    Only one batch is held in memory at a time, whatever the size of the file.
+
+    :param file_path: Path to a .csv, .ndjson or .jsonl scan file.
+    :param batch_rows: Maximum number of rows per batch.
+    :param use_mmap: Force memory-mapped reads on or off; by default large files are mapped.
+    :return: Generator of lists of row dictionaries.
+    """
+    batch = []
+    for row in iter_result_rows(file_path, use_mmap=use_mmap):
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
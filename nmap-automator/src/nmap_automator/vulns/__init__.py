@@ -0,0 +1,3 @@
+# src/nmap_automator/vulns/__init__.py
+from .index import VulnIndex, build_index
+from .normalize import normalize_name, product_candidates, version_key, parse_cpe
\ No newline at end of file
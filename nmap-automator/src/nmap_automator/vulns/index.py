@@ -0,0 +1,446 @@
+import os
+import csv
+import sys
+import gzip
+import json
+import time
+import sqlite3
+import zipfile
+import argparse
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+
+from nmap_automator.scanner.records import RESULT_FIELDS
+from nmap_automator.utils.ingest import iter_result_rows
+from .normalize import (
+    NMAP_PRODUCT_ALIASES, HIGH_UNBOUNDED, LOW_UNBOUNDED, normalize_name, product_candidates, version_key, parse_cpe
+)
+
+INDEX_FORMAT = "2"
+# Range kinds, each answered by its own index range in LOOKUP_SQL
+OPEN_START, EXACT, BOUNDED_START = 0, 1, 2
+DEFAULT_INDEX_PATH = "./cve_index.sqlite"
+SUMMARY_CHARS = 300
+INSERT_BATCH = 5000
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE products (id INTEGER PRIMARY KEY, vendor TEXT NOT NULL, product TEXT NOT NULL);
+CREATE TABLE aliases (alias TEXT NOT NULL, product_id INTEGER NOT NULL, PRIMARY KEY (alias, product_id)) WITHOUT ROWID;
+CREATE TABLE cves (id INTEGER PRIMARY KEY, cve_id TEXT NOT NULL, score REAL, severity TEXT, published TEXT, summary TEXT);
+CREATE TABLE ranges (
+    product_id INTEGER NOT NULL, kind INTEGER NOT NULL, low TEXT NOT NULL, high TEXT NOT NULL, cve INTEGER NOT NULL,
+    PRIMARY KEY (product_id, kind, low, high, cve)
+) WITHOUT ROWID;
+"""
+# Build-time tables, ranges are staged with the feed document they came from
+STAGING_SCHEMA = """
+CREATE TABLE staged (product_id INTEGER, kind INTEGER, low TEXT, high TEXT, cve INTEGER, generation INTEGER);
+CREATE TABLE latest (cve INTEGER PRIMARY KEY, generation INTEGER);
+"""
+# The ranges primary key is the lookup index. Ranges open at the start ('< 9.3p2') share the
+# empty lower bound, so they are a scan over the upper bound; exact versions are an equality on
+# the lower bound; only ranges bounded on both sides scan lower bounds below the version. Every
+# row read in the first two cases is a match
+LOOKUP_SQL = f"""
+SELECT cve FROM ranges WHERE product_id = ?1 AND kind = {OPEN_START} AND low = '' AND high > ?2
+UNION SELECT cve FROM ranges WHERE product_id = ?1 AND kind = {EXACT} AND low = ?2
+UNION SELECT cve FROM ranges WHERE product_id = ?1 AND kind = {BOUNDED_START} AND low <= ?2 AND high > ?2
+"""
+
+
+def _open_feed(path: str):
+    """Yield the decoded JSON documents of a feed file: plain, gzip or zip (one document per member)."""
+    if path.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.lower().endswith(".json"):
+                    with archive.open(name) as member:
+                        yield json.load(member)
+        return
+    opener = gzip.open if path.lower().endswith(".gz") else open
+    with opener(path, "rb") as f:
+        yield json.load(f)
+
+
+def _english(entries: list, key: str = "value") -> str:
+    for entry in entries or []:
+        if entry.get("lang", "en").startswith("en"):
+            return (entry.get(key) or "")[:SUMMARY_CHARS]
+    return ""
+
+
+def _iter_nodes(nodes: list):
+    for node in nodes or []:
+        yield node
+        yield from _iter_nodes(node.get("children"))
+
+
+def _iter_cves(document: dict):
+    """
+    Normalize the CVE entries of an NVD feed document.
+
+    Both the NVD 2.0 format ('vulnerabilities') and the legacy 1.1 feeds
+    ('CVE_Items') are read.
+
+    :return: Tuples (cve_id, score, severity, published, summary, matches), where matches
+        are the vulnerable CPE match dictionaries of the entry.
+    """
+    for item in document.get("vulnerabilities") or []:
+        cve = item.get("cve") or {}
+        score = severity = None
+        metrics = cve.get("metrics") or {}
+        for name in ("cvssMetricV40", "cvssMetricV31", "cvssMetricV30", "cvssMetricV2"):
+            if metrics.get(name):
+                metric = metrics[name][0]
+                score = metric.get("cvssData", {}).get("baseScore")
+                severity = metric.get("cvssData", {}).get("baseSeverity") or metric.get("baseSeverity")
+                break
+        matches = [
+            {**match, "cpe": match.get("criteria")}
+            for configuration in cve.get("configurations") or []
+            for node in _iter_nodes(configuration.get("nodes"))
+            for match in node.get("cpeMatch") or []
+            if match.get("vulnerable", True)
+        ]
+        yield cve.get("id"), score, severity, cve.get("published"), _english(cve.get("descriptions")), matches
+
+    for item in document.get("CVE_Items") or []:
+        cve = item.get("cve") or {}
+        impact = item.get("impact") or {}
+        score = severity = None
+        if impact.get("baseMetricV3"):
+            score = impact["baseMetricV3"].get("cvssV3", {}).get("baseScore")
+            severity = impact["baseMetricV3"].get("cvssV3", {}).get("baseSeverity")
+        elif impact.get("baseMetricV2"):
+            score = impact["baseMetricV2"].get("cvssV2", {}).get("baseScore")
+            severity = impact["baseMetricV2"].get("severity")
+        matches = [
+            {**match, "cpe": match.get("cpe23Uri")}
+            for node in _iter_nodes((item.get("configurations") or {}).get("nodes"))
+            for match in node.get("cpe_match") or []
+            if match.get("vulnerable", True)
+        ]
+        summary = _english((cve.get("description") or {}).get("description_data"))
+        yield (cve.get("CVE_data_meta") or {}).get("ID"), score, severity, item.get("publishedDate"), summary, matches
+
+
+def _version_bounds(match: dict, version: str, update: str):
+    """
+    Lower and upper key of the versions a CPE match covers.
+
+    An exclusive lower bound is the bound's key followed by HIGH_UNBOUNDED, an inclusive
+    upper bound likewise; this works because no version key is a prefix of another, so a
+    single 'low <= key < high' comparison covers all four bound kinds.
+
+    :return: (low, high), or None if a bound cannot be parsed.
+    """
+    start, end = match.get("versionStartIncluding"), match.get("versionEndIncluding")
+    start_excl, end_excl = match.get("versionStartExcluding"), match.get("versionEndExcluding")
+    if start or end or start_excl or end_excl:
+        low, high = LOW_UNBOUNDED, HIGH_UNBOUNDED
+        if start or start_excl:
+            key = version_key(start or start_excl)
+            if key is None:
+                return None
+            low = key if start else key + HIGH_UNBOUNDED
+        if end or end_excl:
+            key = version_key(end or end_excl)
+            if key is None:
+                return None
+            high = key + HIGH_UNBOUNDED if end else key
+        return low, high
+    if version in ("*", "-", ""):
+        return LOW_UNBOUNDED, HIGH_UNBOUNDED
+    # An exact version; CPE keeps suffixes such as OpenSSH's 'p1' in the update field
+    key = version_key(version + (update if update not in ("*", "-", "") else ""))
+    return (key, key + HIGH_UNBOUNDED) if key else None
+
+
+def build_index(feed_paths: list[str], index_path: str = DEFAULT_INDEX_PATH) -> dict:
+    """
+    Build the CVE correlation index from downloaded NVD CVE feed files.
+
+    Vulnerable application CPE matches are stored as version ranges per
+    (vendor, product). Platform conditions of the NVD configurations (for
+    example 'running on Windows') are not evaluated, a service matches on its
+    own CPE. The index is written to a temporary file and moved into place, so
+    readers never open a half-built index.
+
+    :param feed_paths: NVD JSON feeds (.json, .json.gz or .zip), 1.1 or 2.0 format.
+    :param index_path: Where to write the SQLite index.
+    :return: Counts of the indexed CVEs, products and version ranges.
+    """
+    for path in feed_paths:
+        if not os.path.exists(path):
+            raise ValueError(f"File not found: {path}")
+
+    directory = os.path.dirname(os.path.abspath(index_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".cve-index-", suffix=".sqlite", dir=directory)
+    os.close(fd)
+    started = time.monotonic()
+    try:
+        connection = sqlite3.connect(temp_path)
+        connection.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA + STAGING_SCHEMA)
+        products, cve_ids, generations = {}, {}, {}
+        ranges = []
+        skipped = 0
+        for path in feed_paths:
+            for document in _open_feed(path):
+                generation = len(generations) + 1
+                cve_rows = []
+                for cve_id, score, severity, published, summary, matches in _iter_cves(document):
+                    if not cve_id:
+                        continue
+                    number = cve_ids.setdefault(cve_id, len(cve_ids) + 1)
+                    # Later feeds (e.g. the 'modified' feed) replace earlier entries of the same CVE
+                    generations[number] = generation
+                    cve_rows.append((number, cve_id, score, severity, published, summary))
+                    for match in matches:
+                        cpe = parse_cpe(match.get("cpe"))
+                        if cpe is None or cpe[0] not in ("a", "o"):
+                            continue
+                        _, vendor, product, version, update = cpe
+                        bounds = _version_bounds(match, version, update)
+                        if bounds is None:
+                            skipped += 1
+                            continue
+                        low, high = bounds
+                        kind = OPEN_START if low == LOW_UNBOUNDED else EXACT if high == low + HIGH_UNBOUNDED else BOUNDED_START
+                        product_id = products.setdefault((vendor, product), len(products) + 1)
+                        ranges.append((product_id, kind, low, high, number, generation))
+                    if len(ranges) >= INSERT_BATCH:
+                        connection.executemany("INSERT INTO staged VALUES (?, ?, ?, ?, ?, ?)", ranges)
+                        ranges = []
+                connection.executemany("INSERT OR REPLACE INTO cves VALUES (?, ?, ?, ?, ?, ?)", cve_rows)
+                print(f"Indexed {len(cve_rows)} CVEs from {path}")
+        connection.executemany("INSERT INTO staged VALUES (?, ?, ?, ?, ?, ?)", ranges)
+        connection.executemany("INSERT INTO latest VALUES (?, ?)", generations.items())
+        connection.executescript("""
+            INSERT OR IGNORE INTO ranges
+            SELECT s.product_id, s.kind, s.low, s.high, s.cve FROM staged s JOIN latest l ON l.cve = s.cve AND l.generation = s.generation;
+            DROP TABLE staged;
+            DROP TABLE latest;
+        """)
+
+        connection.executemany("INSERT INTO products VALUES (?, ?, ?)", ((i, v, p) for (v, p), i in products.items()))
+        aliases = set()
+        for (vendor, product), product_id in products.items():
+            aliases.add((normalize_name(product), product_id))
+            aliases.add((normalize_name(vendor) + "_" + normalize_name(product), product_id))
+        for alias, cpes in NMAP_PRODUCT_ALIASES.items():
+            for cpe in cpes:
+                product_id = products.get(tuple(cpe.split(":", 1)))
+                if product_id:
+                    aliases.add((alias, product_id))
+        connection.executemany("INSERT INTO aliases VALUES (?, ?)", aliases)
+
+        range_count = connection.execute("SELECT COUNT(*) FROM ranges").fetchone()[0]
+        stats = {"cves": len(cve_ids), "products": len(products), "ranges": range_count, "skipped_matches": skipped}
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("format", INDEX_FORMAT),
+            ("built_at", time.strftime("%Y-%m-%dT%H:%M:%S")),
+            ("sources", json.dumps([os.path.basename(path) for path in feed_paths])),
+            ("stats", json.dumps(stats)),
+        ])
+        connection.commit()
+        connection.execute("ANALYZE")
+        connection.execute("VACUUM")
+        connection.close()
+        os.replace(temp_path, index_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    print(f"CVE index of {stats['cves']} CVEs and {stats['ranges']} ranges written to {index_path} in {time.monotonic() - started:.1f}s")
+    return stats
+
+
+class VulnIndex:
+    """
+    Read-only view of a CVE correlation index.
+
+    Each thread gets its own SQLite connection to the immutable index file.
+    Product resolutions and (product, version) lookups are cached, since a scan
+    repeats the same few hundred service banners across thousands of ports.
+    """
+
+    def __init__(self, index_path: str = None, cache_size: int = 65536):
+        self.index_path = index_path or os.getenv("NMAP_AUTOMATOR_CVE_INDEX", DEFAULT_INDEX_PATH)
+        if not os.path.exists(self.index_path):
+            raise FileNotFoundError(f"CVE index not found at '{self.index_path}', build it with nmap-automator-cve build")
+        stat = os.stat(self.index_path)
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        self.cache_size = cache_size
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__products = {}
+        self.__cves = {}
+        self.__matches = OrderedDict()
+        meta = dict(self.__connection().execute("SELECT key, value FROM meta").fetchall())
+        if meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported CVE index format {meta.get('format')!r} in {self.index_path}, rebuild the index")
+        self.meta = {"built_at": meta.get("built_at"), "sources": json.loads(meta.get("sources", "[]")), **json.loads(meta.get("stats", "{}"))}
+
+    def __connection(self) -> sqlite3.Connection:
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            uri = "file:" + os.path.abspath(self.index_path) + "?mode=ro&immutable=1"
+            connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            connection.execute("PRAGMA mmap_size = 268435456")
+            self.__local.connection = connection
+        return connection
+
+    def resolve_product(self, product: str) -> tuple:
+        """
+        CPE product ids a detected product name stands for.
+
+        :param product: Product string reported by nmap.
+        :return: Tuple of product ids, empty if the product is unknown to the index.
+        """
+        ids = self.__products.get(product)
+        if ids is None:
+            ids = ()
+            connection = self.__connection()
+            for candidate in product_candidates(product):
+                ids = tuple(row[0] for row in connection.execute("SELECT product_id FROM aliases WHERE alias = ?", (candidate,)))
+                if ids:
+                    break
+            self.__products[product] = ids
+        return ids
+
+    def lookup(self, product: str, version: str) -> tuple:
+        """
+        CVEs affecting a product version.
+
+        :param product: Product string reported by nmap, e.g. 'OpenSSH'.
+        :param version: Version string reported by nmap, e.g. '8.9p1 Ubuntu 3ubuntu0.6'.
+        :return: Tuple of (cve_id, score, severity), highest score first. Services without
+            a parsable version match nothing rather than every CVE of the product.
+        """
+        cache_key = (product, version)
+        with self.__lock:
+            cached = self.__matches.get(cache_key)
+            if cached is not None:
+                self.__matches.move_to_end(cache_key)
+                return cached
+
+        matches = ()
+        key = version_key(version)
+        product_ids = self.resolve_product(product) if key else ()
+        if product_ids:
+            connection = self.__connection()
+            found = set()
+            for product_id in product_ids:
+                found.update(row[0] for row in connection.execute(LOOKUP_SQL, (product_id, key)))
+            # CVE details are resolved by row id from a dictionary, most lookups of a product share their CVEs
+            missing = [number for number in found if number not in self.__cves]
+            for start in range(0, len(missing), 500):
+                batch = missing[start:start + 500]
+                sql = f"SELECT id, cve_id, score, severity FROM cves WHERE id IN ({','.join('?' * len(batch))})"
+                for number, cve_id, score, severity in connection.execute(sql, batch):
+                    self.__cves[number] = (cve_id, score, severity)
+            matches = tuple(sorted((self.__cves[number] for number in found), key=lambda match: (-(match[1] or 0), match[0])))
+
+        with self.__lock:
+            self.__matches[cache_key] = matches
+            if len(self.__matches) > self.cache_size:
+                self.__matches.popitem(last=False)
+        return matches
+
+    def __annotate_row(self, row, min_score: float) -> tuple[dict, list]:
+        row = row.to_dict() if hasattr(row, "to_dict") else dict(row)
+        matches = [match for match in self.lookup(row.get("Product"), row.get("Version")) if (match[1] or 0) >= min_score]
+        row["CVEs"] = [match[0] for match in matches]
+        row["CVSS"] = matches[0][1] if matches else None
+        return row, matches
+
+    def annotate(self, rows, min_score: float = 0.0):
+        """
+        Add the matching CVEs to scan rows.
+
+        :param rows: Scan rows as dictionaries or PortRecords.
+        :param min_score: Ignore CVEs scored below this CVSS base score.
+        :return: Iterator of row dictionaries with 'CVEs' (ids, highest score first) and 'CVSS' (highest score or None).
+        """
+        for row in rows:
+            yield self.__annotate_row(row, min_score)[0]
+
+    def correlate(self, rows, state: str = "open", min_score: float = 0.0, limit: int = 1000) -> dict:
+        """
+        Correlate the services of a scan with the index.
+
+        :param rows: Scan rows as dictionaries or PortRecords.
+        :param state: Only check ports in this state; None checks every row.
+        :param min_score: Ignore CVEs scored below this CVSS base score.
+        :param limit: Maximum number of matched rows returned, highest score first.
+        :return: Dictionary with the matched rows, per-CVE counts and the index metadata.
+        """
+        started = time.monotonic()
+        checked = matched = 0
+        cve_counts, cves = Counter(), {}
+        matched_rows = []
+        for row in rows:
+            if state is not None and row.get("State") != state:
+                continue
+            checked += 1
+            row, matches = self.__annotate_row(row, min_score)
+            if not matches:
+                continue
+            matched += 1
+            for cve_id, score, severity in matches:
+                cve_counts[cve_id] += 1
+                cves[cve_id] = (score, severity)
+            matched_rows.append(row)
+            # Keep memory bounded on huge scans: trim to the best rows once the list doubles
+            if len(matched_rows) >= 2 * limit:
+                matched_rows.sort(key=lambda row: -(row["CVSS"] or 0))
+                del matched_rows[limit:]
+        matched_rows.sort(key=lambda row: -(row["CVSS"] or 0))
+        return {
+            "services_checked": checked,
+            "services_matched": matched,
+            "rows": matched_rows[:limit],
+            "cves": [
+                {"cve_id": cve_id, "score": cves[cve_id][0], "severity": cves[cve_id][1], "ports": count}
+                for cve_id, count in cve_counts.most_common()
+            ],
+            "seconds": round(time.monotonic() - started, 3),
+            "index": self.meta
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline CVE correlation of detected services")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the index from downloaded NVD CVE JSON feeds")
+    build.add_argument("feeds", nargs="+", help="NVD CVE feed files (.json, .json.gz or .zip)")
+    build.add_argument("--index", default=os.getenv("NMAP_AUTOMATOR_CVE_INDEX", DEFAULT_INDEX_PATH), help="Index file to write")
+    annotate = commands.add_parser("annotate", help="Write a scan result file with the matching CVEs of each port")
+    annotate.add_argument("scan_file", help="CSV or NDJSON scan result file")
+    annotate.add_argument("--index", default=os.getenv("NMAP_AUTOMATOR_CVE_INDEX", DEFAULT_INDEX_PATH), help="Index file to read")
+    annotate.add_argument("--output", help="CSV file to write, default stdout")
+    annotate.add_argument("--min-score", type=float, default=0.0, help="Ignore CVEs scored below this CVSS base score")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_index(args.feeds, args.index)
+        return
+
+    index = VulnIndex(args.index)
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS + ["CVSS", "CVEs"], extrasaction="ignore")
+        writer.writeheader()
+        for row in index.annotate(iter_result_rows(args.scan_file), args.min_score):
+            row["CVEs"] = ";".join(row["CVEs"])
+            writer.writerow(row)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import re
+
+# Words nmap appends to product names that never appear in CPE product names
+PRODUCT_NOISE = {
+    "httpd", "smtpd", "ftpd", "sshd", "imapd", "pop3d", "named", "daemon", "server", "service",
+    "db", "database", "http", "proxy", "api", "rest", "key", "value", "store", "engine", "jsp"
+}
+# nmap product names whose CPE vendor:product cannot be derived from the name itself
+NMAP_PRODUCT_ALIASES = {
+    "apache_httpd": ["apache:http_server"],
+    "apache_tomcat_coyote_jsp_engine": ["apache:tomcat"],
+    "microsoft_iis_httpd": ["microsoft:internet_information_services", "microsoft:iis"],
+    "microsoft_sql_server": ["microsoft:sql_server"],
+    "mysql": ["oracle:mysql", "mysql:mysql"],
+    "postgresql_db": ["postgresql:postgresql"],
+    "vsftpd": ["vsftpd_project:vsftpd", "beasts:vsftpd"],
+    "dovecot_imapd": ["dovecot:dovecot"],
+    "dovecot_pop3d": ["dovecot:dovecot"],
+    "samba_smbd": ["samba:samba"],
+    "dropbear_sshd": ["dropbear_ssh_project:dropbear_ssh"],
+    "jetty": ["eclipse:jetty", "mortbay:jetty"],
+    "redis_key_value_store": ["redis:redis"],
+    "elasticsearch_rest_api": ["elastic:elasticsearch"],
+    "squid_http_proxy": ["squid-cache:squid"],
+    "exim_smtpd": ["exim:exim"],
+    "isc_bind": ["isc:bind"],
+}
+# Pre-release markers sort before the release they precede (1.0rc1 < 1.0)
+PRE_RELEASE = {"alpha", "beta", "rc", "pre", "preview", "dev", "snapshot"}
+# Version keys are compared as plain strings. Every key ends with the terminator, which sorts
+# after pre-release components and before post-release ones; HIGH_UNBOUNDED sorts after any key
+TERMINATOR = "."
+HIGH_UNBOUNDED = "~"
+LOW_UNBOUNDED = ""
+
+_NAME_SPLIT = re.compile(r"[^a-z0-9]+")
+_VERSION_PARTS = re.compile(r"\d+|[a-z]+")
+_CPE_SPLIT = re.compile(r"(?<!\\):")
+
+
+def normalize_name(text: str) -> str:
+    """Lower-case a product or vendor name and join its words with underscores."""
+    return "_".join(part for part in _NAME_SPLIT.split((text or "").lower()) if part)
+
+
+def product_candidates(product: str) -> list[str]:
+    """
+    Names to look a detected product up under, most specific first.
+
+    :param product: Product string reported by nmap, e.g. 'Apache httpd' or 'Postfix smtpd'.
+    :return: Normalized names, the full name and the name without nmap's noise words.
+    """
+    words = [word for word in _NAME_SPLIT.split((product or "").lower()) if word]
+    if not words:
+        return []
+    candidates = ["_".join(words)]
+    meaningful = [word for word in words if word not in PRODUCT_NOISE]
+    # Single words of longer names are not tried, 'Microsoft Windows RPC' must not match 'windows'
+    if meaningful and meaningful != words:
+        candidates.append("_".join(meaningful))
+    return candidates
+
+
+def version_key(version: str):
+    """
+    Sortable key of a version string.
+
+    Only the leading version of nmap strings such as '8.9p1 Ubuntu 3ubuntu0.6' or
+    '5.7.33-0ubuntu0.18.04.1' is used. Numeric parts compare as numbers, letter parts
+    as text, pre-release parts sort before the release (1.0rc1 < 1.0) and other
+    suffixes after it (8.2 < 8.2p1 < 8.3).
+
+    :param version: Version string.
+    :return: Key string, or None if the string holds no number.
+    """
+    text = (version or "").strip().lower().split(" ", 1)[0]
+    # Drop distribution revisions: '-0ubuntu1', '+deb11u2', '~bpo'
+    text = re.split(r"[+~]|-(?=\d)", text, maxsplit=1)[0]
+    parts = _VERSION_PARTS.findall(text)
+    if not parts or not any(part.isdigit() for part in parts):
+        return None
+    key = []
+    for part in parts:
+        if part.isdigit():
+            digits = part.lstrip("0") or "0"
+            key.append(f"n{len(digits):02d}{digits}")
+        elif part in PRE_RELEASE:
+            key.append(f"-{part} ")
+        else:
+            key.append(f"a{part} ")
+    return "".join(key) + TERMINATOR
+
+
+def parse_cpe(cpe: str):
+    """
+    Split a CPE 2.3 formatted string.
+
+    :param cpe: e.g. 'cpe:2.3:a:openbsd:openssh:8.2:p1:*:*:*:*:*:*'.
+    :return: (part, vendor, product, version, update) with escapes removed, or None if malformed.
+    """
+    fields = _CPE_SPLIT.split(cpe or "")
+    if len(fields) < 7 or fields[0] != "cpe" or fields[1] != "2.3":
+        return None
+    part, vendor, product, version, update = (field.replace("\\", "") for field in fields[2:7])
+    return part, vendor, product, version, update